@@ -0,0 +1,129 @@
+"""
+Benchmark del cómputo de materiales (BOM): modelos con 5k objetos y 200 reglas.
+Compara la pasada única de bom_service con evaluar cada regla recorriendo todos los objetos
+(como se hacía del lado del cliente) y mide POST /materiales-modelo3d/modelo3d/{id}/bom.
+Ejecutar: python benchmarks/bench_bom.py [--objetos 5000] [--reglas 200]
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import random
+
+from common import configurar_entorno, reset_db, medir, imprimir, crear_usuario, crear_modelos3d
+from bench_material_catalog import poblar, CATEGORIAS
+
+MATERIALES = 2_000
+TIPOS = ["wall", "window", "door", "floor", "column", "stair"]
+METRICAS = [
+    "area_piso", "area_paredes", "area_paredes_neta", "perimetro_total", "num_puertas",
+    "num_ventanas", "num_aberturas", *(f"{campo}:{tipo}" for campo in ("area", "longitud", "conteo") for tipo in TIPOS),
+]
+
+def generar_medidas(rng: random.Random, n_objetos: int) -> dict:
+    objetos = []
+    for i in range(n_objetos):
+        ancho, alto = rng.uniform(0.5, 6), rng.uniform(0.5, 3)
+        objetos.append({"id": i, "tipo": rng.choice(TIPOS), "ancho": round(ancho, 2), "alto": round(alto, 2),
+                        "profundidad": 0.2, "area": round(ancho * alto, 2), "posicion": {"x": 0, "y": 0, "z": 0}})
+    paredes = [o for o in objetos if o["tipo"] == "wall"]
+    return {
+        "area_total": 240.0,
+        "area_paredes": round(sum(o["area"] for o in paredes), 2),
+        "perimetro_total": round(sum(o["ancho"] for o in paredes), 2),
+        "num_paredes": len(paredes),
+        "num_ventanas": sum(o["tipo"] == "window" for o in objetos),
+        "num_puertas": sum(o["tipo"] == "door" for o in objetos),
+        "objetos": objetos,
+        "total_objetos": n_objetos,
+    }
+
+def crear_reglas(rng: random.Random, n_reglas: int):
+    """Reglas repartidas entre categorías, cada una con un material por defecto de su unidad"""
+    from database import SessionLocal
+    from models.material import Material
+    from models.regla_bom import ReglaBOM
+
+    db = SessionLocal()
+    try:
+        materiales = db.query(Material.id, Material.categoria_id, Material.unidad_medida).all()
+        db.bulk_insert_mappings(ReglaBOM, [
+            {
+                "nombre": f"Regla {i}", "categoria_id": m.categoria_id, "unidad_medida": m.unidad_medida,
+                "metrica": rng.choice(METRICAS), "factor": round(rng.uniform(0.1, 3), 2),
+                "desperdicio_pct": rng.choice([0, 5, 10]), "redondear_arriba": m.unidad_medida == "unidad",
+                "material_id": m.id, "activa": True,
+            }
+            for i, m in enumerate(rng.sample(materiales, n_reglas))
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def bom_por_regla(medidas: dict, reglas, materiales) -> dict:
+    """Referencia O(objetos × reglas): cada regla recorre todos los objetos"""
+    cantidades = {}
+    for regla in reglas:
+        campo, _, tipo = regla.metrica.partition(":")
+        if tipo:
+            valores = [o["area"] if campo == "area" else o["ancho"] if campo == "longitud" else 1
+                       for o in medidas["objetos"] if o["tipo"] == tipo]
+            metrica = sum(valores)
+        else:
+            metrica = sum(1 for o in medidas["objetos"] if o["tipo"] in ("wall", "window", "door"))  # aproximación
+        cantidad = metrica * regla.factor * (1 + regla.desperdicio_pct / 100)
+        if regla.redondear_arriba:
+            cantidad = math.ceil(cantidad)
+        cantidades[regla.material_id] = cantidades.get(regla.material_id, 0) + cantidad
+    return cantidades
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--objetos", type=int, default=5_000)
+    parser.add_argument("--reglas", type=int, default=200)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(MATERIALES)
+    rng = random.Random(11)
+    medidas = generar_medidas(rng, args.objetos)
+    usuario_id, headers = crear_usuario()
+    modelo_id = crear_modelos3d(usuario_id, 1, medidas=medidas)[0]
+    crear_reglas(rng, args.reglas)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from repositories.material_repository import MaterialRepository
+    from repositories.regla_bom_repository import ReglaBOMRepository
+    from services.bom_service import calcular_metricas, calcular_bom
+
+    db = SessionLocal()
+    reglas = ReglaBOMRepository.get_all(db, solo_activas=True)
+    materiales = MaterialRepository.get_pricing_rows(db, [r.material_id for r in reglas])
+    metricas = calcular_metricas(medidas, medidas["objetos"])
+    lineas, omitidas = calcular_bom(metricas, reglas, materiales, {})
+
+    client = TestClient(app_main.app)
+    url = f"/materiales-modelo3d/modelo3d/{modelo_id}/bom"
+
+    def post(guardar: bool):
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+            response = client.post(url, params={"guardar": guardar}, json={}, headers=headers)
+        assert response.status_code == 200, response.text
+
+    imprimir(f"{args.objetos} objetos × {args.reglas} reglas ({len(lineas)} materiales, {CATEGORIAS} categorías)", {
+        "calcular_metricas (ms)": medir(lambda: calcular_metricas(medidas, medidas["objetos"]), args.repeticiones),
+        "calcular_bom (ms)": medir(lambda: calcular_bom(metricas, reglas, materiales, {}), args.repeticiones),
+        "referencia regla × objetos (ms)": medir(lambda: bom_por_regla(medidas, reglas, materiales), args.repeticiones),
+        "POST .../bom?guardar=false (ms)": medir(lambda: post(False), args.repeticiones),
+        "POST .../bom?guardar=true (ms)": medir(lambda: post(True), args.repeticiones),
+        "reglas omitidas": len(omitidas),
+    })
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark de GET /categorias/ (instantánea con conteos agrupados, ETag y 304) y de la
+construcción de páginas de GET /materiales/ agregando la categoría desde la instantánea
+en lugar de joinedload(Material.categoria). Compara con las consultas anteriores.
+Ejecutar: python benchmarks/bench_categorias.py [--materiales 50000]
+"""
+
+import argparse
+import json
+
+from common import configurar_entorno, reset_db, medir, imprimir
+from bench_material_catalog import poblar
+
+def categorias_anterior(db) -> bytes:
+    """GET /categorias/ anterior: OUTER JOIN agrupado por categoría + COUNT + serialización pydantic"""
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy import func
+    from models.categoria import Categoria
+    from models.material import Material
+    from schemas.response_schemas import SuccessResponse
+
+    filas = db.query(Categoria, func.count(Material.id)).outerjoin(Material).group_by(Categoria.id).all()
+    categorias = [
+        {"id": c.id, "codigo": c.codigo, "nombre": c.nombre, "descripcion": c.descripcion, "imagen_url": c.imagen_url,
+         "fecha_creacion": c.fecha_creacion, "fecha_actualizacion": c.fecha_actualizacion, "total_materiales": total}
+        for c, total in filas
+    ]
+    total = db.query(func.count(Categoria.id)).scalar()
+    respuesta = SuccessResponse(message="Categorías obtenidas exitosamente", data={"categorias": categorias, "total": total})
+    return json.dumps(jsonable_encoder(respuesta)).encode()
+
+def pagina_anterior(db, categoria_id, skip: int, limit: int) -> bytes:
+    """Página de GET /materiales/ anterior: joinedload(Material.categoria) por cada consulta"""
+    from sqlalchemy.orm import joinedload
+    from models.material import Material
+    from repositories.material_repository import MaterialRepository
+    from services.material_catalog_service import material_to_dict
+
+    materiales = MaterialRepository._filtered_query(db, categoria_id, None).options(
+        joinedload(Material.categoria)
+    ).order_by(Material.id).offset(skip).limit(limit).all()
+    total = MaterialRepository.count_filtered(db, categoria_id, None)
+    db.expunge_all()
+    return json.dumps({"materiales": [material_to_dict(m) for m in materiales], "total": total}).encode()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--materiales", type=int, default=50_000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(args.materiales)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from models.material import Material
+    from services.material_catalog_service import categoria_snapshot, material_catalog
+
+    client = TestClient(app_main.app)
+    db = SessionLocal()
+
+    respuesta = client.get("/categorias/")
+    etag = respuesta.headers["ETag"]
+    anterior = json.loads(categorias_anterior(db))
+    assert respuesta.json()["data"]["categorias"] == anterior["data"]["categorias"]
+
+    def miss():
+        categoria_snapshot.invalidate()
+        assert client.get("/categorias/").headers["X-Catalog-Cache"] == "miss"
+
+    imprimir(f"GET /categorias/ ({args.materiales} materiales, {anterior['data']['total']} categorías)", {
+        "Anterior: JOIN agrupado + COUNT + pydantic, en proceso (ms)": medir(lambda: categorias_anterior(db), args.repeticiones),
+        "Instantánea: reconstrucción en proceso (ms)": medir(
+            lambda: (categoria_snapshot.invalidate(), categoria_snapshot.get(db)), args.repeticiones
+        ),
+        "GET /categorias/ miss (ms)": medir(miss, args.repeticiones),
+        "GET /categorias/ hit (ms)": medir(lambda: client.get("/categorias/"), args.repeticiones),
+        "GET /categorias/ If-None-Match -> 304 (ms)": medir(
+            lambda: client.get("/categorias/", headers={"If-None-Match": etag}), args.repeticiones
+        ),
+    })
+
+    # Páginas del catálogo: mismo contenido, la categoría sale de la instantánea
+    paginas = {"sin filtro": (None, 0), "por categoría": (7, 0), "página profunda": (None, args.materiales - 200)}
+    filas = {}
+    for nombre, (categoria_id, skip) in paginas.items():
+        url = f"/materiales/?skip={skip}&limit=100" + (f"&categoria_id={categoria_id}" if categoria_id else "")
+        nueva = client.get(url).json()["data"]
+        assert nueva["materiales"] == json.loads(pagina_anterior(db, categoria_id, skip, 100))["materiales"]
+
+        def pagina_miss():
+            material_catalog.invalidate()
+            assert client.get(url).headers["X-Catalog-Cache"] == "miss"
+
+        filas[f"{nombre}: joinedload anterior, en proceso (ms)"] = medir(
+            lambda: pagina_anterior(db, categoria_id, skip, 100), args.repeticiones
+        )
+        filas[f"{nombre}: instantánea, en proceso (ms)"] = medir(
+            lambda: (material_catalog.invalidate(), material_catalog.get_page(db, categoria_id, None, skip, 100)),
+            args.repeticiones,
+        )
+        filas[f"{nombre}: GET /materiales/ miss (ms)"] = medir(pagina_miss, args.repeticiones)
+    imprimir("Páginas de GET /materiales/ (limit=100)", filas)
+
+    # Crear un material invalida la instantánea y actualiza el conteo
+    antes = client.get("/categorias/7").json()["data"]["total_materiales"]
+    db.add(Material(codigo="BENCH-NUEVO", nombre="Nuevo", precio_base=1, unidad_medida="m2", categoria_id=7))
+    db.commit()
+    despues = client.get("/categorias/")
+    assert despues.headers["ETag"] != etag and despues.headers["X-Catalog-Cache"] == "miss"
+    assert client.get("/categorias/7").json()["data"]["total_materiales"] == antes + 1
+    imprimir("Invalidación", {"total_materiales de la categoría 7": f"{antes} -> {antes + 1}"})
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Benchmark del reparto de conversiones entre réplicas de FloorPlanTo3D-API con el conversor
+stub (converter_stub.py, un proceso por réplica, una conversión a la vez como el real).
+Mide throughput y latencia de ConverterDispatcher.convertir con 1, 2 y 4 réplicas y el reparto
+entre ellas; luego la subida completa POST /planos/ contra un uvicorn (STORAGE_BACKEND=local)
+con 1 y 4 réplicas, y por último la conmutación: se mata una réplica en plena carga (sus
+conversiones se reintentan en otra) y se vuelve a levantar (el health check la reincorpora).
+Ejecutar: python benchmarks/bench_converter_dispatch.py [--conversiones 64] [--concurrencia 16] [--latencia-ms 200]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ROOT, configurar_entorno, reset_db, resumen, imprimir, crear_usuario
+from bench_local_storage import puerto_libre
+
+def iniciar_replica(puerto: int, latencia_ms: float) -> subprocess.Popen:
+    import requests
+
+    replica = subprocess.Popen(
+        [sys.executable, str(ROOT / "converter_stub.py"), "--puerto", str(puerto),
+         "--latencia-ms", str(latencia_ms), "--jitter-ms", str(latencia_ms / 10)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{puerto}/health", timeout=1)
+            return replica
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError("El conversor stub no arrancó")
+
+def detener(procesos: list):
+    for proceso in procesos:
+        proceso.terminate()
+    for proceso in procesos:
+        proceso.wait()
+
+def cargar(fn, n: int, concurrencia: int) -> dict:
+    """`n` llamadas a fn(i) con `concurrencia` hilos: throughput, latencias y errores"""
+    tiempos, errores = [], []
+
+    def una(i: int):
+        inicio = time.perf_counter()
+        try:
+            fn(i)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        except Exception as e:
+            errores.append(type(e).__name__)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as pool:
+        list(pool.map(una, range(n)))
+    segundos = time.perf_counter() - inicio
+    stats = resumen(tiempos) if tiempos else {}
+    return {
+        "conv/s": round(n / segundos, 1),
+        "mediana_ms": round(stats.get("mediana_ms", 0)),
+        "p99_ms": round(stats.get("p99_ms", 0)),
+        "errores": len(errores),
+    }
+
+def reparto(dispatcher) -> str:
+    return " / ".join(str(r["atendidas"]) for r in dispatcher.estado())
+
+def escenario_dispatcher(replicas: int, args) -> dict:
+    from services.converter_dispatcher import ConverterDispatcher
+
+    puertos = [puerto_libre() for _ in range(replicas)]
+    procesos = [iniciar_replica(p, args.latencia_ms) for p in puertos]
+    try:
+        dispatcher = ConverterDispatcher([f"http://127.0.0.1:{p}" for p in puertos], pool=args.concurrencia)
+        archivo = b"\x89PNG" + b"0" * 200_000
+
+        def convertir(i: int):
+            response = dispatcher.convertir(f"plano-{i}.png", archivo)
+            assert response.status_code == 200 and response.json()["objects"]
+
+        fila = cargar(convertir, args.conversiones, args.concurrencia)
+        fila["reparto"] = reparto(dispatcher)
+        dispatcher.cerrar()
+        return fila
+    finally:
+        detener(procesos)
+
+def escenario_api(replicas: int, args, headers: dict, directorio: str) -> dict:
+    """POST /planos/ (validación, verificación contra el conversor y guardado local) por uvicorn"""
+    import httpx
+
+    puertos = [puerto_libre() for _ in range(replicas)]
+    procesos = [iniciar_replica(p, args.latencia_ms) for p in puertos]
+    puerto_api = puerto_libre()
+    env = {**os.environ, "FLOORPLAN_API_URLS": ",".join(f"http://127.0.0.1:{p}" for p in puertos)}
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(ROOT), "--port", str(puerto_api),
+         "--log-level", "warning", "--no-access-log"],
+        env=env, cwd=directorio, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    procesos.append(servidor)
+    try:
+        api = httpx.Client(base_url=f"http://127.0.0.1:{puerto_api}", headers=headers, timeout=120,
+                           limits=httpx.Limits(max_connections=args.concurrencia))
+        for _ in range(100):
+            try:
+                api.get("/docs")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        archivo = b"\x89PNG" + b"0" * 200_000
+
+        def subir(i: int):
+            response = api.post("/planos/", data={"nombre": f"Plano {i}"},
+                                files={"file": ("plano.png", archivo, "image/png")})
+            assert response.status_code == 200, response.text
+
+        fila = cargar(subir, args.conversiones, args.concurrencia)
+        api.close()
+        return fila
+    finally:
+        detener(procesos)
+
+def escenario_conmutacion(args) -> dict:
+    """4 réplicas; a mitad de la carga se mata una y después se vuelve a levantar en el mismo puerto"""
+    from services.converter_dispatcher import ConverterDispatcher
+
+    puertos = [puerto_libre() for _ in range(4)]
+    procesos = [iniciar_replica(p, args.latencia_ms) for p in puertos]
+    try:
+        dispatcher = ConverterDispatcher([f"http://127.0.0.1:{p}" for p in puertos], intervalo=0.5,
+                                         pool=args.concurrencia)
+        archivo = b"\x89PNG" + b"0" * 200_000
+        mitad = args.conversiones // 2
+
+        def convertir(i: int):
+            if i == mitad:
+                procesos[0].kill()
+            assert dispatcher.convertir(f"plano-{i}.png", archivo).status_code == 200
+
+        fila = cargar(convertir, args.conversiones, args.concurrencia)
+        procesos[0].wait()
+        caida = dispatcher.estado()[0]
+        fila["reparto"] = reparto(dispatcher)
+        fila["réplica muerta marcada caída"] = not caida["viva"]
+
+        procesos[0] = iniciar_replica(puertos[0], args.latencia_ms)
+        inicio = time.perf_counter()
+        while not dispatcher.estado()[0]["viva"] and time.perf_counter() - inicio < 10:
+            time.sleep(0.05)
+        fila["reincorporada tras (s)"] = round(time.perf_counter() - inicio, 2)
+        antes = dispatcher.estado()[0]["atendidas"]
+        cargar(convertir, min(args.concurrencia * 2, mitad), args.concurrencia)  # i < mitad: no mata a nadie
+        fila["atendidas tras reincorporarse"] = dispatcher.estado()[0]["atendidas"] - antes
+        dispatcher.cerrar()
+        return fila
+    finally:
+        detener(procesos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversiones", type=int, default=64)
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--latencia-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_converter_")
+    os.environ.update({"STORAGE_BACKEND": "local", "LOCAL_STORAGE_DIR": directorio})
+    configurar_entorno()
+    reset_db()
+    _, headers = crear_usuario()
+
+    titulo = f"{args.conversiones} conversiones, {args.concurrencia} concurrentes, stub de {args.latencia_ms:.0f} ms"
+    imprimir(f"ConverterDispatcher.convertir: {titulo}", {
+        f"{n} réplica{'s' if n > 1 else ''}": escenario_dispatcher(n, args) for n in (1, 2, 4)
+    })
+    imprimir(f"POST /planos/ por uvicorn: {titulo}", {
+        f"{n} réplica{'s' if n > 1 else ''}": escenario_api(n, args, headers, directorio) for n in (1, 4)
+    })
+    imprimir("Conmutación: se mata la réplica 1 a mitad de la carga y se vuelve a levantar",
+             escenario_conmutacion(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark de costos materializados con 1.000.000 de líneas en materiales_modelo3d:
+lecturas de costo por modelo, por categoría y por usuario desde costos_modelo3d frente a
+los agregados sobre las líneas, costo de mantenerlos en las escrituras, verificador
+completo y consistencia después de cada tipo de escritura (incluida la importación de precios).
+Ejecutar: python benchmarks/bench_costos_rollup.py [--lineas 1000000] [--modelos 10000]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from common import configurar_entorno, reset_db, medir, imprimir, crear_usuario, crear_modelos3d
+from bench_material_catalog import poblar
+from bench_price_import import poblar_lineas
+
+MATERIALES = 25_000
+PLANOS_USUARIO = 200
+
+def agregados_anteriores(db, modelo3d_id: int, usuario_id: int):
+    """Consultas que cada pantalla hacía sobre materiales_modelo3d"""
+    from sqlalchemy import func
+    from models.material import Material
+    from models.material_modelo3d import MaterialModelo3D
+    from models.modelo3d import Modelo3D
+    from models.plano import Plano
+
+    def por_modelo():
+        return (
+            db.query(func.sum(MaterialModelo3D.subtotal)).filter(MaterialModelo3D.modelo3d_id == modelo3d_id).scalar(),
+            db.query(func.count(MaterialModelo3D.id)).filter(MaterialModelo3D.modelo3d_id == modelo3d_id).scalar(),
+        )
+
+    def por_categoria():
+        return db.query(Material.categoria_id, func.sum(MaterialModelo3D.subtotal)).join(
+            Material, Material.id == MaterialModelo3D.material_id
+        ).filter(MaterialModelo3D.modelo3d_id == modelo3d_id).group_by(Material.categoria_id).all()
+
+    def por_usuario():
+        return db.query(Plano.id, func.sum(MaterialModelo3D.subtotal)).join(
+            Modelo3D, Modelo3D.plano_id == Plano.id
+        ).join(MaterialModelo3D, MaterialModelo3D.modelo3d_id == Modelo3D.id).filter(
+            Plano.usuario_id == usuario_id
+        ).group_by(Plano.id).all()
+
+    return por_modelo, por_categoria, por_usuario
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lineas", type=int, default=1_000_000)
+    parser.add_argument("--modelos", type=int, default=10_000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(MATERIALES)
+    usuario_id, headers = crear_usuario()
+    otro_id, _ = crear_usuario("otro@bench.com")
+    modelos = crear_modelos3d(usuario_id, PLANOS_USUARIO) + crear_modelos3d(otro_id, args.modelos - PLANOS_USUARIO)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from models.material import Material
+    from repositories.costo_modelo3d_repository import CostoModelo3DRepository
+    from repositories.material_modelo3d_repository import MaterialModelo3DRepository
+    from services.costo_rollup_service import verificar
+    from services.price_import_service import FilaPrecio, price_import_jobs, run_import
+
+    db = SessionLocal()
+    rng = random.Random(40)
+    precios = dict(db.query(Material.id, Material.precio_base))
+    poblar_lineas(modelos, args.lineas, precios, 0.1, rng)
+
+    # Carga inicial: las líneas se insertaron sin pasar por la sesión
+    t = time.perf_counter()
+    inicial = verificar(db, reparar=True)
+    carga_s = time.perf_counter() - t
+    assert inicial["reparados"] == len(modelos), inicial
+    t = time.perf_counter()
+    assert verificar(db)["consistente"]
+    verificacion_s = time.perf_counter() - t
+
+    client = TestClient(app_main.app)
+
+    def request(metodo, url, esperado=200, body=None):
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+            response = client.request(metodo, url, json=body, headers=headers)
+        assert response.status_code == esperado, response.text
+        return response.json()
+
+    modelo3d_id = modelos[0]
+    por_modelo, por_categoria, por_usuario = agregados_anteriores(db, modelo3d_id, usuario_id)
+    costos = request("GET", f"/materiales-modelo3d/modelo3d/{modelo3d_id}/costos")["data"]
+    assert abs(costos["costo_total"] - por_modelo()[0]) < 1e-6 and costos["total_materiales"] == por_modelo()[1]
+    assert len(costos["categorias"]) == len(por_categoria())
+
+    imprimir(f"Lecturas ({args.lineas} líneas, {len(modelos)} modelos, {PLANOS_USUARIO} planos del usuario)", {
+        "Agregado por modelo, sum + count (ms)": medir(por_modelo, args.repeticiones),
+        "Agregado por modelo y categoría (ms)": medir(por_categoria, args.repeticiones),
+        "Agregado por plano del usuario (ms)": medir(por_usuario, args.repeticiones),
+        "Materializado por modelo, get_total_cost + count (ms)": medir(lambda: (
+            MaterialModelo3DRepository.get_total_cost(db, modelo3d_id),
+            MaterialModelo3DRepository.count_by_modelo3d(db, modelo3d_id),
+        ), args.repeticiones),
+        "Materializado por modelo y categoría (ms)": medir(
+            lambda: CostoModelo3DRepository.get_categorias(db, modelo3d_id), args.repeticiones
+        ),
+        "Materializado por plano del usuario (ms)": medir(
+            lambda: CostoModelo3DRepository.get_by_usuario(db, usuario_id), args.repeticiones
+        ),
+        "GET /modelo3d/{id}/costos (ms)": medir(
+            lambda: request("GET", f"/materiales-modelo3d/modelo3d/{modelo3d_id}/costos"), args.repeticiones
+        ),
+        "GET /costos del usuario (ms)": medir(lambda: request("GET", "/materiales-modelo3d/costos"), args.repeticiones),
+    })
+
+    # Escrituras: cada una deja los costos consistentes en el mismo commit
+    material_ids = list(precios)
+    nuevos = []
+
+    def agregar():
+        linea = request("POST", "/materiales-modelo3d/", 201, {
+            "modelo3d_id": rng.choice(modelos[:PLANOS_USUARIO]), "material_id": rng.choice(material_ids),
+            "cantidad": 3.5, "unidad_medida": "m2", "precio_unitario": 12.25,
+        })["data"]
+        nuevos.append(linea["id"])
+
+    def bulk():
+        request("POST", "/materiales-modelo3d/bulk", 201, [
+            {"modelo3d_id": rng.choice(modelos), "material_id": rng.choice(material_ids), "cantidad": 2.0}
+            for _ in range(1_000)
+        ])
+
+    escrituras = {
+        "POST /materiales-modelo3d/ (ms)": medir(agregar, args.repeticiones),
+        "PUT /materiales-modelo3d/{id} (ms)": medir(
+            lambda: request("PUT", f"/materiales-modelo3d/{rng.choice(nuevos)}", body={"cantidad": rng.uniform(1, 9)}),
+            args.repeticiones,
+        ),
+        "POST /bulk con 1.000 líneas (ms)": medir(bulk, 5),
+        "DELETE /materiales-modelo3d/{id} (ms)": medir(
+            lambda: request("DELETE", f"/materiales-modelo3d/{nuevos.pop()}"), args.repeticiones // 2
+        ),
+    }
+    imprimir("Escrituras con mantenimiento de costos", escrituras)
+
+    # Importación de precios: los lotes ajustan los costos con la diferencia de subtotales
+    importados = rng.sample(material_ids, 2_000)
+    job = price_import_jobs.create(len(importados), [], forzar=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_import(job, [FilaPrecio(i + 1, round(precios[m] * 1.1, 2), material_id=m) for i, m in enumerate(importados)])
+    assert job.estado == "completado", job.mensaje
+
+    t = time.perf_counter()
+    final = verificar(db)
+    imprimir("Verificador", {
+        "Carga inicial, verificar + recalcular todo (s)": round(carga_s, 2),
+        "Verificación completa (s)": round(verificacion_s, 2),
+        f"Verificación tras escrituras e importación de {len(importados)} precios (s)": round(time.perf_counter() - t, 2),
+        "Modelos inconsistentes": final["modelos_inconsistentes"] + final["modelos_con_categorias_inconsistentes"],
+    })
+    assert final["consistente"], final
+    db.close()
+
+if __name__ == "__main__":
+    main()
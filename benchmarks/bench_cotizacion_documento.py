@@ -0,0 +1,193 @@
+"""
+Benchmark de documentos de cotización: tiempo de render PDF/XLSX (en proceso y vía
+GET /cotizaciones/{id}/pdf con el pool de procesos), latencia con la caché caliente y
+respuesta 304 por ETag. Usa miniatura de plano e imágenes de materiales locales y del almacén
+de texturas (/texturas/<hash>.webp), y comprueba que el render no lee rutas ni URL arbitrarias.
+Ejecutar: python benchmarks/bench_cotizacion_documento.py [--lineas 20 200]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import tempfile
+import zipfile
+from pathlib import Path
+
+from common import configurar_entorno, reset_db, medir, imprimir, crear_usuario, crear_modelos3d
+from bench_material_catalog import poblar
+
+MATERIALES = 1_000
+TEXTURAS = 40
+
+def crear_imagenes(dir_texturas: Path, plano_png: Path) -> list:
+    """
+    Texturas de 512px (la mitad JPEG en /uploads/textures, la mitad WebP en el almacén de
+    texturas) y un plano PNG de 1600×1200 (requiere Pillow); devuelve las URLs de las texturas
+    """
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        print("⚠️ Pillow no está instalado: el benchmark se ejecuta sin imágenes")
+        return []
+    dir_texturas.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(3)
+    urls = []
+    for i in range(TEXTURAS):
+        imagen = Image.new("RGB", (512, 512), tuple(rng.randrange(256) for _ in range(3)))
+        ImageDraw.Draw(imagen).ellipse((64, 64, 448, 448), fill=tuple(rng.randrange(256) for _ in range(3)))
+        if i % 2:
+            from services.texture_store import texture_store
+
+            buffer = io.BytesIO()
+            imagen.save(buffer, format="WEBP", quality=80)
+            urls.append(texture_store.guardar(buffer.getvalue(), ".webp", "image/webp", 512, 512))
+        else:
+            imagen.save(dir_texturas / f"bench_doc_{i}.jpg", quality=85)
+            urls.append(f"/uploads/textures/bench_doc_{i}.jpg")
+    plano_png.parent.mkdir(parents=True, exist_ok=True)
+    plano = Image.new("RGB", (1600, 1200), "white")
+    dibujo = ImageDraw.Draw(plano)
+    for _ in range(60):
+        x, y = rng.randrange(1500), rng.randrange(1100)
+        dibujo.rectangle((x, y, x + rng.randrange(20, 300), y + rng.randrange(20, 300)), outline="black", width=6)
+    plano.save(plano_png)
+    return urls
+
+def asignar_imagenes(plano_id: int, plano_url: str, urls: list):
+    from database import SessionLocal
+    from models.material import Material
+    from models.plano import Plano
+
+    db = SessionLocal()
+    try:
+        db.query(Plano).filter(Plano.id == plano_id).update({"url": plano_url})
+        if urls:
+            db.bulk_update_mappings(Material, [
+                {"id": m, "imagen_url": urls[m % len(urls)]} for m in range(1, MATERIALES + 1)
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+def verificar_pdf(documento: bytes, paginas_minimas: int = 1):
+    """Chequeo estructural: cada entrada del xref apunta al objeto correcto"""
+    assert documento.startswith(b"%PDF-1.4") and documento.rstrip().endswith(b"%%EOF")
+    inicio_xref = int(re.search(rb"startxref\n(\d+)", documento).group(1))
+    tabla = documento[inicio_xref:].split(b"trailer")[0].split(b"\n")[3:]
+    for numero, entrada in enumerate((e for e in tabla if e.strip()), start=1):
+        offset = int(entrada[:10])
+        assert documento[offset:].startswith(b"%d 0 obj" % numero), numero
+    paginas = int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", documento).group(1))
+    assert paginas >= paginas_minimas, paginas
+
+def imagenes_pdf(documento: bytes) -> int:
+    return documento.count(b"/Subtype /Image")
+
+def verificar_origenes(plano_url: str, urls: list):
+    """Las imágenes del almacenamiento se leen; rutas del disco y URL externas no"""
+    from services.cotizacion_documento_service import leer_imagen
+
+    for url in [plano_url, *urls]:
+        assert leer_imagen(url), url
+    for url in ["/etc/passwd", "/uploads/../../../etc/passwd", "uploads/textures/bench_doc_0.jpg",
+                "http://169.254.169.254/latest/meta-data/", "https://drive.google.com.evil.com/uc?export=view&id=x",
+                "file:///etc/passwd", "/texturas/" + "0" * 64 + ".webp"]:
+        assert leer_imagen(url) is None, url
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lineas", type=int, nargs="+", default=[20, 200])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    # Las imágenes van a un almacenamiento local temporal, que se borra al terminar
+    with tempfile.TemporaryDirectory(prefix="bench_documento_") as directorio:
+        os.environ.update({"TEXTURE_STORAGE": "local", "LOCAL_STORAGE_DIR": directorio})
+        ejecutar(args, Path(directorio))
+
+def ejecutar(args, directorio: Path):
+    configurar_entorno()
+    reset_db()
+    poblar(MATERIALES)
+    usuario_id, headers = crear_usuario()
+    plano_id = crear_modelos3d(usuario_id, 1)[0]
+    plano_png = directorio / "planos" / "bench_doc_plano.png"
+    urls = crear_imagenes(directorio / "textures", plano_png)
+    plano_url = "/uploads/planos/bench_doc_plano.png"
+    asignar_imagenes(plano_id, plano_url if urls else None, urls)
+    if urls:
+        with contextlib.redirect_stdout(io.StringIO()):
+            verificar_origenes(plano_url, urls)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from repositories.cotizacion_repository import CotizacionRepository
+    from services.cotizacion_documento_service import cargar_datos, cotizacion_documentos, leer_imagenes
+    from services.documento_render import render_pdf, render_xlsx
+
+    client = TestClient(app_main.app)
+
+    def request(metodo, url, esperado=200, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+            response = client.request(metodo, url, headers={**headers, **kwargs.pop("headers", {})}, **kwargs)
+        assert response.status_code == esperado, response.text
+        return response
+
+    rng = random.Random(8)
+    db = SessionLocal()
+    for lineas in args.lineas:
+        payload = [{"material_id": m, "cantidad": round(rng.uniform(1, 90), 2)}
+                   for m in rng.sample(range(1, MATERIALES + 1), lineas)]
+        cotizacion_id = request("POST", "/cotizaciones/", json={
+            "plano_id": plano_id, "cliente_nombre": "Constructora Ñandú", "cliente_email": "obra@bench.com",
+            "descripcion": "Remodelación de cocina y baño con cambio de revestimientos " * 3, "materiales": payload,
+        }).json()["id"]
+
+        repo = CotizacionRepository(db)
+        cotizacion = repo.get_by_id(cotizacion_id, usuario_id)
+        datos = cargar_datos(db, cotizacion, repo.get_items([cotizacion_id])[cotizacion_id])
+        datos["imagenes"] = leer_imagenes(datos)
+
+        pdf = request("GET", f"/cotizaciones/{cotizacion_id}/pdf")
+        verificar_pdf(pdf.content, paginas_minimas=max(1, lineas // 30))
+        if urls:
+            # Miniatura del plano + una por textura distinta (JPEG locales y WebP del almacén)
+            esperadas = 1 + len({url for url in datos["imagenes"] if url != plano_url})
+            assert imagenes_pdf(pdf.content) == esperadas, (imagenes_pdf(pdf.content), esperadas)
+        xlsx = request("GET", f"/cotizaciones/{cotizacion_id}/xlsx")
+        with zipfile.ZipFile(io.BytesIO(xlsx.content)) as archivo:
+            assert archivo.testzip() is None
+            assert archivo.read("xl/worksheets/sheet1.xml").count(b"<row ") == lineas + 13
+        etag = pdf.headers["etag"]
+
+        def render_http(formato):
+            cotizacion_documentos.cache.invalidate()
+            request("GET", f"/cotizaciones/{cotizacion_id}/{formato}")
+
+        medir_render = {
+            "GET /pdf sin caché, pool de procesos (ms)": medir(lambda: render_http("pdf"), args.repeticiones),
+            "GET /xlsx sin caché, pool de procesos (ms)": medir(lambda: render_http("xlsx"), args.repeticiones),
+        }
+        request("GET", f"/cotizaciones/{cotizacion_id}/pdf")  # Dejar el PDF en caché
+        imprimir(f"Cotización de {lineas} líneas ({len(pdf.content) / 1024:.0f} KB PDF, "
+                 f"{len(xlsx.content) / 1024:.0f} KB XLSX)", {
+            "render_pdf en proceso (ms)": medir(lambda: render_pdf(datos), args.repeticiones),
+            "render_xlsx en proceso (ms)": medir(lambda: render_xlsx(datos), args.repeticiones),
+            **medir_render,
+            "GET /pdf con caché (ms)": medir(
+                lambda: request("GET", f"/cotizaciones/{cotizacion_id}/pdf"), args.repeticiones * 4
+            ),
+            "GET /pdf If-None-Match -> 304 (ms)": medir(
+                lambda: request("GET", f"/cotizaciones/{cotizacion_id}/pdf", 304, headers={"If-None-Match": etag}),
+                args.repeticiones * 4,
+            ),
+        })
+    db.close()
+    cotizacion_documentos.shutdown()
+
+if __name__ == "__main__":
+    main()
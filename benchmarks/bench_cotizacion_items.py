@@ -0,0 +1,144 @@
+"""
+Benchmark de listar 10k cotizaciones: líneas en cotizacion_items (una consulta por página)
+frente a parsear la columna JSON `materiales` de cada cotización, y analítica por material.
+Ejecutar: python benchmarks/bench_cotizacion_items.py [--cotizaciones 10000] [--lineas 20]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import configurar_entorno, reset_db, medir, imprimir, crear_usuario, crear_modelos3d
+from bench_material_catalog import PALABRAS
+
+MATERIALES = 2_000
+
+def poblar_cotizaciones(usuario_id: int, plano_id: int, n: int, lineas: int, seed: int = 9):
+    """Insertar `n` cotizaciones con líneas solo en la columna JSON (formato anterior a cotizacion_items)"""
+    from database import SessionLocal
+    from models.cotizacion import Cotizacion
+
+    rng = random.Random(seed)
+    ahora = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        filas = []
+        for i in range(n):
+            materiales = []
+            for material_id in rng.sample(range(1, MATERIALES + 1), lineas):
+                cantidad = round(rng.uniform(1, 80), 2)
+                precio = round(rng.uniform(5, 300), 2)
+                materiales.append({
+                    "material_id": material_id, "nombre": f"{rng.choice(PALABRAS).capitalize()} {material_id}",
+                    "categoria": f"Categoría {material_id % 20}", "cantidad": cantidad,
+                    "precio_unitario": precio, "subtotal": round(cantidad * precio, 2),
+                })
+            subtotal = round(sum(m["subtotal"] for m in materiales), 2)
+            filas.append({
+                "plano_id": plano_id, "usuario_id": usuario_id, "cliente_nombre": f"Cliente {i}",
+                "cliente_email": f"cliente{i}@bench.com", "materiales": materiales, "subtotal": subtotal,
+                "iva": round(subtotal * 0.19, 2), "total": round(subtotal * 1.19, 2),
+                "fecha_creacion": ahora - timedelta(minutes=i), "fecha_actualizacion": ahora,
+            })
+            if len(filas) == 1_000:
+                db.bulk_insert_mappings(Cotizacion, filas)
+                filas = []
+        if filas:
+            db.bulk_insert_mappings(Cotizacion, filas)
+        db.commit()
+    finally:
+        db.close()
+
+def listar_desde_json(db, usuario_id: int, limit: int):
+    """Ruta anterior (sin HTTP): cargar cada cotización con su JSON y parsear todas sus líneas"""
+    from models.cotizacion import Cotizacion
+    from schemas.cotizacion_schemas import MaterialCotizacion
+
+    cotizaciones = db.query(Cotizacion).filter(Cotizacion.usuario_id == usuario_id).order_by(
+        Cotizacion.fecha_creacion.desc()
+    ).limit(limit).all()
+    resultado = [[MaterialCotizacion(**m) for m in c.materiales] for c in cotizaciones]
+    db.expunge_all()
+    return resultado
+
+def listar_desde_items(db, usuario_id: int, limit: int):
+    """Ruta nueva (sin HTTP): página de cotizaciones + una consulta de líneas"""
+    from repositories.cotizacion_repository import CotizacionRepository
+    from routers.cotizacion import _lineas
+
+    repo = CotizacionRepository(db)
+    cotizaciones = repo.get_all_by_usuario(usuario_id, 0, limit)
+    items = repo.get_items(c.id for c in cotizaciones)
+    resultado = [_lineas(items[c.id]) for c in cotizaciones]
+    db.expunge_all()
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cotizaciones", type=int, default=10_000)
+    parser.add_argument("--lineas", type=int, default=20)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    usuario_id, headers = crear_usuario()
+    plano_id = crear_modelos3d(usuario_id, 1)[0]
+    poblar_cotizaciones(usuario_id, plano_id, args.cotizaciones, args.lineas)
+
+    import manage
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        manage.backfill_cotizacion_items()
+    backfill_s = time.perf_counter() - inicio
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from models.cotizacion import Cotizacion
+
+    client = TestClient(app_main.app)
+    db = SessionLocal()
+
+    def get(url, **params):
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+            response = client.get(url, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    material_id = 42
+
+    def buscar_en_json():
+        return [c.id for c in db.query(Cotizacion).filter(Cotizacion.usuario_id == usuario_id)
+                if any(m["material_id"] == material_id for m in c.materiales)]
+
+    imprimir(f"{args.cotizaciones} cotizaciones × {args.lineas} líneas", {
+        "backfill JSON -> cotizacion_items (s)": round(backfill_s, 2),
+        "GET /cotizaciones/?limit=100 (ms)": medir(lambda: get("/cotizaciones/", limit=100), args.repeticiones * 3),
+        f"GET /cotizaciones/?limit={args.cotizaciones} (ms)": medir(
+            lambda: get("/cotizaciones/", limit=args.cotizaciones), args.repeticiones
+        ),
+        "página de 100: cotizacion_items (ms)": medir(lambda: listar_desde_items(db, usuario_id, 100), args.repeticiones * 3),
+        "página de 100: JSON (ruta anterior, ms)": medir(lambda: listar_desde_json(db, usuario_id, 100), args.repeticiones * 3),
+        "todas: cotizacion_items (ms)": medir(
+            lambda: listar_desde_items(db, usuario_id, args.cotizaciones), args.repeticiones
+        ),
+        "todas: JSON (ruta anterior, ms)": medir(
+            lambda: listar_desde_json(db, usuario_id, args.cotizaciones), args.repeticiones
+        ),
+    })
+    encontrados = get(f"/cotizaciones/analytics/materiales/{material_id}", limit=500)["data"]["total"]
+    imprimir(f"Cotizaciones con el material {material_id} ({encontrados})", {
+        "GET /analytics/materiales/{id} (ms)": medir(
+            lambda: get(f"/cotizaciones/analytics/materiales/{material_id}", limit=500), args.repeticiones * 3
+        ),
+        "recorrer JSON de todas (ms)": medir(buscar_en_json, args.repeticiones),
+        "GET /analytics/materiales top 20 (ms)": medir(lambda: get("/cotizaciones/analytics/materiales"), args.repeticiones),
+    })
+    db.close()
+
+if __name__ == "__main__":
+    main()
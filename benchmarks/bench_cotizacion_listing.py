@@ -0,0 +1,117 @@
+"""
+Benchmark de listados de cotizaciones con 10k cotizaciones por usuario: listado completo
+(con líneas) frente al resumen de columnas (/cotizaciones/resumen), líneas bajo demanda y
+exportación NDJSON por streaming. Mide tiempo y memoria pico (tracemalloc) de cada ruta.
+Ejecutar: python benchmarks/bench_cotizacion_listing.py [--cotizaciones 10000] [--lineas 20]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import tracemalloc
+
+from common import configurar_entorno, reset_db, medir, imprimir, crear_usuario, crear_modelos3d
+from bench_cotizacion_items import poblar_cotizaciones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cotizaciones", type=int, default=10_000)
+    parser.add_argument("--lineas", type=int, default=20)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    usuario_id, headers = crear_usuario()
+    plano_id = crear_modelos3d(usuario_id, 1)[0]
+    poblar_cotizaciones(usuario_id, plano_id, args.cotizaciones, args.lineas)
+
+    import manage
+    with contextlib.redirect_stdout(io.StringIO()):
+        manage.backfill_cotizacion_items()
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from repositories.cotizacion_repository import CotizacionRepository
+    from routers.cotizacion import _ndjson
+
+    client = TestClient(app_main.app)
+
+    def get(url, **params):
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+            response = client.get(url, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        return response
+
+    def resumen_completo():
+        """Recorrer todas las páginas del resumen (límite máximo 1000 por página)"""
+        filas, skip = [], 0
+        while True:
+            pagina = get("/cotizaciones/resumen", skip=skip, limit=1000).json()["data"]["cotizaciones"]
+            filas.extend(pagina)
+            if len(pagina) < 1000:
+                return filas
+            skip += 1000
+
+    def exportar(**params):
+        with contextlib.redirect_stdout(io.StringIO()):
+            with client.stream("GET", "/cotizaciones/export", params=params, headers=headers) as response:
+                assert response.status_code == 200
+                return sum(1 for linea in response.iter_lines() if linea)
+
+    db = SessionLocal()
+
+    def generar_export():
+        """Lo que hace el endpoint /export, sin el cliente HTTP que guarda la respuesta entera"""
+        for lote in CotizacionRepository(db).iter_export(usuario_id):
+            "".join(json.dumps(fila, ensure_ascii=False, default=_ndjson) + "\n" for fila in lote)
+
+    def pico_mb(fn) -> float:
+        tracemalloc.start()
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return round(pico / 1_048_576, 1)
+
+    # Consistencia: mismas cotizaciones y líneas en todas las rutas
+    completo = get("/cotizaciones/", limit=args.cotizaciones).json()
+    resumen = resumen_completo()
+    assert [c["id"] for c in completo] == [c["id"] for c in resumen]
+    assert all(c["num_materiales"] == args.lineas for c in resumen)
+    assert exportar() == args.cotizaciones
+    primera = resumen[0]["id"]
+    lineas = get(f"/cotizaciones/{primera}/materiales").json()["data"]["materiales"]
+    assert lineas == completo[0]["materiales"]
+    tamano_completo = len(json.dumps(completo))
+    tamano_resumen = len(json.dumps(resumen))
+
+    imprimir(f"{args.cotizaciones} cotizaciones × {args.lineas} líneas", {
+        "GET /cotizaciones/?limit=100 (ms)": medir(lambda: get("/cotizaciones/", limit=100), args.repeticiones * 3),
+        "GET /cotizaciones/resumen?limit=100 (ms)": medir(
+            lambda: get("/cotizaciones/resumen", limit=100), args.repeticiones * 3
+        ),
+        "GET /cotizaciones/{id}/materiales (ms)": medir(
+            lambda: get(f"/cotizaciones/{primera}/materiales"), args.repeticiones * 3
+        ),
+        f"GET /cotizaciones/?limit={args.cotizaciones} (ms)": medir(
+            lambda: get("/cotizaciones/", limit=args.cotizaciones), args.repeticiones
+        ),
+        "resumen completo, páginas de 1000 (ms)": medir(resumen_completo, args.repeticiones),
+        "export NDJSON con líneas (ms)": medir(exportar, args.repeticiones),
+        "export NDJSON sin líneas (ms)": medir(lambda: exportar(incluir_materiales=False), args.repeticiones),
+    })
+    imprimir("Tamaño y memoria", {
+        "respuesta completa (MB)": round(tamano_completo / 1_048_576, 1),
+        "resumen completo (MB)": round(tamano_resumen / 1_048_576, 1),
+        "pico GET /cotizaciones/ completo (MB)": pico_mb(lambda: get("/cotizaciones/", limit=args.cotizaciones)),
+        "pico resumen completo (MB)": pico_mb(resumen_completo),
+        # TestClient acumula todo el cuerpo; se mide el generador del servidor por separado
+        "pico export NDJSON vía TestClient (MB)": pico_mb(exportar),
+        "pico generador NDJSON en el servidor (MB)": pico_mb(generar_export),
+    })
+    db.close()
+
+if __name__ == "__main__":
+    main()
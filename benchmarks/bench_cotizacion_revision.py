@@ -0,0 +1,122 @@
+"""
+Benchmark de revisiones y copias de una cotización de 300 líneas con 5 cambios:
+tamaño del payload y latencia de volver a enviar la cotización completa (POST /cotizaciones/)
+frente a POST /cotizaciones/{id}/revisions con solo los cambios, reconstrucción de una
+revisión (sin caché / con caché) y POST /cotizaciones/{id}/clone (INSERT … SELECT).
+Ejecutar: python benchmarks/bench_cotizacion_revision.py [--lineas 300] [--cambios 5]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+
+from common import configurar_entorno, reset_db, medir, imprimir, crear_usuario, crear_modelos3d
+from bench_material_catalog import poblar
+
+MATERIALES = 2_000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lineas", type=int, default=300)
+    parser.add_argument("--cambios", type=int, default=5)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(MATERIALES)
+    usuario_id, headers = crear_usuario()
+    plano_id = crear_modelos3d(usuario_id, 1)[0]
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from services.cotizacion_revision_service import revision_cache
+
+    client = TestClient(app_main.app)
+
+    def request(metodo, url, body=None):
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+            response = client.request(metodo, url, json=body, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    rng = random.Random(12)
+    elegidos = rng.sample(range(1, MATERIALES + 1), args.lineas + 200)
+    lineas = {m: round(rng.uniform(1, 90), 2) for m in elegidos[:args.lineas]}
+    libres = iter(elegidos[args.lineas:])
+    completa = {
+        "plano_id": plano_id, "cliente_nombre": "Cliente", "cliente_email": "cliente@bench.com",
+        "descripcion": "Cotización de referencia", "materiales": [{"material_id": m, "cantidad": c} for m, c in lineas.items()],
+    }
+    cotizacion = request("POST", "/cotizaciones/", completa)
+    cotizacion_id = cotizacion["id"]
+    original = cotizacion["materiales"]
+
+    def generar_cambios() -> list:
+        """3 cantidades modificadas, 1 línea nueva y 1 eliminada (para --cambios 5)"""
+        cambios = []
+        actuales = list(lineas)
+        for _ in range(max(args.cambios - 2, 1)):
+            m = rng.choice(actuales)
+            lineas[m] = round(lineas[m] + rng.uniform(1, 10), 2)
+            cambios.append({"material_id": m, "cantidad": lineas[m]})
+        nuevo = next(libres)
+        lineas[nuevo] = round(rng.uniform(1, 90), 2)
+        cambios.append({"material_id": nuevo, "cantidad": lineas[nuevo]})
+        eliminado = rng.choice([m for m in actuales if m not in {c["material_id"] for c in cambios}])
+        del lineas[eliminado]
+        cambios.append({"material_id": eliminado, "cantidad": 0})
+        return cambios
+
+    # Consistencia: la versión vigente coincide con las líneas guardadas y la 0 con la original
+    cambios = generar_cambios()
+    revision = request("POST", f"/cotizaciones/{cotizacion_id}/revisions", {"cambios": cambios, "nota": "Ajuste"})
+    vigente = request("GET", f"/cotizaciones/{cotizacion_id}")
+    assert {m["material_id"]: m["cantidad"] for m in vigente["materiales"]} == lineas
+    assert vigente["total"] == revision["data"]["total"]
+    assert request("GET", f"/cotizaciones/{cotizacion_id}/revisions/0")["data"]["materiales"] == original
+    assert request("GET", f"/cotizaciones/{cotizacion_id}/revisions/1")["data"]["materiales"] == vigente["materiales"]
+
+    payload_revision = {"cambios": generar_cambios()}
+    payload_completo = {**completa, "materiales": [{"material_id": m, "cantidad": c} for m, c in lineas.items()]}
+    respuesta_revision = request("POST", f"/cotizaciones/{cotizacion_id}/revisions", payload_revision)
+    respuesta_completa = request("POST", "/cotizaciones/", payload_completo)
+    imprimir(f"Payloads: cotización de {args.lineas} líneas con {args.cambios} cambios", {
+        "POST /cotizaciones/ completa: request (KB)": round(len(json.dumps(payload_completo)) / 1024, 1),
+        "POST /cotizaciones/ completa: response (KB)": round(len(json.dumps(respuesta_completa)) / 1024, 1),
+        "POST /revisions: request (KB)": round(len(json.dumps(payload_revision)) / 1024, 2),
+        "POST /revisions: response (KB)": round(len(json.dumps(respuesta_revision)) / 1024, 2),
+    })
+
+    def revisar():
+        request("POST", f"/cotizaciones/{cotizacion_id}/revisions", {"cambios": generar_cambios()})
+
+    def reconstruir(numero, cache: bool):
+        if not cache:
+            revision_cache.invalidate()
+        return request("GET", f"/cotizaciones/{cotizacion_id}/revisions/{numero}")
+
+    imprimir("Latencia", {
+        "POST /cotizaciones/ completa (ms)": medir(lambda: request("POST", "/cotizaciones/", payload_completo), args.repeticiones),
+        f"POST /revisions con {args.cambios} cambios (ms)": medir(revisar, args.repeticiones),
+        "POST /clone, INSERT … SELECT (ms)": medir(
+            lambda: request("POST", f"/cotizaciones/{cotizacion_id}/clone", {"cliente_nombre": "Otro cliente"}),
+            args.repeticiones,
+        ),
+    })
+    ultima = len(request("GET", f"/cotizaciones/{cotizacion_id}/revisions")["data"])
+    imprimir(f"Reconstrucción de revisiones ({ultima} revisiones)", {
+        "GET /revisions/{última} sin caché (ms)": medir(lambda: reconstruir(ultima, False), args.repeticiones),
+        "GET /revisions/0 sin caché, deshace todas (ms)": medir(lambda: reconstruir(0, False), args.repeticiones),
+        "GET /revisions/0 con caché (ms)": medir(lambda: reconstruir(0, True), args.repeticiones),
+        "GET /cotizaciones/{id} (ms)": medir(lambda: request("GET", f"/cotizaciones/{cotizacion_id}"), args.repeticiones),
+    })
+
+    copia = request("POST", f"/cotizaciones/{cotizacion_id}/clone", {"cliente_nombre": "Copia"})["data"]
+    assert copia["num_materiales"] == len(lineas) and copia["cliente_nombre"] == "Copia"
+    assert request("GET", f"/cotizaciones/{copia['id']}")["materiales"] == request("GET", f"/cotizaciones/{cotizacion_id}")["materiales"]
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Benchmark del almacenamiento local (TEXTURE_STORAGE=local): escrituras concurrentes con
+subdirectorios por hash y escritura atómica frente a la escritura directa anterior, y lecturas
+concurrentes por el montaje estático /uploads servido por uvicorn (archivo completo y Range).
+También cuenta lecturas corruptas mientras otros hilos reescriben los mismos archivos.
+Ejecutar: python benchmarks/bench_local_storage.py [--archivos 2000] [--kb 256] [--concurrencia 32]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from common import ROOT, configurar_entorno, reset_db, resumen, imprimir
+
+def guardar_anterior(directorio: Path, contenido: bytes, nombre: str) -> str:
+    """Escritura anterior: un solo directorio, open('wb') sobre el destino"""
+    with open(directorio / nombre, 'wb') as f:
+        f.write(contenido)
+    return f"/uploads/textures/{nombre}"
+
+def escribir(fn, archivos: dict, hilos: int) -> dict:
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        urls = list(pool.map(lambda item: fn(item[1], item[0]), archivos.items()))
+    segundos = time.perf_counter() - inicio
+    megas = sum(len(c) for c in archivos.values()) / 1e6
+    return {"urls": urls, "archivos_s": round(len(archivos) / segundos), "MB_s": round(megas / segundos, 1)}
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def leer(base_url: str, urls: list, peticiones: int, concurrencia: int, rango: str = None) -> dict:
+    import httpx
+
+    rng = random.Random(44)
+    latencias, total_bytes = [], 0
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=base_url, limits=limites, timeout=30) as client:
+        async def trabajador(n: int):
+            nonlocal total_bytes
+            for _ in range(n):
+                inicio = time.perf_counter()
+                response = await client.get(rng.choice(urls), headers={"Range": rango} if rango else None)
+                assert response.status_code == (206 if rango else 200), response.status_code
+                total_bytes += len(response.content)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador(peticiones // concurrencia) for _ in range(concurrencia)))
+        segundos = time.perf_counter() - inicio
+    return {"peticiones_s": round(len(latencias) / segundos), "MB_s": round(total_bytes / 1e6 / segundos, 1),
+            **{k: v for k, v in resumen(latencias).items() if k != "n"}}
+
+async def leer_mientras_escriben(base_url: str, urls: dict, reescribir, segundos: float) -> dict:
+    """Lectores verifican el SHA-256 de cada respuesta mientras un hilo reescribe los mismos archivos"""
+    import httpx
+
+    activo = True
+
+    def escritor():
+        while activo:
+            for nombre, (contenido, _) in urls.items():
+                reescribir(contenido, nombre)
+
+    hilo = threading.Thread(target=escritor)
+    hilo.start()
+    lecturas = corruptas = 0
+    fin = time.perf_counter() + segundos
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        async def lector():
+            nonlocal lecturas, corruptas
+            while time.perf_counter() < fin:
+                contenido, url = random.choice(list(urls.values()))
+                lecturas += 1
+                try:
+                    response = await client.get(url)
+                except httpx.HTTPError:
+                    # El servidor cortó la respuesta: el archivo cambió de tamaño mientras se enviaba
+                    corruptas += 1
+                    continue
+                if response.status_code != 200 or response.content != contenido:
+                    corruptas += 1
+
+        try:
+            await asyncio.gather(*(lector() for _ in range(8)))
+        finally:
+            activo = False
+            hilo.join()
+    return {"lecturas": lecturas, "corruptas": corruptas}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--archivos", type=int, default=2_000)
+    parser.add_argument("--kb", type=int, default=256)
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--peticiones", type=int, default=4_000)
+    args = parser.parse_args()
+
+    directorio = Path(tempfile.mkdtemp(prefix="bench_storage_"))
+    os.environ["LOCAL_STORAGE_DIR"] = str(directorio)
+    os.environ["TEXTURE_STORAGE"] = "local"
+    env = configurar_entorno()
+    reset_db()
+
+    from services.local_image_service import local_image_service
+
+    rng = random.Random(44)
+    archivos = {}
+    for _ in range(args.archivos):
+        contenido = rng.randbytes(args.kb * 1024)
+        archivos[f"{hashlib.sha256(contenido).hexdigest()}.webp"] = contenido
+
+    plano = directorio / "textures"
+    anterior = escribir(lambda c, n: guardar_anterior(plano, c, n), archivos, args.hilos)
+    for nombre in archivos:
+        (plano / nombre).unlink()
+    actual = escribir(local_image_service.save_as, archivos, args.hilos)
+    imprimir(f"Escrituras: {args.archivos} archivos de {args.kb} KB, {args.hilos} hilos", {
+        "Anterior, directorio único sin fsync": {k: v for k, v in anterior.items() if k != "urls"},
+        "Subdirectorios + temporal + fsync + rename": {k: v for k, v in actual.items() if k != "urls"},
+        "Archivos en el directorio más poblado": max(
+            len(os.listdir(d)) for d in local_image_service.upload_dir.glob("*/*")
+        ),
+    })
+
+    # Lecturas por HTTP con uvicorn en un proceso aparte (el mismo servidor que producción)
+    puerto = puerto_libre()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(puerto), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env={**env, **os.environ}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        import httpx
+
+        base_url = f"http://127.0.0.1:{puerto}"
+        for _ in range(100):
+            try:
+                httpx.get(f"{base_url}/docs")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+
+        url = actual["urls"][0]
+        completa = httpx.get(f"{base_url}{url}")
+        parcial = httpx.get(f"{base_url}{url}", headers={"Range": "bytes=0-65535"})
+        no_modificada = httpx.get(f"{base_url}{url}", headers={"If-None-Match": completa.headers["etag"]})
+        assert completa.content == archivos[Path(url).name] and "immutable" in completa.headers["cache-control"]
+        assert parcial.status_code == 206 and len(parcial.content) == 65536 and no_modificada.status_code == 304
+
+        filas = {
+            "Cabeceras": {k: completa.headers[k] for k in ("cache-control", "accept-ranges")},
+            f"GET completo, {args.concurrencia} conexiones": asyncio.run(
+                leer(base_url, actual["urls"], args.peticiones, args.concurrencia)
+            ),
+            f"GET Range primeros 64 KB, {args.concurrencia} conexiones": asyncio.run(
+                leer(base_url, actual["urls"], args.peticiones, args.concurrencia, "bytes=0-65535")
+            ),
+        }
+        imprimir("Lecturas por /uploads (uvicorn)", filas)
+
+        # Mismos nombres reescritos con el mismo contenido mientras se leen
+        muestra = dict(list(archivos.items())[:20])
+        atomica = {n: (c, local_image_service.save_as(c, n)) for n, c in muestra.items()}
+        directa = {n: (c, guardar_anterior(plano, c, n)) for n, c in muestra.items()}
+        imprimir("Lecturas durante reescrituras (3 s)", {
+            "Escritura directa anterior": asyncio.run(
+                leer_mientras_escriben(base_url, directa, lambda c, n: guardar_anterior(plano, c, n), 3)
+            ),
+            "Escritura atómica": asyncio.run(
+                leer_mientras_escriben(base_url, atomica, local_image_service.save_as, 3)
+            ),
+        })
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+if __name__ == "__main__":
+    main()
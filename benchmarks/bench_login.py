@@ -0,0 +1,128 @@
+"""
+Benchmark de /auth/login: throughput a un p99 objetivo, latencia del event loop
+durante la carga y costo del limitador de tasa
+Ejecutar: python benchmarks/bench_login.py [--p99-objetivo-ms 500]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+
+from common import configurar_entorno, reset_db, resumen, imprimir
+
+NIVELES_CONCURRENCIA = [1, 2, 4, 8, 16]
+PETICIONES_POR_NIVEL = 32
+USUARIOS = 32
+
+def preparar_usuarios():
+    """Crear usuarios con hash bcrypt y la mitad con el SHA-256 heredado"""
+    from database import SessionLocal
+    from models.usuario import Usuario
+    from services.password_service import hash_password
+
+    db = SessionLocal()
+    try:
+        bcrypt_hash = hash_password("secreto123")
+        legacy_hash = hashlib.sha256("secreto123".encode()).hexdigest()
+        for i in range(USUARIOS):
+            db.add(Usuario(
+                nombre=f"Usuario {i}",
+                correo=f"user{i}@bench.com",
+                contrasena=legacy_hash if i % 2 else bcrypt_hash
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+async def _nivel(client, concurrencia: int) -> dict:
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias = []
+
+    async def una(i: int):
+        async with semaforo:
+            inicio = time.perf_counter()
+            response = await client.post("/auth/login", json={
+                "correo": f"user{i % USUARIOS}@bench.com", "contrasena": "secreto123"
+            })
+            assert response.status_code == 200, response.text
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(i) for i in range(PETICIONES_POR_NIVEL)))
+    duracion = time.perf_counter() - inicio
+    return {**resumen(latencias), "logins_por_s": round(PETICIONES_POR_NIVEL / duracion, 1)}
+
+async def _latencia_event_loop(client) -> dict:
+    """Latencia de GET /test mientras 16 logins concurrentes ocupan el pool de hashing"""
+    latencias = []
+
+    async def ping():
+        for _ in range(20):
+            inicio = time.perf_counter()
+            await client.get("/test")
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            await asyncio.sleep(0.005)
+
+    await asyncio.gather(_nivel(client, 16), ping())
+    return resumen(latencias)
+
+async def correr(p99_objetivo_ms: float):
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Primera pasada: migra los hashes heredados a bcrypt
+        await _nivel(client, 4)
+
+        resultados = {}
+        mejor = None
+        for concurrencia in NIVELES_CONCURRENCIA:
+            fila = await _nivel(client, concurrencia)
+            resultados[f"concurrencia {concurrencia}"] = fila
+            if fila["p99_ms"] <= p99_objetivo_ms:
+                mejor = (concurrencia, fila["logins_por_s"])
+
+        resultados["GET /test durante carga (ms)"] = await _latencia_event_loop(client)
+        resultados[f"máximo con p99 <= {p99_objetivo_ms:.0f} ms"] = (
+            f"{mejor[1]} logins/s (concurrencia {mejor[0]})" if mejor else "ninguno"
+        )
+        imprimir("Login con bcrypt en pool acotado", resultados)
+
+def bench_rate_limiter():
+    from services.rate_limiter import RateLimiter
+
+    limiter = RateLimiter(per_minute=5)
+    permitidos = sum(limiter.hit("victima@bench.com")[0] for _ in range(1000))
+
+    limiter = RateLimiter(per_minute=20)
+    n = 200_000
+    inicio = time.perf_counter()
+    for i in range(n):
+        limiter.hit(f"10.0.{i % 250}.{i % 200}")
+    por_hit_us = (time.perf_counter() - inicio) / n * 1e6
+
+    imprimir("Limitador de tasa", {
+        "ráfaga de 1000 intentos a una cuenta (5/min)": f"{permitidos} permitidos",
+        "costo por intento": f"{por_hit_us:.2f} µs",
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--p99-objetivo-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    # El benchmark mide hashing, no el limitador: se desactiva con cuotas altas
+    os.environ.setdefault("LOGIN_RATE_LIMIT_IP", "1000000")
+    os.environ.setdefault("LOGIN_RATE_LIMIT_ACCOUNT", "1000000")
+    configurar_entorno()
+    reset_db()
+    preparar_usuarios()
+
+    asyncio.run(correr(args.p99_objetivo_ms))
+    bench_rate_limiter()
+
+if __name__ == "__main__":
+    main()
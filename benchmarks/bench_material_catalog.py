@@ -0,0 +1,107 @@
+"""
+Benchmark de GET /materiales/ con el catálogo cacheado sobre 50k materiales
+Ejecutar: python benchmarks/bench_material_catalog.py [--materiales 50000]
+"""
+
+import argparse
+import random
+from datetime import datetime
+
+from common import configurar_entorno, reset_db, medir, imprimir
+
+CATEGORIAS = 20
+PALABRAS = ["cerámica", "porcelanato", "madera", "mármol", "granito", "pintura", "laminado", "vinilo"]
+
+def poblar(n_materiales: int):
+    """Insertar categorías y materiales sintéticos en lote"""
+    from database import SessionLocal
+    from models.categoria import Categoria
+    from models.material import Material
+
+    rng = random.Random(42)
+    ahora = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(Categoria, [
+            {"id": i, "codigo": f"CAT-{i}", "nombre": f"Categoría {i}", "fecha_creacion": ahora, "fecha_actualizacion": ahora}
+            for i in range(1, CATEGORIAS + 1)
+        ])
+        db.bulk_insert_mappings(Material, [
+            {
+                "codigo": f"MAT-{i:06d}",
+                "nombre": f"{rng.choice(PALABRAS).capitalize()} {i}",
+                "descripcion": f"Material de prueba {rng.choice(PALABRAS)} {i}",
+                "precio_base": round(rng.uniform(5, 500), 2),
+                "unidad_medida": rng.choice(["m2", "m", "unidad"]),
+                "categoria_id": 1 + i % CATEGORIAS,
+                "fecha_creacion": ahora,
+                "fecha_actualizacion": ahora,
+            }
+            for i in range(n_materiales)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--materiales", type=int, default=50_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(args.materiales)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from services.material_catalog_service import material_catalog
+    from database import SessionLocal
+    from models.material import Material
+
+    client = TestClient(app_main.app)
+    consultas = {
+        "sin filtro": "/materiales/?skip=0&limit=100",
+        "por categoría": "/materiales/?categoria_id=7&limit=100",
+        "búsqueda 'mármol'": "/materiales/?search=m%C3%A1rmol&limit=100",
+        "página profunda": "/materiales/?skip=40000&limit=100",
+    }
+
+    filas = {}
+    for nombre, url in consultas.items():
+        def miss():
+            material_catalog.invalidate()
+            assert client.get(url).headers["X-Catalog-Cache"] == "miss"
+
+        def hit():
+            assert client.get(url).headers["X-Catalog-Cache"] == "hit"
+
+        respuesta = client.get(url)
+        etag = respuesta.headers["ETag"]
+        total = respuesta.json()["data"]["total"]
+
+        def not_modified():
+            assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        filas[nombre] = f"total={total}"
+        filas["  miss (ms)"] = medir(miss, args.repeticiones)
+        filas["  hit (ms)"] = medir(hit, args.repeticiones)
+        filas["  304 (ms)"] = medir(not_modified, args.repeticiones)
+        imprimir(f"GET /materiales/ — {nombre}", filas)
+        filas = {}
+
+    # Una escritura ORM invalida el catálogo
+    url = consultas["sin filtro"]
+    client.get(url)
+    db = SessionLocal()
+    material = db.query(Material).first()
+    material.precio_base += 1
+    db.commit()
+    db.close()
+    imprimir("Invalidación", {
+        "versión del catálogo": material_catalog.version,
+        "tras actualizar un material": client.get(url).headers["X-Catalog-Cache"],
+    })
+
+if __name__ == "__main__":
+    main()
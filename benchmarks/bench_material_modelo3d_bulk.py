@@ -0,0 +1,105 @@
+"""
+Benchmark de POST /materiales-modelo3d/bulk con payloads de 1.000 elementos:
+validación por conjuntos + INSERT ... RETURNING frente al recorrido anterior
+(dos get_by_id por elemento, add_all y refresh de cada fila)
+Ejecutar: python benchmarks/bench_material_modelo3d_bulk.py [--items 1000]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+
+from common import configurar_entorno, reset_db, medir, imprimir, crear_usuario, crear_modelos3d
+from bench_material_catalog import poblar
+
+MATERIALES = 5_000
+
+def contar_consultas(engine):
+    """Contador de sentencias SQL ejecutadas sobre el engine, por tipo (SELECT/INSERT)"""
+    from collections import Counter
+    from sqlalchemy import event
+    contador = Counter()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _contar(conn, cursor, statement, *args):
+        contador[statement.lstrip().split(None, 1)[0].upper()] += 1
+    return contador
+
+def bulk_anterior(db, items):
+    """Implementación previa: validar elemento a elemento y refrescar cada fila"""
+    from models.material_modelo3d import MaterialModelo3D
+    from repositories.material_repository import MaterialRepository
+    from repositories.modelo3d_repository import Modelo3DRepository
+
+    modelo3d_repo = Modelo3DRepository(db)
+    for item in items:
+        if not modelo3d_repo.get_by_id(item["modelo3d_id"]) or not MaterialRepository.get_by_id(db, item["material_id"]):
+            raise ValueError("no encontrado")
+    filas = [MaterialModelo3D(**item, subtotal=item["cantidad"] * item["precio_unitario"]) for item in items]
+    db.add_all(filas)
+    db.commit()
+    for fila in filas:
+        db.refresh(fila)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(MATERIALES)
+    usuario_id, headers = crear_usuario()
+    modelos = crear_modelos3d(usuario_id, 50)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal, engine
+
+    rng = random.Random(3)
+    validos = [
+        {"modelo3d_id": rng.choice(modelos), "material_id": rng.randint(1, MATERIALES),
+         "cantidad": round(rng.uniform(1, 100), 2), "unidad_medida": "m2", "precio_unitario": 12.5}
+        for _ in range(args.items)
+    ]
+    # 2% de elementos con IDs inexistentes y la mitad sin precio (se toma del catálogo)
+    con_errores = [dict(item) for item in validos]
+    for item in rng.sample(con_errores, args.items // 50):
+        item["material_id"] = 10_000_000
+    for item in con_errores[::2]:
+        item.pop("precio_unitario")
+
+    client = TestClient(app_main.app)
+    consultas = contar_consultas(engine)
+
+    def post(payload):
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+            response = client.post("/materiales-modelo3d/bulk", json=payload, headers=headers)
+        assert response.status_code == 201, response.text
+        return response.json()["data"]
+
+    consultas.clear()
+    data = post(con_errores)
+    consultas_nuevo = dict(consultas)
+
+    db = SessionLocal()
+    consultas.clear()
+    bulk_anterior(db, validos)
+    consultas_anterior = dict(consultas)
+
+    imprimir(f"{args.items} elementos por petición", {
+        "POST /bulk (ms)": medir(lambda: post(validos), args.repeticiones),
+        "POST /bulk con 2% inválidos (ms)": medir(lambda: post(con_errores), args.repeticiones),
+        "implementación anterior (ms)": medir(lambda: bulk_anterior(db, validos), args.repeticiones),
+        # En SQLite el INSERT ... RETURNING ordenado se emite fila a fila (sin centinela implícito);
+        # en PostgreSQL SQLAlchemy lo agrupa en sentencias multi-fila de hasta 1.000 filas
+        "sentencias nuevo (incluye auth)": consultas_nuevo,
+        "sentencias anterior": consultas_anterior,
+        "insertados / errores reportados": f"{data['total']} / {data['total_errores']}",
+    })
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark de GET /materiales/search sobre 100k materiales (índice en memoria, SQLite)
+comparado con el `ilike '%term%'` de MaterialRepository.search_by_name
+Ejecutar: python benchmarks/bench_material_search.py [--materiales 100000]
+"""
+
+import argparse
+import time
+
+from common import configurar_entorno, reset_db, medir, imprimir
+from bench_material_catalog import poblar
+
+CONSULTAS = {
+    "palabra completa": "granito",
+    "prefijo (autocompletado)": "porcel",
+    "sin acento": "marmol",
+    "dos términos": "ceramica 4521",
+    "código": "MAT-0420",
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--materiales", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(args.materiales)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from repositories.material_repository import MaterialRepository
+    from services.material_search_service import material_search_index
+
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    material_search_index.ensure_fresh(db)
+    construccion_ms = (time.perf_counter() - inicio) * 1000
+    imprimir("Índice en memoria", {
+        "materiales": args.materiales,
+        "tokens distintos": len(material_search_index._tokens),
+        "construcción (ms)": round(construccion_ms, 1),
+    })
+
+    client = TestClient(app_main.app)
+    for nombre, q in CONSULTAS.items():
+        respuesta = client.get("/materiales/search", params={"q": q, "limit": 20}).json()["data"]
+        primero = respuesta["materiales"][0]["nombre"] if respuesta["materiales"] else "-"
+        imprimir(f"q='{q}' ({nombre})", {
+            "resultados": respuesta["total"],
+            "primer resultado": primero,
+            "GET /materiales/search (ms)": medir(
+                lambda: client.get("/materiales/search", params={"q": q, "limit": 20}), args.repeticiones
+            ),
+            "ilike search_by_name (ms)": medir(
+                lambda: MaterialRepository.search_by_name(db, q, limit=20), args.repeticiones
+            ),
+        })
+    db.close()
+
+if __name__ == "__main__":
+    main()
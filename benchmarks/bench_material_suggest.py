@@ -0,0 +1,112 @@
+"""
+Benchmark de GET /materiales/suggest simulando usuarios que escriben letra por letra
+sobre 100k materiales (índice de prefijos en memoria, SQLite)
+Ejecutar: python benchmarks/bench_material_suggest.py [--materiales 100000] [--usuarios 200]
+"""
+
+import argparse
+import random
+import time
+
+from common import configurar_entorno, reset_db, resumen, imprimir
+from bench_material_catalog import poblar, PALABRAS
+
+def flujos_de_teclas(rng: random.Random, usuarios: int) -> list:
+    """Cada usuario escribe un nombre, un código o un número de material carácter a carácter"""
+    objetivos = []
+    for _ in range(usuarios):
+        tipo = rng.random()
+        if tipo < 0.5:
+            objetivos.append(rng.choice(PALABRAS))
+        elif tipo < 0.8:
+            objetivos.append(f"MAT-{rng.randrange(100_000):06d}")
+        else:
+            objetivos.append(f"{rng.choice(PALABRAS)} {rng.randrange(100_000)}")
+    return [[texto[:i] for i in range(1, len(texto) + 1)] for texto in objetivos]
+
+def medir_teclas(flujos: list, fn) -> list:
+    tiempos = []
+    for flujo in flujos:
+        for prefijo in flujo:
+            inicio = time.perf_counter()
+            fn(prefijo)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+def en_microsegundos(r: dict) -> dict:
+    return {k.replace("_ms", "_us"): (round(v * 1000, 1) if k.endswith("_ms") else v) for k, v in r.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--materiales", type=int, default=100_000)
+    parser.add_argument("--usuarios", type=int, default=200)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(args.materiales)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from models.material import Material
+    from repositories.material_repository import MaterialRepository
+    from services.material_suggest_service import material_suggest_index
+
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    material_suggest_index.ensure_loaded(db)
+    imprimir("Índice de prefijos", {
+        "materiales": args.materiales,
+        "claves": sum(len(claves) for claves in material_suggest_index._entries.values()),
+        "construcción (ms)": round((time.perf_counter() - inicio) * 1000, 1),
+    })
+
+    flujos = flujos_de_teclas(random.Random(7), args.usuarios)
+    teclas = sum(len(f) for f in flujos)
+    client = TestClient(app_main.app)
+
+    imprimir(f"{args.usuarios} usuarios, {teclas} pulsaciones", {
+        "índice suggest() (µs)": en_microsegundos(resumen(
+            medir_teclas(flujos, lambda p: material_suggest_index.suggest(p, limit=10))
+        )),
+        # Prefijos que comparten miles de materiales y pocas categorías: no debe recorrer los materiales
+        "índice suggest(tipo=categoria) (µs)": en_microsegundos(resumen(
+            medir_teclas(flujos, lambda p: material_suggest_index.suggest(p, limit=10, tipo="categoria"))
+        )),
+        "GET /materiales/suggest (ms)": resumen(
+            medir_teclas(flujos, lambda p: client.get("/materiales/suggest", params={"prefix": p}))
+        ),
+        "ilike search_by_name (ms)": resumen(
+            medir_teclas(flujos[: max(1, args.usuarios // 10)], lambda p: MaterialRepository.search_by_name(db, p, limit=10))
+        ),
+    })
+
+    categorias = material_suggest_index.suggest("c", limit=5, tipo="categoria")
+    assert categorias and all(c["tipo"] == "categoria" for c in categorias), categorias
+    materiales = material_suggest_index.suggest("c", limit=5, tipo="material")
+    assert materiales and all(m["tipo"] == "material" for m in materiales), materiales
+
+    # Actualización incremental: crear y renombrar un material debe reflejarse sin reconstruir
+    nuevo = Material(codigo="ZZZ-NUEVO", nombre="Zócalo Experimental", precio_base=10, unidad_medida="m", categoria_id=1)
+    db.add(nuevo)
+    inicio = time.perf_counter()
+    db.commit()
+    alta_ms = (time.perf_counter() - inicio) * 1000
+    visible_alta = [s["nombre"] for s in material_suggest_index.suggest("zocalo exp")]
+    nuevo.nombre = "Zócalo Renombrado"
+    inicio = time.perf_counter()
+    db.commit()
+    cambio_ms = (time.perf_counter() - inicio) * 1000
+    imprimir("Actualización incremental", {
+        "commit alta + índice (ms)": round(alta_ms, 2),
+        "visible tras alta": visible_alta,
+        "commit cambio + índice (ms)": round(cambio_ms, 2),
+        "visible tras renombrar": [s["nombre"] for s in material_suggest_index.suggest("zocalo ren")],
+        "nombre anterior retirado": not material_suggest_index.suggest("zocalo exp"),
+        "índice sigue cargado (sin reconstrucción)": material_suggest_index.loaded,
+    })
+    db.close()
+
+if __name__ == "__main__":
+    main()
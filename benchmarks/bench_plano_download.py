@@ -0,0 +1,181 @@
+"""
+Benchmark de memoria de GET /planos/{id}/download: 10 descargas concurrentes de 10 MB contra
+un uvicorn nuevo por escenario, midiendo el pico de RSS del proceso de la API sobre su RSS en
+reposo. Compara el camino con buffer (archivo completo en memoria antes de responder, el que
+sigue usando GET /image?proxy=true) con la transmisión por partes desde S3 (moto local), el
+archivo local con FileResponse y la redirección a una URL prefirmada. Verifica también Range
+(reanudar una descarga, 416) y que los planos sin tipo/tamaño cacheados los completan.
+Ejecutar: python benchmarks/bench_plano_download.py [--mb 10] [--concurrencia 10]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import ROOT, configurar_entorno, reset_db, imprimir, crear_usuario
+from bench_local_storage import puerto_libre
+
+BUCKET = "planos-bench"
+
+def iniciar_api(puerto: int):
+    import httpx
+
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(ROOT), "--port", str(puerto),
+         "--log-level", "warning", "--no-access-log"],
+        env={**os.environ}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{puerto}/docs")
+            return servidor
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("uvicorn no arrancó")
+
+async def descargar(base_url: str, rutas: list, headers: dict, seguir: bool) -> int:
+    """Descargar todas las rutas a la vez descartando los bytes; devuelve el total recibido"""
+    import httpx
+
+    total = 0
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=120, follow_redirects=seguir) as client:
+        async def una(ruta: str):
+            nonlocal total
+            async with client.stream("GET", ruta) as response:
+                assert response.status_code == 200, response.status_code
+                async for parte in response.aiter_bytes():
+                    total += len(parte)
+
+        await asyncio.gather(*(una(ruta) for ruta in rutas))
+    return total
+
+def escenario(rutas: list, headers: dict, seguir: bool = True) -> dict:
+    """RSS de un uvicorn nuevo en reposo (tras una petición de calentamiento) y su pico durante las descargas"""
+    import psutil
+
+    puerto = puerto_libre()
+    servidor = iniciar_api(puerto)
+    base_url = f"http://127.0.0.1:{puerto}"
+    try:
+        asyncio.run(descargar(base_url, rutas[:1], headers, seguir))
+        proceso = psutil.Process(servidor.pid)
+        reposo = proceso.memory_info().rss
+        pico, activo = reposo, True
+
+        def muestrear():
+            nonlocal pico
+            while activo:
+                pico = max(pico, proceso.memory_info().rss)
+                time.sleep(0.005)
+
+        hilo = threading.Thread(target=muestrear)
+        hilo.start()
+        inicio = time.perf_counter()
+        total = asyncio.run(descargar(base_url, rutas, headers, seguir))
+        segundos = time.perf_counter() - inicio
+        activo = False
+        hilo.join()
+    finally:
+        servidor.terminate()
+        servidor.wait()
+    return {
+        "rss_reposo_MB": round(reposo / 1e6, 1),
+        "pico_sobre_reposo_MB": round((pico - reposo) / 1e6, 1),
+        "MB_recibidos": round(total / 1e6),
+        "s": round(segundos, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, default=10)
+    parser.add_argument("--concurrencia", type=int, default=10)
+    args = parser.parse_args()
+
+    from moto.server import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import make_server
+
+    puerto_s3 = puerto_libre()
+    directorio = tempfile.mkdtemp(prefix="bench_download_")
+    os.environ.update({
+        "STORAGE_BACKEND": "s3", "S3_BUCKET": BUCKET, "S3_ENDPOINT_URL": f"http://127.0.0.1:{puerto_s3}",
+        "S3_ACCESS_KEY_ID": "bench", "S3_SECRET_ACCESS_KEY": "bench", "LOCAL_STORAGE_DIR": directorio,
+    })
+    configurar_entorno()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # moto registra cada petición
+    reset_db()
+    usuario_id, headers = crear_usuario()
+    os.chdir(directorio)
+
+    bucket = make_server("127.0.0.1", puerto_s3, DomainDispatcherApplication(create_backend_app), threaded=True)
+    threading.Thread(target=bucket.serve_forever, daemon=True).start()
+
+    from database import SessionLocal
+    from models.plano import Plano
+    from services.storage_service import get_storage
+
+    get_storage("s3").client.create_bucket(Bucket=BUCKET)
+    rng = random.Random(46)
+    contenido = rng.randbytes(int(args.mb * 1024 * 1024))
+    db = SessionLocal()
+    ids = {"s3": [], "local": []}
+    for backend in ids:
+        for i in range(args.concurrencia):
+            url = get_storage(backend).guardar(f"planos/{backend}-{i}.png", contenido, "image/png")
+            plano = Plano(usuario_id=usuario_id, nombre=f"Plano {backend} {i}", url=url,
+                          mime_type="image/png", tamano=len(contenido), estado="completado")
+            db.add(plano)
+            db.commit()
+            ids[backend].append(plano.id)
+
+    n, mb = args.concurrencia, args.mb
+    imprimir(f"{n} descargas concurrentes de {mb} MB (uvicorn nuevo por escenario)", {
+        "Buffer completo (GET /image?proxy=true)": escenario([f"/planos/{i}/image?proxy=true" for i in ids["s3"]], headers),
+        "Por partes desde S3 (GET /download?proxy=true)": escenario([f"/planos/{i}/download?proxy=true" for i in ids["s3"]], headers),
+        "Archivo local, FileResponse (GET /download?proxy=true)": escenario([f"/planos/{i}/download?proxy=true" for i in ids["local"]], headers),
+        "Redirección a URL prefirmada (GET /download)": escenario([f"/planos/{i}/download" for i in ids["s3"]], headers),
+    })
+
+    # Range: reanudar una descarga cortada a la mitad
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    client = TestClient(app_main.app, headers=headers)
+    ruta = f"/planos/{ids['s3'][0]}/download?proxy=true"
+    mitad = len(contenido) // 2
+    with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+        primera = client.get(ruta, headers={"Range": f"bytes=0-{mitad - 1}"})
+        resto = client.get(ruta, headers={"Range": f"bytes={mitad}-"})
+        ultimos = client.get(ruta, headers={"Range": "bytes=-100"})
+        fuera = client.get(ruta, headers={"Range": f"bytes={len(contenido)}-"})
+    assert primera.content + resto.content == contenido and ultimos.content == contenido[-100:]
+
+    # Plano anterior a las columnas de metadatos: se completan en la primera descarga
+    url = get_storage("s3").guardar("planos/anterior.pdf", contenido[:1000], "application/pdf")
+    anterior = Plano(usuario_id=usuario_id, nombre="Anterior", url=url, estado="completado")
+    db.add(anterior)
+    db.commit()
+    with contextlib.redirect_stdout(io.StringIO()):
+        descarga_anterior = client.get(f"/planos/{anterior.id}/download?proxy=true")
+    db.refresh(anterior)
+    imprimir("Range y metadatos cacheados", {
+        "Primera mitad": f"{primera.status_code} {primera.headers['content-range']}",
+        "Reanudación": f"{resto.status_code} {resto.headers['content-range']}",
+        "Últimos 100 bytes": f"{ultimos.status_code} {ultimos.headers['content-range']}",
+        "Rango fuera del archivo": f"{fuera.status_code} {fuera.headers['content-range']}",
+        "Plano sin metadatos": f"{descarga_anterior.status_code} {descarga_anterior.headers['content-disposition']}",
+        "Metadatos guardados": (anterior.mime_type, anterior.tamano),
+    })
+    db.close()
+    bucket.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark de la normalización de planos antes del conversor (PLANO_NORMALIZAR): una foto de
+celular (4032x3024, rotación EXIF, papel gris desparejo y ruido), un escaneo a 300 dpi y un
+plano PNG de 1600x1200 subidos con POST /planos/ contra el conversor stub, cuya latencia crece
+con los megapíxeles recibidos y que mide la habitación en proporción a los píxeles (como el
+conversor real). Compara el envío original, la pre-validación sin normalizar y la
+normalización con varios lados máximos: KB enviados, tiempo de preparación (en el pool de
+procesos) y tiempo total de la subida. Luego verifica que, reescalado, el modelo mide lo mismo
+con cualquier lado máximo y que la foto llega orientada.
+Ejecutar: python benchmarks/bench_plano_normalizacion.py [--latencia-ms 300] [--ms-por-megapixel 250] [--repeticiones 3]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from common import configurar_entorno, reset_db, imprimir, crear_usuario
+from bench_local_storage import puerto_libre
+from bench_plano_prevalidacion import dibujar_plano, codificar
+
+METROS_POR_PIXEL = 0.005
+LADOS = (1024, 1536, 2048, 3072)
+
+def foto_celular() -> bytes:
+    """Plano vertical fotografiado: guardado apaisado con Orientation=6, papel gris con sombra y ruido"""
+    from PIL import Image
+
+    plano = dibujar_plano(3024, 4032).convert("L")
+    sombra = Image.linear_gradient("L").resize(plano.size).point(lambda v: 150 + v * 70 // 255)
+    papel = Image.composite(sombra, Image.new("L", plano.size, 25), plano.point(lambda v: 255 if v > 128 else 0))
+    ruido = Image.effect_noise(plano.size, 12)
+    gris = Image.blend(papel, ruido, 0.15)
+    color = Image.merge("RGB", (gris, gris.point(lambda v: v * 96 // 100), gris.point(lambda v: v * 88 // 100)))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    return codificar(color.rotate(90, expand=True), "JPEG", quality=90, exif=exif)
+
+def corpus() -> list:
+    """[(descripción, filename, contenido, (ancho, alto) orientado)]"""
+    return [
+        ("Foto celular JPEG 4032x3024 (EXIF 6)", "foto.jpg", foto_celular(), (3024, 4032)),
+        ("Escaneo 300 dpi PNG 4961x3508", "escaneo.png", codificar(dibujar_plano(4961, 3508).convert("L"), "PNG"), (4961, 3508)),
+        ("Plano PNG 1600x1200", "casa.png", codificar(dibujar_plano(1600, 1200), "PNG"), (1600, 1200)),
+    ]
+
+def configurar(prevalidar: bool, normalizar: bool, lado: int):
+    from config import settings
+
+    settings.PLANO_PREVALIDACION = prevalidar
+    settings.PLANO_NORMALIZAR = normalizar
+    settings.PLANO_CONVERTER_MAX_LADO = lado
+
+def subir(client, headers: dict, filename: str, contenido: bytes, repeticiones: int) -> dict:
+    from converter_stub import ConversorStub
+
+    tiempos, bytes_0 = [], ConversorStub.bytes_recibidos
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user y el servicio imprimen cada paso
+            response = client.post("/planos/", headers=headers, data={"nombre": filename},
+                                   files={"file": (filename, contenido, "application/octet-stream")})
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        assert response.status_code == 200, response.text
+    return {
+        "ms": statistics.median(tiempos),
+        "KB": (ConversorStub.bytes_recibidos - bytes_0) / repeticiones / 1024,
+        "medidas": response.json()["medidas_extraidas"],
+    }
+
+def preparar(filename: str, contenido: bytes, repeticiones: int):
+    """Mediana del tiempo de _preparar (ida y vuelta al pool de procesos incluida) y el resultado"""
+    from services.plano_service import PlanoService
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            preparado = PlanoService(None)._preparar(contenido, filename)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), preparado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latencia-ms", type=float, default=300, help="Latencia fija del conversor stub")
+    parser.add_argument("--ms-por-megapixel", type=float, default=250, help="Latencia del stub por megapíxel recibido")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    from converter_stub import crear_servidor
+
+    puerto_stub = puerto_libre()
+    directorio = tempfile.mkdtemp(prefix="bench_normalizacion_")
+    os.environ.update({
+        "STORAGE_BACKEND": "local", "LOCAL_STORAGE_DIR": directorio,
+        "FLOORPLAN_API_URL": f"http://127.0.0.1:{puerto_stub}", "FLOORPLAN_API_URLS": "",
+    })
+    configurar_entorno()
+    reset_db()
+    _, headers = crear_usuario()
+    os.chdir(directorio)
+
+    stub = crear_servidor(puerto_stub, latencia_ms=args.latencia_ms, ms_por_megapixel=args.ms_por_megapixel,
+                          metros_por_pixel=METROS_POR_PIXEL)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    archivos = corpus()
+    client = TestClient(app_main.app)
+    modos = [("Original (sin pre-validación)", False, False, 2048),
+             ("Pre-validación sin normalizar, lado 2048", True, False, 2048)]
+    modos += [(f"Normalizado, lado {lado}", True, True, lado) for lado in LADOS]
+
+    configurar(True, True, 2048)
+    preparar("casa.png", archivos[2][2], 1)  # Arranca los procesos del pool fuera de la medición
+
+    medidas = {}
+    for descripcion, filename, contenido, _ in archivos:
+        filas = {}
+        for modo, prevalidar, normalizar, lado in modos:
+            configurar(prevalidar, normalizar, lado)
+            ms_preparar = preparar(filename, contenido, args.repeticiones)[0] if prevalidar else 0
+            r = subir(client, headers, filename, contenido, args.repeticiones)
+            filas[modo] = (f"{r['KB']:7.0f} KB al conversor  preparación {ms_preparar:6.0f} ms  "
+                           f"subida {r['ms']:6.0f} ms")
+            medidas.setdefault(descripcion, {})[modo] = r["medidas"]["bounds"]
+        imprimir(f"{descripcion}: {len(contenido) / 1024:.0f} KB, stub de {args.latencia_ms:.0f} ms + "
+                 f"{args.ms_por_megapixel:.0f} ms/MP, mediana de {args.repeticiones}", filas)
+
+    filas = {}
+    for descripcion, filename, contenido, (ancho, alto) in archivos:
+        esperado = f"{ancho * METROS_POR_PIXEL:.2f}x{alto * METROS_POR_PIXEL:.2f} m"
+        obtenidos = {f"{b['ancho']:.2f}x{b['alto']:.2f} m" for b in medidas[descripcion].values()}
+        filas[descripcion] = f"esperado {esperado}, medido {' / '.join(sorted(obtenidos))}"
+    imprimir("Bounds del modelo reescalado (mismo valor con cualquier modo = coordenadas en escala original)", filas)
+
+    configurar(True, True, 1536)
+    filas = {}
+    for descripcion, filename, contenido, _ in archivos:
+        _, preparado = preparar(filename, contenido, 1)
+        filas[descripcion] = (f"{preparado.mime_type} {preparado.ancho}x{preparado.alto} de "
+                              f"{preparado.ancho_original}x{preparado.alto_original}, escala {preparado.escala:.4f}")
+    imprimir("Normalizado a lado 1536: imagen enviada y escala registrada", filas)
+
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
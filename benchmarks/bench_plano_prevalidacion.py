@@ -0,0 +1,171 @@
+"""
+Benchmark de la pre-validación de planos: un corpus mixto (planos PNG/JPEG/PDF/SVG, escaneos
+enormes, imágenes en blanco o diminutas, archivos corruptos y archivos de otro tipo con una
+extensión permitida) subido con POST /planos/ contra el conversor stub, con y sin
+PLANO_PREVALIDACION. Cuenta las llamadas al conversor evitadas, los bytes enviados y lo que
+aceptó cada modo; luego detalla por archivo el resultado y el tiempo de la pre-validación.
+Ejecutar: python benchmarks/bench_plano_prevalidacion.py [--latencia-ms 1500]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import zipfile
+
+from common import configurar_entorno, reset_db, imprimir, crear_usuario
+from bench_local_storage import puerto_libre
+
+def dibujar_plano(ancho: int, alto: int, fondo=(255, 255, 255)):
+    """Plano sintético: contorno, tabiques, puertas y cotas"""
+    from PIL import Image, ImageDraw
+
+    imagen = Image.new("RGB", (ancho, alto), fondo)
+    dibujo = ImageDraw.Draw(imagen)
+    grosor = max(2, ancho // 200)
+    margen = ancho // 10
+    dibujo.rectangle([margen, margen, ancho - margen, alto - margen], outline=(0, 0, 0), width=grosor * 2)
+    dibujo.line([ancho // 2, margen, ancho // 2, alto - margen], fill=(0, 0, 0), width=grosor)
+    dibujo.line([margen, alto // 2, ancho // 2, alto // 2], fill=(0, 0, 0), width=grosor)
+    dibujo.arc([ancho // 2 - margen // 2, alto // 2, ancho // 2 + margen // 2, alto // 2 + margen], 0, 90,
+               fill=(60, 60, 60), width=grosor)
+    dibujo.line([margen, margen // 2, ancho - margen, margen // 2], fill=(90, 90, 90), width=max(1, grosor // 2))
+    return imagen
+
+def codificar(imagen, formato: str, **opciones) -> bytes:
+    buffer = io.BytesIO()
+    imagen.save(buffer, format=formato, **opciones)
+    return buffer.getvalue()
+
+def escaneo_en_blanco(ancho: int, alto: int) -> bytes:
+    """Hoja en blanco escaneada: papel levemente gris con ruido de sensor"""
+    from PIL import Image
+
+    ruido = Image.effect_noise((ancho, alto), 2).point(lambda v: 240 + (v - 128) // 16)
+    return codificar(ruido.convert("RGB"), "JPEG", quality=85)
+
+SVG_PLANO = """<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="800" height="600" viewBox="0 0 800 600">
+  <rect x="40" y="40" width="720" height="520" fill="none" stroke="#000" stroke-width="8"/>
+  <line x1="400" y1="40" x2="400" y2="560" stroke="#000" stroke-width="4"/>
+  <line x1="40" y1="300" x2="400" y2="300" stroke="#000" stroke-width="4"/>
+  <path d="M400 300 A60 60 0 0 1 460 360" fill="none" stroke="#444" stroke-width="2"/>
+  <text x="200" y="180" font-size="24">Living</text>
+</svg>"""
+
+def corpus() -> list:
+    """[(descripción, filename, contenido, es_plano)]"""
+    plano = dibujar_plano(1600, 1200)
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as z:
+        z.writestr("plano.txt", "no es un plano")
+    png = codificar(plano, "PNG")
+    return [
+        ("Plano PNG 1600x1200", "casa.png", png, True),
+        ("Plano JPEG 1600x1200", "casa.jpg", codificar(plano, "JPEG", quality=90), True),
+        ("Escaneo JPEG 6000x4500", "escaneo.jpg", codificar(dibujar_plano(6000, 4500), "JPEG", quality=85), True),
+        ("Escaneo PNG 5000x3750", "escaneo.png", codificar(dibujar_plano(5000, 3750).convert("L"), "PNG"), True),
+        ("Plano PDF (A4 apaisado)", "casa.pdf", codificar(dibujar_plano(1754, 1240), "PDF", resolution=150), True),
+        ("Plano SVG", "casa.svg", SVG_PLANO.encode(), True),
+        ("SVG que declara 6000x6000", "grande.svg",
+         SVG_PLANO.replace('width="800" height="600"', 'width="6000" height="6000"').encode(), True),
+        ("JPEG con extensión .png", "foto.png", codificar(plano, "JPEG", quality=90), True),
+        ("PNG en blanco 1600x1200", "blanco.png", codificar(dibujar_plano(1, 1).resize((1600, 1200)), "PNG"), False),
+        ("Escaneo en blanco JPEG 3000x2250", "hoja.jpg", escaneo_en_blanco(3000, 2250), False),
+        ("Miniatura PNG 120x90", "mini.png", codificar(plano.resize((120, 90)), "PNG"), False),
+        ("PDF con una página en blanco", "vacio.pdf", codificar(dibujar_plano(1, 1).resize((1240, 1754)), "PDF"), False),
+        ("PDF corrupto", "roto.pdf", b"%PDF-1.4\n" + random.Random(49).randbytes(20_000), False),
+        ("PNG truncado", "cortado.png", png[: len(png) // 3], False),
+        ("Texto con extensión .png", "notas.png", ("Lista de compras\n" * 500).encode(), False),
+        ("ZIP con extensión .pdf", "planos.pdf", zip_buffer.getvalue(), False),
+        ("HTML con extensión .svg", "pagina.svg", b"<!DOCTYPE html><html><body>hola</body></html>", False),
+        ("SVG que declara 600000x600000", "bomba.svg",
+         SVG_PLANO.replace('width="800" height="600"', 'width="600000" height="600000"').encode(), False),
+        ("SVG sin tamaño declarado", "sin_tamano.svg",
+         SVG_PLANO.replace('width="800" height="600" viewBox="0 0 800 600"', "").encode(), False),
+        ("SVG con imagen externa", "externo.svg",
+         SVG_PLANO.replace("</svg>", '<image href="file:///etc/passwd" width="10" height="10"/></svg>').encode(), False),
+    ]
+
+def subir_corpus(client, headers: dict, archivos: list, prevalidar: bool) -> dict:
+    from config import settings
+    from converter_stub import ConversorStub
+
+    settings.PLANO_PREVALIDACION = prevalidar
+    llamadas_0, bytes_0 = ConversorStub.atendidas, ConversorStub.bytes_recibidos
+    aceptados_validos = aceptados_invalidos = 0
+    inicio = time.perf_counter()
+    for _, filename, contenido, es_plano in archivos:
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user y el servicio imprimen cada paso
+            response = client.post("/planos/", headers=headers, data={"nombre": filename},
+                                   files={"file": (filename, contenido, "application/octet-stream")})
+        if response.status_code == 200:
+            if es_plano:
+                aceptados_validos += 1
+            else:
+                aceptados_invalidos += 1
+    return {
+        "llamadas_conversor": ConversorStub.atendidas - llamadas_0,
+        "MB_al_conversor": round((ConversorStub.bytes_recibidos - bytes_0) / 1e6, 2),
+        "planos_aceptados": f"{aceptados_validos}/{sum(1 for a in archivos if a[3])}",
+        "no_planos_aceptados": aceptados_invalidos,
+        "s": round(time.perf_counter() - inicio, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latencia-ms", type=float, default=1500, help="Latencia del conversor stub")
+    args = parser.parse_args()
+
+    from converter_stub import crear_servidor
+
+    puerto_stub = puerto_libre()
+    directorio = tempfile.mkdtemp(prefix="bench_prevalidacion_")
+    os.environ.update({
+        "STORAGE_BACKEND": "local", "LOCAL_STORAGE_DIR": directorio,
+        "FLOORPLAN_API_URL": f"http://127.0.0.1:{puerto_stub}", "FLOORPLAN_API_URLS": "",
+    })
+    configurar_entorno()
+    reset_db()
+    _, headers = crear_usuario()
+    os.chdir(directorio)
+
+    stub = crear_servidor(puerto_stub, latencia_ms=args.latencia_ms)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from config import settings
+    from services.plano_prevalidacion import ArchivoInvalido, prevalidar
+
+    archivos = corpus()
+    client = TestClient(app_main.app)
+    n_planos = sum(1 for a in archivos if a[3])
+    imprimir(f"POST /planos/ con {len(archivos)} archivos ({n_planos} planos), conversor stub de {args.latencia_ms:.0f} ms", {
+        "Sin pre-validación": subir_corpus(client, headers, archivos, prevalidar=False),
+        "Con pre-validación": subir_corpus(client, headers, archivos, prevalidar=True),
+    })
+
+    filas = {}
+    for descripcion, filename, contenido, _ in archivos:
+        inicio = time.perf_counter()
+        try:
+            preparado = prevalidar(
+                contenido, filename, settings.PLANO_MIN_LADO, settings.PLANO_CONVERTER_MAX_LADO,
+                settings.PLANO_RASTER_DPI, settings.PLANO_MIN_DESVIACION, settings.PLANO_MAX_MEGAPIXELES
+            )
+            resultado = (f"→ {preparado.mime_type} {preparado.ancho}x{preparado.alto}, "
+                         f"{len(contenido) / 1024:.0f} KB → {len(preparado.contenido) / 1024:.0f} KB")
+        except ArchivoInvalido as e:
+            resultado = f"✗ {str(e)[:70]}"
+        filas[descripcion] = f"{(time.perf_counter() - inicio) * 1000:6.1f} ms  {resultado}"
+    imprimir("Pre-validación por archivo", filas)
+
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
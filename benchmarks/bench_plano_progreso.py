@@ -0,0 +1,232 @@
+"""
+Benchmark del progreso de planos por Server-Sent Events (GET /planos/progreso/{seguimiento}).
+1. Bus en memoria: latencia de entrega (publicación desde un hilo del threadpool hasta la cola
+   asyncio del suscriptor) con 1.000 suscriptores en un canal y en 1.000 canales.
+2. Por uvicorn: 1.000 suscripciones SSE concurrentes (20 por subida) mientras se suben 50
+   planos con POST /planos/ contra el conversor stub; latencia de cada evento (ts del servidor
+   hasta que llega al cliente, mismo reloj), secuencia completa de etapas, RSS y CPU del
+   proceso de la API con las suscripciones abiertas.
+3. Casos: archivo rechazado (evento 'error') y suscripción tardía (recibe 'listo' y cierra).
+Ejecutar: python benchmarks/bench_plano_progreso.py [--suscriptores 1000] [--subidas 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from common import ROOT, configurar_entorno, reset_db, resumen, imprimir, crear_usuario
+from bench_local_storage import puerto_libre
+from bench_plano_prevalidacion import dibujar_plano, codificar
+
+ETAPAS_SUBIDA = ["recibido", "validando", "convirtiendo", "midiendo", "guardando", "listo"]
+
+async def bus_en_memoria(suscriptores: int, canales: int) -> dict:
+    """Suscriptores repartidos en `canales`; un hilo publica 6 etapas por canal"""
+    from services.progreso_service import BusProgreso, Seguimiento
+
+    bus = BusProgreso()
+    latencias, listos = [], asyncio.Event()
+    pendientes = suscriptores
+
+    async def suscriptor(canal: str, preparado: asyncio.Event):
+        nonlocal pendientes
+        async with bus.suscribir(canal) as cola:
+            preparado.set()
+            while True:
+                evento = await cola.get()
+                latencias.append((time.time() - evento["ts"]) * 1000)
+                if evento["etapa"] == "listo":
+                    break
+        pendientes -= 1
+        if pendientes == 0:
+            listos.set()
+
+    claves = [uuid.uuid4().hex for _ in range(canales)]
+    preparados = []
+    for i in range(suscriptores):
+        preparado = asyncio.Event()
+        preparados.append(preparado)
+        asyncio.create_task(suscriptor(f"1:{claves[i % canales]}", preparado))
+    await asyncio.gather(*(p.wait() for p in preparados))
+
+    def publicar():
+        seguimientos = [Seguimiento(1, clave, bus) for clave in claves]
+        for etapa in ETAPAS_SUBIDA:
+            for seguimiento in seguimientos:
+                seguimiento(etapa)
+
+    inicio = time.perf_counter()
+    threading.Thread(target=publicar).start()
+    await listos.wait()
+    stats = resumen(latencias)
+    return {
+        "eventos": len(latencias),
+        "mediana_ms": round(stats["mediana_ms"], 2),
+        "p99_ms": round(stats["p99_ms"], 2),
+        "total_ms": round((time.perf_counter() - inicio) * 1000, 1),
+    }
+
+async def suscribir(base_url: str, headers: dict, clave: str, al_suscribir: asyncio.Event,
+                    params: str = "") -> list:
+    """
+    Cliente SSE mínimo sobre asyncio (httpx con 1.000 streams en un solo proceso frena su
+    propio event loop y esa demora se mediría como latencia del servidor). La respuesta llega
+    con Transfer-Encoding chunked: cada evento va en un chunk propio y basta con leer líneas.
+    """
+    host, puerto = base_url.removeprefix("http://").split(":")
+    reader, writer = await asyncio.open_connection(host, int(puerto))
+    cabeceras = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    writer.write(f"GET /planos/progreso/{clave}{params} HTTP/1.1\r\nHost: {host}\r\n{cabeceras}\r\n".encode())
+    status = int((await reader.readline()).split()[1])
+    eventos = []
+    try:
+        if status != 200:
+            return [(time.time(), {"etapa": f"HTTP {status}"})]
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass  # Cabeceras
+        while linea := await reader.readline():
+            if linea.startswith(b": suscrito"):
+                al_suscribir.set()
+            elif linea.startswith(b"data: "):
+                evento = json.loads(linea[6:])
+                eventos.append((time.time(), evento))
+                if evento["etapa"] in ("listo", "error"):
+                    break
+    finally:
+        writer.close()
+    return eventos
+
+async def carga_sse(base_url: str, headers: dict, suscriptores: int, subidas: int, proceso) -> dict:
+    import httpx
+
+    archivo = codificar(dibujar_plano(1024, 768), "PNG")  # Pasa la pre-validación
+    claves = [uuid.uuid4().hex for _ in range(subidas)]
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=120) as client:
+        rss_0 = proceso.memory_info().rss
+        inicio = time.perf_counter()
+        suscritos = [asyncio.Event() for _ in range(suscriptores)]
+        tareas = [asyncio.create_task(suscribir(base_url, headers, claves[i % subidas], suscritos[i]))
+                  for i in range(suscriptores)]
+        await asyncio.gather(*(s.wait() for s in suscritos))
+        segundos_suscribir = time.perf_counter() - inicio
+        rss_suscritos = proceso.memory_info().rss
+
+        # CPU de la API con las suscripciones abiertas y sin eventos
+        cpu_0 = sum(proceso.cpu_times()[:2])
+        await asyncio.sleep(2)
+        cpu_reposo = (sum(proceso.cpu_times()[:2]) - cpu_0) / 2
+
+        async def subir(i: int):
+            response = await client.post("/planos/", data={"nombre": f"Plano {i}", "seguimiento": claves[i]},
+                                         files={"file": ("plano.png", archivo, "image/png")})
+            assert response.status_code == 200, response.text
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(subir(i) for i in range(subidas)))
+        resultados = await asyncio.gather(*tareas)
+        segundos_subidas = time.perf_counter() - inicio
+
+    latencias = [(llegada - evento["ts"]) * 1000 for eventos in resultados for llegada, evento in eventos]
+    completos = sum(1 for eventos in resultados if [e["etapa"] for _, e in eventos] == ETAPAS_SUBIDA)
+    stats = resumen(latencias)
+    return {
+        "suscripciones abiertas": f"{suscriptores} en {segundos_suscribir:.2f} s",
+        "RSS por suscripción": f"{(rss_suscritos - rss_0) / suscriptores / 1024:.1f} KB",
+        "CPU de la API en reposo con suscripciones": f"{cpu_reposo * 100:.1f} %",
+        "subidas": f"{subidas} en {segundos_subidas:.2f} s",
+        "eventos recibidos": len(latencias),
+        "suscriptores con las 6 etapas en orden": f"{completos}/{suscriptores}",
+        "latencia evento mediana": f"{stats['mediana_ms']:.1f} ms",
+        "latencia evento p99": f"{stats['p99_ms']:.1f} ms",
+    }
+
+async def casos(base_url: str, headers: dict) -> dict:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60) as client:
+        # Archivo con extensión no permitida: la suscripción recibe el error y se cierra
+        clave, suscrito = uuid.uuid4().hex, asyncio.Event()
+        tarea = asyncio.create_task(suscribir(base_url, headers, clave, suscrito))
+        await suscrito.wait()
+        rechazo = await client.post("/planos/", data={"nombre": "X", "seguimiento": clave},
+                                    files={"file": ("plano.exe", b"MZ", "application/octet-stream")})
+        rechazado = [e["etapa"] for _, e in await tarea]
+
+        # Suscripción después de terminar: recibe la última etapa y se cierra
+        clave = uuid.uuid4().hex
+        subida = await client.post("/planos/", data={"nombre": "Tarde", "seguimiento": clave},
+                                   files={"file": ("plano.png", codificar(dibujar_plano(512, 384), "PNG"), "image/png")})
+        tardia = [e["etapa"] for _, e in await suscribir(base_url, headers, clave, asyncio.Event())]
+
+        # Token por query (EventSource) y suscripción sin credenciales
+        token = headers["Authorization"].split()[1]
+        con_query = await suscribir(base_url, {}, clave, asyncio.Event(), params=f"?token={token}")
+        sin_token = await suscribir(base_url, {}, clave, asyncio.Event())
+    return {
+        f"POST .exe ({rechazo.status_code})": " → ".join(rechazado),
+        f"Suscripción tardía (POST {subida.status_code})": " → ".join(tardia),
+        "Token por query": " → ".join(e["etapa"] for _, e in con_query),
+        "Sin token": sin_token[0][1]["etapa"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suscriptores", type=int, default=1000)
+    parser.add_argument("--subidas", type=int, default=50)
+    parser.add_argument("--latencia-ms", type=float, default=300, help="Latencia del conversor stub")
+    args = parser.parse_args()
+
+    import httpx
+    import psutil
+    from converter_stub import crear_servidor
+
+    puerto_stub, puerto_api = puerto_libre(), puerto_libre()
+    directorio = tempfile.mkdtemp(prefix="bench_progreso_")
+    os.environ.update({
+        "STORAGE_BACKEND": "local", "LOCAL_STORAGE_DIR": directorio,
+        "FLOORPLAN_API_URL": f"http://127.0.0.1:{puerto_stub}", "FLOORPLAN_API_URLS": "",
+    })
+    configurar_entorno()
+    reset_db()
+    _, headers = crear_usuario()
+
+    n = args.suscriptores
+    imprimir(f"Bus en memoria: {n} suscriptores, 6 etapas por canal publicadas desde otro hilo", {
+        "1 canal (todos siguen la misma subida)": asyncio.run(bus_en_memoria(n, 1)),
+        f"{n} canales (uno por subida)": asyncio.run(bus_en_memoria(n, n)),
+    })
+
+    # Conversor stub con capacidad de sobra: se mide el canal de progreso, no la cola del conversor
+    stub = crear_servidor(puerto_stub, latencia_ms=args.latencia_ms, capacidad=args.subidas)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(ROOT), "--port", str(puerto_api),
+         "--log-level", "warning", "--no-access-log"],
+        env={**os.environ}, cwd=directorio, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{puerto_api}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{base_url}/docs")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        proceso = psutil.Process(servidor.pid)
+        imprimir(f"SSE por uvicorn: {n} suscriptores, {args.subidas} subidas, conversor stub de {args.latencia_ms:.0f} ms",
+                 asyncio.run(carga_sse(base_url, headers, n, args.subidas, proceso)))
+        imprimir("Casos", asyncio.run(casos(base_url, headers)))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+        stub.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark de POST /materiales/precios/importar: 20.000 cambios de precio que afectan a
+1.000.000 de líneas de materiales_modelo3d, con UPDATE … FROM desde una tabla temporal,
+frente a actualizar material por material (PUT /materiales/{id} + recalcular sus líneas
+con el ORM), medido sobre una muestra y extrapolado.
+Ejecutar: python benchmarks/bench_price_import.py [--cambios 20000] [--lineas 1000000]
+"""
+
+import argparse
+import os
+import contextlib
+import io
+import random
+import time
+
+from common import configurar_entorno, reset_db, imprimir, crear_usuario, crear_modelos3d
+from bench_material_catalog import poblar
+
+def poblar_lineas(modelos: list, n_lineas: int, precios: dict, manuales: float, rng: random.Random):
+    """Líneas con el precio de catálogo salvo una fracción `manuales` con precio negociado"""
+    from database import engine
+    from models.material_modelo3d import MaterialModelo3D
+
+    tabla = MaterialModelo3D.__table__
+    material_ids = list(precios)
+    with engine.begin() as conexion:
+        for inicio in range(0, n_lineas, 50_000):
+            filas = []
+            for _ in range(min(50_000, n_lineas - inicio)):
+                material_id = rng.choice(material_ids)
+                precio = precios[material_id] if rng.random() >= manuales else round(precios[material_id] * 0.9, 2)
+                cantidad = round(rng.uniform(1, 100), 2)
+                filas.append({
+                    "modelo3d_id": rng.choice(modelos), "material_id": material_id, "cantidad": cantidad,
+                    "unidad_medida": "m2", "precio_unitario": precio, "subtotal": cantidad * precio,
+                })
+            conexion.execute(tabla.insert(), filas)
+
+def contar_inconsistencias(db) -> dict:
+    from sqlalchemy import text
+    return dict(db.execute(text("""
+        SELECT
+            SUM(CASE WHEN ABS(l.subtotal - l.cantidad * l.precio_unitario) > 1e-6 THEN 1 ELSE 0 END) AS subtotal_incorrecto,
+            SUM(CASE WHEN l.precio_unitario <> m.precio_base THEN 1 ELSE 0 END) AS precio_distinto_al_catalogo
+        FROM materiales_modelo3d l JOIN materiales m ON m.id = l.material_id
+    """)).mappings().one())
+
+def actualizar_anterior(client, headers, db, material_id: int, precio: float):
+    """Un PUT por material y sus líneas recalculadas fila a fila con el ORM"""
+    from models.material_modelo3d import MaterialModelo3D
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        anterior = client.get(f"/materiales/{material_id}").json()["data"]["precio_base"]
+        response = client.put(f"/materiales/{material_id}", json={"precio_base": precio}, headers=headers)
+    assert response.status_code == 200, response.text
+    for linea in db.query(MaterialModelo3D).filter(
+        MaterialModelo3D.material_id == material_id, MaterialModelo3D.precio_unitario == anterior
+    ):
+        linea.precio_unitario = precio
+        linea.subtotal = linea.cantidad * precio
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--materiales", type=int, default=25_000)
+    parser.add_argument("--cambios", type=int, default=20_000)
+    parser.add_argument("--lineas", type=int, default=1_000_000)
+    parser.add_argument("--modelos", type=int, default=10_000)
+    parser.add_argument("--muestra", type=int, default=200, help="Materiales actualizados con el método anterior")
+    args = parser.parse_args()
+
+    os.environ["ADMIN_CORREOS"] = "bench@bench.com"  # La importación es solo para administradores
+    configurar_entorno()
+    reset_db()
+    t = time.perf_counter()
+    poblar(args.materiales)
+    usuario_id, headers = crear_usuario()
+    modelos = crear_modelos3d(usuario_id, args.modelos)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from models.material import Material
+
+    db = SessionLocal()
+    rng = random.Random(21)
+    precios = {m: (c, p) for m, c, p in db.query(Material.id, Material.codigo, Material.precio_base)}
+    poblar_lineas(modelos, args.lineas, {m: p for m, (_, p) in precios.items()}, 0.1, rng)
+    print(f"⚙️ Datos de prueba: {args.materiales} materiales, {args.lineas} líneas en {time.perf_counter() - t:.1f}s")
+    inicial = contar_inconsistencias(db)
+
+    # Muestra del método anterior sobre materiales que no entran en la importación
+    elegidos = rng.sample(sorted(precios), args.cambios + args.muestra)
+    importados, muestra = elegidos[:args.cambios], elegidos[args.cambios:]
+    client = TestClient(app_main.app)
+    t = time.perf_counter()
+    for material_id in muestra:
+        actualizar_anterior(client, headers, db, material_id, round(precios[material_id][1] * 1.05, 2))
+    anterior_ms = (time.perf_counter() - t) * 1000
+
+    filas = ["codigo;precio"] + [
+        f"{precios[m][0]};{str(round(precios[m][1] * rng.uniform(1.01, 1.2), 2)).replace('.', ',')}" for m in importados
+    ] + ["NO-EXISTE;10,00", "MAT-000001;abc"]
+    archivo = "\n".join(filas).encode()
+
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # TestClient ejecuta las tareas en segundo plano antes de devolver la respuesta
+        response = client.post(
+            "/materiales/precios/importar", headers=headers,
+            files={"archivo": ("precios.csv", archivo, "text/csv")},
+        )
+        assert response.status_code == 202, response.text
+        job_id = response.json()["data"]["id"]
+        estado = client.get(f"/materiales/precios/importar/{job_id}", headers=headers).json()["data"]
+    importacion_ms = (time.perf_counter() - t) * 1000
+    assert estado["estado"] == "completado", estado
+    assert estado["materiales_actualizados"] == args.cambios and estado["total_errores"] == 2, estado
+
+    final = contar_inconsistencias(db)
+    assert final["subtotal_incorrecto"] == 0, final
+    # Las líneas con precio manual siguen con su precio; las de catálogo siguen al catálogo
+    assert final["precio_distinto_al_catalogo"] == inicial["precio_distinto_al_catalogo"], (inicial, final)
+    db.close()
+
+    imprimir(f"Importación de {args.cambios} precios ({estado['lineas_actualizadas']} líneas recalculadas)", {
+        "POST /precios/importar completo (ms)": round(importacion_ms, 1),
+        "Etapas de la tarea (ms)": estado["duraciones_ms"],
+        f"Método anterior, {args.muestra} materiales (ms)": round(anterior_ms, 1),
+        f"Método anterior extrapolado a {args.cambios} (s)": round(anterior_ms / args.muestra * args.cambios / 1000, 1),
+        "Líneas con subtotal inconsistente": final["subtotal_incorrecto"],
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark del motor de precios con una cotización de 500 líneas:
+cálculo en memoria, carga de precios en 3 consultas, POST /cotizaciones/preview (caché)
+y POST /cotizaciones/, frente a consultar cada material por separado.
+Ejecutar: python benchmarks/bench_pricing.py [--lineas 500]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+
+from common import configurar_entorno, reset_db, medir, imprimir, crear_usuario, crear_modelos3d
+from bench_material_catalog import poblar, CATEGORIAS
+
+MATERIALES = 5_000
+
+def preparar_precios(rng: random.Random, usuario_id: int):
+    """Lista de precios del usuario (300 materiales) y 40 escalones de descuento"""
+    from database import SessionLocal
+    from models.descuento_volumen import DescuentoVolumen
+    from models.precio_usuario import PrecioUsuario
+
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(PrecioUsuario, [
+            {"usuario_id": usuario_id, "material_id": m, "precio": round(rng.uniform(5, 400), 2)}
+            for m in rng.sample(range(1, MATERIALES + 1), 300)
+        ])
+        db.bulk_insert_mappings(DescuentoVolumen, [
+            {"categoria_id": 1 + i % CATEGORIAS, "cantidad_minima": rng.choice([10, 50, 100]),
+             "porcentaje": rng.choice([2, 5, 8]), "activo": True}
+            for i in range(40)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lineas", type=int, default=500)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(MATERIALES)
+    usuario_id, headers = crear_usuario()
+    plano_id = crear_modelos3d(usuario_id, 1)[0]
+    rng = random.Random(5)
+    preparar_precios(rng, usuario_id)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from database import SessionLocal
+    from repositories.material_repository import MaterialRepository
+    from services.pricing_service import calcular_cotizacion, cotizar, TablaDescuentos
+    from repositories.precio_repository import PrecioRepository
+
+    lineas = [(m, round(rng.uniform(1, 150), 2)) for m in rng.sample(range(1, MATERIALES + 1), args.lineas)]
+    payload = [{"material_id": m, "cantidad": c} for m, c in lineas]
+
+    db = SessionLocal()
+    ids = [m for m, _ in lineas]
+    materiales = MaterialRepository.get_pricing_rows(db, ids)
+    precios_usuario = PrecioRepository.get_user_prices(db, usuario_id, ids)
+    descuentos = TablaDescuentos(PrecioRepository.get_discounts(db, solo_activos=True))
+    resultado = calcular_cotizacion(lineas, materiales, precios_usuario, descuentos)
+
+    client = TestClient(app_main.app)
+
+    def post(url, body, esperado):
+        with contextlib.redirect_stdout(io.StringIO()):  # get_current_user imprime cada paso
+            response = client.post(url, json=body, headers=headers)
+        assert response.status_code == esperado, response.text
+        return response.json()
+
+    crear = {"plano_id": plano_id, "cliente_nombre": "Cliente", "cliente_email": "cliente@bench.com", "materiales": payload}
+    guardada = post("/cotizaciones/", crear, 200)
+    assert guardada["total"] == float(resultado.total)
+
+    imprimir(f"Cotización de {args.lineas} líneas", {
+        "calcular_cotizacion en memoria (ms)": medir(
+            lambda: calcular_cotizacion(lineas, materiales, precios_usuario, descuentos), args.repeticiones
+        ),
+        "cotizar: 3 consultas + cálculo (ms)": medir(lambda: cotizar(db, usuario_id, lineas), args.repeticiones),
+        "get_by_id por línea (solo carga, ms)": medir(
+            lambda: [MaterialRepository.get_by_id(db, m) for m in ids], args.repeticiones
+        ),
+        "POST /cotizaciones/preview con caché (ms)": medir(
+            lambda: post("/cotizaciones/preview", {"materiales": payload}, 200), args.repeticiones
+        ),
+        "POST /cotizaciones/ (ms)": medir(lambda: post("/cotizaciones/", crear, 200), args.repeticiones),
+        "líneas con descuento": sum(1 for l in resultado.materiales if l["descuento_pct"]),
+        "líneas con precio de lista propia": sum(1 for m in ids if m in precios_usuario),
+        "totales": resultado.totales(),
+    })
+    db.close()
+
+if __name__ == "__main__":
+    main()
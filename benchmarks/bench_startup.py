@@ -0,0 +1,81 @@
+"""
+Benchmark de arranque: tamaño de dependencias, tiempo de `import main`, RSS en reposo
+y latencia de la primera petición
+Ejecutar: python benchmarks/bench_startup.py
+"""
+
+import subprocess
+import sys
+from importlib import metadata
+
+from common import ROOT, configurar_entorno, medir_import_main, resumen, imprimir
+
+SCRIPT_PRIMERA_PETICION = """
+import time
+import main
+from fastapi.testclient import TestClient
+t = time.perf_counter()
+client = TestClient(main.app)
+response = client.get('/test')
+assert response.status_code == 200, response.text
+print((time.perf_counter() - t) * 1000)
+"""
+
+MODULOS_PESADOS = ["stripe", "googleapiclient.discovery", "google_auth_oauthlib.flow"]
+
+def _leer_requirements(nombre: str) -> list:
+    """Nombres de paquetes de un requirements, siguiendo los `-r`"""
+    paquetes = []
+    for linea in (ROOT / nombre).read_text(encoding="utf-8").splitlines():
+        linea = linea.strip()
+        if not linea or linea.startswith("#"):
+            continue
+        if linea.startswith("-r "):
+            paquetes += _leer_requirements(linea[3:].strip())
+        else:
+            paquetes.append(linea.split("==")[0])
+    return paquetes
+
+def tamano_instalado(nombre: str) -> str:
+    """MB en disco de los paquetes instalados de un requirements (aproxima el peso de la imagen)"""
+    total, faltantes = 0, 0
+    for paquete in _leer_requirements(nombre):
+        try:
+            archivos = metadata.distribution(paquete).files or []
+        except metadata.PackageNotFoundError:
+            faltantes += 1
+            continue
+        for archivo in archivos:
+            try:
+                total += archivo.locate().stat().st_size
+            except OSError:
+                pass
+    nota = f" ({faltantes} no instalados)" if faltantes else ""
+    return f"{total / 1024 / 1024:.1f} MB{nota}"
+
+def main(repeticiones: int = 5):
+    env = configurar_entorno()
+
+    mediciones = [medir_import_main(env) for _ in range(repeticiones)]
+
+    tiempos_peticion = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", SCRIPT_PRIMERA_PETICION],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        )
+        tiempos_peticion.append(float(salida.stdout.strip().splitlines()[-1]))
+
+    cargados = [m for m in MODULOS_PESADOS if m in mediciones[0]["modulos"]]
+
+    imprimir("Arranque de la API", {
+        "requirements.txt instalado": tamano_instalado("requirements.txt"),
+        "requirements-ml.txt instalado": tamano_instalado("requirements-ml.txt"),
+        "import main (ms)": resumen([m["import_ms"] for m in mediciones]),
+        "RSS en reposo tras import (MB)": round(max(m["rss_mb"] for m in mediciones), 1),
+        "primera petición GET /test (ms)": resumen(tiempos_peticion),
+        "módulos pesados cargados al importar": ", ".join(cargados) or "-",
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Benchmark de subidas y descargas de planos: proxy por la API (POST /planos/ multipart,
+GET /download?proxy=true) frente a URL prefirmadas (POST /planos/subidas + subida directa al
+bucket + POST /confirmar, GET /download con redirección). Mide por operación la CPU del proceso
+de la API (uvicorn aparte), los bytes entre el cliente y la API y los bytes que la API
+intercambia con el bucket (peticiones de boto3) y con el verificador.
+S3 es un servidor moto local y FloorPlanTo3D-API un verificador mínimo que acepta cualquier
+archivo: ambos corren en este proceso, fuera de la CPU medida. Al final verifica el flujo del
+almacenamiento local (/storage firmado) con TestClient.
+Ejecutar: python benchmarks/bench_storage_presigned.py [--archivos 20] [--mb 5]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import ROOT, configurar_entorno, reset_db, imprimir, crear_usuario
+from bench_local_storage import puerto_libre
+
+BUCKET = "planos-bench"
+
+# Respuesta fija del verificador: un plano de 10 x 8 m con una pared
+MODELO = {
+    "objects": [{"id": 1, "type": "wall", "dimensions": {"width": 10, "height": 2.5, "depth": 0.2},
+                 "position": {"x": 0, "y": 0, "z": 0}}],
+    "scene": {"bounds": {"width": 10, "height": 8}},
+}
+
+# Bytes que la API intercambia con servicios internos (bucket y verificador)
+trafico_interno = {"bytes": 0}
+
+class Verificador(BaseHTTPRequestHandler):
+    """Stand-in de POST /convert: consume el archivo y responde el modelo"""
+
+    def do_POST(self):
+        trafico_interno["bytes"] += len(self.rfile.read(int(self.headers["Content-Length"])))
+        cuerpo = json.dumps(MODELO).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+class ContadorS3:
+    """Middleware WSGI sobre moto: cuenta los bytes de las peticiones de boto3 (las de la API)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        if not environ.get("HTTP_USER_AGENT", "").startswith("Boto3"):
+            return self.app(environ, start_response)
+        trafico_interno["bytes"] += int(environ.get("CONTENT_LENGTH") or 0)
+        return self._contar(self.app(environ, start_response))
+
+    @staticmethod
+    def _contar(cuerpo):
+        for parte in cuerpo:
+            trafico_interno["bytes"] += len(parte)
+            yield parte
+
+class Medidor:
+    """CPU del proceso de la API y bytes cliente↔API (hooks de httpx) e internos por operación"""
+
+    def __init__(self, pid: int):
+        import psutil
+        self.proceso = psutil.Process(pid)
+        self.bytes_cliente = 0
+
+    def contar_peticion(self, request):
+        self.bytes_cliente += len(request.read())
+
+    def contar_respuesta(self, response):
+        self.bytes_cliente += len(response.read())
+
+    def medir(self, fn, n: int) -> dict:
+        time.sleep(0.2)  # Que terminen las tareas de la operación anterior
+        cpu_0 = sum(self.proceso.cpu_times()[:2])
+        cliente_0, interno_0 = self.bytes_cliente, trafico_interno["bytes"]
+        inicio = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        segundos = time.perf_counter() - inicio
+        return {
+            "cpu_api_ms": round((sum(self.proceso.cpu_times()[:2]) - cpu_0) * 1000 / n, 1),
+            "MB_cliente_api": round((self.bytes_cliente - cliente_0) / 1e6 / n, 2),
+            "MB_api_internos": round((trafico_interno["bytes"] - interno_0) / 1e6 / n, 2),
+            "ms": round(segundos * 1000 / n, 1),
+        }
+
+def verificar_local(archivo: bytes, headers: dict):
+    """
+    Flujo completo con STORAGE_BACKEND=local: PUT firmado, confirmación, descarga, firmas
+    inválidas, PUT repetido y purga de planos sin confirmar
+    """
+    from fastapi.testclient import TestClient
+    import main as app_main
+    from config import settings
+    from services.plano_service import purgar_pendientes
+
+    settings.STORAGE_BACKEND = "local"
+    client = TestClient(app_main.app)
+    with contextlib.redirect_stdout(io.StringIO()):
+        subida = client.post("/planos/subidas", headers=headers, json={
+            "nombre": "Local", "filename": "casa.png", "tamano": len(archivo)
+        }).json()
+        url = subida["subida"]["url"]
+        tipo = subida["subida"]["headers"]
+        alterada = url.replace("tamano_max=", "tamano_max=9")
+        resultados = {
+            "PUT con firma alterada": client.put(alterada, content=archivo, headers=tipo).status_code,
+            "PUT con otro Content-Type": client.put(url, content=archivo, headers={"Content-Type": "text/html"}).status_code,
+            "PUT firmado": client.put(url, content=archivo, headers=tipo).status_code,
+        }
+        repetido = client.put(url, content=archivo, headers=tipo).status_code
+        confirmado = client.post(f"/planos/{subida['plano_id']}/confirmar", headers=headers)
+        resultados.update({
+            "PUT repetido antes de confirmar": repetido,
+            "PUT repetido tras confirmar": client.put(url, content=b"reemplazo", headers=tipo).status_code,
+        })
+        descarga = client.get(f"/planos/{subida['plano_id']}/download", headers=headers, follow_redirects=False)
+        firmada = descarga.headers["location"]
+        resultados.update({
+            "POST /confirmar": f"{confirmado.status_code} ({confirmado.json()['estado']})",
+            "GET /download": descarga.status_code,
+            "GET /storage firmado": client.get(firmada).status_code,
+            "GET /storage con Range": client.get(firmada, headers={"Range": "bytes=0-99"}).status_code,
+            "GET /storage con firma alterada": client.get(firmada.replace("firma=", "firma=0")).status_code,
+            "GET /uploads/planos (sin firma)": client.get(subida["subida"]["ubicacion"]).status_code,
+        })
+        assert client.get(firmada).content == archivo
+        assert resultados["PUT repetido antes de confirmar"] == 409 and resultados["PUT repetido tras confirmar"] == 409
+
+        sin_confirmar = client.post("/planos/subidas", headers=headers, json={
+            "nombre": "Sin confirmar", "filename": "casa.png", "tamano": len(archivo)
+        }).json()
+        assert client.put(sin_confirmar["subida"]["url"], content=archivo, headers=tipo).status_code == 204
+        purgados = purgar_pendientes(0)
+        resultados.update({
+            "Planos sin confirmar purgados": purgados,
+            "PUT tras la purga": client.put(sin_confirmar["subida"]["url"], content=archivo, headers=tipo).status_code,
+            "GET /planos/{id} tras la purga": client.get(f"/planos/{sin_confirmar['plano_id']}", headers=headers).status_code,
+        })
+        assert purgados >= 1 and resultados["PUT tras la purga"] == 409
+    imprimir("Almacenamiento local (STORAGE_BACKEND=local)", resultados)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--archivos", type=int, default=20)
+    parser.add_argument("--mb", type=float, default=5)
+    args = parser.parse_args()
+
+    from moto.server import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import make_server
+
+    puerto_s3, puerto_verificador, puerto_api = puerto_libre(), puerto_libre(), puerto_libre()
+    directorio = tempfile.mkdtemp(prefix="bench_presigned_")
+    os.environ.update({
+        "STORAGE_BACKEND": "s3", "S3_BUCKET": BUCKET, "S3_ENDPOINT_URL": f"http://127.0.0.1:{puerto_s3}",
+        "S3_ACCESS_KEY_ID": "bench", "S3_SECRET_ACCESS_KEY": "bench",
+        "FLOORPLAN_API_URL": f"http://127.0.0.1:{puerto_verificador}", "LOCAL_STORAGE_DIR": directorio,
+        "PLANO_PREVALIDACION": "false",  # Los archivos son bytes aleatorios: se mide la transferencia
+    })
+    env = configurar_entorno()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # moto registra cada petición
+    reset_db()
+    usuario_id, headers = crear_usuario()
+    os.chdir(directorio)
+
+    bucket = make_server("127.0.0.1", puerto_s3, ContadorS3(DomainDispatcherApplication(create_backend_app)), threaded=True)
+    threading.Thread(target=bucket.serve_forever, daemon=True).start()
+    verificador = ThreadingHTTPServer(("127.0.0.1", puerto_verificador), Verificador)
+    threading.Thread(target=verificador.serve_forever, daemon=True).start()
+
+    from services.storage_service import get_storage
+    get_storage("s3").client.create_bucket(Bucket=BUCKET)
+
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(ROOT), "--port", str(puerto_api),
+         "--log-level", "warning", "--no-access-log"],
+        env={**env, **os.environ}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        import httpx
+
+        medidor = Medidor(servidor.pid)
+        api = httpx.Client(base_url=f"http://127.0.0.1:{puerto_api}", headers=headers, timeout=60, event_hooks={
+            "request": [medidor.contar_peticion], "response": [medidor.contar_respuesta]
+        })
+        directo = httpx.Client(timeout=60)  # Cliente hacia el bucket: no pasa por la API
+        for _ in range(100):
+            try:
+                api.get("/docs")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+
+        rng = random.Random(45)
+        archivos = [rng.randbytes(int(args.mb * 1024 * 1024)) for _ in range(args.archivos)]
+        ids = {"proxy": [], "prefirmada": []}
+
+        def subir_proxy(i: int):
+            response = api.post("/planos/", data={"nombre": f"Proxy {i}"},
+                                files={"file": ("plano.png", archivos[i], "image/png")})
+            assert response.status_code == 200, response.text
+            ids["proxy"].append(response.json()["id"])
+
+        def subir_prefirmada(i: int):
+            inicio = api.post("/planos/subidas", json={
+                "nombre": f"Directo {i}", "filename": "plano.png", "tamano": len(archivos[i])
+            })
+            assert inicio.status_code == 201, inicio.text
+            subida = inicio.json()["subida"]
+            response = directo.post(subida["url"], data=subida["campos"],
+                                    files={"file": ("plano.png", archivos[i], "image/png")})
+            assert response.status_code == 204, response.text
+            confirmado = api.post(f"/planos/{inicio.json()['plano_id']}/confirmar")
+            assert confirmado.status_code == 200 and confirmado.json()["estado"] == "completado", confirmado.text
+            ids["prefirmada"].append(confirmado.json()["id"])
+
+        def bajar_proxy(i: int):
+            response = api.get(f"/planos/{ids['proxy'][i]}/download", params={"proxy": True})
+            assert response.content == archivos[i]
+
+        def bajar_prefirmada(i: int):
+            response = api.get(f"/planos/{ids['prefirmada'][i]}/download")
+            assert response.status_code == 307, response.text
+            assert directo.get(response.headers["location"]).content == archivos[i]
+
+        n = args.archivos
+        imprimir(f"Subidas: {n} archivos de {args.mb} MB (incluye verificación del plano)", {
+            "Proxy por la API (POST /planos/ multipart)": medidor.medir(subir_proxy, n),
+            "Prefirmada (subidas + POST al bucket + confirmar)": medidor.medir(subir_prefirmada, n),
+        })
+        imprimir(f"Descargas: {n} archivos de {args.mb} MB", {
+            "Proxy por la API (GET /download?proxy=true)": medidor.medir(bajar_proxy, n),
+            "Prefirmada (307 + GET al bucket)": medidor.medir(bajar_prefirmada, n),
+        })
+
+        # content-length-range lo aplica el bucket (S3, MinIO); moto no lo hace: /confirmar vuelve a validar
+        inicio = api.post("/planos/subidas", json={"nombre": "Grande", "filename": "plano.png", "tamano": 1024})
+        subida = inicio.json()["subida"]
+        grande = directo.post(subida["url"], data=subida["campos"],
+                              files={"file": ("plano.png", b"0" * (11 * 1024 * 1024), "image/png")})
+        confirmar_grande = api.post(f"/planos/{inicio.json()['plano_id']}/confirmar")
+        rechazado = api.get(f"/planos/{inicio.json()['plano_id']}")
+        pendiente = api.post("/planos/subidas", json={"nombre": "Vacío", "filename": "plano.png", "tamano": 1024})
+        imprimir("Validaciones", {
+            "POST al bucket de 11 MB (límite 10 MB, moto no lo aplica)": grande.status_code,
+            "POST /confirmar del archivo de 11 MB": confirmar_grande.status_code,
+            "GET del plano rechazado": rechazado.status_code,
+            "POST /confirmar sin archivo subido": api.post(f"/planos/{pendiente.json()['plano_id']}/confirmar").status_code,
+            "POST /planos/subidas con .exe": api.post("/planos/subidas", json={
+                "nombre": "X", "filename": "plano.exe", "tamano": 10
+            }).status_code,
+        })
+        api.close()
+        directo.close()
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    verificar_local(archivos[0], headers)
+    verificador.shutdown()
+    bucket.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark del almacén de texturas direccionado por contenido: siembra de un catálogo por
+POST /materiales/with-image donde muchas texturas se repiten (mismo archivo para varios
+materiales). Compara archivos, bytes guardados y tiempo con el pipeline sin deduplicar
+(procesar y subir cada imagen), cuenta las descargas del visor para recorrer el catálogo
+y verifica referencias, la purga de huérfanas y las cabeceras de GET /texturas/{hash}.
+Sin credenciales de Google Drive los archivos se guardan en uploads/textures (directorio temporal).
+Ejecutar: python benchmarks/bench_texture_dedup.py [--materiales 120] [--texturas 8]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from common import configurar_entorno, reset_db, resumen, imprimir, crear_usuario
+from bench_material_catalog import poblar
+from bench_texture_upload import generar_textura
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--materiales", type=int, default=120)
+    parser.add_argument("--texturas", type=int, default=8)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(0)
+    usuario_id, headers = crear_usuario()
+    os.chdir(tempfile.mkdtemp(prefix="bench_texturas_"))
+
+    import httpx
+    from sqlalchemy import func
+    import main as app_main
+    from config import settings
+    from database import SessionLocal
+    from models.material import Material
+    from models.textura import Textura
+    from services.local_image_service import local_image_service
+    from services.texture_processing import procesar_textura
+    from services.texture_store import hash_de, texture_store
+    from services.texture_upload_service import texture_pipeline
+
+    texturas = [generar_textura(1200 + 100 * (i % 4), 1200, "JPEG", i) for i in range(args.texturas)]
+    asignacion = [i % args.texturas for i in range(args.materiales)]  # Cada textura la usan ~N/K materiales
+    parametros = (settings.TEXTURE_MAX_SIZE, settings.TEXTURE_MIN_SIZE, settings.TEXTURE_WEBP_QUALITY)
+
+    # Sin deduplicar: cada material procesaba su imagen y subía todos sus derivados con un nombre nuevo
+    procesado_ms, bytes_por_textura, derivados_por_textura = [], [], []
+    for contenido in texturas:
+        inicio = time.perf_counter()
+        variantes = procesar_textura(contenido, *parametros)["variantes"]
+        procesado_ms.append((time.perf_counter() - inicio) * 1000)
+        bytes_por_textura.append(sum(len(v["contenido"]) for v in variantes))
+        derivados_por_textura.append(len(variantes))
+
+    async def sembrar():
+        transporte = httpx.ASGITransport(app=app_main.app)
+        limite = asyncio.Semaphore(args.concurrencia)
+        latencias = []
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as client:
+            async def crear(i: int):
+                async with limite:
+                    inicio = time.perf_counter()
+                    response = await client.post("/materiales/with-image", headers=headers, data={
+                        "codigo": f"TEX-{i:05d}", "nombre": f"Material {i}", "categoria_id": 1 + i % 20,
+                        "precio_base": 10, "unidad_medida": "m2",
+                    }, files={"imagen": ("textura.jpg", texturas[asignacion[i]], "image/jpeg")})
+                    assert response.status_code == 201, response.text
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+
+            # Las primeras K subidas (una por textura) procesan; el resto reutiliza los derivados
+            await asyncio.gather(*(crear(i) for i in range(args.texturas)))
+            await asyncio.gather(*(crear(i) for i in range(args.texturas, args.materiales)))
+        return latencias
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # get_current_user y el pipeline imprimen cada paso
+        latencias = asyncio.run(sembrar())
+    siembra_s = time.perf_counter() - inicio
+
+    db = SessionLocal()
+    archivos = [p for p in local_image_service.upload_dir.rglob("*") if p.is_file()]
+    guardados = db.query(func.count(Textura.hash), func.sum(Textura.tamano)).one()
+    por_material = sum(bytes_por_textura[t] for t in asignacion)
+    imprimir(f"Siembra de {args.materiales} materiales con {args.texturas} texturas distintas", {
+        "Latencia por POST /materiales/with-image": resumen(latencias),
+        "Siembra completa (s)": round(siembra_s, 2),
+        "Sin deduplicar, solo procesar cada imagen (s, estimado)": round(
+            sum(procesado_ms[t] for t in asignacion) / 1000 / settings.TEXTURE_PROCESS_WORKERS, 2
+        ),
+        "Archivos guardados sin deduplicar": sum(derivados_por_textura[t] for t in asignacion),
+        "Archivos guardados con el almacén": f"{guardados[0]} ({len(archivos)} en disco)",
+        "Bytes guardados sin deduplicar (MB)": round(por_material / 1e6, 1),
+        "Bytes guardados con el almacén (MB)": round(guardados[1] / 1e6, 1),
+    })
+
+    # El visor recorre el catálogo pidiendo el derivado de 512: una descarga por URL distinta
+    urls = [variantes["512x512"] for (variantes,) in db.query(Material.imagen_variantes)]
+    tamanos = dict(db.query(Textura.hash, Textura.tamano))
+    imprimir("Visor recorriendo el catálogo (derivado 512x512, caché del navegador)", {
+        "Descargas antes (una URL por material)": len(urls),
+        "Descargas ahora (una URL por textura)": len(set(urls)),
+        "Bytes descargados antes (MB)": round(sum(tamanos[hash_de(u)] for u in urls) / 1e6, 2),
+        "Bytes descargados ahora (MB)": round(sum(tamanos[hash_de(u)] for u in set(urls)) / 1e6, 2),
+    })
+
+    # Referencias: cada archivo cuenta los materiales que lo usan
+    esperadas = {}
+    for (variantes,) in db.query(Material.imagen_variantes):
+        for url in set(variantes.values()):
+            esperadas[hash_de(url)] = esperadas.get(hash_de(url), 0) + 1
+    assert dict(db.query(Textura.hash, Textura.referencias)) == esperadas
+
+    from fastapi.testclient import TestClient
+    client = TestClient(app_main.app)
+    primero = db.get(Material, 1)
+    url = primero.imagen_variantes["512x512"]
+    respuesta = client.get(url)
+    assert respuesta.status_code == 200 and "immutable" in respuesta.headers["Cache-Control"]
+    assert client.get(url, headers={"If-None-Match": respuesta.headers["ETag"]}).status_code == 304
+
+    # Borrar todos los materiales de una textura deja sus archivos huérfanos; la purga los elimina
+    ids = [m.id for m in db.query(Material).all() if m.imagen_url == primero.imagen_url]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for material_id in ids:
+            assert client.delete(f"/materiales/{material_id}", headers=headers).status_code == 200
+        borradas = texture_store.purgar(gracia_segundos=0)
+    imprimir("Referencias y purga", {
+        "Materiales borrados (misma textura)": len(ids),
+        "Archivos purgados": borradas,
+        "Archivos en disco después": len([p for p in local_image_service.upload_dir.rglob("*") if p.is_file()]),
+        "GET de la textura purgada": client.get(url).status_code,
+    })
+    assert borradas == derivados_por_textura[0] and client.get(url).status_code == 404
+    db.close()
+    texture_pipeline.shutdown()
+
+if __name__ == "__main__":
+    main()
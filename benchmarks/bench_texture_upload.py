@@ -0,0 +1,139 @@
+"""
+Benchmark del pipeline de texturas: latencia de PUT /materiales/{id}/imagen con subidas
+concurrentes, bloqueo del event loop (procesamiento en el pool frente a hacerlo en el loop)
+y bytes que descarga el visor 3D por material (original frente a derivados WebP potencia de 2).
+Sin credenciales de Google Drive los derivados se guardan en uploads/textures (directorio temporal).
+Ejecutar: python benchmarks/bench_texture_upload.py [--concurrencia 8]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from common import configurar_entorno, reset_db, medir, resumen, imprimir, crear_usuario
+from bench_material_catalog import poblar
+
+def generar_textura(ancho: int, alto: int, formato: str, semilla: int) -> bytes:
+    """Textura sintética con ruido (se comprime como una foto, no como un color plano)"""
+    from PIL import Image, ImageFilter
+
+    rng = random.Random(semilla)
+    imagen = Image.frombytes("RGB", (ancho // 4, alto // 4), rng.randbytes(ancho // 4 * alto // 4 * 3))
+    imagen = imagen.resize((ancho, alto), Image.BICUBIC).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    imagen.save(buffer, format=formato, **({"quality": 92} if formato == "JPEG" else {}))
+    return buffer.getvalue()
+
+async def medir_loop(coro_fn, intervalo_ms: float = 5) -> dict:
+    """Ejecutar `coro_fn()` mientras un ticker mide cuánto se atrasa el event loop"""
+    atrasos, activo = [], True
+
+    async def ticker():
+        while activo:
+            inicio = time.perf_counter()
+            await asyncio.sleep(intervalo_ms / 1000)
+            atrasos.append((time.perf_counter() - inicio) * 1000 - intervalo_ms)
+
+    tarea = asyncio.create_task(ticker())
+    await asyncio.sleep(0)  # El ticker queda esperando antes de empezar
+    inicio = time.perf_counter()
+    await coro_fn()
+    total_ms = (time.perf_counter() - inicio) * 1000
+    activo = False
+    await tarea  # Su último tick registra el bloqueo final, si lo hubo
+    return {"total_ms": round(total_ms, 1), "atraso_max_ms": round(max(atrasos, default=0), 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    configurar_entorno()
+    reset_db()
+    poblar(args.concurrencia)
+    usuario_id, headers = crear_usuario()
+    # local_image_service escribe en uploads/textures relativo al directorio actual
+    os.chdir(tempfile.mkdtemp(prefix="bench_texturas_"))
+
+    import httpx
+    import main as app_main
+    from config import settings
+    from services.texture_processing import procesar_textura
+    from services.texture_upload_service import texture_pipeline
+
+    texturas = {
+        "JPEG 1500x1500": generar_textura(1500, 1500, "JPEG", 1),
+        "PNG 1500x1500": generar_textura(1500, 1500, "PNG", 2),
+        "JPEG 3000x2000": generar_textura(3000, 2000, "JPEG", 3),
+    }
+    parametros = (settings.TEXTURE_MAX_SIZE, settings.TEXTURE_MIN_SIZE, settings.TEXTURE_WEBP_QUALITY)
+
+    # Bytes que descarga el visor por material
+    filas = {}
+    for nombre, contenido in texturas.items():
+        variantes = procesar_textura(contenido, *parametros)["variantes"]
+        tamanos = {f"{v['ancho']}x{v['alto']}": len(v["contenido"]) for v in variantes}
+        filas[f"{nombre}: original (KB)"] = round(len(contenido) / 1024)
+        filas[f"{nombre}: derivados WebP (KB)"] = {k: round(b / 1024) for k, b in tamanos.items()}
+    imprimir("Bytes por material (el visor descarga un solo derivado)", filas)
+
+    jpeg = texturas["JPEG 3000x2000"]
+    imprimir("procesar_textura, JPEG 3000x2000", {
+        "En proceso (ms)": medir(lambda: procesar_textura(jpeg, *parametros), args.repeticiones),
+    })
+
+    async def escenario():
+        transporte = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as client:
+            async def subir(material_id: int, contenido: bytes) -> float:
+                inicio = time.perf_counter()
+                response = await client.put(
+                    f"/materiales/{material_id}/imagen", headers=headers,
+                    files={"imagen": ("textura.jpg", contenido, "image/jpeg")}
+                )
+                assert response.status_code == 200, response.text
+                assert response.json()["data"]["imagen_variantes"], response.text
+                return (time.perf_counter() - inicio) * 1000
+
+            # Primera subida: crea el pool de procesos (spawn) fuera de la medición
+            await subir(1, texturas["JPEG 1500x1500"])
+
+            latencias = []
+
+            async def concurrentes():
+                latencias.extend(await asyncio.gather(*(
+                    subir(i + 1, jpeg) for i in range(args.concurrencia)
+                )))
+
+            pool = {}
+            for _ in range(args.repeticiones):
+                pool = await medir_loop(concurrentes)
+
+            async def en_el_loop():
+                # Lo que hacía cada petición: procesar dentro de la corrutina, entre awaits
+                for _ in range(args.concurrencia):
+                    procesar_textura(jpeg, *parametros)
+                    await asyncio.sleep(0)
+
+            bloqueante = await medir_loop(en_el_loop)
+            return latencias, pool, bloqueante
+
+    with contextlib.redirect_stdout(io.StringIO()):  # get_current_user y el pipeline imprimen cada paso
+        latencias, pool, bloqueante = asyncio.run(escenario())
+    texture_pipeline.shutdown()
+
+    imprimir(f"PUT /materiales/{{id}}/imagen, {args.concurrencia} subidas concurrentes de JPEG 3000x2000", {
+        "Latencia por subida": resumen(latencias),
+        "Pool de procesos: lote completo / atraso máximo del loop (ms)": pool,
+        "Procesar en el loop: lote completo / atraso máximo del loop (ms)": bloqueante,
+        "Workers (procesos / subidas)": f"{settings.TEXTURE_PROCESS_WORKERS} / {settings.TEXTURE_UPLOAD_WORKERS}",
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Auditoría de arranque: falla (exit 1) si `import main` excede el presupuesto de tiempo o memoria,
+o si arrastra dependencias pesadas que la API no necesita.
+Ejecutar: python benchmarks/check_import_budget.py [--max-ms 2500] [--max-rss-mb 150]
+"""
+
+import argparse
+import os
+import sys
+
+from common import configurar_entorno, medir_import_main
+
+# Paquetes de requirements-ml.txt que nunca deben cargarse al importar la API
+MODULOS_PROHIBIDOS = [
+    "tensorflow", "keras", "cv2", "torch", "django", "flask", "deepface", "mtcnn",
+    "retinaface", "sklearn", "pandas", "matplotlib", "scipy",
+]
+
+# Clientes pesados que se inicializan en el primer uso (ver services/stripe_client.py)
+# PIL solo se importa dentro del pool de texturas (ver services/texture_processing.py)
+# boto3 solo con almacenamiento S3 (ver services/storage_service.py)
+MODULOS_DIFERIDOS = ["stripe", "googleapiclient", "google_auth_oauthlib", "PIL", "boto3", "botocore", "pypdfium2", "resvg_py"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", 2500)))
+    parser.add_argument("--max-rss-mb", type=float, default=float(os.environ.get("IMPORT_BUDGET_RSS_MB", 150)))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    env = configurar_entorno()
+    mediciones = [medir_import_main(env) for _ in range(args.repeticiones)]
+    # El mejor caso descarta ruido de disco/caché; el presupuesto debe cumplirse incluso así
+    import_ms = min(m["import_ms"] for m in mediciones)
+    rss_mb = max(m["rss_mb"] for m in mediciones)
+    modulos = set(mediciones[0]["modulos"])
+
+    errores = []
+    if import_ms > args.max_ms:
+        errores.append(f"import main tardó {import_ms:.0f} ms (presupuesto {args.max_ms:.0f} ms)")
+    if rss_mb > args.max_rss_mb:
+        errores.append(f"RSS tras import main: {rss_mb:.1f} MB (presupuesto {args.max_rss_mb:.0f} MB)")
+    for nombre in MODULOS_PROHIBIDOS + MODULOS_DIFERIDOS:
+        if nombre in modulos:
+            errores.append(f"'{nombre}' se carga al importar main")
+
+    print(f"⏱️  import main: {import_ms:.0f} ms | RSS: {rss_mb:.1f} MB | módulos: {len(modulos)}")
+    if errores:
+        for error in errores:
+            print(f"❌ {error}")
+        sys.exit(1)
+    print("✅ Dentro del presupuesto de arranque")
+
+if __name__ == "__main__":
+    main()
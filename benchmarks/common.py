@@ -0,0 +1,133 @@
+"""
+Utilidades compartidas por los benchmarks
+Los benchmarks corren sin Postgres ni servicios externos: usan SQLite en un archivo temporal.
+"""
+
+import os
+import sys
+import json
+import logging
+import time
+import subprocess
+import tempfile
+import statistics
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+BENCH_DB_PATH = Path(tempfile.gettempdir()) / "floorplan_bench.db"
+
+def configurar_entorno(db_path: Path = BENCH_DB_PATH) -> dict:
+    """Variables de entorno mínimas para importar `config` sin un archivo .env"""
+    defaults = {
+        "DB_USER": "bench",
+        "DB_PASSWORD": "bench",
+        "DB_HOST": "localhost",
+        "DB_PORT": "5432",
+        "DB_NAME": "bench",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "SECRET_KEY": "bench-secret",
+        "ALGORITHM": "HS256",
+        "STRIPE_SECRET_KEY": "sk_test_bench",
+        "STRIPE_WEBHOOK_SECRET": "whsec_bench",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    # main.py configura logging en INFO: el log por petición de httpx ensucia la salida
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return {**os.environ}
+
+def reset_db(db_path: Path = BENCH_DB_PATH):
+    """Borrar la base de benchmark y crear las tablas desde cero"""
+    if db_path.exists():
+        db_path.unlink()
+    configurar_entorno(db_path)
+    from database import init_db
+    init_db()
+
+def medir(fn, repeticiones: int = 5) -> dict:
+    """Ejecutar `fn` varias veces y devolver estadísticas en milisegundos"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return resumen(tiempos)
+
+def resumen(tiempos_ms: list) -> dict:
+    """Mediana, p99 y máximo de una lista de tiempos en milisegundos"""
+    ordenados = sorted(tiempos_ms)
+    p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+    return {
+        "n": len(ordenados),
+        "mediana_ms": round(statistics.median(ordenados), 3),
+        "p99_ms": round(p99, 3),
+        "max_ms": round(ordenados[-1], 3),
+    }
+
+def imprimir(titulo: str, filas: dict):
+    """Imprimir un bloque de resultados alineado"""
+    print(f"\n📊 {titulo}")
+    ancho = max(len(k) for k in filas)
+    for clave, valor in filas.items():
+        print(f"  {clave.ljust(ancho)} : {valor}")
+
+# Mide `import main` en un proceso limpio: tiempo, RSS y módulos cargados
+_SCRIPT_IMPORT_MAIN = """
+import json, resource, sys, time
+t = time.perf_counter()
+import main
+ms = (time.perf_counter() - t) * 1000
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_ms": ms, "rss_mb": rss_kb / 1024, "modulos": sorted(sys.modules)}))
+"""
+
+def medir_import_main(env: dict = None) -> dict:
+    """Importar `main` en un subproceso y devolver tiempo (ms), RSS pico (MB) y módulos cargados"""
+    resultado = subprocess.run(
+        [sys.executable, "-c", _SCRIPT_IMPORT_MAIN],
+        cwd=ROOT, env=env or configurar_entorno(), capture_output=True, text=True, check=True
+    )
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+def crear_usuario(correo: str = "bench@bench.com") -> tuple:
+    """Crear un usuario y devolver (usuario_id, cabeceras Authorization con un JWT válido)"""
+    from database import SessionLocal
+    from models.usuario import Usuario
+    from services.auth_service import create_token
+
+    db = SessionLocal()
+    try:
+        usuario = Usuario(nombre="Bench", correo=correo, contrasena="-")
+        db.add(usuario)
+        db.commit()
+        usuario_id = usuario.id
+    finally:
+        db.close()
+    token = create_token({"sub": correo})
+    return usuario_id, {"Authorization": f"Bearer {token}"}
+
+def crear_modelos3d(usuario_id: int, n: int, medidas: dict = None) -> list:
+    """Crear `n` planos con su modelo 3D en lote; devuelve los IDs de modelo3d"""
+    from database import SessionLocal
+    from models.plano import Plano
+    from models.modelo3d import Modelo3D
+
+    db = SessionLocal()
+    try:
+        inicio = db.query(Plano).count()
+        db.bulk_insert_mappings(Plano, [
+            {"id": inicio + i + 1, "usuario_id": usuario_id, "nombre": f"Plano {i}", "estado": "procesado",
+             "medidas_extraidas": medidas}
+            for i in range(n)
+        ])
+        db.bulk_insert_mappings(Modelo3D, [
+            {"id": inicio + i + 1, "plano_id": inicio + i + 1, "datos_json": {"objects": []}}
+            for i in range(n)
+        ])
+        db.commit()
+        return [inicio + i + 1 for i in range(n)]
+    finally:
+        db.close()
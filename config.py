@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,13 +7,58 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: int
     DB_NAME: str
+    DATABASE_URL: Optional[str] = None  # Sobrescribe la URL de Postgres (p. ej. sqlite:///./bench.db)
     SECRET_KEY: str
     ALGORITHM: str
     TOKEN_SECONDS_EXP: int = 3600  # 1 hora por defecto
+    ADMIN_CORREOS: str = ""  # Correos de administradores separados por coma (descuentos por volumen generales)
+    BCRYPT_ROUNDS: int = 12  # Costo de bcrypt para contraseñas nuevas o re-hasheadas
+    PASSWORD_HASH_WORKERS: int = 4  # Hilos dedicados a hashear/verificar contraseñas
+    LOGIN_RATE_LIMIT_IP: int = 20  # Intentos de login por minuto por IP
+    LOGIN_RATE_LIMIT_ACCOUNT: int = 5  # Intentos de login por minuto por cuenta
+    TRUSTED_PROXY_HOPS: int = 0  # Proxies propios delante de la API que agregan X-Forwarded-For (Railway: 1)
+    CATALOG_CACHE_TTL_SECONDS: int = 60  # Vigencia máxima del catálogo cacheado (otros workers pueden escribir)
+    CATALOG_CACHE_MAX_ENTRIES: int = 512  # Páginas de catálogo pre-serializadas en memoria
+    IVA_PORCENTAJE: float = 19.0  # IVA aplicado a las cotizaciones
+    PRICE_CACHE_TTL_SECONDS: int = 30  # Vigencia de precios cacheados para /cotizaciones/preview
+    DOCUMENT_RENDER_WORKERS: int = 2  # Procesos que generan PDF/XLSX de cotizaciones
+    DOCUMENT_CACHE_MAX_MB: int = 64  # Memoria para documentos de cotización ya generados
+    REVISION_CACHE_MAX_ENTRIES: int = 256  # Versiones de cotizaciones reconstruidas desde sus revisiones
+    TEXTURE_MAX_SIZE: int = 2048  # Lado máximo (potencia de 2) de las texturas procesadas
+    TEXTURE_MIN_SIZE: int = 128  # Lado del derivado más chico de la cadena de mipmaps
+    TEXTURE_WEBP_QUALITY: int = 82  # Calidad WebP de los derivados de texturas
+    TEXTURE_PROCESS_WORKERS: int = 2  # Procesos que reescalan y codifican texturas
+    TEXTURE_UPLOAD_WORKERS: int = 4  # Hilos que suben derivados de texturas al almacenamiento
+    TEXTURE_ORPHAN_GRACE_SECONDS: int = 3600  # Antigüedad mínima de una textura sin referencias para borrarla
+    TEXTURE_STORAGE: str = "drive"  # Almacenamiento principal de texturas: "drive", "local" (sin conexión) o "s3"
+    LOCAL_STORAGE_DIR: str = "uploads"  # Directorio del almacenamiento local (textures/ se sirve en /uploads/textures)
+    STORAGE_BACKEND: str = "drive"  # Almacenamiento de planos: "drive", "local" o "s3" (subidas y descargas directas)
+    STORAGE_URL_EXPIRATION_SECONDS: int = 900  # Vigencia de las URL firmadas de subida y descarga
+    PLANO_PENDIENTE_MAX_SECONDS: int = 86400  # Antigüedad a partir de la cual se borra un plano de subida directa sin confirmar
+    PLANO_MAX_MB: int = 10  # Tamaño máximo de un archivo de plano
+    PLANO_PREVALIDACION: bool = True  # Validar tipo real, dimensiones y contenido antes de llamar al conversor
+    PLANO_MIN_LADO: int = 256  # Lado menor mínimo (px) de un plano
+    PLANO_CONVERTER_MAX_LADO: int = 2048  # Lado mayor con el que se envían los planos al conversor (se reducen los más grandes)
+    PLANO_RASTER_DPI: int = 150  # Resolución con la que se rasterizan los planos PDF/SVG
+    PLANO_MIN_DESVIACION: float = 3.0  # Desviación estándar de grises mínima: por debajo la imagen se considera en blanco
+    PLANO_MAX_MEGAPIXELES: int = 100  # Imágenes más grandes se rechazan sin decodificarlas
+    PLANO_NORMALIZAR: bool = True  # Enviar al conversor un PNG en grises, orientado y con contraste normalizado
+    PLANO_REESCALAR_MODELO: bool = True  # Llevar las coordenadas del modelo a la escala de la imagen original
+    PLANO_PROCESS_WORKERS: int = 2  # Procesos que pre-validan y normalizan planos
+    S3_BUCKET: str = ""  # Bucket de planos y texturas con STORAGE_BACKEND/TEXTURE_STORAGE=s3
+    S3_ENDPOINT_URL: Optional[str] = None  # Endpoint compatible con S3 (MinIO, R2...); None usa AWS
+    S3_REGION: str = "us-east-1"  # Región del bucket
+    S3_ACCESS_KEY_ID: Optional[str] = None  # Credenciales; None usa las del entorno (rol IAM, ~/.aws)
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
     STRIPE_SECRET_KEY: str
     STRIPE_WEBHOOK_SECRET: str
     FRONTEND_URL: str = "https://floorplanto3dfrontendreact-eight.vercel.app"  # URL del frontend
     FLOORPLAN_API_URL: str = "https://floorplanto3dapi-production.up.railway.app"  # URL del servicio Flask
+    FLOORPLAN_API_URLS: str = ""  # Réplicas del conversor separadas por coma (vacío = solo FLOORPLAN_API_URL)
+    CONVERTER_HEALTH_PATH: str = "/health"  # Ruta consultada por el health check de cada réplica
+    CONVERTER_HEALTH_INTERVAL_SECONDS: int = 10  # Intervalo entre health checks de las réplicas
+    PROGRESO_BACKEND: str = "memoria"  # Bus del progreso de planos: "memoria" (un worker) o "postgres" (LISTEN/NOTIFY)
+    PROGRESO_KEEPALIVE_SECONDS: int = 15  # Comentario SSE periódico para que proxies no corten la suscripción
     GOOGLE_DRIVE_FOLDER_ID: str = "1_Mv_vpgc-0LCEuPaI49Ym3xvzvRhW7OW"  # ID del folder de Google Drive
     GOOGLE_CREDENTIALS_PATH: str = "./credentials.json"
     GOOGLE_OAUTH_REDIRECT_URI: str = "https://floorplanto3dfastapi-production.up.railway.app/auth/google/callback"
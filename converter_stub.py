@@ -0,0 +1,147 @@
+"""
+Conversor de planos local para desarrollo y pruebas de carga sin FloorPlanTo3D-API
+
+Responde POST /convert con un modelo Three.js fijo (una habitación con paredes, puerta y
+ventanas, en el formato que espera PlanoService) después de una latencia configurable, y
+GET /health con {"status": "ok"}. `--capacidad` limita las conversiones simultáneas como el
+conversor real (un modelo por proceso): las demás esperan su turno. `--ms-por-megapixel`
+suma latencia según la resolución del PNG/JPEG recibido, como la inferencia del conversor
+real, y `--metros-por-pixel` mide la habitación en proporción a los píxeles de la imagen (como
+el conversor real, cuyas coordenadas salen de la imagen que recibe). Solo usa la biblioteca estándar.
+Ejecutar: python converter_stub.py [--puerto 5001] [--latencia-ms 300] [--jitter-ms 50] [--capacidad 1]
+          [--ms-por-megapixel 0] [--metros-por-pixel 0]
+Varias réplicas: un proceso por puerto y FLOORPLAN_API_URLS=http://127.0.0.1:5001,http://127.0.0.1:5002
+"""
+
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def modelo_threejs(ancho: float = 10.0, largo: float = 8.0, alto: float = 2.5) -> dict:
+    """Habitación rectangular: 4 paredes, 1 puerta y 2 ventanas"""
+    grosor = 0.15
+    objetos = [
+        {"id": "wall_1", "type": "wall", "dimensions": {"width": ancho, "height": alto, "depth": grosor},
+         "position": {"x": 0, "y": alto / 2, "z": -largo / 2}},
+        {"id": "wall_2", "type": "wall", "dimensions": {"width": ancho, "height": alto, "depth": grosor},
+         "position": {"x": 0, "y": alto / 2, "z": largo / 2}},
+        {"id": "wall_3", "type": "wall", "dimensions": {"width": largo, "height": alto, "depth": grosor},
+         "position": {"x": -ancho / 2, "y": alto / 2, "z": 0}, "rotation": {"x": 0, "y": 90, "z": 0}},
+        {"id": "wall_4", "type": "wall", "dimensions": {"width": largo, "height": alto, "depth": grosor},
+         "position": {"x": ancho / 2, "y": alto / 2, "z": 0}, "rotation": {"x": 0, "y": 90, "z": 0}},
+        {"id": "door_1", "type": "door", "dimensions": {"width": 0.9, "height": 2.1, "depth": grosor},
+         "position": {"x": 0, "y": 1.05, "z": largo / 2}},
+        {"id": "window_1", "type": "window", "dimensions": {"width": 1.5, "height": 1.2, "depth": grosor},
+         "position": {"x": -2.5, "y": 1.5, "z": -largo / 2}},
+        {"id": "window_2", "type": "window", "dimensions": {"width": 1.5, "height": 1.2, "depth": grosor},
+         "position": {"x": 2.5, "y": 1.5, "z": -largo / 2}},
+    ]
+    return {
+        "format": "threejs",
+        "objects": objetos,
+        "scene": {"bounds": {"width": ancho, "height": largo}, "units": "meters"},
+        "metadata": {"generator": "converter_stub", "total_objects": len(objetos)},
+    }
+
+def dimensiones(cuerpo: bytes) -> tuple:
+    """(ancho, alto) del primer PNG o JPEG dentro del cuerpo multipart; (0, 0) si no hay"""
+    png = cuerpo.find(b"\x89PNG\r\n\x1a\n")
+    if png >= 0:
+        return struct.unpack(">II", cuerpo[png + 16:png + 24])
+    i = cuerpo.find(b"\xff\xd8\xff")
+    if i < 0:
+        return 0, 0
+    i += 2
+    while i + 9 < len(cuerpo) and cuerpo[i] == 0xFF:
+        marcador, largo = cuerpo[i + 1], struct.unpack(">H", cuerpo[i + 2:i + 4])[0]
+        if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):  # SOFn
+            alto, ancho = struct.unpack(">HH", cuerpo[i + 5:i + 9])
+            return ancho, alto
+        i += 2 + largo
+    return 0, 0
+
+class ConversorStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como el conversor detrás de su proxy
+    latencia_ms = 300.0
+    jitter_ms = 0.0
+    ms_por_megapixel = 0.0
+    metros_por_pixel = 0.0
+    turnos: threading.Semaphore = None
+    respuesta = json.dumps(modelo_threejs()).encode()
+    atendidas = 0
+    bytes_recibidos = 0
+
+    def _responder(self, status: int, cuerpo: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/health":
+            self._responder(200, b'{"status": "ok"}')
+        else:
+            self._responder(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        ConversorStub.bytes_recibidos += len(cuerpo)
+        if self.path.split("?")[0] != "/convert":
+            self._responder(404, b'{"error": "not found"}')
+            return
+        ancho, alto = dimensiones(cuerpo) if self.ms_por_megapixel or self.metros_por_pixel else (0, 0)
+        with self.turnos:
+            demora = self.latencia_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            demora += self.ms_por_megapixel * ancho * alto / 1_000_000
+            time.sleep(max(demora, 0) / 1000)
+            ConversorStub.atendidas += 1
+        if self.metros_por_pixel and ancho:
+            self._responder(200, json.dumps(modelo_threejs(ancho * self.metros_por_pixel,
+                                                           alto * self.metros_por_pixel)).encode())
+        else:
+            self._responder(200, self.respuesta)
+
+    def log_message(self, *args):
+        pass
+
+def crear_servidor(puerto: int, latencia_ms: float = 300, jitter_ms: float = 0, capacidad: int = 1,
+                   host: str = "127.0.0.1", ms_por_megapixel: float = 0,
+                   metros_por_pixel: float = 0) -> ThreadingHTTPServer:
+    """Servidor listo para serve_forever (los benchmarks lo usan en un hilo o en un proceso aparte)"""
+    handler = type("ConversorStubConfigurado", (ConversorStub,), {
+        "latencia_ms": latencia_ms, "jitter_ms": jitter_ms, "ms_por_megapixel": ms_por_megapixel,
+        "metros_por_pixel": metros_por_pixel,
+        "turnos": threading.Semaphore(capacidad),
+    })
+    servidor = ThreadingHTTPServer((host, puerto), handler)
+    servidor.daemon_threads = True
+    return servidor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=5001)
+    parser.add_argument("--latencia-ms", type=float, default=300, help="Duración de cada conversión")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Variación aleatoria de la latencia (±)")
+    parser.add_argument("--capacidad", type=int, default=1, help="Conversiones simultáneas")
+    parser.add_argument("--ms-por-megapixel", type=float, default=0, help="Latencia adicional por megapíxel recibido")
+    parser.add_argument("--metros-por-pixel", type=float, default=0,
+                        help="Medir la habitación según los píxeles recibidos (0: modelo fijo)")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.puerto, args.latencia_ms, args.jitter_ms, args.capacidad, args.host,
+                              args.ms_por_megapixel, args.metros_por_pixel)
+    print(f"🧪 Conversor stub en http://{args.host}:{args.puerto} "
+          f"({args.latencia_ms:.0f}±{args.jitter_ms:.0f} ms, capacidad {args.capacidad})", flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,27 @@ from sqlalchemy.pool import StaticPool
 from config import settings
 
 from models import Base, Usuario, Membresia, Suscripcion, Pago, Plano, Modelo3D, Cotizacion
-DATABASE_URL = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+DATABASE_URL = settings.DATABASE_URL or f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+
+# SQLite (benchmarks/desarrollo offline) necesita compartir la conexión entre hilos
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,  # Verifica conexiones antes de usarlas
     pool_recycle=300,    # Recicla conexiones cada 5 minutos
-    echo=False           # Cambia a True para ver las consultas SQL
+    echo=False,          # Cambia a True para ver las consultas SQL
+    connect_args=connect_args
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Crear tablas automáticamente (asegúrate de importar todos los modelos en algún lugar central)
-Base.metadata.create_all(bind=engine)
+def init_db():
+    """
+    Crear las tablas que falten.
+    Ya no se ejecuta al importar el módulo: se llama desde `python manage.py init-db`
+    para que el arranque de la API no tenga que conectarse a Postgres.
+    """
+    Base.metadata.create_all(bind=engine)
 
 # Dependencia para inyectar sesión DB
 def get_db():
@@ -24,4 +33,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
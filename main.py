@@ -16,6 +16,11 @@ from routers.categoria import router as categoria_router
 from routers.material import router as material_router
 from routers.material_modelo3d import router as material_modelo3d_router
 from routers.cotizacion import router as cotizacion_router
+from routers.regla_bom import router as regla_bom_router
+from routers.precios import router as precios_router
+from routers.textura import router as textura_router
+from routers.storage import router as storage_router
+from services.local_image_service import ArchivosInmutables, URL_PREFIX, local_image_service
 from swagger_config import custom_openapi
 from routers.google_auth import router as google_auth_router
 
@@ -66,11 +71,23 @@ app.include_router(categoria_router)
 app.include_router(material_router)
 app.include_router(material_modelo3d_router)
 app.include_router(cotizacion_router)
+app.include_router(regla_bom_router)
+app.include_router(precios_router)
+app.include_router(textura_router)
+app.include_router(storage_router)
 app.include_router(stripe_router)
 app.include_router(stripe_create_membresia_router)
 app.include_router(stripe_webhook_router)
 app.include_router(google_auth_router)
 
+# Texturas del almacenamiento local (fallback de Drive o principal con TEXTURE_STORAGE=local).
+# Solo textures/ es público: los planos locales se sirven con URL firmadas en /storage
+app.mount(
+    f"{URL_PREFIX}/textures",
+    ArchivosInmutables(directory=local_image_service.upload_dir, check_dir=False),
+    name="uploads"
+)
+
 origins = [
     "http://localhost:5173",  # URL de tu frontend React
     "http://127.0.0.1:5173",
@@ -0,0 +1,155 @@
+"""
+Tareas administrativas que no deben ejecutarse al arrancar la API
+Ejecutar: python manage.py init-db
+          python manage.py backfill-cotizacion-items
+          python manage.py check-costos [--reparar]
+          python manage.py purge-texturas [--gracia SEGUNDOS]
+          python manage.py purge-planos-pendientes [--max-segundos SEGUNDOS]
+"""
+
+import argparse
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+def init_db(skip_sql: bool = False):
+    """Crear tablas desde los modelos y aplicar los scripts SQL de migrations/"""
+    from database import engine, init_db as create_tables
+
+    print("🗄️  Creando tablas faltantes...")
+    create_tables()
+
+    if skip_sql or engine.dialect.name != "postgresql":
+        print("ℹ️  Scripts SQL omitidos (solo aplican a PostgreSQL)")
+        return
+
+    # Los scripts son idempotentes (IF NOT EXISTS / OR REPLACE), se aplican en orden alfabético
+    for script in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        print(f"  ▶️  {script.name}")
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(script.read_text(encoding="utf-8"))
+            connection.commit()
+        finally:
+            connection.close()
+
+    print("✅ Base de datos inicializada")
+
+def backfill_cotizacion_items(batch_size: int = 500):
+    """
+    Copiar las líneas JSON de cotizaciones a cotizacion_items en cualquier motor de base de datos
+    y vaciar el JSON de las migradas (una cotización sin líneas no vuelve a tomar las del JSON).
+    En PostgreSQL init-db ya lo hace con migrations/backfill_cotizacion_items.sql.
+    """
+    from sqlalchemy import String, cast
+    from database import SessionLocal
+    from models.cotizacion import Cotizacion
+    from models.cotizacion_item import CotizacionItem
+
+    # El JSON se vacía sin tocar fecha_actualizacion (clave de la caché de documentos)
+    vaciar = {Cotizacion.materiales: [], Cotizacion.fecha_actualizacion: Cotizacion.fecha_actualizacion}
+
+    db = SessionLocal()
+    try:
+        pendientes = [row.id for row in db.query(Cotizacion.id).filter(
+            ~Cotizacion.items.any(), cast(Cotizacion.materiales, String) != "[]"
+        )]
+        for inicio in range(0, len(pendientes), batch_size):
+            ids = pendientes[inicio:inicio + batch_size]
+            lote = []
+            for cotizacion_id, materiales in db.query(Cotizacion.id, Cotizacion.materiales).filter(Cotizacion.id.in_(ids)):
+                for posicion, linea in enumerate(materiales or []):
+                    lote.append({
+                        "cotizacion_id": cotizacion_id,
+                        "material_id": linea["material_id"],
+                        "posicion": posicion,
+                        "nombre": linea.get("nombre", ""),
+                        "categoria": linea.get("categoria", ""),
+                        "unidad_medida": linea.get("unidad_medida"),
+                        "cantidad": linea.get("cantidad", 0),
+                        "precio_unitario": linea.get("precio_unitario", 0),
+                        "descuento_pct": linea.get("descuento_pct", 0),
+                        "subtotal": linea.get("subtotal", 0),
+                    })
+            if lote:
+                db.bulk_insert_mappings(CotizacionItem, lote)
+            db.query(Cotizacion).filter(Cotizacion.id.in_(ids)).update(vaciar, synchronize_session=False)
+            db.commit()
+        # Migradas por una versión anterior que no vaciaba el JSON
+        db.query(Cotizacion).filter(
+            Cotizacion.items.any(), cast(Cotizacion.materiales, String) != "[]"
+        ).update(vaciar, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"✅ {len(pendientes)} cotizaciones migradas a cotizacion_items")
+
+def check_costos(reparar: bool = False):
+    """Verificar costos_modelo3d contra materiales_modelo3d; con --reparar también los llena la primera vez"""
+    from database import SessionLocal
+    from services.costo_rollup_service import verificar
+
+    db = SessionLocal()
+    try:
+        resultado = verificar(db, reparar=reparar)
+    finally:
+        db.close()
+
+    if resultado["consistente"]:
+        print("✅ Costos materializados consistentes")
+        return
+    print(f"⚠️ Modelos con total inconsistente: {resultado['modelos_inconsistentes']}, "
+          f"con categorías inconsistentes: {resultado['modelos_con_categorias_inconsistentes']}")
+    if reparar:
+        print(f"✅ {resultado['reparados']} modelos recalculados")
+
+def purge_texturas(gracia: int = None):
+    """Borrar del almacenamiento las texturas que ningún material usa"""
+    from services.texture_store import texture_store
+
+    borradas = texture_store.purgar(gracia)
+    print(f"✅ {borradas} texturas sin referencias eliminadas")
+
+def purge_planos_pendientes(max_segundos: int = None):
+    """Borrar los planos de subida directa que nunca se confirmaron y sus archivos"""
+    from services.plano_service import purgar_pendientes
+
+    borrados = purgar_pendientes(max_segundos)
+    print(f"✅ {borrados} planos sin confirmar eliminados")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tareas administrativas de FloorPlanTo3D API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    init_parser = subparsers.add_parser("init-db", help="Crear tablas y aplicar migraciones SQL")
+    init_parser.add_argument("--skip-sql", action="store_true", help="No ejecutar los scripts de migrations/")
+
+    subparsers.add_parser("backfill-cotizacion-items", help="Copiar líneas JSON de cotizaciones a cotizacion_items")
+
+    costos_parser = subparsers.add_parser("check-costos", help="Verificar los costos materializados por modelo 3D")
+    costos_parser.add_argument("--reparar", action="store_true", help="Recalcular los modelos inconsistentes")
+
+    texturas_parser = subparsers.add_parser("purge-texturas", help="Borrar texturas sin referencias")
+    texturas_parser.add_argument("--gracia", type=int, default=None,
+                                 help="Antigüedad mínima en segundos (por defecto TEXTURE_ORPHAN_GRACE_SECONDS)")
+
+    pendientes_parser = subparsers.add_parser("purge-planos-pendientes", help="Borrar planos de subida directa sin confirmar")
+    pendientes_parser.add_argument("--max-segundos", type=int, default=None,
+                                   help="Antigüedad mínima en segundos (por defecto PLANO_PENDIENTE_MAX_SECONDS)")
+
+    args = parser.parse_args()
+    if args.command == "init-db":
+        init_db(skip_sql=args.skip_sql)
+    elif args.command == "backfill-cotizacion-items":
+        backfill_cotizacion_items()
+    elif args.command == "check-costos":
+        check_costos(reparar=args.reparar)
+    elif args.command == "purge-texturas":
+        purge_texturas(gracia=args.gracia)
+    elif args.command == "purge-planos-pendientes":
+        purge_planos_pendientes(max_segundos=args.max_segundos)
+
+if __name__ == "__main__":
+    main()
@@ -68,3 +68,17 @@ def get_current_user_optional(
         return get_current_user(credentials, db)
     except HTTPException:
         return None
+
+def get_current_admin(current_user = Depends(get_current_user)):
+    """
+    Usuario autenticado cuyo correo está en ADMIN_CORREOS
+    Para endpoints que modifican datos compartidos por todos los usuarios
+    """
+    admins = {correo.strip().lower() for correo in settings.ADMIN_CORREOS.split(",") if correo.strip()}
+    if current_user.correo.lower() not in admins:
+        print(f"[AUTH] ERROR: {current_user.correo} no es administrador")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acceso denegado - Solo administradores",
+        )
+    return current_user
@@ -0,0 +1,3 @@
+-- Índice para listar las cotizaciones de un usuario por fecha (GET /cotizaciones/resumen)
+-- Se aplica con: python manage.py init-db (create_all ya lo crea en tablas nuevas)
+CREATE INDEX IF NOT EXISTS idx_cotizaciones_usuario_fecha ON cotizaciones (usuario_id, fecha_creacion);
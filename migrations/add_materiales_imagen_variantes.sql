@@ -0,0 +1,3 @@
+-- Derivados WebP potencia de 2 de la textura de cada material ({"ANCHOxALTO": url})
+-- Se aplica con: python manage.py init-db
+ALTER TABLE materiales ADD COLUMN IF NOT EXISTS imagen_variantes JSON;
@@ -0,0 +1,3 @@
+-- Índice para recalcular las líneas de un material (importación masiva de precios)
+-- Se aplica con: python manage.py init-db (create_all ya lo crea en tablas nuevas)
+CREATE INDEX IF NOT EXISTS ix_materiales_modelo3d_material_id ON materiales_modelo3d (material_id);
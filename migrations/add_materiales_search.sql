@@ -0,0 +1,24 @@
+-- Búsqueda de texto completo en materiales (PostgreSQL 12+)
+-- Se aplica con: python manage.py init-db
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- unaccent() no es IMMUTABLE; este envoltorio permite usarlo en columnas generadas e índices
+CREATE OR REPLACE FUNCTION f_unaccent(text)
+RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+-- Vector ponderado: nombre y código (A) pesan más que la descripción (B)
+ALTER TABLE materiales ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish'::regconfig, f_unaccent(coalesce(nombre, ''))), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, f_unaccent(coalesce(codigo, ''))), 'A') ||
+        setweight(to_tsvector('spanish'::regconfig, f_unaccent(coalesce(descripcion, ''))), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_materiales_search_vector ON materiales USING GIN (search_vector);
+
+-- Trigramas para coincidencias aproximadas (errores de tipeo) sobre nombre y código
+CREATE INDEX IF NOT EXISTS idx_materiales_nombre_trgm ON materiales USING GIN (f_unaccent(lower(nombre)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_materiales_codigo_trgm ON materiales USING GIN (lower(codigo) gin_trgm_ops);
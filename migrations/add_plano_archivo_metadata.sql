@@ -0,0 +1,5 @@
+-- Tipo y tamaño del archivo de cada plano, cacheados para servir descargas (Content-Type, Range)
+-- Los planos anteriores se completan en su primera descarga
+-- Se aplica con: python manage.py init-db
+ALTER TABLE plano ADD COLUMN IF NOT EXISTS mime_type VARCHAR(100);
+ALTER TABLE plano ADD COLUMN IF NOT EXISTS tamano BIGINT;
@@ -0,0 +1,18 @@
+-- Índice por modelo y carga inicial de los costos materializados (PostgreSQL)
+-- Se aplica con: python manage.py init-db (en otras bases: python manage.py check-costos --reparar)
+-- Idempotente: solo carga modelos que todavía no tienen fila en costos_modelo3d
+CREATE INDEX IF NOT EXISTS ix_materiales_modelo3d_modelo3d_id ON materiales_modelo3d (modelo3d_id);
+
+INSERT INTO costos_modelo3d_categoria (modelo3d_id, categoria_id, total_materiales, costo_total)
+SELECT l.modelo3d_id, m.categoria_id, count(l.id), coalesce(sum(l.subtotal), 0)
+FROM materiales_modelo3d l
+JOIN materiales m ON m.id = l.material_id
+WHERE NOT EXISTS (SELECT 1 FROM costos_modelo3d c WHERE c.modelo3d_id = l.modelo3d_id)
+GROUP BY l.modelo3d_id, m.categoria_id
+ON CONFLICT DO NOTHING;
+
+INSERT INTO costos_modelo3d (modelo3d_id, total_materiales, costo_total, fecha_actualizacion)
+SELECT cc.modelo3d_id, sum(cc.total_materiales), sum(cc.costo_total), now() AT TIME ZONE 'utc'
+FROM costos_modelo3d_categoria cc
+WHERE NOT EXISTS (SELECT 1 FROM costos_modelo3d c WHERE c.modelo3d_id = cc.modelo3d_id)
+GROUP BY cc.modelo3d_id;
@@ -0,0 +1,29 @@
+-- Copiar las líneas de cotizaciones.materiales (JSON) a cotizacion_items (PostgreSQL)
+-- Se aplica con: python manage.py init-db (en otras bases: python manage.py backfill-cotizacion-items)
+-- Idempotente: solo migra cotizaciones que todavía no tienen líneas en cotizacion_items, y
+-- después vacía el JSON de las que ya las tienen. Si no, una cotización a la que luego se le
+-- quitaran todas las líneas recuperaría las del JSON viejo al volver a ejecutar init-db
+INSERT INTO cotizacion_items (
+    cotizacion_id, material_id, posicion, nombre, categoria, unidad_medida,
+    cantidad, precio_unitario, descuento_pct, subtotal
+)
+SELECT
+    c.id,
+    (linea.valor->>'material_id')::integer,
+    linea.posicion - 1,
+    coalesce(linea.valor->>'nombre', ''),
+    coalesce(linea.valor->>'categoria', ''),
+    linea.valor->>'unidad_medida',
+    coalesce((linea.valor->>'cantidad')::double precision, 0),
+    coalesce((linea.valor->>'precio_unitario')::double precision, 0),
+    coalesce((linea.valor->>'descuento_pct')::double precision, 0),
+    coalesce((linea.valor->>'subtotal')::double precision, 0)
+FROM cotizaciones c
+CROSS JOIN LATERAL json_array_elements(c.materiales::json) WITH ORDINALITY AS linea(valor, posicion)
+WHERE json_typeof(c.materiales::json) = 'array'
+  AND NOT EXISTS (SELECT 1 FROM cotizacion_items ci WHERE ci.cotizacion_id = c.id);
+
+UPDATE cotizaciones c
+SET materiales = '[]'
+WHERE c.materiales::jsonb <> '[]'::jsonb
+  AND EXISTS (SELECT 1 FROM cotizacion_items ci WHERE ci.cotizacion_id = c.id);
@@ -12,3 +12,10 @@ from .categoria import Categoria
 from .material import Material
 from .material_modelo3d import MaterialModelo3D
 from .cotizacion import Cotizacion
+from .regla_bom import ReglaBOM
+from .precio_usuario import PrecioUsuario
+from .descuento_volumen import DescuentoVolumen
+from .cotizacion_item import CotizacionItem
+from .cotizacion_revision import CotizacionRevision
+from .costo_modelo3d import CostoModelo3D, CostoModelo3DCategoria
+from .textura import Textura
@@ -0,0 +1,31 @@
+"""
+Totales materializados de materiales_modelo3d (ver services/costo_rollup_service.py)
+"""
+
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from datetime import datetime
+from . import Base
+
+class CostoModelo3D(Base):
+    """Cantidad de líneas y costo total de un modelo 3D"""
+    __tablename__ = "costos_modelo3d"
+
+    modelo3d_id = Column(Integer, ForeignKey("modelo3d.id", ondelete="CASCADE"), primary_key=True)
+    total_materiales = Column(Integer, nullable=False, default=0)
+    costo_total = Column(Float, nullable=False, default=0.0)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CostoModelo3D(modelo3d_id={self.modelo3d_id}, costo_total={self.costo_total})>"
+
+class CostoModelo3DCategoria(Base):
+    """Cantidad de líneas y costo de un modelo 3D por categoría de material"""
+    __tablename__ = "costos_modelo3d_categoria"
+
+    modelo3d_id = Column(Integer, ForeignKey("modelo3d.id", ondelete="CASCADE"), primary_key=True)
+    categoria_id = Column(Integer, ForeignKey("categorias.id", ondelete="CASCADE"), primary_key=True, index=True)
+    total_materiales = Column(Integer, nullable=False, default=0)
+    costo_total = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<CostoModelo3DCategoria(modelo3d_id={self.modelo3d_id}, categoria_id={self.categoria_id}, costo_total={self.costo_total})>"
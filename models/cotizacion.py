@@ -2,7 +2,7 @@
 Modelo de base de datos para Cotización
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, JSON, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from . import Base  # ✅ Cambiar de 'from database import Base' a 'from . import Base'
@@ -11,6 +11,10 @@ import datetime
 class Cotizacion(Base):
     """Modelo de Cotización"""
     __tablename__ = "cotizaciones"
+    __table_args__ = (
+        # Listados del usuario ordenados por fecha (ver migrations/add_cotizaciones_usuario_fecha_index.sql)
+        Index("idx_cotizaciones_usuario_fecha", "usuario_id", "fecha_creacion"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     plano_id = Column(Integer, ForeignKey('plano.id', ondelete='CASCADE'), nullable=False, index=True)  # ✅ Cambiar 'planos.id' a 'plano.id'
@@ -24,8 +28,9 @@ class Cotizacion(Base):
     # Descripción del proyecto
     descripcion = Column(Text, nullable=True)
     
-    # Materiales (JSON array) - Para PostgreSQL usar JSONB
-    materiales = Column(JSON, nullable=False)  # En PostgreSQL podría ser JSONB
+    # Materiales (JSON array) - Legado: las líneas nuevas se guardan en cotizacion_items.
+    # Las de cotizaciones anteriores se copian allí y el JSON queda vacío (ver migrations/backfill_cotizacion_items.sql)
+    materiales = Column(JSON, nullable=False, default=list)
     
     # Totales
     subtotal = Column(Float, nullable=False, default=0.0)
@@ -38,4 +43,8 @@ class Cotizacion(Base):
     
     # Relaciones
     plano = relationship("Plano", back_populates="cotizaciones")
-    usuario = relationship("Usuario", back_populates="cotizaciones")
\ No newline at end of file
+    usuario = relationship("Usuario", back_populates="cotizaciones")
+    items = relationship("CotizacionItem", back_populates="cotizacion", cascade="all, delete-orphan",
+                         passive_deletes=True, order_by="CotizacionItem.posicion")
+    revisiones = relationship("CotizacionRevision", back_populates="cotizacion", cascade="all, delete-orphan",
+                              passive_deletes=True, order_by="CotizacionRevision.numero")
\ No newline at end of file
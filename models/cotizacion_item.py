@@ -0,0 +1,27 @@
+"""
+Modelo de base de datos para las líneas de una Cotización
+"""
+
+from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy.orm import relationship
+from . import Base
+
+class CotizacionItem(Base):
+    """Línea de cotización: copia del material y precio al momento de cotizar"""
+    __tablename__ = "cotizacion_items"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    cotizacion_id = Column(Integer, ForeignKey('cotizaciones.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Sin FK a materiales: la cotización conserva la línea aunque el material se elimine del catálogo
+    material_id = Column(Integer, nullable=False, index=True)
+    posicion = Column(Integer, nullable=False, default=0)
+    nombre = Column(String(255), nullable=False)
+    categoria = Column(String(255), nullable=False)
+    unidad_medida = Column(String(20), nullable=True)
+    cantidad = Column(Float, nullable=False)
+    precio_unitario = Column(Float, nullable=False)
+    descuento_pct = Column(Float, nullable=False, default=0.0)
+    subtotal = Column(Float, nullable=False)
+
+    # Relaciones
+    cotizacion = relationship("Cotizacion", back_populates="items")
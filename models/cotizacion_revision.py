@@ -0,0 +1,37 @@
+"""
+Modelo de base de datos para las revisiones de una Cotización
+"""
+
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, JSON, Text, UniqueConstraint
+from sqlalchemy.orm import relationship
+from . import Base
+import datetime
+
+class CotizacionRevision(Base):
+    """
+    Revisión de una cotización guardada como delta: solo las líneas que cambiaron.
+    `cambios` = {"lineas": [{"material_id", "antes", "despues"}], "totales_antes": {...}};
+    "antes"/"despues" son la línea completa o null (línea agregada/eliminada), así que
+    cada delta se puede aplicar o deshacer sin consultar precios.
+    """
+    __tablename__ = "cotizacion_revisiones"
+    __table_args__ = (
+        UniqueConstraint("cotizacion_id", "numero", name="uq_cotizacion_revision_numero"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    cotizacion_id = Column(Integer, ForeignKey('cotizaciones.id', ondelete='CASCADE'), nullable=False, index=True)
+    numero = Column(Integer, nullable=False)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False)
+    nota = Column(Text, nullable=True)
+    cambios = Column(JSON, nullable=False)
+
+    # Totales de la cotización después de aplicar esta revisión
+    subtotal = Column(Float, nullable=False, default=0.0)
+    iva = Column(Float, nullable=False, default=0.0)
+    total = Column(Float, nullable=False, default=0.0)
+
+    fecha_creacion = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    # Relaciones
+    cotizacion = relationship("Cotizacion", back_populates="revisiones")
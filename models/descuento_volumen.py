@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Float, Boolean, DateTime, ForeignKey
+from datetime import datetime
+from . import Base
+
+class DescuentoVolumen(Base):
+    """
+    Descuento por volumen: aplica a una línea cuya cantidad alcanza `cantidad_minima`.
+    Sin material ni categoría es un descuento general; con ambos, aplica solo a ese material.
+    """
+    __tablename__ = "descuentos_volumen"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materiales.id", ondelete="CASCADE"), nullable=True, index=True)
+    categoria_id = Column(Integer, ForeignKey("categorias.id", ondelete="CASCADE"), nullable=True, index=True)
+    cantidad_minima = Column(Float, nullable=False)
+    porcentaje = Column(Float, nullable=False)
+    activo = Column(Boolean, nullable=False, default=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<DescuentoVolumen(id={self.id}, cantidad_minima={self.cantidad_minima}, porcentaje={self.porcentaje})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from . import Base
@@ -13,6 +13,7 @@ class Material(Base):
     precio_base = Column(Float, nullable=False, default=0.0)
     unidad_medida = Column(String(20), nullable=False)  # m2, m3, unidad, kg, etc.
     imagen_url = Column(Text, nullable=True)
+    imagen_variantes = Column(JSON, nullable=True)  # {"1024x1024": url, "512x512": url, ...} derivados WebP
     categoria_id = Column(Integer, ForeignKey("categorias.id"), nullable=False)
     fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
     fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
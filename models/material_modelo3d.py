@@ -6,8 +6,8 @@ class MaterialModelo3D(Base):
     __tablename__ = "materiales_modelo3d"
     
     id = Column(Integer, primary_key=True, index=True)
-    modelo3d_id = Column(Integer, ForeignKey("modelo3d.id", ondelete="CASCADE"), nullable=False)
-    material_id = Column(Integer, ForeignKey("materiales.id", ondelete="CASCADE"), nullable=False)
+    modelo3d_id = Column(Integer, ForeignKey("modelo3d.id", ondelete="CASCADE"), nullable=False, index=True)
+    material_id = Column(Integer, ForeignKey("materiales.id", ondelete="CASCADE"), nullable=False, index=True)
     cantidad = Column(Float, nullable=False, default=0.0)
     unidad_medida = Column(String(20), nullable=False)
     precio_unitario = Column(Float, nullable=False, default=0.0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from . import Base
 import datetime
@@ -9,8 +9,10 @@ class Plano(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False)
     nombre = Column(String(255), nullable=False)
-    url = Column(Text)  # ubicación del archivo (S3/local)
+    url = Column(Text)  # ubicación del archivo: Drive, /uploads/... o s3://bucket/clave (services/storage_service.py)
     formato = Column(String(32), default="image")  # jpg|png|pdf|image|svg, etc.
+    mime_type = Column(String(100))  # tipo del archivo guardado (cacheado para las descargas)
+    tamano = Column(BigInteger)  # bytes del archivo guardado (Content-Length y Range sin consultar el almacenamiento)
     tipo_plano = Column(String(64))  # arquitectónico, mano_alzada, etc.
     descripcion = Column(Text)
     medidas_extraidas = Column(JSON)  # metadatos/medidas detectadas (opcional)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from . import Base
+
+class PrecioUsuario(Base):
+    """Lista de precios propia de un usuario: reemplaza Material.precio_base en sus cotizaciones"""
+    __tablename__ = "precios_usuario"
+    __table_args__ = (UniqueConstraint("usuario_id", "material_id", name="uq_precios_usuario_material"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False, index=True)
+    material_id = Column(Integer, ForeignKey("materiales.id", ondelete="CASCADE"), nullable=False)
+    precio = Column(Float, nullable=False)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relaciones
+    material = relationship("Material")
+    
+    def __repr__(self):
+        return f"<PrecioUsuario(usuario_id={self.usuario_id}, material_id={self.material_id}, precio={self.precio})>"
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from . import Base
+
+class ReglaBOM(Base):
+    """
+    Regla de cómputo de materiales: para los materiales de una categoría y unidad,
+    cantidad = métrica del plano × factor × (1 + desperdicio_pct / 100)
+    """
+    __tablename__ = "reglas_bom"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    nombre = Column(String(100), nullable=False)
+    categoria_id = Column(Integer, ForeignKey("categorias.id", ondelete="CASCADE"), nullable=False, index=True)
+    unidad_medida = Column(String(20), nullable=False)  # m2, m, unidad, etc.
+    metrica = Column(String(50), nullable=False)  # area_paredes, perimetro_total, conteo:door, etc.
+    factor = Column(Float, nullable=False, default=1.0)
+    desperdicio_pct = Column(Float, nullable=False, default=0.0)
+    redondear_arriba = Column(Boolean, nullable=False, default=False)
+    material_id = Column(Integer, ForeignKey("materiales.id", ondelete="SET NULL"), nullable=True)  # material por defecto
+    activa = Column(Boolean, nullable=False, default=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relaciones
+    categoria = relationship("Categoria")
+    material = relationship("Material")
+    
+    def __repr__(self):
+        return f"<ReglaBOM(id={self.id}, categoria_id={self.categoria_id}, metrica='{self.metrica}', factor={self.factor})>"
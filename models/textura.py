@@ -0,0 +1,31 @@
+"""
+Almacén de texturas direccionado por contenido (ver services/texture_store.py)
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from datetime import datetime
+from . import Base
+
+class Textura(Base):
+    """Un archivo de textura guardado una sola vez, identificado por el SHA-256 de sus bytes"""
+    __tablename__ = "texturas"
+
+    hash = Column(String(64), primary_key=True)
+    extension = Column(String(10), nullable=False)  # ".webp", ".jpg", ...
+    mime_type = Column(String(50), nullable=False)
+    tamano = Column(Integer, nullable=False)  # Bytes
+    ancho = Column(Integer, nullable=True)
+    alto = Column(Integer, nullable=True)
+    origen = Column(String(64), nullable=True, index=True)  # SHA-256 de la imagen subida de la que deriva
+    almacenamiento_url = Column(Text, nullable=False)  # Google Drive o /uploads/textures/...
+    referencias = Column(Integer, nullable=False, default=0)  # Materiales que la usan
+    fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def url(self) -> str:
+        """URL pública estable: el contenido detrás de ella nunca cambia"""
+        return f"/texturas/{self.hash}{self.extension}"
+
+    def __repr__(self):
+        return f"<Textura(hash='{self.hash[:12]}', referencias={self.referencias})>"
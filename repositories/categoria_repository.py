@@ -33,11 +33,15 @@ class CategoriaRepository:
     
     @staticmethod
     def get_all_with_count(db: Session, skip: int = 0, limit: int = None):
-        """Obtener categorías con conteo de materiales"""
+        """Obtener categorías con conteo de materiales (conteos agrupados en una subconsulta)"""
+        conteos = db.query(
+            Material.categoria_id,
+            func.count(Material.id).label('total_materiales')
+        ).group_by(Material.categoria_id).subquery()
         query = db.query(
             Categoria,
-            func.count(Material.id).label('total_materiales')
-        ).outerjoin(Material).group_by(Categoria.id).offset(skip)
+            func.coalesce(conteos.c.total_materiales, 0)
+        ).outerjoin(conteos, conteos.c.categoria_id == Categoria.id).order_by(Categoria.id).offset(skip)
         
         if limit is not None:
             query = query.limit(limit)
@@ -0,0 +1,222 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import and_, delete, distinct, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from models.categoria import Categoria
+from models.costo_modelo3d import CostoModelo3D, CostoModelo3DCategoria
+from models.material import Material
+from models.material_modelo3d import MaterialModelo3D
+from models.modelo3d import Modelo3D
+from models.plano import Plano
+
+TOLERANCIA = 0.001  # Diferencia de costo que el verificador considera inconsistente
+LOTE_MODELOS = 500  # Modelos por sentencia al recalcular (acota el tamaño del IN)
+
+_lineas = MaterialModelo3D.__table__
+_materiales = Material.__table__
+_costos = CostoModelo3D.__table__
+_costos_categoria = CostoModelo3DCategoria.__table__
+
+def _agregado_por_categoria():
+    """SELECT modelo3d_id, categoria_id, líneas y costo desde materiales_modelo3d"""
+    return select(
+        _lineas.c.modelo3d_id,
+        _materiales.c.categoria_id,
+        func.count(_lineas.c.id).label("total_materiales"),
+        func.coalesce(func.sum(_lineas.c.subtotal), 0.0).label("costo_total")
+    ).select_from(
+        _lineas.join(_materiales, _materiales.c.id == _lineas.c.material_id)
+    ).group_by(_lineas.c.modelo3d_id, _materiales.c.categoria_id)
+
+def _agregado_por_modelo():
+    return select(
+        _lineas.c.modelo3d_id,
+        func.count(_lineas.c.id).label("total_materiales"),
+        func.coalesce(func.sum(_lineas.c.subtotal), 0.0).label("costo_total")
+    ).group_by(_lineas.c.modelo3d_id)
+
+class CostoModelo3DRepository:
+    """Lectura y mantenimiento de costos_modelo3d y costos_modelo3d_categoria (sin commit)"""
+
+    @staticmethod
+    def get_by_modelo3d(db: Session, modelo3d_id: int) -> Optional[CostoModelo3D]:
+        """Totales de un modelo 3D (None si no tiene líneas)"""
+        return db.get(CostoModelo3D, modelo3d_id)
+
+    @staticmethod
+    def get_categorias(db: Session, modelo3d_id: int) -> List[dict]:
+        """Costo por categoría de un modelo 3D, de mayor a menor"""
+        filas = db.execute(
+            select(
+                _costos_categoria.c.categoria_id,
+                Categoria.nombre,
+                _costos_categoria.c.total_materiales,
+                _costos_categoria.c.costo_total
+            ).join(Categoria, Categoria.id == _costos_categoria.c.categoria_id)
+            .where(_costos_categoria.c.modelo3d_id == modelo3d_id)
+            .order_by(_costos_categoria.c.costo_total.desc())
+        ).all()
+        return [
+            {"categoria_id": f[0], "nombre": f[1], "total_materiales": f[2], "costo_total": f[3]}
+            for f in filas
+        ]
+
+    @staticmethod
+    def get_by_usuario(db: Session, usuario_id: int) -> List[dict]:
+        """Costo de cada plano con modelo 3D del usuario (planos sin líneas en 0)"""
+        filas = db.execute(
+            select(
+                Plano.id, Plano.nombre, Modelo3D.id,
+                func.coalesce(_costos.c.total_materiales, 0), func.coalesce(_costos.c.costo_total, 0.0)
+            ).join(Modelo3D, Modelo3D.plano_id == Plano.id)
+            .outerjoin(_costos, _costos.c.modelo3d_id == Modelo3D.id)
+            .where(Plano.usuario_id == usuario_id)
+            .order_by(Plano.id)
+        ).all()
+        return [
+            {"plano_id": f[0], "plano_nombre": f[1], "modelo3d_id": f[2], "total_materiales": f[3], "costo_total": f[4]}
+            for f in filas
+        ]
+
+    @staticmethod
+    def get_categorias_by_usuario(db: Session, usuario_id: int) -> List[dict]:
+        """Costo por categoría sumando todos los modelos 3D del usuario"""
+        filas = db.execute(
+            select(
+                _costos_categoria.c.categoria_id,
+                Categoria.nombre,
+                func.sum(_costos_categoria.c.total_materiales),
+                func.sum(_costos_categoria.c.costo_total)
+            ).join(Categoria, Categoria.id == _costos_categoria.c.categoria_id)
+            # IN (modelos del usuario) para buscar por clave primaria en vez de recorrer la tabla
+            .where(_costos_categoria.c.modelo3d_id.in_(
+                select(Modelo3D.id).join(Plano, Plano.id == Modelo3D.plano_id).where(Plano.usuario_id == usuario_id)
+            ))
+            .group_by(_costos_categoria.c.categoria_id, Categoria.nombre)
+            .order_by(func.sum(_costos_categoria.c.costo_total).desc())
+        ).all()
+        return [
+            {"categoria_id": f[0], "nombre": f[1], "total_materiales": f[2], "costo_total": f[3]}
+            for f in filas
+        ]
+
+    @staticmethod
+    def get_modelos_by_materiales(db: Session, material_ids: Iterable[int]) -> Set[int]:
+        """Modelos 3D con alguna línea de los materiales dados"""
+        ids = list(set(material_ids))
+        modelos = set()
+        for inicio in range(0, len(ids), LOTE_MODELOS):
+            modelos.update(db.execute(
+                select(distinct(_lineas.c.modelo3d_id)).where(_lineas.c.material_id.in_(ids[inicio:inicio + LOTE_MODELOS]))
+            ).scalars())
+        return modelos
+
+    @staticmethod
+    def recalcular(db: Session, modelo3d_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Reemplazar los totales de los modelos dados (todos si es None) por el agregado de sus líneas.
+        Devuelve la cantidad de modelos recalculados.
+
+        Antes de borrar se toman las filas de modelo3d con FOR UPDATE, en orden de id: dos
+        transacciones que tocan líneas del mismo modelo se turnan (en READ COMMITTED el DELETE de
+        la segunda no vería la fila que insertó la primera y su INSERT chocaría con la PK) y el
+        orden fijo evita deadlocks entre ellas. SQLite ignora FOR UPDATE: ya serializa las escrituras.
+        """
+        ahora = datetime.utcnow()
+        if modelo3d_ids is None:
+            lotes = [None]
+        else:
+            ids = sorted(set(modelo3d_ids))
+            lotes = [ids[i:i + LOTE_MODELOS] for i in range(0, len(ids), LOTE_MODELOS)]
+
+        recalculados = 0
+        for lote in lotes:
+            bloqueo = select(Modelo3D.id).order_by(Modelo3D.id).with_for_update()
+            if lote is not None:
+                bloqueo = bloqueo.where(Modelo3D.id.in_(lote))
+            db.execute(bloqueo).all()
+            por_categoria = _agregado_por_categoria()
+            borrar_categorias = delete(_costos_categoria)
+            borrar_totales = delete(_costos)
+            if lote is not None:
+                por_categoria = por_categoria.where(_lineas.c.modelo3d_id.in_(lote))
+                borrar_categorias = borrar_categorias.where(_costos_categoria.c.modelo3d_id.in_(lote))
+                borrar_totales = borrar_totales.where(_costos.c.modelo3d_id.in_(lote))
+                recalculados += len(lote)
+            db.execute(borrar_categorias)
+            db.execute(borrar_totales)
+            db.execute(insert(_costos_categoria).from_select(
+                ["modelo3d_id", "categoria_id", "total_materiales", "costo_total"], por_categoria
+            ))
+            # El total del modelo es la suma de sus categorías: ambas tablas siempre coinciden
+            totales = select(
+                _costos_categoria.c.modelo3d_id,
+                func.sum(_costos_categoria.c.total_materiales),
+                func.sum(_costos_categoria.c.costo_total),
+                literal(ahora)
+            ).group_by(_costos_categoria.c.modelo3d_id)
+            if lote is not None:
+                totales = totales.where(_costos_categoria.c.modelo3d_id.in_(lote))
+            resultado = db.execute(insert(_costos).from_select(
+                ["modelo3d_id", "total_materiales", "costo_total", "fecha_actualizacion"], totales
+            ))
+            if lote is None:
+                recalculados = resultado.rowcount
+        return recalculados
+
+    @staticmethod
+    def ajustar_subtotales(db: Session, nuevo_subtotal, *condiciones):
+        """
+        Sumar a los totales la diferencia (nuevo_subtotal - subtotal) de las líneas que cumplen
+        `condiciones`, antes de que un UPDATE masivo las modifique. `nuevo_subtotal` es una
+        expresión SQL sobre materiales_modelo3d y las tablas de las condiciones.
+        """
+        diferencias = select(
+            _lineas.c.modelo3d_id,
+            _materiales.c.categoria_id,
+            func.sum(nuevo_subtotal - _lineas.c.subtotal).label("delta")
+        ).select_from(
+            _lineas.join(_materiales, _materiales.c.id == _lineas.c.material_id)
+        ).where(*condiciones).group_by(_lineas.c.modelo3d_id, _materiales.c.categoria_id).subquery()
+        por_modelo = select(
+            diferencias.c.modelo3d_id, func.sum(diferencias.c.delta).label("delta")
+        ).group_by(diferencias.c.modelo3d_id).subquery()
+
+        db.execute(update(_costos_categoria).where(
+            _costos_categoria.c.modelo3d_id == diferencias.c.modelo3d_id,
+            _costos_categoria.c.categoria_id == diferencias.c.categoria_id
+        ).values(costo_total=_costos_categoria.c.costo_total + diferencias.c.delta))
+        db.execute(update(_costos).where(_costos.c.modelo3d_id == por_modelo.c.modelo3d_id).values(
+            costo_total=_costos.c.costo_total + por_modelo.c.delta,
+            fecha_actualizacion=datetime.utcnow()
+        ))
+
+    @staticmethod
+    def get_inconsistentes(db: Session) -> Dict[str, Set[int]]:
+        """
+        Modelos 3D cuyos totales no coinciden con sus líneas:
+        {"modelos": totales del modelo, "categorias": totales por categoría}
+        """
+        def distintos(agregado, rollup, claves):
+            real = agregado.subquery()
+            union = and_(*(real.c[clave] == rollup.c[clave] for clave in claves))
+            # Agregados sin fila materializada o con valores distintos
+            sin_fila_o_distinto = select(distinct(real.c.modelo3d_id)).select_from(
+                real.outerjoin(rollup, union)
+            ).where(or_(
+                rollup.c.modelo3d_id.is_(None),
+                rollup.c.total_materiales != real.c.total_materiales,
+                func.abs(rollup.c.costo_total - real.c.costo_total) > TOLERANCIA
+            ))
+            # Filas materializadas sin líneas que las respalden
+            sobrantes = select(distinct(rollup.c.modelo3d_id)).select_from(
+                rollup.outerjoin(real, union)
+            ).where(real.c.modelo3d_id.is_(None))
+            return set(db.execute(sin_fila_o_distinto).scalars()) | set(db.execute(sobrantes).scalars())
+
+        return {
+            "modelos": distintos(_agregado_por_modelo(), _costos, ["modelo3d_id"]),
+            "categorias": distintos(_agregado_por_categoria(), _costos_categoria, ["modelo3d_id", "categoria_id"]),
+        }
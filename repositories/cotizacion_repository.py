@@ -2,17 +2,36 @@
 Repositorio para Cotización
 """
 
-from sqlalchemy.orm import Session
-from typing import List, Optional
+import datetime
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session, defer
+from typing import Dict, Iterable, Iterator, List, Optional
 from models.cotizacion import Cotizacion
+from models.cotizacion_item import CotizacionItem
+from models.cotizacion_revision import CotizacionRevision
 from schemas.cotizacion_schemas import CotizacionCreate
 
+# Campos de cotizacion_items que forman una línea de MaterialCotizacion
+ITEM_CAMPOS = (
+    "material_id", "nombre", "categoria", "unidad_medida",
+    "cantidad", "precio_unitario", "descuento_pct", "subtotal"
+)
+
+# Columnas del listado resumido; num_materiales se calcula con una subconsulta sobre cotizacion_items
+RESUMEN_CAMPOS = (
+    "id", "plano_id", "cliente_nombre", "cliente_email",
+    "subtotal", "iva", "total", "fecha_creacion", "num_materiales"
+)
+
+# Columnas adicionales que incluye la exportación NDJSON
+EXPORT_CAMPOS = RESUMEN_CAMPOS + ("cliente_telefono", "descripcion", "fecha_actualizacion")
+
 class CotizacionRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create(self, cotizacion_data: CotizacionCreate, usuario_id: int) -> Cotizacion:
-        """Crear una nueva cotización"""
+    def create(self, cotizacion_data: CotizacionCreate, usuario_id: int, precio) -> Cotizacion:
+        """Crear una nueva cotización con líneas y totales calculados por el motor de precios (CotizacionCalculada)"""
         cotizacion = Cotizacion(
             plano_id=cotizacion_data.plano_id,
             usuario_id=usuario_id,
@@ -20,34 +39,236 @@ class CotizacionRepository:
             cliente_email=cotizacion_data.cliente_email,
             cliente_telefono=cotizacion_data.cliente_telefono,
             descripcion=cotizacion_data.descripcion,
-            materiales=[m.dict() for m in cotizacion_data.materiales],
-            subtotal=cotizacion_data.subtotal,
-            iva=cotizacion_data.iva,
-            total=cotizacion_data.total
+            materiales=[],
+            subtotal=float(precio.subtotal),
+            iva=float(precio.iva),
+            total=float(precio.total)
         )
         
         self.db.add(cotizacion)
+        self.db.flush()
+        self.db.bulk_insert_mappings(CotizacionItem, [
+            {"cotizacion_id": cotizacion.id, "posicion": posicion, **linea}
+            for posicion, linea in enumerate(precio.materiales)
+        ])
         self.db.commit()
         self.db.refresh(cotizacion)
         return cotizacion
 
+    def get_items(self, cotizacion_ids: Iterable[int], campos: tuple = ITEM_CAMPOS) -> Dict[int, List[dict]]:
+        """
+        Líneas de varias cotizaciones con una sola consulta: {cotizacion_id: [líneas en orden]}.
+        Se consulta la tabla con Core (sin entidades ni Row por nombre) y se arman dicts por
+        posición: en páginas grandes la capa ORM triplicaba el costo de leer las líneas.
+        """
+        ids = list(cotizacion_ids)
+        items: Dict[int, List[dict]] = {cotizacion_id: [] for cotizacion_id in ids}
+        if not ids:
+            return items
+        tabla = CotizacionItem.__table__
+        consulta = select(tabla.c.cotizacion_id, *(tabla.c[campo] for campo in campos)).where(
+            tabla.c.cotizacion_id.in_(ids)
+        ).order_by(tabla.c.cotizacion_id, tabla.c.posicion)
+        for cotizacion_id, *valores in self.db.execute(consulta):
+            items[cotizacion_id].append(dict(zip(campos, valores)))
+        return items
+
+    def get_items_by_material(self, cotizacion_id: int, material_ids: Iterable[int]) -> Dict[int, dict]:
+        """Líneas de una cotización para ciertos materiales: {material_id: línea con id y posicion}"""
+        campos = ("id", "posicion") + ITEM_CAMPOS
+        tabla = CotizacionItem.__table__
+        consulta = select(*(tabla.c[campo] for campo in campos)).where(
+            tabla.c.cotizacion_id == cotizacion_id,
+            tabla.c.material_id.in_(list(material_ids))
+        )
+        return {fila.material_id: dict(zip(campos, fila)) for fila in self.db.execute(consulta)}
+
+    def get_item_stats(self, cotizacion_id: int) -> tuple:
+        """(número de líneas, mayor posicion) de una cotización"""
+        return self.db.query(
+            func.count(CotizacionItem.id), func.coalesce(func.max(CotizacionItem.posicion), -1)
+        ).filter(CotizacionItem.cotizacion_id == cotizacion_id).one()
+
+    def apply_item_changes(self, cotizacion_id: int, actualizar: List[dict], insertar: List[dict], eliminar: List[int]):
+        """
+        Aplicar cambios de líneas sin reescribir la cotización completa (sin commit).
+        `actualizar` son dicts con "id" y los campos a cambiar; `eliminar` son ids de cotizacion_items.
+        """
+        if eliminar:
+            self.db.query(CotizacionItem).filter(
+                CotizacionItem.cotizacion_id == cotizacion_id,
+                CotizacionItem.id.in_(eliminar)
+            ).delete(synchronize_session=False)
+        if actualizar:
+            self.db.bulk_update_mappings(CotizacionItem, actualizar)
+        if insertar:
+            self.db.bulk_insert_mappings(CotizacionItem, [{"cotizacion_id": cotizacion_id, **linea} for linea in insertar])
+
+    def clone(self, cotizacion_id: int, usuario_id: int, reemplazos: dict) -> Optional[int]:
+        """
+        Copiar una cotización y sus líneas en el servidor con INSERT … SELECT (las líneas no pasan
+        por Python). `reemplazos` sobrescribe columnas de la copia. Devuelve el id nuevo o None.
+        """
+        tabla = Cotizacion.__table__
+        ahora = datetime.datetime.utcnow()
+        valores = {
+            **{columna.name: columna for columna in tabla.c if columna.name != "id"},
+            "materiales": literal([], tabla.c.materiales.type),
+            "fecha_creacion": literal(ahora, tabla.c.fecha_creacion.type),
+            "fecha_actualizacion": literal(ahora, tabla.c.fecha_actualizacion.type),
+            **{campo: literal(valor, tabla.c[campo].type) for campo, valor in reemplazos.items()},
+        }
+        nuevo_id = self.db.execute(
+            insert(tabla).from_select(
+                list(valores),
+                select(*valores.values()).where(tabla.c.id == cotizacion_id, tabla.c.usuario_id == usuario_id)
+            ).returning(tabla.c.id)
+        ).scalar()
+        if nuevo_id is None:
+            self.db.rollback()
+            return None
+
+        items = CotizacionItem.__table__
+        columnas = [columna.name for columna in items.c if columna.name not in ("id", "cotizacion_id")]
+        self.db.execute(
+            insert(items).from_select(
+                ["cotizacion_id", *columnas],
+                select(literal(nuevo_id), *(items.c[columna] for columna in columnas)).where(
+                    items.c.cotizacion_id == cotizacion_id
+                )
+            )
+        )
+        self.db.commit()
+        return nuevo_id
+
+    def get_resumen_by_id(self, cotizacion_id: int, usuario_id: int) -> Optional[dict]:
+        """Una cotización con los campos de RESUMEN_CAMPOS"""
+        consulta = self._consulta_resumen(RESUMEN_CAMPOS, usuario_id).where(Cotizacion.__table__.c.id == cotizacion_id)
+        fila = self.db.execute(consulta).first()
+        return dict(zip(RESUMEN_CAMPOS, fila)) if fila else None
+
+    def _consulta_resumen(self, campos, usuario_id: int, plano_id: Optional[int] = None):
+        """SELECT solo de columnas (sin entidades ni la columna JSON legada) para listados"""
+        tabla = Cotizacion.__table__
+        items = CotizacionItem.__table__
+        num_materiales = select(func.count()).where(
+            items.c.cotizacion_id == tabla.c.id
+        ).correlate(tabla).scalar_subquery().label("num_materiales")
+        columnas = [num_materiales if campo == "num_materiales" else tabla.c[campo] for campo in campos]
+        consulta = select(*columnas).where(tabla.c.usuario_id == usuario_id)
+        if plano_id is not None:
+            consulta = consulta.where(tabla.c.plano_id == plano_id)
+        return consulta
+
+    def get_resumen(self, usuario_id: int, plano_id: Optional[int] = None, skip: int = 0, limit: int = 100) -> List[dict]:
+        """Página de cotizaciones sin líneas (ver RESUMEN_CAMPOS), de la más reciente a la más antigua"""
+        tabla = Cotizacion.__table__
+        consulta = self._consulta_resumen(RESUMEN_CAMPOS, usuario_id, plano_id).order_by(
+            tabla.c.fecha_creacion.desc(), tabla.c.id.desc()
+        ).offset(skip).limit(limit)
+        return [dict(zip(RESUMEN_CAMPOS, fila)) for fila in self.db.execute(consulta)]
+
+    def count_by_usuario(self, usuario_id: int, plano_id: Optional[int] = None) -> int:
+        """Número de cotizaciones del usuario (opcionalmente de un plano)"""
+        consulta = self.db.query(func.count(Cotizacion.id)).filter(Cotizacion.usuario_id == usuario_id)
+        if plano_id is not None:
+            consulta = consulta.filter(Cotizacion.plano_id == plano_id)
+        return consulta.scalar()
+
+    def iter_export(
+        self, usuario_id: int, plano_id: Optional[int] = None,
+        incluir_materiales: bool = True, batch_size: int = 500
+    ) -> Iterator[List[dict]]:
+        """
+        Recorrer todas las cotizaciones del usuario en lotes (EXPORT_CAMPOS + materiales).
+        Pagina por id (keyset) para que cada lote cueste lo mismo sin importar la profundidad,
+        y carga las líneas de cada lote con una sola consulta.
+        """
+        tabla = Cotizacion.__table__
+        ultimo_id = None
+        while True:
+            consulta = self._consulta_resumen(EXPORT_CAMPOS, usuario_id, plano_id)
+            if ultimo_id is not None:
+                consulta = consulta.where(tabla.c.id < ultimo_id)
+            lote = [
+                dict(zip(EXPORT_CAMPOS, fila))
+                for fila in self.db.execute(consulta.order_by(tabla.c.id.desc()).limit(batch_size))
+            ]
+            if not lote:
+                return
+            if incluir_materiales:
+                items = self.get_items(fila["id"] for fila in lote)
+                for fila in lote:
+                    fila["materiales"] = items[fila["id"]]
+            yield lote
+            if len(lote) < batch_size:
+                return
+            ultimo_id = lote[-1]["id"]
+
+    def exists(self, cotizacion_id: int, usuario_id: int) -> bool:
+        """Verificar que la cotización existe y pertenece al usuario (sin cargar la fila)"""
+        return self.db.query(Cotizacion.id).filter(
+            Cotizacion.id == cotizacion_id,
+            Cotizacion.usuario_id == usuario_id
+        ).first() is not None
+
+    def get_material_usage(self, usuario_id: int, limit: int = 20) -> list:
+        """Materiales más cotizados por el usuario: cotizaciones, cantidad y monto acumulados"""
+        return self.db.query(
+            CotizacionItem.material_id,
+            func.max(CotizacionItem.nombre).label("nombre"),
+            func.max(CotizacionItem.categoria).label("categoria"),
+            func.count(func.distinct(CotizacionItem.cotizacion_id)).label("cotizaciones"),
+            func.sum(CotizacionItem.cantidad).label("cantidad_total"),
+            func.sum(CotizacionItem.subtotal).label("monto_total")
+        ).join(Cotizacion, Cotizacion.id == CotizacionItem.cotizacion_id).filter(
+            Cotizacion.usuario_id == usuario_id
+        ).group_by(CotizacionItem.material_id).order_by(
+            func.sum(CotizacionItem.subtotal).desc()
+        ).limit(limit).all()
+
+    def get_by_material(self, material_id: int, usuario_id: int, skip: int = 0, limit: int = 100) -> list:
+        """Cotizaciones del usuario que incluyen un material, con la cantidad y subtotal de esa línea"""
+        return self.db.query(
+            Cotizacion.id,
+            Cotizacion.plano_id,
+            Cotizacion.cliente_nombre,
+            Cotizacion.total,
+            Cotizacion.fecha_creacion,
+            CotizacionItem.cantidad,
+            CotizacionItem.precio_unitario,
+            CotizacionItem.subtotal
+        ).join(CotizacionItem, CotizacionItem.cotizacion_id == Cotizacion.id).filter(
+            CotizacionItem.material_id == material_id,
+            Cotizacion.usuario_id == usuario_id
+        ).order_by(Cotizacion.fecha_creacion.desc()).offset(skip).limit(limit).all()
+
+    def count_by_material(self, material_id: int, usuario_id: int) -> int:
+        """Número de cotizaciones del usuario que incluyen un material"""
+        return self.db.query(func.count(func.distinct(CotizacionItem.cotizacion_id))).join(
+            Cotizacion, Cotizacion.id == CotizacionItem.cotizacion_id
+        ).filter(
+            CotizacionItem.material_id == material_id,
+            Cotizacion.usuario_id == usuario_id
+        ).scalar()
+
     def get_by_id(self, cotizacion_id: int, usuario_id: int) -> Optional[Cotizacion]:
         """Obtener una cotización por ID"""
-        return self.db.query(Cotizacion).filter(
+        return self.db.query(Cotizacion).options(defer(Cotizacion.materiales)).filter(
             Cotizacion.id == cotizacion_id,
             Cotizacion.usuario_id == usuario_id
         ).first()
 
     def get_by_plano(self, plano_id: int, usuario_id: int) -> List[Cotizacion]:
         """Obtener todas las cotizaciones de un plano"""
-        return self.db.query(Cotizacion).filter(
+        return self.db.query(Cotizacion).options(defer(Cotizacion.materiales)).filter(
             Cotizacion.plano_id == plano_id,
             Cotizacion.usuario_id == usuario_id
         ).order_by(Cotizacion.fecha_creacion.desc()).all()
 
     def get_all_by_usuario(self, usuario_id: int, skip: int = 0, limit: int = 100) -> List[Cotizacion]:
         """Obtener todas las cotizaciones de un usuario"""
-        return self.db.query(Cotizacion).filter(
+        return self.db.query(Cotizacion).options(defer(Cotizacion.materiales)).filter(
             Cotizacion.usuario_id == usuario_id
         ).order_by(Cotizacion.fecha_creacion.desc()).offset(skip).limit(limit).all()
 
@@ -57,6 +278,9 @@ class CotizacionRepository:
         if not cotizacion:
             return False
         
+        # Borrado explícito de líneas y revisiones: no todos los motores aplican ON DELETE CASCADE (SQLite)
+        self.db.query(CotizacionItem).filter(CotizacionItem.cotizacion_id == cotizacion_id).delete(synchronize_session=False)
+        self.db.query(CotizacionRevision).filter(CotizacionRevision.cotizacion_id == cotizacion_id).delete(synchronize_session=False)
         self.db.delete(cotizacion)
         self.db.commit()
         return True
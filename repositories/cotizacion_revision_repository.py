@@ -0,0 +1,43 @@
+"""
+Repositorio para revisiones de Cotización
+"""
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from models.cotizacion_revision import CotizacionRevision
+
+class CotizacionRevisionRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_last_numero(self, cotizacion_id: int) -> int:
+        """Número de la última revisión (0 si la cotización no tiene revisiones)"""
+        return self.db.query(func.coalesce(func.max(CotizacionRevision.numero), 0)).filter(
+            CotizacionRevision.cotizacion_id == cotizacion_id
+        ).scalar()
+
+    def add(self, revision: CotizacionRevision) -> CotizacionRevision:
+        """Agregar una revisión a la sesión (el commit lo hace el servicio junto con las líneas)"""
+        self.db.add(revision)
+        return revision
+
+    def get_by_numero(self, cotizacion_id: int, numero: int) -> Optional[CotizacionRevision]:
+        """Obtener una revisión por número"""
+        return self.db.query(CotizacionRevision).filter(
+            CotizacionRevision.cotizacion_id == cotizacion_id,
+            CotizacionRevision.numero == numero
+        ).first()
+
+    def get_all(self, cotizacion_id: int) -> List[CotizacionRevision]:
+        """Revisiones de una cotización en orden"""
+        return self.db.query(CotizacionRevision).filter(
+            CotizacionRevision.cotizacion_id == cotizacion_id
+        ).order_by(CotizacionRevision.numero).all()
+
+    def get_deltas_after(self, cotizacion_id: int, numero: int) -> List[Tuple[int, dict]]:
+        """(numero, cambios) de las revisiones posteriores a `numero`, de la más nueva a la más antigua"""
+        return self.db.query(CotizacionRevision.numero, CotizacionRevision.cambios).filter(
+            CotizacionRevision.cotizacion_id == cotizacion_id,
+            CotizacionRevision.numero > numero
+        ).order_by(CotizacionRevision.numero.desc()).all()
@@ -1,9 +1,11 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy import insert
 from models.material_modelo3d import MaterialModelo3D
 from models.material import Material
+from models.modelo3d import Modelo3D
+from models.costo_modelo3d import CostoModelo3D
 from schemas.material_modelo3d_schemas import MaterialModelo3DCreate, MaterialModelo3DUpdate
-from typing import Optional, List
+from typing import Iterable, Optional, List, Set
 
 class MaterialModelo3DRepository:
     
@@ -23,22 +25,27 @@ class MaterialModelo3DRepository:
         return material_modelo3d
     
     @staticmethod
-    def create_bulk(db: Session, materiales_data: List[MaterialModelo3DCreate]) -> List[MaterialModelo3D]:
-        """Crear múltiples relaciones material-modelo3d"""
-        materiales = []
-        for material_data in materiales_data:
-            subtotal = material_data.cantidad * material_data.precio_unitario
-            material = MaterialModelo3D(
-                **material_data.model_dump(),
-                subtotal=subtotal
-            )
-            materiales.append(material)
-        
-        db.add_all(materiales)
+    def create_bulk(db: Session, rows: List[dict]) -> List[int]:
+        """
+        Insertar múltiples relaciones con un único INSERT ... RETURNING multi-fila.
+        `rows` ya trae subtotal calculado; devuelve los IDs en el mismo orden.
+        """
+        if not rows:
+            return []
+        ids = db.execute(
+            insert(MaterialModelo3D).returning(MaterialModelo3D.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
         db.commit()
-        for material in materiales:
-            db.refresh(material)
-        return materiales
+        return ids
+    
+    @staticmethod
+    def get_existing_modelo3d_ids(db: Session, modelo3d_ids: Iterable[int]) -> Set[int]:
+        """IDs de modelos 3D existentes entre los dados (una consulta IN)"""
+        ids = set(modelo3d_ids)
+        if not ids:
+            return set()
+        return {row.id for row in db.query(Modelo3D.id).filter(Modelo3D.id.in_(ids))}
     
     @staticmethod
     def get_by_id(db: Session, material_modelo3d_id: int) -> Optional[MaterialModelo3D]:
@@ -98,6 +105,17 @@ class MaterialModelo3DRepository:
         db.commit()
         return True
     
+    @staticmethod
+    def delete_by_modelo3d_and_materials(db: Session, modelo3d_id: int, material_ids: Iterable[int]) -> int:
+        """Eliminar las líneas de un modelo 3D para los materiales dados (sin commit)"""
+        ids = set(material_ids)
+        if not ids:
+            return 0
+        return db.query(MaterialModelo3D).filter(
+            MaterialModelo3D.modelo3d_id == modelo3d_id,
+            MaterialModelo3D.material_id.in_(ids)
+        ).delete(synchronize_session=False)
+    
     @staticmethod
     def delete_by_modelo3d(db: Session, modelo3d_id: int) -> bool:
         """Eliminar todos los materiales de un modelo 3D"""
@@ -107,15 +125,12 @@ class MaterialModelo3DRepository:
     
     @staticmethod
     def get_total_cost(db: Session, modelo3d_id: int) -> float:
-        """Obtener el costo total de materiales de un modelo 3D"""
-        total = db.query(func.sum(MaterialModelo3D.subtotal)).filter(
-            MaterialModelo3D.modelo3d_id == modelo3d_id
-        ).scalar()
+        """Obtener el costo total de materiales de un modelo 3D (desde costos_modelo3d)"""
+        total = db.query(CostoModelo3D.costo_total).filter(CostoModelo3D.modelo3d_id == modelo3d_id).scalar()
         return total if total else 0.0
     
     @staticmethod
     def count_by_modelo3d(db: Session, modelo3d_id: int) -> int:
-        """Contar materiales de un modelo 3D"""
-        return db.query(func.count(MaterialModelo3D.id)).filter(
-            MaterialModelo3D.modelo3d_id == modelo3d_id
-        ).scalar()
+        """Contar materiales de un modelo 3D (desde costos_modelo3d)"""
+        total = db.query(CostoModelo3D.total_materiales).filter(CostoModelo3D.modelo3d_id == modelo3d_id).scalar()
+        return total or 0
@@ -3,7 +3,7 @@ from sqlalchemy import func
 from models.material import Material
 from models.categoria import Categoria
 from schemas.material_schemas import MaterialCreate, MaterialUpdate
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List
 
 class MaterialRepository:
     
@@ -21,6 +21,22 @@ class MaterialRepository:
         """Obtener material por ID"""
         return db.query(Material).filter(Material.id == material_id).first()
     
+    @staticmethod
+    def get_pricing_rows(db: Session, material_ids: Iterable[int]) -> Dict[int, tuple]:
+        """
+        Datos de precio de varios materiales con una sola consulta IN (sin cargar entidades).
+        Devuelve {id: fila} con fila.nombre, fila.precio_base, fila.unidad_medida,
+        fila.categoria_id y fila.categoria_nombre
+        """
+        ids = set(material_ids)
+        if not ids:
+            return {}
+        rows = db.query(
+            Material.id, Material.nombre, Material.precio_base, Material.unidad_medida, Material.categoria_id,
+            Categoria.nombre.label("categoria_nombre")
+        ).join(Categoria, Material.categoria_id == Categoria.id).filter(Material.id.in_(ids))
+        return {row.id: row for row in rows}
+    
     @staticmethod
     def get_by_id_with_categoria(db: Session, material_id: int) -> Optional[Material]:
         """Obtener material por ID con su categoría"""
@@ -56,6 +72,39 @@ class MaterialRepository:
             (Material.codigo.ilike(search))
         ).offset(skip).limit(limit).all()
     
+    @staticmethod
+    def _filtered_query(db: Session, categoria_id: Optional[int] = None, search_term: Optional[str] = None):
+        """Consulta base con los filtros opcionales de categoría y búsqueda"""
+        query = db.query(Material)
+        if categoria_id:
+            query = query.filter(Material.categoria_id == categoria_id)
+        if search_term:
+            search = f"%{search_term}%"
+            query = query.filter(
+                (Material.nombre.ilike(search)) |
+                (Material.descripcion.ilike(search)) |
+                (Material.codigo.ilike(search))
+            )
+        return query
+    
+    @staticmethod
+    def get_filtered(db: Session, categoria_id: Optional[int] = None, search_term: Optional[str] = None,
+                     skip: int = 0, limit: int = 100) -> List[Material]:
+        """
+        Obtener materiales filtrados por categoría y/o búsqueda (sin la categoría:
+        se agrega desde la instantánea de categorías, ver materiales_con_categoria)
+        """
+        return MaterialRepository._filtered_query(db, categoria_id, search_term).order_by(
+            Material.id
+        ).offset(skip).limit(limit).all()
+    
+    @staticmethod
+    def count_filtered(db: Session, categoria_id: Optional[int] = None, search_term: Optional[str] = None) -> int:
+        """Contar materiales que cumplen los mismos filtros que get_filtered"""
+        return MaterialRepository._filtered_query(db, categoria_id, search_term).with_entities(
+            func.count(Material.id)
+        ).scalar()
+    
     @staticmethod
     def update(db: Session, material_id: int, material_data: MaterialUpdate) -> Optional[Material]:
         """Actualizar un material"""
@@ -4,6 +4,7 @@ Repositorio para operaciones CRUD de Plano
 
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
+from datetime import datetime
 from typing import List, Optional
 from models.plano import Plano
 from schemas.plano_schemas import PlanoCreate, PlanoUpdate
@@ -12,17 +13,20 @@ class PlanoRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create(self, plano_data: PlanoCreate, usuario_id: int, url: str = None) -> Plano:
+    def create(self, plano_data: PlanoCreate, usuario_id: int, url: str = None, estado: str = "subido",
+               mime_type: str = None, tamano: int = None) -> Plano:
         """Crear un nuevo plano"""
         plano = Plano(
             usuario_id=usuario_id,
             nombre=plano_data.nombre,
             url=url,
+            mime_type=mime_type,
+            tamano=tamano,
             formato=plano_data.formato,
             tipo_plano=plano_data.tipo_plano,
             descripcion=plano_data.descripcion,
             medidas_extraidas=plano_data.medidas_extraidas,
-            estado="subido"
+            estado=estado
         )
         self.db.add(plano)
         self.db.commit()
@@ -39,6 +43,21 @@ class PlanoRepository:
         """Obtener un plano por ID sin verificar usuario (para acceso público)"""
         return self.db.query(Plano).filter(Plano.id == plano_id).first()
 
+    def get_archivo(self, plano_id: int, usuario_id: int):
+        """Solo las columnas del archivo, verificando el propietario (sin cargar el plano ni su modelo 3D)"""
+        return self.db.query(Plano.nombre, Plano.url, Plano.mime_type, Plano.tamano).filter(
+            and_(Plano.id == plano_id, Plano.usuario_id == usuario_id)
+        ).first()
+
+    def set_archivo_info(self, plano_id: int, mime_type: str, tamano: Optional[int]):
+        """Guardar tipo y tamaño del archivo (no cuenta como modificación del plano)"""
+        self.db.query(Plano).filter(Plano.id == plano_id).update({
+            Plano.mime_type: mime_type,
+            Plano.tamano: tamano,
+            Plano.fecha_actualizacion: Plano.fecha_actualizacion,
+        }, synchronize_session=False)
+        self.db.commit()
+
     def get_all_by_usuario(self, usuario_id: int, skip: int = 0, limit: int = 100) -> List[Plano]:
         """Obtener todos los planos de un usuario con paginación"""
         return self.db.query(Plano).filter(
@@ -89,3 +108,23 @@ class PlanoRepository:
         return self.db.query(Plano).filter(
             and_(Plano.usuario_id == usuario_id, Plano.estado == estado)
         ).all()
+
+    def existe_pendiente(self, url: str) -> bool:
+        """Si hay un plano de subida directa esperando el archivo en esa ubicación"""
+        return self.db.query(Plano.id).filter(
+            and_(Plano.url == url, Plano.estado == "pendiente")
+        ).first() is not None
+
+    def get_pendientes_vencidos(self, antes_de: datetime) -> List[Plano]:
+        """Planos de subida directa sin confirmar registrados antes de `antes_de`"""
+        return self.db.query(Plano).filter(
+            and_(Plano.estado == "pendiente", Plano.fecha_subida < antes_de)
+        ).all()
+
+    def delete_pendiente_vencido(self, plano_id: int, antes_de: datetime) -> bool:
+        """Eliminar el plano solo si sigue sin confirmar (si se confirmó entretanto se conserva)"""
+        borradas = self.db.query(Plano).filter(
+            and_(Plano.id == plano_id, Plano.estado == "pendiente", Plano.fecha_subida < antes_de)
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return borradas > 0
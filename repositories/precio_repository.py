@@ -0,0 +1,77 @@
+"""
+Repositorio para listas de precios por usuario y descuentos por volumen
+"""
+
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional
+from models.precio_usuario import PrecioUsuario
+from models.descuento_volumen import DescuentoVolumen
+from schemas.precio_schemas import PrecioUsuarioItem, DescuentoVolumenCreate
+
+class PrecioRepository:
+    
+    @staticmethod
+    def get_user_prices(db: Session, usuario_id: int, material_ids: Optional[Iterable[int]] = None) -> Dict[int, float]:
+        """{material_id: precio} de la lista del usuario, opcionalmente solo para los materiales dados"""
+        query = db.query(PrecioUsuario.material_id, PrecioUsuario.precio).filter(PrecioUsuario.usuario_id == usuario_id)
+        if material_ids is not None:
+            ids = set(material_ids)
+            if not ids:
+                return {}
+            query = query.filter(PrecioUsuario.material_id.in_(ids))
+        return {row.material_id: row.precio for row in query}
+    
+    @staticmethod
+    def upsert_user_prices(db: Session, usuario_id: int, precios: List[PrecioUsuarioItem]) -> int:
+        """Reemplazar los precios del usuario para los materiales dados (un DELETE y un INSERT masivo)"""
+        por_material = {p.material_id: p.precio for p in precios}
+        if not por_material:
+            return 0
+        db.query(PrecioUsuario).filter(
+            PrecioUsuario.usuario_id == usuario_id,
+            PrecioUsuario.material_id.in_(por_material)
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(PrecioUsuario, [
+            {"usuario_id": usuario_id, "material_id": material_id, "precio": precio}
+            for material_id, precio in por_material.items()
+        ])
+        db.commit()
+        return len(por_material)
+    
+    @staticmethod
+    def delete_user_price(db: Session, usuario_id: int, material_id: int) -> bool:
+        """Quitar un material de la lista de precios del usuario"""
+        eliminados = db.query(PrecioUsuario).filter(
+            PrecioUsuario.usuario_id == usuario_id,
+            PrecioUsuario.material_id == material_id
+        ).delete(synchronize_session=False)
+        db.commit()
+        return eliminados > 0
+    
+    @staticmethod
+    def get_discounts(db: Session, solo_activos: bool = False) -> List[DescuentoVolumen]:
+        """Obtener los descuentos por volumen"""
+        query = db.query(DescuentoVolumen)
+        if solo_activos:
+            query = query.filter(DescuentoVolumen.activo.is_(True))
+        return query.order_by(DescuentoVolumen.cantidad_minima).all()
+    
+    @staticmethod
+    def create_discount(db: Session, descuento_data: DescuentoVolumenCreate) -> DescuentoVolumen:
+        """Crear un descuento por volumen"""
+        descuento = DescuentoVolumen(**descuento_data.model_dump())
+        db.add(descuento)
+        db.commit()
+        db.refresh(descuento)
+        return descuento
+    
+    @staticmethod
+    def delete_discount(db: Session, descuento_id: int) -> bool:
+        """Eliminar un descuento por volumen"""
+        descuento = db.query(DescuentoVolumen).filter(DescuentoVolumen.id == descuento_id).first()
+        if not descuento:
+            return False
+        
+        db.delete(descuento)
+        db.commit()
+        return True
@@ -0,0 +1,55 @@
+from sqlalchemy.orm import Session
+from models.regla_bom import ReglaBOM
+from schemas.regla_bom_schemas import ReglaBOMCreate, ReglaBOMUpdate
+from typing import Optional, List
+
+class ReglaBOMRepository:
+    
+    @staticmethod
+    def create(db: Session, regla_data: ReglaBOMCreate) -> ReglaBOM:
+        """Crear una nueva regla de cómputo"""
+        regla = ReglaBOM(**regla_data.model_dump())
+        db.add(regla)
+        db.commit()
+        db.refresh(regla)
+        return regla
+    
+    @staticmethod
+    def get_by_id(db: Session, regla_id: int) -> Optional[ReglaBOM]:
+        """Obtener regla por ID"""
+        return db.query(ReglaBOM).filter(ReglaBOM.id == regla_id).first()
+    
+    @staticmethod
+    def get_all(db: Session, categoria_id: Optional[int] = None, solo_activas: bool = False) -> List[ReglaBOM]:
+        """Obtener reglas, opcionalmente de una categoría y solo las activas"""
+        query = db.query(ReglaBOM)
+        if categoria_id is not None:
+            query = query.filter(ReglaBOM.categoria_id == categoria_id)
+        if solo_activas:
+            query = query.filter(ReglaBOM.activa.is_(True))
+        return query.order_by(ReglaBOM.categoria_id, ReglaBOM.id).all()
+    
+    @staticmethod
+    def update(db: Session, regla_id: int, regla_data: ReglaBOMUpdate) -> Optional[ReglaBOM]:
+        """Actualizar una regla"""
+        regla = ReglaBOMRepository.get_by_id(db, regla_id)
+        if not regla:
+            return None
+        
+        for key, value in regla_data.model_dump(exclude_unset=True).items():
+            setattr(regla, key, value)
+        
+        db.commit()
+        db.refresh(regla)
+        return regla
+    
+    @staticmethod
+    def delete(db: Session, regla_id: int) -> bool:
+        """Eliminar una regla"""
+        regla = ReglaBOMRepository.get_by_id(db, regla_id)
+        if not regla:
+            return False
+        
+        db.delete(regla)
+        db.commit()
+        return True
@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from models.textura import Textura
+
+class TexturaRepository:
+    """Filas de texturas; el conteo de referencias no hace commit (lo hace la transacción del material)"""
+
+    @staticmethod
+    def get(db: Session, hash: str) -> Optional[Textura]:
+        return db.get(Textura, hash)
+
+    @staticmethod
+    def get_by_origen(db: Session, origen: str) -> List[Textura]:
+        """Derivados de una imagen subida, del más grande al más chico"""
+        return db.query(Textura).filter(Textura.origen == origen).order_by(Textura.ancho.desc(), Textura.alto.desc()).all()
+
+    @staticmethod
+    def create(db: Session, textura: Textura) -> Textura:
+        db.add(textura)
+        db.commit()
+        return textura
+
+    @staticmethod
+    def touch(db: Session, hash: str):
+        """Reiniciar el plazo de gracia de una textura sin referencias que se va a volver a usar"""
+        db.execute(update(Textura).where(Textura.hash == hash, Textura.referencias <= 0).values(
+            fecha_actualizacion=datetime.utcnow()
+        ))
+        db.commit()
+
+    @staticmethod
+    def set_origen(db: Session, origen: str, hashes: Iterable[str]):
+        """Asociar derivados a la imagen de la que salieron (un derivado compartido conserva su primer origen)"""
+        db.execute(update(Textura).where(Textura.hash.in_(list(hashes)), Textura.origen.is_(None)).values(origen=origen))
+        db.commit()
+
+    @staticmethod
+    def sumar_referencias(db: Session, deltas: Dict[str, int]):
+        ahora = datetime.utcnow()
+        for hash, delta in deltas.items():
+            if delta:
+                db.execute(update(Textura).where(Textura.hash == hash).values(
+                    referencias=Textura.referencias + delta, fecha_actualizacion=ahora
+                ))
+
+    @staticmethod
+    def get_huerfanas(db: Session, antes_de: datetime) -> List[Textura]:
+        """Texturas sin referencias desde antes de `antes_de`"""
+        return db.query(Textura).filter(Textura.referencias <= 0, Textura.fecha_actualizacion < antes_de).all()
+
+    @staticmethod
+    def delete_huerfana(db: Session, hash: str, antes_de: datetime) -> bool:
+        """Borrar la fila solo si sigue sin referencias (una subida concurrente pudo volver a usarla)"""
+        resultado = db.execute(delete(Textura).where(
+            Textura.hash == hash, Textura.referencias <= 0, Textura.fecha_actualizacion < antes_de
+        ))
+        db.commit()
+        return resultado.rowcount == 1
+
+    @staticmethod
+    def get_ubicacion(db: Session, hash: str) -> Optional[tuple]:
+        """(extension, mime_type, almacenamiento_url) sin cargar la entidad"""
+        return db.execute(
+            select(Textura.extension, Textura.mime_type, Textura.almacenamiento_url).where(Textura.hash == hash)
+        ).first()
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
@@ -6,6 +7,7 @@ from repositories.categoria_repository import CategoriaRepository
 from schemas.categoria_schemas import CategoriaCreate, CategoriaUpdate, CategoriaResponse
 from schemas.response_schemas import SuccessResponse, ErrorResponse
 from models.usuario import Usuario
+from services.material_catalog_service import categoria_snapshot
 
 router = APIRouter(
     prefix="/categorias",
@@ -49,33 +51,40 @@ def create_categoria(
     "/",
     response_model=SuccessResponse,
     summary="Listar todas las categorías",
-    description="Obtiene todas las categorías con conteo de materiales"
+    description="""
+    Obtiene todas las categorías con conteo de materiales.
+    
+    Se sirve desde una instantánea en memoria invalidada al modificar materiales o categorías.
+    La respuesta incluye `ETag`; reenviarlo en `If-None-Match` devuelve 304.
+    """
 )
 def get_categorias(
+    request: Request,
     db: Session = Depends(get_db)
 ):
-    categorias = CategoriaRepository.get_all_with_count(db, skip=0, limit=None)
-    total = CategoriaRepository.count(db)
+    snapshot, hit = categoria_snapshot.get(db)
     
-    return SuccessResponse(
-        message="Categorías obtenidas exitosamente",
-        data={
-            "categorias": categorias,
-            "total": total
-        }
-    )
+    headers = {
+        "ETag": snapshot.page.etag,
+        "Cache-Control": "no-cache",
+        "X-Catalog-Cache": "hit" if hit else "miss"
+    }
+    if request.headers.get("if-none-match") == snapshot.page.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=snapshot.page.body, media_type="application/json", headers=headers)
 
 @router.get(
     "/{categoria_id}",
     response_model=SuccessResponse,
     summary="Obtener categoría por ID",
-    description="Obtiene los detalles de una categoría específica"
+    description="Obtiene los detalles de una categoría específica y su cantidad de materiales"
 )
 def get_categoria(
     categoria_id: int,
     db: Session = Depends(get_db)
 ):
-    categoria = CategoriaRepository.get_by_id(db, categoria_id)
+    categoria = categoria_snapshot.get(db)[0].categorias.get(categoria_id)
     if not categoria:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -85,13 +94,14 @@ def get_categoria(
     return SuccessResponse(
         message="Categoría obtenida exitosamente",
         data={
-            "id": categoria.id,
-            "codigo": categoria.codigo,
-            "nombre": categoria.nombre,
-            "descripcion": categoria.descripcion,
-            "imagen_url": categoria.imagen_url,
-            "fecha_creacion": categoria.fecha_creacion.isoformat(),
-            "fecha_actualizacion": categoria.fecha_actualizacion.isoformat()
+            "id": categoria["id"],
+            "codigo": categoria["codigo"],
+            "nombre": categoria["nombre"],
+            "descripcion": categoria["descripcion"],
+            "imagen_url": categoria["imagen_url"],
+            "fecha_creacion": categoria["fecha_creacion"].isoformat(),
+            "fecha_actualizacion": categoria["fecha_actualizacion"].isoformat() if categoria["fecha_actualizacion"] else None,
+            "total_materiales": categoria["total_materiales"]
         }
     )
 
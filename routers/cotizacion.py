@@ -2,19 +2,54 @@
 Router para endpoints de Cotización
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 
 from database import get_db
 from middleware.auth_middleware import get_current_user
 from repositories.cotizacion_repository import CotizacionRepository
+from repositories.cotizacion_revision_repository import CotizacionRevisionRepository
 from repositories.plano_repository import PlanoRepository
-from schemas.cotizacion_schemas import CotizacionCreate, CotizacionResponse, MaterialCotizacion
+from schemas.cotizacion_schemas import (
+    CotizacionCloneRequest, CotizacionCreate, CotizacionPreviewRequest, CotizacionResponse,
+    CotizacionRevisionCreate, MaterialCotizacion
+)
 from schemas.response_schemas import SuccessResponse
+from services.cotizacion_documento_service import FORMATOS, RenderNoDisponible, cotizacion_documentos
+from services.cotizacion_revision_service import CambiosInvalidos, crear_revision, materializar, revision_cache
+from services.pricing_service import MaterialesNoEncontrados, cotizar, cotizar_preview
 
 router = APIRouter(prefix="/cotizaciones", tags=["cotizaciones"])
 
+def _lineas(items: List[dict]) -> List[MaterialCotizacion]:
+    """Convertir las líneas de cotizacion_items al schema de respuesta"""
+    return [MaterialCotizacion(**item) for item in items]
+
+def _respuesta(cotizacion, items: List[dict]) -> CotizacionResponse:
+    """Armar CotizacionResponse desde la fila (sin la columna JSON legada) y sus líneas"""
+    return CotizacionResponse(
+        id=cotizacion.id,
+        plano_id=cotizacion.plano_id,
+        usuario_id=cotizacion.usuario_id,
+        cliente_nombre=cotizacion.cliente_nombre,
+        cliente_email=cotizacion.cliente_email,
+        cliente_telefono=cotizacion.cliente_telefono,
+        descripcion=cotizacion.descripcion,
+        materiales=_lineas(items),
+        subtotal=cotizacion.subtotal,
+        iva=cotizacion.iva,
+        total=cotizacion.total,
+        fecha_creacion=cotizacion.fecha_creacion,
+        fecha_actualizacion=cotizacion.fecha_actualizacion
+    )
+
 @router.post("/", response_model=CotizacionResponse)
 async def create_cotizacion(
     cotizacion_data: CotizacionCreate,
@@ -29,27 +64,38 @@ async def create_cotizacion(
     if not plano:
         raise HTTPException(status_code=404, detail="Plano no encontrado")
     
+    # Calcular precios en el servidor (los totales del cliente se ignoran)
+    lineas = [(m.material_id, m.cantidad) for m in cotizacion_data.materiales]
+    try:
+        precio = cotizar(db, current_user.id, lineas)
+    except MaterialesNoEncontrados as e:
+        raise HTTPException(status_code=400, detail=f"Materiales no encontrados: {e.material_ids}")
+    
     # Crear cotización
     cotizacion_repo = CotizacionRepository(db)
-    cotizacion = cotizacion_repo.create(cotizacion_data, current_user.id)
+    cotizacion = cotizacion_repo.create(cotizacion_data, current_user.id, precio)
     
-    # Convertir materiales de JSON a objetos Pydantic
-    materiales_parsed = [MaterialCotizacion(**m) for m in cotizacion.materiales]
+    return _respuesta(cotizacion, precio.materiales)
+
+@router.post("/preview", response_model=SuccessResponse)
+async def preview_cotizacion(
+    preview_data: CotizacionPreviewRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Calcular líneas, descuentos, IVA y total sin guardar la cotización.
+    Usa precios cacheados por unos segundos (PRICE_CACHE_TTL_SECONDS).
+    """
+    lineas = [(m.material_id, m.cantidad) for m in preview_data.materiales]
+    try:
+        precio = cotizar_preview(db, current_user.id, lineas)
+    except MaterialesNoEncontrados as e:
+        raise HTTPException(status_code=400, detail=f"Materiales no encontrados: {e.material_ids}")
     
-    return CotizacionResponse(
-        id=cotizacion.id,
-        plano_id=cotizacion.plano_id,
-        usuario_id=cotizacion.usuario_id,
-        cliente_nombre=cotizacion.cliente_nombre,
-        cliente_email=cotizacion.cliente_email,
-        cliente_telefono=cotizacion.cliente_telefono,
-        descripcion=cotizacion.descripcion,
-        materiales=materiales_parsed,
-        subtotal=cotizacion.subtotal,
-        iva=cotizacion.iva,
-        total=cotizacion.total,
-        fecha_creacion=cotizacion.fecha_creacion,
-        fecha_actualizacion=cotizacion.fecha_actualizacion
+    return SuccessResponse(
+        message="Precio calculado exitosamente",
+        data={"materiales": precio.materiales, **precio.totales()}
     )
 
 @router.get("/plano/{plano_id}", response_model=List[CotizacionResponse])
@@ -69,28 +115,122 @@ async def get_cotizaciones_by_plano(
     # Obtener cotizaciones
     cotizacion_repo = CotizacionRepository(db)
     cotizaciones = cotizacion_repo.get_by_plano(plano_id, current_user.id)
+    items = cotizacion_repo.get_items(c.id for c in cotizaciones)
+    
+    return [_respuesta(cotizacion, items[cotizacion.id]) for cotizacion in cotizaciones]
+
+@router.get("/resumen", response_model=SuccessResponse)
+async def get_resumen_cotizaciones(
+    plano_id: Optional[int] = Query(None, description="Filtrar por plano"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Listado liviano de cotizaciones: id, plano, cliente, totales, fecha y número de líneas.
+    Las líneas se piden aparte con GET /cotizaciones/{id}/materiales.
+    """
+    cotizacion_repo = CotizacionRepository(db)
+    
+    return SuccessResponse(
+        message="Cotizaciones obtenidas exitosamente",
+        data={
+            "total": cotizacion_repo.count_by_usuario(current_user.id, plano_id),
+            "skip": skip,
+            "limit": limit,
+            "cotizaciones": cotizacion_repo.get_resumen(current_user.id, plano_id, skip, limit)
+        }
+    )
+
+def _ndjson(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_cotizaciones(
+    plano_id: Optional[int] = Query(None, description="Filtrar por plano"),
+    incluir_materiales: bool = Query(True, description="Incluir las líneas de cada cotización"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Exportar todas las cotizaciones del usuario como NDJSON (una cotización por línea).
+    Se genera por lotes mientras se envía, sin armar la respuesta completa en memoria.
+    """
+    cotizacion_repo = CotizacionRepository(db)
+    
+    def generar():
+        for lote in cotizacion_repo.iter_export(current_user.id, plano_id, incluir_materiales):
+            yield "".join(json.dumps(fila, ensure_ascii=False, default=_ndjson) + "\n" for fila in lote)
+    
+    return StreamingResponse(
+        generar(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="cotizaciones.ndjson"'}
+    )
+
+@router.get("/analytics/materiales", response_model=SuccessResponse)
+async def get_uso_materiales(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Materiales más cotizados por el usuario (por monto), con número de cotizaciones y cantidades"""
+    cotizacion_repo = CotizacionRepository(db)
+    uso = cotizacion_repo.get_material_usage(current_user.id, limit)
     
-    # Convertir a response
-    result = []
-    for cotizacion in cotizaciones:
-        materiales_parsed = [MaterialCotizacion(**m) for m in cotizacion.materiales]
-        result.append(CotizacionResponse(
-            id=cotizacion.id,
-            plano_id=cotizacion.plano_id,
-            usuario_id=cotizacion.usuario_id,
-            cliente_nombre=cotizacion.cliente_nombre,
-            cliente_email=cotizacion.cliente_email,
-            cliente_telefono=cotizacion.cliente_telefono,
-            descripcion=cotizacion.descripcion,
-            materiales=materiales_parsed,
-            subtotal=cotizacion.subtotal,
-            iva=cotizacion.iva,
-            total=cotizacion.total,
-            fecha_creacion=cotizacion.fecha_creacion,
-            fecha_actualizacion=cotizacion.fecha_actualizacion
-        ))
-    
-    return result
+    return SuccessResponse(
+        message="Uso de materiales obtenido exitosamente",
+        data={
+            "materiales": [
+                {
+                    "material_id": fila.material_id,
+                    "nombre": fila.nombre,
+                    "categoria": fila.categoria,
+                    "cotizaciones": fila.cotizaciones,
+                    "cantidad_total": round(fila.cantidad_total or 0, 3),
+                    "monto_total": round(fila.monto_total or 0, 2)
+                }
+                for fila in uso
+            ]
+        }
+    )
+
+@router.get("/analytics/materiales/{material_id}", response_model=SuccessResponse)
+async def get_cotizaciones_por_material(
+    material_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Cotizaciones del usuario que incluyen un material"""
+    cotizacion_repo = CotizacionRepository(db)
+    filas = cotizacion_repo.get_by_material(material_id, current_user.id, skip, limit)
+    total = cotizacion_repo.count_by_material(material_id, current_user.id)
+    
+    return SuccessResponse(
+        message="Cotizaciones obtenidas exitosamente",
+        data={
+            "material_id": material_id,
+            "total": total,
+            "cotizaciones": [
+                {
+                    "id": fila.id,
+                    "plano_id": fila.plano_id,
+                    "cliente_nombre": fila.cliente_nombre,
+                    "total": fila.total,
+                    "fecha_creacion": fila.fecha_creacion.isoformat(),
+                    "cantidad": fila.cantidad,
+                    "precio_unitario": fila.precio_unitario,
+                    "subtotal": fila.subtotal
+                }
+                for fila in filas
+            ]
+        }
+    )
 
 @router.get("/{cotizacion_id}", response_model=CotizacionResponse)
 async def get_cotizacion(
@@ -105,22 +245,196 @@ async def get_cotizacion(
     if not cotizacion:
         raise HTTPException(status_code=404, detail="Cotización no encontrada")
     
-    materiales_parsed = [MaterialCotizacion(**m) for m in cotizacion.materiales]
+    return _respuesta(cotizacion, cotizacion_repo.get_items([cotizacion.id])[cotizacion.id])
+
+@router.get("/{cotizacion_id}/materiales", response_model=SuccessResponse)
+async def get_materiales_cotizacion(
+    cotizacion_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Líneas de una cotización (complemento de GET /cotizaciones/resumen)"""
+    cotizacion_repo = CotizacionRepository(db)
     
-    return CotizacionResponse(
-        id=cotizacion.id,
-        plano_id=cotizacion.plano_id,
-        usuario_id=cotizacion.usuario_id,
-        cliente_nombre=cotizacion.cliente_nombre,
-        cliente_email=cotizacion.cliente_email,
-        cliente_telefono=cotizacion.cliente_telefono,
-        descripcion=cotizacion.descripcion,
-        materiales=materiales_parsed,
-        subtotal=cotizacion.subtotal,
-        iva=cotizacion.iva,
-        total=cotizacion.total,
-        fecha_creacion=cotizacion.fecha_creacion,
-        fecha_actualizacion=cotizacion.fecha_actualizacion
+    if not cotizacion_repo.exists(cotizacion_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Cotización no encontrada")
+    
+    return SuccessResponse(
+        message="Materiales obtenidos exitosamente",
+        data={
+            "cotizacion_id": cotizacion_id,
+            "materiales": cotizacion_repo.get_items([cotizacion_id])[cotizacion_id]
+        }
+    )
+
+async def _documento(cotizacion_id: int, formato: str, request: Request, db: Session, current_user) -> Response:
+    """Responder el documento de la cotización, con ETag por versión (fecha_actualizacion)"""
+    cotizacion_repo = CotizacionRepository(db)
+    cotizacion = await run_in_threadpool(cotizacion_repo.get_by_id, cotizacion_id, current_user.id)
+    
+    if not cotizacion:
+        raise HTTPException(status_code=404, detail="Cotización no encontrada")
+    
+    etag = f'"cot-{cotizacion.id}-{formato}-{cotizacion.fecha_actualizacion.timestamp():.6f}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        documento = await cotizacion_documentos.obtener(
+            db, cotizacion, formato, lambda: cotizacion_repo.get_items([cotizacion.id])[cotizacion.id]
+        )
+    except RenderNoDisponible as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        print(f"❌ Error generando {formato} de la cotización {cotizacion_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error generando el documento: {str(e)}")
+    
+    media_type, _ = FORMATOS[formato]
+    headers["Content-Disposition"] = f'inline; filename="cotizacion_{cotizacion.id}.{formato}"'
+    return Response(content=documento, media_type=media_type, headers=headers)
+
+@router.get("/{cotizacion_id}/pdf", response_class=Response)
+async def get_cotizacion_pdf(
+    cotizacion_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Cotización en PDF (cliente, miniatura del plano, materiales con imagen y totales).
+    Se genera en el servidor y se guarda en caché hasta que la cotización cambie.
+    """
+    return await _documento(cotizacion_id, "pdf", request, db, current_user)
+
+@router.get("/{cotizacion_id}/xlsx", response_class=Response)
+async def get_cotizacion_xlsx(
+    cotizacion_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Cotización como planilla Excel (XLSX), con la misma caché que el PDF"""
+    return await _documento(cotizacion_id, "xlsx", request, db, current_user)
+
+@router.post("/{cotizacion_id}/revisions", response_model=SuccessResponse)
+async def create_revision(
+    cotizacion_id: int,
+    revision_data: CotizacionRevisionCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Revisar una cotización enviando solo las líneas que cambian (cantidad 0 elimina la línea).
+    Las líneas nuevas o modificadas se cotizan con los precios vigentes; el resto no se toca.
+    """
+    cotizacion_repo = CotizacionRepository(db)
+    cotizacion = cotizacion_repo.get_by_id(cotizacion_id, current_user.id)
+    
+    if not cotizacion:
+        raise HTTPException(status_code=404, detail="Cotización no encontrada")
+    
+    cambios = [(c.material_id, c.cantidad) for c in revision_data.cambios]
+    try:
+        revision = crear_revision(db, cotizacion, current_user.id, cambios, revision_data.nota)
+    except CambiosInvalidos as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MaterialesNoEncontrados as e:
+        raise HTTPException(status_code=400, detail=f"Materiales no encontrados: {e.material_ids}")
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="La cotización fue revisada al mismo tiempo; reintenta")
+    
+    return SuccessResponse(
+        message="Revisión creada exitosamente",
+        data={
+            "cotizacion_id": cotizacion_id,
+            "numero": revision.numero,
+            "cambios": [cambio["despues"] or {"material_id": cambio["material_id"], "eliminado": True}
+                        for cambio in revision.cambios["lineas"]],
+            "subtotal": revision.subtotal,
+            "iva": revision.iva,
+            "total": revision.total
+        }
+    )
+
+@router.get("/{cotizacion_id}/revisions", response_model=SuccessResponse)
+async def get_revisions(
+    cotizacion_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Historial de revisiones de una cotización (sin las líneas)"""
+    if not CotizacionRepository(db).exists(cotizacion_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Cotización no encontrada")
+    
+    revisiones = CotizacionRevisionRepository(db).get_all(cotizacion_id)
+    
+    return SuccessResponse(
+        message="Revisiones obtenidas exitosamente",
+        data=[
+            {
+                "numero": r.numero,
+                "nota": r.nota,
+                "lineas_cambiadas": len(r.cambios["lineas"]),
+                "subtotal": r.subtotal,
+                "iva": r.iva,
+                "total": r.total,
+                "fecha_creacion": r.fecha_creacion.isoformat()
+            }
+            for r in revisiones
+        ]
+    )
+
+@router.get("/{cotizacion_id}/revisions/{numero}", response_model=SuccessResponse)
+async def get_revision(
+    cotizacion_id: int,
+    numero: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Cotización completa tal como quedó en una revisión (0 = versión original)"""
+    cotizacion_repo = CotizacionRepository(db)
+    cotizacion = cotizacion_repo.get_by_id(cotizacion_id, current_user.id)
+    
+    if not cotizacion:
+        raise HTTPException(status_code=404, detail="Cotización no encontrada")
+    
+    version = materializar(db, cotizacion, numero) if numero >= 0 else None
+    if version is None:
+        raise HTTPException(status_code=404, detail="Revisión no encontrada")
+    
+    return SuccessResponse(
+        message="Revisión obtenida exitosamente",
+        data={"cotizacion_id": cotizacion_id, **version}
+    )
+
+@router.post("/{cotizacion_id}/clone", response_model=SuccessResponse)
+async def clone_cotizacion(
+    cotizacion_id: int,
+    clone_data: Optional[CotizacionCloneRequest] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Copiar una cotización con todas sus líneas en el servidor (INSERT … SELECT), opcionalmente
+    con otro cliente, plano o descripción. La copia empieza sin revisiones.
+    """
+    reemplazos = clone_data.model_dump(exclude_none=True) if clone_data else {}
+    if reemplazos.get("plano_id") is not None:
+        plano = PlanoRepository(db).get_by_id(reemplazos["plano_id"], current_user.id)
+        if not plano:
+            raise HTTPException(status_code=404, detail="Plano no encontrado")
+    
+    cotizacion_repo = CotizacionRepository(db)
+    nuevo_id = cotizacion_repo.clone(cotizacion_id, current_user.id, reemplazos)
+    
+    if nuevo_id is None:
+        raise HTTPException(status_code=404, detail="Cotización no encontrada")
+    
+    return SuccessResponse(
+        message="Cotización copiada exitosamente",
+        data=cotizacion_repo.get_resumen_by_id(nuevo_id, current_user.id)
     )
 
 @router.get("/", response_model=List[CotizacionResponse])
@@ -130,30 +444,12 @@ async def get_cotizaciones_usuario(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """Obtener todas las cotizaciones del usuario"""
+    """Obtener todas las cotizaciones del usuario con sus líneas (para listados grandes usar /resumen o /export)"""
     cotizacion_repo = CotizacionRepository(db)
     cotizaciones = cotizacion_repo.get_all_by_usuario(current_user.id, skip, limit)
+    items = cotizacion_repo.get_items(c.id for c in cotizaciones)
     
-    result = []
-    for cotizacion in cotizaciones:
-        materiales_parsed = [MaterialCotizacion(**m) for m in cotizacion.materiales]
-        result.append(CotizacionResponse(
-            id=cotizacion.id,
-            plano_id=cotizacion.plano_id,
-            usuario_id=cotizacion.usuario_id,
-            cliente_nombre=cotizacion.cliente_nombre,
-            cliente_email=cotizacion.cliente_email,
-            cliente_telefono=cotizacion.cliente_telefono,
-            descripcion=cotizacion.descripcion,
-            materiales=materiales_parsed,
-            subtotal=cotizacion.subtotal,
-            iva=cotizacion.iva,
-            total=cotizacion.total,
-            fecha_creacion=cotizacion.fecha_creacion,
-            fecha_actualizacion=cotizacion.fecha_actualizacion
-        ))
-    
-    return result
+    return [_respuesta(cotizacion, items[cotizacion.id]) for cotizacion in cotizaciones]
 
 @router.delete("/{cotizacion_id}", response_model=SuccessResponse)
 async def delete_cotizacion(
@@ -168,5 +464,8 @@ async def delete_cotizacion(
     if not success:
         raise HTTPException(status_code=404, detail="Cotización no encontrada")
     
+    revision_cache.invalidate(cotizacion_id)
+    cotizacion_documentos.cache.invalidate(cotizacion_id)
+    
     return SuccessResponse(message="Cotización eliminada exitosamente")
 
@@ -1,7 +1,6 @@
 # routers/google_auth.py
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import RedirectResponse
-from google_auth_oauthlib.flow import Flow  # Import correcto para aplicación web
 from config import settings
 
 router = APIRouter(prefix="/auth/google", tags=["google-auth"])
@@ -9,6 +8,7 @@ router = APIRouter(prefix="/auth/google", tags=["google-auth"])
 @router.get("/login")
 async def google_login():
     """Iniciar flujo de autenticación con Google"""
+    from google_auth_oauthlib.flow import Flow  # Import diferido: solo se usa en este flujo
     try:
         # Crear flujo OAuth2 para aplicación web
         flow = Flow.from_client_secrets_file(
@@ -28,6 +28,7 @@ async def google_login():
 @router.get("/callback")
 async def google_callback(code: str = None, state: str = None):
     """Manejar callback de Google OAuth"""
+    from google_auth_oauthlib.flow import Flow
     try:
         if not code:
             raise HTTPException(status_code=400, detail="Código de autorización no recibido")
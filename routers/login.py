@@ -1,34 +1,82 @@
 # routers/login.py
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from jose import jwt
 from datetime import datetime, timedelta
-import hashlib
 from database import get_db
 from repositories.user_repository import get_user_by_username
+from models.usuario import Usuario
 from config import settings
 from schemas import LoginRequest, TokenResponse, ErrorResponse
+from services.password_service import verify_password_async, hash_password_async, needs_rehash
+from services.rate_limiter import RateLimiter
 
 router = APIRouter(
     prefix="/auth",
     tags=["Autenticación"],
     responses={
         401: {"model": ErrorResponse, "description": "Credenciales incorrectas"},
-        422: {"model": ErrorResponse, "description": "Error de validación"}
+        422: {"model": ErrorResponse, "description": "Error de validación"},
+        429: {"model": ErrorResponse, "description": "Demasiados intentos de inicio de sesión"}
     }
 )
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
+# Limitadores en memoria (por proceso): frenan ráfagas de credential stuffing antes de gastar CPU en bcrypt
+ip_rate_limiter = RateLimiter(per_minute=settings.LOGIN_RATE_LIMIT_IP)
+account_rate_limiter = RateLimiter(per_minute=settings.LOGIN_RATE_LIMIT_ACCOUNT)
 
-def authenticate_user(db: Session, correo: str, contrasena: str):
+def get_client_ip(request: Request) -> str:
+    """
+    IP del cliente. X-Forwarded-For lo escribe el cliente y cada proxy agrega al final la IP
+    de quien le habló: solo son confiables los TRUSTED_PROXY_HOPS saltos de la derecha, y la
+    IP del cliente es la que agregó el proxy más externo. Sin proxies configurados se usa la
+    dirección de la conexión (tomar el primer salto permitiría esquivar el límite por IP).
+    """
+    saltos = settings.TRUSTED_PROXY_HOPS
+    forwarded = request.headers.get("x-forwarded-for")
+    if saltos > 0 and forwarded:
+        ips = [ip.strip() for ip in forwarded.split(",") if ip.strip()]
+        if len(ips) >= saltos:
+            return ips[-saltos]
+    return request.client.host if request.client else "desconocida"
+
+def check_rate_limit(ip: str, correo: str):
+    """Lanzar 429 si la IP o la cuenta superaron su cuota de intentos"""
+    for limiter, key in ((ip_rate_limiter, ip), (account_rate_limiter, correo.lower())):
+        allowed, retry_after = limiter.hit(key)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiados intentos de inicio de sesión. Intenta nuevamente más tarde",
+                headers={"Retry-After": str(int(retry_after) + 1)}
+            )
+
+def _buscar_usuario(db: Session, correo: str):
     user = get_user_by_username(db, correo)
-    if not user:
-        return False
+    if user:
+        # Liberar la conexión al pool antes de esperar a bcrypt (~250 ms)
+        db.expunge(user)
+    db.rollback()
+    return user
+
+def _guardar_hash(db: Session, usuario_id: int, nuevo_hash: str):
+    db.query(Usuario).filter(Usuario.id == usuario_id).update({Usuario.contrasena: nuevo_hash})
+    db.commit()
+
+async def authenticate_user(db: Session, correo: str, contrasena: str):
+    # Las consultas son síncronas: van al threadpool para no bloquear el event loop
+    user = await run_in_threadpool(_buscar_usuario, db, correo)
     
-    if not verify_password(contrasena, user.contrasena):
+    # La verificación corre en el pool de hashing; sin usuario se verifica contra un hash ficticio
+    if not await verify_password_async(contrasena, user.contrasena if user else None):
         return False
+    
+    # Migrar hashes SHA-256 heredados (o con pocas rondas) a bcrypt tras un login exitoso
+    if needs_rehash(user.contrasena):
+        nuevo_hash = await hash_password_async(contrasena)
+        await run_in_threadpool(_guardar_hash, db, user.id, nuevo_hash)
+        user.contrasena = nuevo_hash
     return user
 
 def create_token(data: dict):
@@ -63,7 +111,7 @@ def create_token(data: dict):
         }
     }
 )
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, http_request: Request, db: Session = Depends(get_db)):
     """
     Iniciar sesión de usuario
     
@@ -71,8 +119,11 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
     - **contrasena**: Contraseña del usuario
     
     Devuelve un token JWT que debe ser incluido en el header Authorization para endpoints protegidos.
+    Los intentos están limitados por IP y por cuenta (HTTP 429 con `Retry-After`).
     """
-    user = authenticate_user(db, request.correo, request.contrasena)
+    check_rate_limit(get_client_ip(http_request), request.correo)
+    
+    user = await authenticate_user(db, request.correo, request.contrasena)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
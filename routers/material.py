@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, UploadFile, File, Form, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from database import get_db
@@ -6,9 +7,14 @@ from repositories.material_repository import MaterialRepository
 from repositories.categoria_repository import CategoriaRepository
 from schemas.material_schemas import MaterialCreate, MaterialUpdate, MaterialResponse, MaterialConCategoria
 from schemas.response_schemas import SuccessResponse, ErrorResponse
-from middleware.auth_middleware import get_current_user
+from middleware.auth_middleware import get_current_admin, get_current_user
 from models.usuario import Usuario
-from services.texture_upload_service import texture_upload_service
+from services.texture_upload_service import texture_pipeline, texture_upload_service
+from services.texture_store import texture_store
+from services.material_catalog_service import categoria_snapshot, material_catalog, material_to_dict
+from services.material_search_service import search_materials
+from services.material_suggest_service import material_suggest_index
+from services.price_import_service import parse_archivo, price_import_jobs, run_import
 
 router = APIRouter(
     prefix="/materiales",
@@ -78,7 +84,8 @@ async def create_material_with_image(
 ):
     """
     Crear un material con imagen de textura.
-    La imagen se sube a Google Drive y se guarda la URL pública.
+    La imagen se reescala a potencia de 2, se generan sus derivados WebP y se suben a
+    Google Drive; imagen_url apunta al derivado más grande.
     """
     try:
         # Verificar si el código ya existe
@@ -112,13 +119,19 @@ async def create_material_with_image(
                 detail=error_message
             )
         
-        # Subir imagen a Google Drive
+        # Reescalar, generar derivados y subirlos sin bloquear el event loop
         print(f"📤 Subiendo textura '{nombre}' a Google Drive...")
-        imagen_url = texture_upload_service.upload_texture(
-            file_content=file_content,
-            filename=imagen.filename,
-            material_name=nombre
-        )
+        try:
+            imagen_url, imagen_variantes = await texture_pipeline.procesar_y_subir(
+                file_content=file_content,
+                filename=imagen.filename,
+                material_name=nombre
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
         
         if not imagen_url:
             raise HTTPException(
@@ -136,6 +149,7 @@ async def create_material_with_image(
             precio_base=precio_base,
             unidad_medida=unidad_medida,
             imagen_url=imagen_url,
+            imagen_variantes=imagen_variantes,
             categoria_id=categoria_id
         )
         
@@ -151,6 +165,7 @@ async def create_material_with_image(
                 "precio_base": material.precio_base,
                 "unidad_medida": material.unidad_medida,
                 "imagen_url": material.imagen_url,
+                "imagen_variantes": material.imagen_variantes,
                 "categoria_id": material.categoria_id,
                 "fecha_creacion": material.fecha_creacion.isoformat()
             }
@@ -169,52 +184,66 @@ async def create_material_with_image(
     "/",
     response_model=SuccessResponse,
     summary="Listar todos los materiales",
-    description="Obtiene todos los materiales con opción de filtrar por categoría o buscar"
+    description="""
+    Obtiene todos los materiales con opción de filtrar por categoría o buscar.
+    
+    Las páginas se sirven desde un catálogo en memoria invalidado al modificar materiales
+    o categorías. La respuesta incluye `ETag`; reenviarlo en `If-None-Match` devuelve 304.
+    `total` corresponde a los filtros aplicados.
+    """
 )
 def get_materiales(
+    request: Request,
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=100, description="Número máximo de registros"),
     categoria_id: Optional[int] = Query(None, description="Filtrar por categoría"),
     search: Optional[str] = Query(None, description="Buscar por nombre, código o descripción"),
     db: Session = Depends(get_db)
 ):
-    if search:
-        materiales = MaterialRepository.search_by_name(db, search, skip=skip, limit=limit)
-    elif categoria_id:
-        materiales = MaterialRepository.get_by_categoria(db, categoria_id, skip=skip, limit=limit)
-    else:
-        materiales = MaterialRepository.get_all_with_categoria(db, skip=skip, limit=limit)
+    page, hit = material_catalog.get_page(db, categoria_id=categoria_id, search=search, skip=skip, limit=limit)
+    
+    headers = {
+        "ETag": page.etag,
+        "Cache-Control": "no-cache",
+        "X-Catalog-Cache": "hit" if hit else "miss"
+    }
+    if request.headers.get("if-none-match") == page.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=page.body, media_type="application/json", headers=headers)
+
+@router.get(
+    "/search",
+    response_model=SuccessResponse,
+    summary="Buscar materiales por relevancia",
+    description="""
+    Búsqueda de texto completo sobre código, nombre y descripción.
     
-    total = MaterialRepository.count(db)
+    - Ignora mayúsculas y acentos (`marmol` encuentra "Mármol")
+    - Cada palabra coincide por prefijo (`porcel blan` encuentra "Porcelanato Blanco")
+    - Los resultados se ordenan por relevancia (`relevancia` en cada material)
+    """
+)
+def search_materiales(
+    q: str = Query(..., min_length=1, max_length=100, description="Texto a buscar"),
+    categoria_id: Optional[int] = Query(None, description="Restringir a una categoría"),
+    skip: int = Query(0, ge=0, description="Número de registros a omitir"),
+    limit: int = Query(20, ge=1, le=100, description="Número máximo de registros"),
+    db: Session = Depends(get_db)
+):
+    resultados, total = search_materials(db, q, categoria_id=categoria_id, skip=skip, limit=limit)
+    categorias = categoria_snapshot.get(db)[0].categorias
     
-    # Convertir a diccionarios con categoría
     materiales_data = []
-    for material in materiales:
-        material_dict = {
-            "id": material.id,
-            "codigo": material.codigo,
-            "nombre": material.nombre,
-            "descripcion": material.descripcion,
-            "precio_base": material.precio_base,
-            "unidad_medida": material.unidad_medida,
-            "imagen_url": material.imagen_url,
-            "categoria_id": material.categoria_id,
-            "fecha_creacion": material.fecha_creacion.isoformat(),
-            "fecha_actualizacion": material.fecha_actualizacion.isoformat()
-        }
-        
-        if hasattr(material, 'categoria') and material.categoria:
-            material_dict["categoria"] = {
-                "id": material.categoria.id,
-                "codigo": material.categoria.codigo,
-                "nombre": material.categoria.nombre
-            }
-        
+    for material, relevancia in resultados:
+        material_dict = material_to_dict(material, categorias)
+        material_dict["relevancia"] = round(relevancia, 4)
         materiales_data.append(material_dict)
     
     return SuccessResponse(
-        message="Materiales obtenidos exitosamente",
+        message="Búsqueda realizada exitosamente",
         data={
+            "q": q,
             "materiales": materiales_data,
             "total": total,
             "skip": skip,
@@ -222,6 +251,102 @@ def get_materiales(
         }
     )
 
+@router.get(
+    "/suggest",
+    response_model=SuccessResponse,
+    summary="Autocompletar materiales y categorías",
+    description="""
+    Sugerencias para typeahead a partir de un prefijo.
+    
+    - Coincide con el inicio del código o de cualquier palabra del nombre (`blan` sugiere "Porcelanato Blanco")
+    - Ignora mayúsculas y acentos
+    - Se resuelve desde un índice en memoria, sin consultar la base de datos
+    """
+)
+def suggest_materiales(
+    prefix: str = Query(..., min_length=1, max_length=100, description="Texto escrito hasta ahora"),
+    tipo: Optional[str] = Query(None, pattern="^(material|categoria)$", description="Restringir a materiales o categorías"),
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de sugerencias"),
+    db: Session = Depends(get_db)
+):
+    material_suggest_index.ensure_loaded(db)
+    sugerencias = material_suggest_index.suggest(prefix, limit=limit, tipo=tipo)
+    
+    return SuccessResponse(
+        message="Sugerencias obtenidas exitosamente",
+        data={
+            "prefix": prefix,
+            "sugerencias": sugerencias
+        }
+    )
+
+@router.post(
+    "/precios/importar",
+    response_model=SuccessResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Importar precios de materiales",
+    description="""
+    Actualización masiva de precios desde un CSV o JSON.
+    
+    - CSV: columnas `codigo` (o `material_id`) y `precio`; separador `,` o `;` (con `;` se acepta coma decimal)
+    - JSON: lista de objetos `{"codigo": ..., "precio": ...}`
+    - Se procesa en segundo plano: la respuesta trae el `id` de la tarea para consultar el progreso
+    - Las líneas de modelos 3D que usaban el precio anterior se recalculan; con `forzar=true` también las de precio manual
+    
+    **🔒 Permisos:** Solo administradores (`ADMIN_CORREOS`): cambia los precios de catálogo de todos los usuarios
+    """
+)
+async def importar_precios(
+    background_tasks: BackgroundTasks,
+    archivo: UploadFile = File(..., description="Archivo CSV o JSON con los precios"),
+    forzar: bool = Form(False, description="Recalcular también líneas con precio manual"),
+    current_user: Usuario = Depends(get_current_admin)
+):
+    contenido = await archivo.read()
+    try:
+        filas, errores = parse_archivo(contenido, archivo.filename or "")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Archivo de precios inválido: {str(e)}"
+        )
+    if not filas:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "El archivo no tiene filas válidas", "errores": errores[:100]}
+        )
+    
+    job = price_import_jobs.create(len(filas), errores, forzar)
+    background_tasks.add_task(run_import, job, filas)
+    print(f"📤 Importación de precios {job.id} en cola: {len(filas)} filas ({len(errores)} con error)")
+    
+    return SuccessResponse(
+        message="Importación de precios en proceso",
+        data=job.to_dict()
+    )
+
+@router.get(
+    "/precios/importar/{job_id}",
+    response_model=SuccessResponse,
+    summary="Progreso de una importación de precios",
+    description="Estado, etapa, progreso (0 a 1) y errores por fila de una importación de precios"
+)
+def get_importacion_precios(
+    job_id: str,
+    current_user: Usuario = Depends(get_current_user)
+):
+    job = price_import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Importación no encontrada"
+        )
+    
+    return SuccessResponse(
+        message="Estado de la importación",
+        data=job.to_dict()
+    )
+
 @router.get(
     "/{material_id}",
     response_model=SuccessResponse,
@@ -232,7 +357,7 @@ def get_material(
     material_id: int,
     db: Session = Depends(get_db)
 ):
-    material = MaterialRepository.get_by_id_with_categoria(db, material_id)
+    material = MaterialRepository.get_by_id(db, material_id)
     if not material:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -252,12 +377,13 @@ def get_material(
         "fecha_actualizacion": material.fecha_actualizacion.isoformat()
     }
     
-    if material.categoria:
+    categoria = categoria_snapshot.get(db)[0].categorias.get(material.categoria_id)
+    if categoria:
         material_data["categoria"] = {
-            "id": material.categoria.id,
-            "codigo": material.categoria.codigo,
-            "nombre": material.categoria.nombre,
-            "descripcion": material.categoria.descripcion
+            "id": categoria["id"],
+            "codigo": categoria["codigo"],
+            "nombre": categoria["nombre"],
+            "descripcion": categoria["descripcion"]
         }
     
     return SuccessResponse(
@@ -314,13 +440,15 @@ def update_material(
 )
 async def update_material_imagen(
     material_id: int,
+    background_tasks: BackgroundTasks,
     imagen: UploadFile = File(..., description="Nueva imagen de la textura"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """
     Actualizar solo la imagen de textura de un material.
-    La nueva imagen se sube a Google Drive y reemplaza la URL anterior.
+    La nueva imagen se procesa igual que al crear el material y reemplaza la URL y los derivados anteriores.
+    Los archivos anteriores se borran del almacén cuando ningún material los usa (ver texture_store.purgar).
     """
     try:
         # Verificar que el material existe
@@ -346,13 +474,19 @@ async def update_material_imagen(
                 detail=error_message
             )
         
-        # Subir nueva imagen a Google Drive
+        # Reescalar, generar derivados y subirlos sin bloquear el event loop
         print(f"📤 Actualizando textura para material '{material.nombre}'...")
-        nueva_imagen_url = texture_upload_service.upload_texture(
-            file_content=file_content,
-            filename=imagen.filename,
-            material_name=material.nombre
-        )
+        try:
+            nueva_imagen_url, imagen_variantes = await texture_pipeline.procesar_y_subir(
+                file_content=file_content,
+                filename=imagen.filename,
+                material_name=material.nombre
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
         
         if not nueva_imagen_url:
             raise HTTPException(
@@ -363,8 +497,9 @@ async def update_material_imagen(
         print(f"✅ Nueva textura subida: {nueva_imagen_url}")
         
         # Actualizar solo la URL de la imagen
-        material_update = MaterialUpdate(imagen_url=nueva_imagen_url)
+        material_update = MaterialUpdate(imagen_url=nueva_imagen_url, imagen_variantes=imagen_variantes)
         material_actualizado = MaterialRepository.update(db, material_id, material_update)
+        background_tasks.add_task(texture_store.purgar)
         
         return SuccessResponse(
             message="Imagen de textura actualizada exitosamente",
@@ -372,6 +507,7 @@ async def update_material_imagen(
                 "id": material_actualizado.id,
                 "nombre": material_actualizado.nombre,
                 "imagen_url": material_actualizado.imagen_url,
+                "imagen_variantes": material_actualizado.imagen_variantes,
                 "fecha_actualizacion": material_actualizado.fecha_actualizacion.isoformat()
             }
         )
@@ -393,6 +529,7 @@ async def update_material_imagen(
 )
 def delete_material(
     material_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -409,6 +546,7 @@ def delete_material(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al eliminar el material"
         )
+    background_tasks.add_task(texture_store.purgar)
     
     return SuccessResponse(
         message="Material eliminado exitosamente",
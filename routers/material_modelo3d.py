@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
@@ -7,13 +7,18 @@ from repositories.material_repository import MaterialRepository
 from repositories.modelo3d_repository import Modelo3DRepository
 from schemas.material_modelo3d_schemas import (
     MaterialModelo3DCreate, 
+    MaterialModelo3DBulkItem,
     MaterialModelo3DUpdate, 
     MaterialModelo3DResponse,
     MaterialModelo3DConDetalles,
     ResumenCostosMateriales
 )
+from schemas.regla_bom_schemas import GenerarBOMRequest
+from services.bom_service import generar_bom
+from services import costo_rollup_service
+from repositories.costo_modelo3d_repository import CostoModelo3DRepository
 from schemas.response_schemas import SuccessResponse
-from middleware.auth_middleware import get_current_user
+from middleware.auth_middleware import get_current_admin, get_current_user
 from models.usuario import Usuario
 
 router = APIRouter(
@@ -70,10 +75,16 @@ def add_material_to_modelo3d(
     response_model=SuccessResponse,
     status_code=status.HTTP_201_CREATED,
     summary="Agregar múltiples materiales",
-    description="Asocia múltiples materiales con un modelo 3D en una sola operación"
+    description="""
+    Asocia múltiples materiales con modelos 3D en una sola operación.
+    
+    - Si no se envía `precio_unitario` se usa el `precio_base` del material (y su unidad de medida)
+    - Los elementos inválidos no detienen la carga: se reportan en `errores` con su índice
+    - Si ningún elemento es válido se responde 400 con la lista de errores
+    """
 )
 def add_materials_bulk(
-    materiales_data: List[MaterialModelo3DCreate],
+    materiales_data: List[MaterialModelo3DBulkItem],
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -83,40 +94,112 @@ def add_materials_bulk(
             detail="Debe proporcionar al menos un material"
         )
     
-    # Verificar que todos los materiales y modelos existen
-    modelo3d_repo = Modelo3DRepository(db)
-    for material_data in materiales_data:
-        modelo3d = modelo3d_repo.get_by_id(material_data.modelo3d_id)
-        if not modelo3d:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Modelo 3D con ID {material_data.modelo3d_id} no encontrado"
-            )
+    # Validación por conjuntos: una consulta para modelos y otra para materiales
+    modelos_existentes = MaterialModelo3DRepository.get_existing_modelo3d_ids(
+        db, (item.modelo3d_id for item in materiales_data)
+    )
+    precios = MaterialRepository.get_pricing_rows(
+        db, (item.material_id for item in materiales_data)
+    )
+    
+    filas = []
+    indices = []
+    errores = []
+    for indice, item in enumerate(materiales_data):
+        if item.modelo3d_id not in modelos_existentes:
+            errores.append({
+                "indice": indice,
+                "material_id": item.material_id,
+                "error": f"Modelo 3D con ID {item.modelo3d_id} no encontrado"
+            })
+            continue
         
-        material = MaterialRepository.get_by_id(db, material_data.material_id)
-        if not material:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Material con ID {material_data.material_id} no encontrado"
-            )
+        catalogo = precios.get(item.material_id)
+        if catalogo is None:
+            errores.append({
+                "indice": indice,
+                "material_id": item.material_id,
+                "error": f"Material con ID {item.material_id} no encontrado"
+            })
+            continue
+        
+        precio_unitario = item.precio_unitario if item.precio_unitario is not None else catalogo.precio_base
+        filas.append({
+            "modelo3d_id": item.modelo3d_id,
+            "material_id": item.material_id,
+            "cantidad": item.cantidad,
+            "unidad_medida": item.unidad_medida or catalogo.unidad_medida,
+            "precio_unitario": precio_unitario,
+            "subtotal": item.cantidad * precio_unitario
+        })
+        indices.append(indice)
+    
+    if not filas:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Ningún material pudo agregarse", "errores": errores}
+        )
     
-    materiales_modelo3d = MaterialModelo3DRepository.create_bulk(db, materiales_data)
+    ids = MaterialModelo3DRepository.create_bulk(db, filas)
     
     return SuccessResponse(
-        message=f"{len(materiales_modelo3d)} materiales agregados exitosamente",
+        message=f"{len(ids)} materiales agregados exitosamente",
         data={
-            "total": len(materiales_modelo3d),
+            "total": len(ids),
+            "total_errores": len(errores),
             "materiales": [
                 {
-                    "id": m.id,
-                    "material_id": m.material_id,
-                    "cantidad": m.cantidad,
-                    "subtotal": m.subtotal
-                } for m in materiales_modelo3d
-            ]
+                    "indice": indice,
+                    "id": nuevo_id,
+                    "material_id": fila["material_id"],
+                    "cantidad": fila["cantidad"],
+                    "precio_unitario": fila["precio_unitario"],
+                    "subtotal": fila["subtotal"]
+                } for indice, nuevo_id, fila in zip(indices, ids, filas)
+            ],
+            "errores": errores
         }
     )
 
+@router.post(
+    "/modelo3d/{modelo3d_id}/bom",
+    response_model=SuccessResponse,
+    summary="Generar cómputo de materiales",
+    description="""
+    Calcula las cantidades de materiales de un modelo 3D a partir de las medidas del plano
+    y las reglas de cómputo activas (`/reglas-bom`).
+    
+    - `seleccion` indica el material elegido por categoría; si falta se usa el material por defecto de la regla
+    - Con `guardar=true` las líneas reemplazan a las existentes de esos mismos materiales
+    - Con `guardar=false` solo devuelve el cálculo
+    """
+)
+def generar_bom_modelo3d(
+    modelo3d_id: int,
+    request: GenerarBOMRequest,
+    guardar: bool = Query(True, description="Guardar las líneas calculadas en el modelo"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    resultado = generar_bom(
+        db,
+        modelo3d_id,
+        current_user.id,
+        seleccion=request.seleccion,
+        categoria_id=request.categoria_id,
+        guardar=guardar
+    )
+    if resultado is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Modelo 3D con ID {modelo3d_id} no encontrado"
+        )
+    
+    return SuccessResponse(
+        message=f"Cómputo de materiales generado: {len(resultado['materiales'])} materiales",
+        data=resultado
+    )
+
 @router.get(
     "/modelo3d/{modelo3d_id}",
     response_model=SuccessResponse,
@@ -180,6 +263,89 @@ def get_materiales_by_modelo3d(
         }
     )
 
+@router.get(
+    "/modelo3d/{modelo3d_id}/costos",
+    response_model=SuccessResponse,
+    summary="Costos de un modelo 3D",
+    description="""
+    Costo total y número de materiales de un modelo 3D, desglosado por categoría.
+    
+    - Se lee de los costos materializados, que se actualizan en la misma transacción que las líneas
+    - No recorre materiales_modelo3d: el tiempo no depende de la cantidad de líneas
+    """
+)
+def get_costos_modelo3d(
+    modelo3d_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    modelo3d_repo = Modelo3DRepository(db)
+    if not modelo3d_repo.get_by_id(modelo3d_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Modelo 3D con ID {modelo3d_id} no encontrado"
+        )
+    
+    costo = CostoModelo3DRepository.get_by_modelo3d(db, modelo3d_id)
+    
+    return SuccessResponse(
+        message="Costos obtenidos exitosamente",
+        data={
+            "modelo3d_id": modelo3d_id,
+            "total_materiales": costo.total_materiales if costo else 0,
+            "costo_total": costo.costo_total if costo else 0.0,
+            "fecha_actualizacion": costo.fecha_actualizacion.isoformat() if costo and costo.fecha_actualizacion else None,
+            "categorias": CostoModelo3DRepository.get_categorias(db, modelo3d_id) if costo else []
+        }
+    )
+
+@router.get(
+    "/costos",
+    response_model=SuccessResponse,
+    summary="Costos de los planos del usuario",
+    description="Costo de cada plano con modelo 3D del usuario autenticado, total general y desglose por categoría"
+)
+def get_costos_usuario(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    planos = CostoModelo3DRepository.get_by_usuario(db, current_user.id)
+    
+    return SuccessResponse(
+        message="Costos obtenidos exitosamente",
+        data={
+            "usuario_id": current_user.id,
+            "total_planos": len(planos),
+            "costo_total": sum(plano["costo_total"] for plano in planos),
+            "planos": planos,
+            "categorias": CostoModelo3DRepository.get_categorias_by_usuario(db, current_user.id)
+        }
+    )
+
+@router.get(
+    "/costos/consistencia",
+    response_model=SuccessResponse,
+    summary="Verificar costos materializados",
+    description="""
+    Compara los costos materializados con un agregado completo de materiales_modelo3d.
+    
+    - Recorre todas las líneas: es una tarea de mantenimiento, no para el uso normal
+    - Solo lectura: los modelos inconsistentes se recalculan con `python manage.py check-costos --reparar`
+    
+    **🔒 Permisos:** Solo administradores (`ADMIN_CORREOS`)
+    """
+)
+def verificar_costos(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_admin)
+):
+    resultado = costo_rollup_service.verificar(db)
+    
+    return SuccessResponse(
+        message="Costos consistentes" if resultado["consistente"] else "Se encontraron costos inconsistentes",
+        data=resultado
+    )
+
 @router.get(
     "/{material_modelo3d_id}",
     response_model=SuccessResponse,
@@ -2,23 +2,97 @@
 Router para endpoints de Planos
 """
 
+import asyncio
+import mimetypes
 import os
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from pathlib import Path
+import requests
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Tuple
 
-from database import get_db
+from config import settings
+
+from database import SessionLocal, get_db
 from middleware.auth_middleware import get_current_user
-from services.plano_service import PlanoService
+from services.plano_service import PlanoService, purgar_pendientes
+from services.plano_prevalidacion import ArchivoInvalido
+from services.local_image_service import local_image_service
+from services.progreso_service import ETAPAS_FINALES, Seguimiento, canal_de, formato_sse, get_bus_progreso
+from services.storage_service import almacenamiento_de, content_disposition
 from schemas.plano_schemas import (
-    PlanoCreate, PlanoUpdate, PlanoResponse, PlanoListResponse
+    PlanoCreate, PlanoUpdate, PlanoResponse, PlanoListResponse,
+    PlanoSubidaCreate, PlanoSubidaResponse
 )
 from schemas.modelo3d_schemas import Modelo3DDataResponse, Modelo3DObjectsUpdate
 from schemas.response_schemas import SuccessResponse, ErrorResponse
 
 router = APIRouter(prefix="/planos", tags=["planos"])
 
-# Ya no necesitamos guardar archivos localmente, se suben a Google Drive
+# La suscripción al progreso también acepta el token por query (EventSource no envía cabeceras)
+bearer_opcional = HTTPBearer(auto_error=False)
+
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.pdf', '.svg'}
+
+def _validar_archivo(filename: str, file_size: int):
+    """Validar extensión y tamaño máximo (PLANO_MAX_MB) del archivo de un plano"""
+    file_extension = os.path.splitext(filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de archivo no permitido. Extensiones permitidas: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    
+    if file_size > settings.PLANO_MAX_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El archivo es demasiado grande. Tamaño máximo: {settings.PLANO_MAX_MB}MB"
+        )
+
+def _leer_archivo(url: str) -> Tuple[bytes, str]:
+    """Contenido y tipo de un archivo para responderlo a través de la API"""
+    if url.startswith('http'):
+        # Google Drive: el tipo real viene en la respuesta (la URL no tiene extensión)
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        return response.content, response.headers.get('content-type', 'image/jpeg')
+    
+    contenido = almacenamiento_de(url).leer(url)
+    if contenido is None:
+        raise HTTPException(status_code=404, detail="Archivo del plano no encontrado")
+    return contenido, mimetypes.guess_type(Path(url).name)[0] or 'application/octet-stream'
+
+def _rango(cabecera: Optional[str], tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    (inicio, fin) de una cabecera Range de un solo intervalo; None para responder el archivo
+    completo (sin Range, con varios intervalos o mal formada) y 416 si no es satisfacible
+    """
+    if not cabecera or not cabecera.startswith('bytes=') or ',' in cabecera:
+        return None
+    desde, _, hasta = cabecera[len('bytes='):].strip().partition('-')
+    try:
+        if desde:
+            inicio, fin = int(desde), int(hasta) if hasta else tamano - 1
+        else:
+            # bytes=-N: los últimos N bytes
+            inicio, fin = max(tamano - int(hasta), 0), tamano - 1
+    except ValueError:
+        return None
+    fin = min(fin, tamano - 1)
+    if inicio > fin:
+        raise HTTPException(status_code=416, detail="Rango no satisfacible", headers={
+            'Content-Range': f'bytes */{tamano}'
+        })
+    return inicio, fin
+
+def _redireccion(url: str) -> RedirectResponse:
+    """Redirección temporal a una URL firmada (cacheable por menos tiempo que su vigencia)"""
+    return RedirectResponse(url, status_code=307, headers={
+        'Cache-Control': f'private, max-age={settings.STORAGE_URL_EXPIRATION_SECONDS // 2}'
+    })
 
 @router.post("/", response_model=PlanoResponse)
 async def create_plano(
@@ -27,30 +101,20 @@ async def create_plano(
     formato: str = Form(default="image", description="Formato del archivo"),
     tipo_plano: Optional[str] = Form(None, description="Tipo de plano"),
     descripcion: Optional[str] = Form(None, description="Descripción del plano"),
+    seguimiento: Optional[str] = Form(None, description="Clave para seguir el progreso en GET /planos/progreso/{seguimiento}"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Subir un nuevo plano"""
+    progreso = Seguimiento(current_user.id, seguimiento)
     try:
-        # Validar tipo de archivo
-        allowed_extensions = {'.jpg', '.jpeg', '.png', '.pdf', '.svg'}
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        if file_extension not in allowed_extensions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Tipo de archivo no permitido. Extensiones permitidas: {', '.join(allowed_extensions)}"
-            )
-        
-        # Validar tamaño del archivo (10MB máximo)
+        # Validar tipo y tamaño del archivo
         file.file.seek(0, 2)  # Ir al final del archivo
         file_size = file.file.tell()
         file.file.seek(0)  # Volver al inicio
-        
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(
-                status_code=400,
-                detail="El archivo es demasiado grande. Tamaño máximo: 10MB"
-            )
+        await progreso.publicar("recibido", bytes=file_size)
+        await progreso.publicar("validando")
+        _validar_archivo(file.filename, file_size)
         
         # Leer contenido del archivo
         file_content = await file.read()
@@ -63,19 +127,137 @@ async def create_plano(
             descripcion=descripcion
         )
         
+        # La verificación espera al conversor: fuera del event loop para no frenar otras peticiones
         plano_service = PlanoService(db)
-        plano = plano_service.create_plano(
+        plano = await run_in_threadpool(
+            plano_service.create_plano,
             plano_data, 
             current_user.id, 
             file_content=file_content, 
-            filename=file.filename
+            filename=file.filename,
+            progreso=progreso
         )
         
+        await progreso.publicar("listo", plano_id=plano.id)
         return plano
         
+    except HTTPException as e:
+        await progreso.publicar("error", mensaje=e.detail)
+        raise
+    except ArchivoInvalido as e:
+        # Rechazado por la pre-validación: no llegó al conversor
+        await progreso.publicar("error", mensaje=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        await progreso.publicar("error", mensaje=str(e))
         raise HTTPException(status_code=500, detail=f"Error al subir plano: {str(e)}")
 
+@router.post("/subidas", response_model=PlanoSubidaResponse, status_code=201)
+async def iniciar_subida_plano(
+    plano_data: PlanoSubidaCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Iniciar una subida directa: registra el plano como 'pendiente' y devuelve una URL firmada
+    para subir el archivo al almacenamiento sin pasar por la API (formulario POST en S3, PUT en
+    el almacenamiento local). Luego confirmar con POST /planos/{id}/confirmar. Los planos que
+    siguen sin confirmar después de PLANO_PENDIENTE_MAX_SECONDS se eliminan.
+    """
+    _validar_archivo(plano_data.filename, plano_data.tamano)
+    
+    plano_service = PlanoService(db)
+    resultado = plano_service.iniciar_subida(
+        PlanoCreate(**plano_data.model_dump(exclude={"filename", "tamano"})),
+        current_user.id,
+        plano_data.filename,
+        plano_data.tamano
+    )
+    
+    if resultado is None:
+        raise HTTPException(
+            status_code=409,
+            detail="El almacenamiento configurado no admite subidas directas. Usar POST /planos/"
+        )
+    
+    background_tasks.add_task(purgar_pendientes)
+    return resultado
+
+@router.post("/{plano_id}/confirmar", response_model=PlanoResponse)
+async def confirmar_subida_plano(
+    plano_id: int,
+    seguimiento: Optional[str] = Query(None, description="Clave para seguir el progreso en GET /planos/progreso/{seguimiento}"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Verificar un plano subido directamente (si no es un plano válido se elimina)"""
+    progreso = Seguimiento(current_user.id, seguimiento)
+    await progreso.publicar("recibido", plano_id=plano_id)
+    plano_service = PlanoService(db)
+    try:
+        plano = await run_in_threadpool(plano_service.confirmar_subida, plano_id, current_user.id, progreso)
+    except ValueError as e:
+        await progreso.publicar("error", plano_id=plano_id, mensaje=str(e))
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        await progreso.publicar("error", plano_id=plano_id, mensaje=str(e))
+        raise HTTPException(status_code=400, detail=f"Error al verificar plano: {str(e)}")
+    
+    if not plano:
+        await progreso.publicar("error", plano_id=plano_id, mensaje="Plano no encontrado")
+        raise HTTPException(status_code=404, detail="Plano no encontrado")
+    
+    await progreso.publicar("listo", plano_id=plano_id)
+    return plano
+
+def _usuario_de_token(token: str):
+    """Autenticar con una sesión que se cierra enseguida: la suscripción puede durar minutos"""
+    db = SessionLocal()
+    try:
+        return get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db)
+    finally:
+        db.close()
+
+@router.get("/progreso/{seguimiento}")
+async def progreso_plano(
+    seguimiento: str,
+    token: Optional[str] = Query(None, description="JWT, para EventSource (que no puede enviar Authorization)"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_opcional)
+):
+    """
+    Progreso de una subida o conversión como Server-Sent Events (text/event-stream).
+    Abrir la suscripción con una clave nueva (un UUID), esperar el comentario ': suscrito' y
+    enviar POST /planos/, /planos/{id}/confirmar o /planos/{id}/convertir con la misma clave
+    en `seguimiento`. Cada evento es una etapa (recibido, validando, convirtiendo, midiendo,
+    guardando) y la conexión se cierra después de 'listo' o 'error'. Quien se suscribe tarde
+    recibe primero la última etapa publicada.
+    """
+    token = credentials.credentials if credentials else token
+    if not token:
+        raise HTTPException(status_code=401, detail="No autenticado", headers={"WWW-Authenticate": "Bearer"})
+    usuario = await run_in_threadpool(_usuario_de_token, token)
+    canal = canal_de(usuario.id, seguimiento)
+    bus = get_bus_progreso()
+    
+    async def eventos():
+        async with bus.suscribir(canal) as cola:
+            yield ": suscrito\n\n"
+            while True:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), timeout=settings.PROGRESO_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield formato_sse(evento)
+                if evento["etapa"] in ETAPAS_FINALES:
+                    return
+    
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Sin buffer en nginx: cada etapa sale en cuanto se publica
+    })
+
 @router.get("/", response_model=PlanoListResponse)
 async def get_planos(
     skip: int = Query(0, ge=0, description="Número de elementos a omitir"),
@@ -136,19 +318,25 @@ async def delete_plano(
 @router.post("/{plano_id}/convertir", response_model=SuccessResponse)
 async def convertir_plano_a_3d(
     plano_id: int,
+    seguimiento: Optional[str] = Query(None, description="Clave para seguir el progreso en GET /planos/progreso/{seguimiento}"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Convertir un plano a modelo 3D"""
+    progreso = Seguimiento(current_user.id, seguimiento)
+    await progreso.publicar("recibido", plano_id=plano_id)
     plano_service = PlanoService(db)
-    result = plano_service.convertir_a_3d(plano_id, current_user.id)
+    result = await run_in_threadpool(plano_service.convertir_a_3d, plano_id, current_user.id, progreso)
     
     if not result:
+        await progreso.publicar("error", plano_id=plano_id, mensaje="Plano no encontrado")
         raise HTTPException(status_code=404, detail="Plano no encontrado")
     
     if not result["success"]:
+        await progreso.publicar("error", plano_id=plano_id, mensaje=result["error"])
         raise HTTPException(status_code=500, detail=result["error"])
     
+    await progreso.publicar("listo", plano_id=plano_id)
     return SuccessResponse(message=result["message"])
 
 @router.get("/{plano_id}/modelo3d", response_model=Modelo3DDataResponse)
@@ -211,7 +399,8 @@ async def debug_plano_image(
         return {"error": "URL no es de Google Drive", "url": plano.url}
     
     # Verificar información del archivo
-    from services.google_drive_service import google_drive_service
+    from services.google_drive_service import get_google_drive_service
+    google_drive_service = get_google_drive_service()
     file_info = google_drive_service.get_file_info(file_id)
     
     # Intentar hacer público si no lo está
@@ -236,7 +425,8 @@ async def make_all_planos_public(
     planos = plano_service.get_planos_usuario(current_user.id, 0, 1000)
     
     results = []
-    from services.google_drive_service import google_drive_service
+    from services.google_drive_service import get_google_drive_service
+    google_drive_service = get_google_drive_service()
     
     for plano in planos.planos:
         if plano.url and "drive.google.com/uc?export=view&id=" in plano.url:
@@ -257,9 +447,14 @@ async def make_all_planos_public(
 @router.get("/{plano_id}/image")
 async def get_plano_image(
     plano_id: int,
+    proxy: bool = Query(False, description="Responder los bytes en lugar de redirigir al almacenamiento"),
     db: Session = Depends(get_db)
 ):
-    """Obtener imagen del plano como proxy (sin autenticación para acceso público)"""
+    """
+    Obtener imagen del plano (sin autenticación para acceso público). Con almacenamiento local
+    o S3 redirige a una URL firmada y el archivo no pasa por la API; con Google Drive (o
+    proxy=true) la API hace de proxy.
+    """
     plano_service = PlanoService(db)
     # Obtener plano sin verificar usuario (para acceso público a imágenes)
     plano = plano_service.get_plano_by_id(plano_id)
@@ -270,27 +465,28 @@ async def get_plano_image(
     if not plano.url:
         raise HTTPException(status_code=404, detail="Plano no tiene imagen")
     
+    url_directa = None if proxy else almacenamiento_de(plano.url).url_descarga(plano.url)
+    if url_directa:
+        return _redireccion(url_directa)
+    
     try:
-        import requests
-        
-        # Descargar imagen de Google Drive
-        response = requests.get(plano.url, timeout=30)
-        response.raise_for_status()
+        content, media_type = await run_in_threadpool(_leer_archivo, plano.url)
         
         # Retornar imagen con headers apropiados
-        from fastapi.responses import Response
         return Response(
-            content=response.content,
-            media_type=response.headers.get('content-type', 'image/jpeg'),
+            content=content,
+            media_type=media_type,
             headers={
                 'Cache-Control': 'public, max-age=3600',
-                'Content-Length': str(len(response.content)),
+                'Content-Length': str(len(content)),
                 'Access-Control-Allow-Origin': '*',  # Permitir acceso desde cualquier origen
                 'Access-Control-Allow-Methods': 'GET, OPTIONS',
                 'Access-Control-Allow-Headers': '*',
             }
         )
         
+    except HTTPException:
+        raise
     except requests.exceptions.RequestException as e:
         raise HTTPException(status_code=500, detail=f"Error descargando imagen: {str(e)}")
     except Exception as e:
@@ -299,54 +495,66 @@ async def get_plano_image(
 @router.get("/{plano_id}/download")
 async def download_plano(
     plano_id: int,
+    request: Request,
+    proxy: bool = Query(False, description="Transmitir los bytes en lugar de redirigir al almacenamiento"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """Descargar el archivo del plano"""
+    """
+    Descargar el archivo del plano. Redirige a una URL firmada del almacenamiento; con Google
+    Drive (o proxy=true) lo transmite por partes sin cargarlo en memoria. Soporta Range para
+    reanudar descargas.
+    """
     plano_service = PlanoService(db)
-    plano = plano_service.get_plano(plano_id, current_user.id)
+    archivo = await run_in_threadpool(plano_service.get_archivo, plano_id, current_user.id)
     
-    if not plano:
+    if not archivo:
         raise HTTPException(status_code=404, detail="Plano no encontrado")
     
-    if not plano.url:
+    if not archivo.url:
         raise HTTPException(status_code=404, detail="Plano no tiene archivo")
     
-    try:
-        import requests
-        
-        # Descargar archivo de Google Drive
-        response = requests.get(plano.url, timeout=30)
-        response.raise_for_status()
-        
-        # Determinar el tipo de archivo y extensión
-        content_type = response.headers.get('content-type', 'application/octet-stream')
-        file_extension = 'jpg'  # default
-        if 'image/jpeg' in content_type:
-            file_extension = 'jpg'
-        elif 'image/png' in content_type:
-            file_extension = 'png'
-        elif 'image/svg' in content_type:
-            file_extension = 'svg'
-        elif 'application/pdf' in content_type:
-            file_extension = 'pdf'
-        
-        # Retornar archivo con headers para descarga
-        from fastapi.responses import Response
-        return Response(
-            content=response.content,
-            media_type=content_type,
-            headers={
-                'Content-Disposition': f'attachment; filename="{plano.nombre}.{file_extension}"',
-                'Content-Length': str(len(response.content)),
-                'Cache-Control': 'no-cache'
-            }
+    almacenamiento = almacenamiento_de(archivo.url)
+    if not proxy:
+        url_directa = almacenamiento.url_descarga(archivo.url, nombre_descarga=archivo.nombre_descarga)
+        if url_directa:
+            return _redireccion(url_directa)
+    
+    ruta = local_image_service.path_for(archivo.url)
+    if ruta:
+        if not ruta.is_file():
+            raise HTTPException(status_code=404, detail="Archivo del plano no encontrado")
+        # FileResponse resuelve Range y, si el servidor lo soporta, envía el archivo con sendfile
+        return FileResponse(
+            ruta, media_type=archivo.media_type, filename=archivo.nombre_descarga,
+            headers={'Cache-Control': 'no-cache'}
         )
-        
+    
+    headers = {
+        'Content-Disposition': content_disposition(archivo.nombre_descarga),
+        'Cache-Control': 'no-cache'
+    }
+    rango = None
+    if archivo.tamano:
+        headers['Accept-Ranges'] = 'bytes'
+        headers['Content-Length'] = str(archivo.tamano)
+        rango = _rango(request.headers.get('range'), archivo.tamano)
+    inicio, fin = rango or (0, None)
+    
+    try:
+        partes = await run_in_threadpool(almacenamiento.abrir, archivo.url, inicio, fin)
     except requests.exceptions.RequestException as e:
         raise HTTPException(status_code=500, detail=f"Error descargando archivo: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error procesando archivo: {str(e)}")
+    if partes is None:
+        raise HTTPException(status_code=404, detail="Archivo del plano no encontrado")
+    
+    if rango:
+        headers['Content-Range'] = f'bytes {inicio}-{fin}/{archivo.tamano}'
+        headers['Content-Length'] = str(fin - inicio + 1)
+    # El iterador es bloqueante: StreamingResponse lo recorre en el threadpool
+    return StreamingResponse(
+        partes, status_code=206 if rango else 200, media_type=archivo.media_type, headers=headers
+    )
 
 @router.put("/{plano_id}/modelo3d/objects", response_model=SuccessResponse)
 async def update_modelo3d_objects(
@@ -0,0 +1,153 @@
+"""
+Router para listas de precios por usuario y descuentos por volumen
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from database import get_db
+from middleware.auth_middleware import get_current_admin, get_current_user
+from models.usuario import Usuario
+from repositories.material_repository import MaterialRepository
+from repositories.precio_repository import PrecioRepository
+from schemas.precio_schemas import PrecioUsuarioItem, DescuentoVolumenCreate, DescuentoVolumenResponse
+from schemas.response_schemas import SuccessResponse
+from services.pricing_service import price_cache
+
+router = APIRouter(prefix="/precios", tags=["Precios"])
+
+@router.get(
+    "/mi-lista",
+    response_model=SuccessResponse,
+    summary="Obtener mi lista de precios",
+    description="Precios propios del usuario que reemplazan el precio base en sus cotizaciones"
+)
+def get_mi_lista(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    precios = PrecioRepository.get_user_prices(db, current_user.id)
+    
+    return SuccessResponse(
+        message="Lista de precios obtenida exitosamente",
+        data={
+            "precios": [{"material_id": m, "precio": p} for m, p in precios.items()],
+            "total": len(precios)
+        }
+    )
+
+@router.put(
+    "/mi-lista",
+    response_model=SuccessResponse,
+    summary="Actualizar mi lista de precios",
+    description="Crea o reemplaza el precio propio de los materiales enviados"
+)
+def put_mi_lista(
+    precios: List[PrecioUsuarioItem],
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    existentes = MaterialRepository.get_pricing_rows(db, (p.material_id for p in precios))
+    faltantes = sorted({p.material_id for p in precios} - existentes.keys())
+    if faltantes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Materiales no encontrados: {faltantes}"
+        )
+    
+    total = PrecioRepository.upsert_user_prices(db, current_user.id, precios)
+    price_cache.invalidate_usuario(current_user.id)
+    
+    return SuccessResponse(
+        message=f"{total} precios actualizados exitosamente",
+        data={"total": total}
+    )
+
+@router.delete(
+    "/mi-lista/{material_id}",
+    response_model=SuccessResponse,
+    summary="Quitar material de mi lista de precios",
+    description="El material vuelve a cotizarse con su precio base"
+)
+def delete_de_mi_lista(
+    material_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    if not PrecioRepository.delete_user_price(db, current_user.id, material_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"El material {material_id} no está en su lista de precios"
+        )
+    price_cache.invalidate_usuario(current_user.id)
+    
+    return SuccessResponse(
+        message="Precio eliminado de la lista exitosamente",
+        data={"material_id": material_id}
+    )
+
+@router.get(
+    "/descuentos",
+    response_model=SuccessResponse,
+    summary="Listar descuentos por volumen",
+    description="Obtiene los escalones de descuento por cantidad"
+)
+def get_descuentos(db: Session = Depends(get_db)):
+    descuentos = PrecioRepository.get_discounts(db)
+    
+    return SuccessResponse(
+        message="Descuentos obtenidos exitosamente",
+        data={
+            "descuentos": [DescuentoVolumenResponse.model_validate(d).model_dump(mode="json") for d in descuentos],
+            "total": len(descuentos)
+        }
+    )
+
+@router.post(
+    "/descuentos",
+    response_model=SuccessResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Crear descuento por volumen",
+    description="""
+    Crea un escalón de descuento. A cada línea se aplica el mayor porcentaje cuyo
+    `cantidad_minima` alcance, entre los descuentos de su material, de su categoría y los generales.
+    
+    **🔒 Permisos:** Solo administradores (`ADMIN_CORREOS`): el descuento aplica a las cotizaciones de todos los usuarios
+    """
+)
+def create_descuento(
+    descuento_data: DescuentoVolumenCreate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_admin)
+):
+    descuento = PrecioRepository.create_discount(db, descuento_data)
+    price_cache.invalidate_descuentos()
+    
+    return SuccessResponse(
+        message="Descuento creado exitosamente",
+        data=DescuentoVolumenResponse.model_validate(descuento).model_dump(mode="json")
+    )
+
+@router.delete(
+    "/descuentos/{descuento_id}",
+    response_model=SuccessResponse,
+    summary="Eliminar descuento por volumen",
+    description="Elimina un escalón de descuento (solo administradores, `ADMIN_CORREOS`)"
+)
+def delete_descuento(
+    descuento_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_admin)
+):
+    if not PrecioRepository.delete_discount(db, descuento_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Descuento con ID {descuento_id} no encontrado"
+        )
+    price_cache.invalidate_descuentos()
+    
+    return SuccessResponse(
+        message="Descuento eliminado exitosamente",
+        data={"id": descuento_id}
+    )
@@ -1,7 +1,6 @@
 # routers/register.py
 from fastapi import APIRouter, HTTPException, Depends, status
 from sqlalchemy.orm import Session
-import hashlib
 from database import get_db
 from repositories.user_repository import get_user_by_username
 from models.usuario import Usuario
@@ -10,6 +9,7 @@ from jose import jwt
 from config import settings
 from datetime import datetime, timedelta
 from schemas import RegisterRequest, RegisterResponse, ErrorResponse
+from services.password_service import hash_password
 
 router = APIRouter(
     prefix="/auth",
@@ -20,14 +20,6 @@ router = APIRouter(
     }
 )
 
-def hash_password(password: str) -> str:
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
-
 # Función para crear el token JWT
 def create_token(data: dict):
     data_token = data.copy()
@@ -46,7 +38,7 @@ def create_token(data: dict):
     - Crea una nueva cuenta de usuario
     - Valida que el correo no esté en uso
     - Devuelve un token JWT para autenticación inmediata
-    - La contraseña se almacena de forma segura (hash SHA-256)
+    - La contraseña se almacena de forma segura (hash bcrypt con sal)
     """,
     responses={
         201: {
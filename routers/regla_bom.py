@@ -0,0 +1,134 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from database import get_db
+from repositories.regla_bom_repository import ReglaBOMRepository
+from repositories.categoria_repository import CategoriaRepository
+from repositories.material_repository import MaterialRepository
+from schemas.regla_bom_schemas import ReglaBOMCreate, ReglaBOMUpdate, ReglaBOMResponse
+from schemas.response_schemas import SuccessResponse
+from middleware.auth_middleware import get_current_user
+from models.usuario import Usuario
+
+router = APIRouter(
+    prefix="/reglas-bom",
+    tags=["Reglas de Cómputo"]
+)
+
+def _validar_material_default(db: Session, material_id: Optional[int], categoria_id: int):
+    if material_id is None:
+        return
+    material = MaterialRepository.get_by_id(db, material_id)
+    if not material:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Material con ID {material_id} no encontrado"
+        )
+    if material.categoria_id != categoria_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El material {material_id} no pertenece a la categoría {categoria_id}"
+        )
+
+@router.post(
+    "/",
+    response_model=SuccessResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Crear regla de cómputo",
+    description="""
+    Crea una regla que convierte una medida del plano en cantidad de material
+    para una categoría y unidad de medida.
+    
+    Métricas: `area_piso`, `area_paredes`, `area_paredes_neta`, `area_ventanas`, `area_puertas`,
+    `perimetro_total`, `num_paredes`, `num_ventanas`, `num_puertas`, `num_aberturas`,
+    y por tipo de objeto `area:<tipo>`, `longitud:<tipo>`, `conteo:<tipo>`.
+    """
+)
+def create_regla(
+    regla_data: ReglaBOMCreate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    if not CategoriaRepository.get_by_id(db, regla_data.categoria_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Categoría con ID {regla_data.categoria_id} no encontrada"
+        )
+    _validar_material_default(db, regla_data.material_id, regla_data.categoria_id)
+    
+    regla = ReglaBOMRepository.create(db, regla_data)
+    
+    return SuccessResponse(
+        message="Regla creada exitosamente",
+        data=ReglaBOMResponse.model_validate(regla).model_dump(mode="json")
+    )
+
+@router.get(
+    "/",
+    response_model=SuccessResponse,
+    summary="Listar reglas de cómputo",
+    description="Obtiene las reglas de cómputo, opcionalmente filtradas por categoría"
+)
+def get_reglas(
+    categoria_id: Optional[int] = Query(None, description="Filtrar por categoría"),
+    solo_activas: bool = Query(False, description="Solo reglas activas"),
+    db: Session = Depends(get_db)
+):
+    reglas = ReglaBOMRepository.get_all(db, categoria_id=categoria_id, solo_activas=solo_activas)
+    
+    return SuccessResponse(
+        message="Reglas obtenidas exitosamente",
+        data={
+            "reglas": [ReglaBOMResponse.model_validate(r).model_dump(mode="json") for r in reglas],
+            "total": len(reglas)
+        }
+    )
+
+@router.put(
+    "/{regla_id}",
+    response_model=SuccessResponse,
+    summary="Actualizar regla de cómputo",
+    description="Actualiza la métrica, factor, desperdicio o material por defecto de una regla"
+)
+def update_regla(
+    regla_id: int,
+    regla_data: ReglaBOMUpdate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    regla = ReglaBOMRepository.get_by_id(db, regla_id)
+    if not regla:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Regla con ID {regla_id} no encontrada"
+        )
+    _validar_material_default(db, regla_data.material_id, regla.categoria_id)
+    
+    regla = ReglaBOMRepository.update(db, regla_id, regla_data)
+    
+    return SuccessResponse(
+        message="Regla actualizada exitosamente",
+        data=ReglaBOMResponse.model_validate(regla).model_dump(mode="json")
+    )
+
+@router.delete(
+    "/{regla_id}",
+    response_model=SuccessResponse,
+    summary="Eliminar regla de cómputo",
+    description="Elimina una regla de cómputo"
+)
+def delete_regla(
+    regla_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    if not ReglaBOMRepository.delete(db, regla_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Regla con ID {regla_id} no encontrada"
+        )
+    
+    return SuccessResponse(
+        message="Regla eliminada exitosamente",
+        data={"id": regla_id}
+    )
@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, Response
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from database import get_db
+from repositories.plano_repository import PlanoRepository
+from services.local_image_service import URL_PREFIX, local_image_service
+from services.storage_service import STORAGE_PREFIX, AlmacenamientoLocal
+
+router = APIRouter(
+    prefix=STORAGE_PREFIX,
+    tags=["Almacenamiento"]
+)
+
+def _ruta_firmada(ruta: str, metodo: str, expira: int, firma: str, tamano_max: int = 0, mime_type: str = ""):
+    if not AlmacenamientoLocal.verificar(metodo, ruta, expira, firma, tamano_max, mime_type):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Firma inválida o expirada"
+        )
+    archivo = local_image_service.path_for(f"{URL_PREFIX}/{ruta}")
+    if archivo is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Archivo no encontrado"
+        )
+    return archivo
+
+@router.get(
+    "/{ruta:path}",
+    summary="Descargar un archivo con URL firmada",
+    description="""
+    Sirve un archivo privado del almacenamiento local (`STORAGE_BACKEND=local`) con la URL
+    firmada que devuelve la API (`expira`, `firma`). Soporta `Range`.
+    """
+)
+def descargar(
+    ruta: str,
+    expira: int = Query(...),
+    firma: str = Query(...),
+    nombre: Optional[str] = Query(None, description="Nombre del archivo descargado")
+):
+    archivo = _ruta_firmada(ruta, "GET", expira, firma)
+    if not archivo.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Archivo no encontrado"
+        )
+    return FileResponse(archivo, filename=nombre, headers={"Cache-Control": "private, no-store"})
+
+@router.put(
+    "/{ruta:path}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Subir un archivo con URL firmada",
+    description="""
+    Recibe el cuerpo de una subida directa (`POST /planos/subidas`) y lo escribe de forma atómica.
+    La firma cubre la ruta, la expiración, el tamaño máximo y el `Content-Type`. El archivo se
+    escribe una sola vez y solo mientras el plano está pendiente: repetir el PUT antes de que
+    expire la firma no reemplaza un archivo ya subido (o ya validado por `confirmar`).
+    """
+)
+async def subir(
+    ruta: str,
+    request: Request,
+    expira: int = Query(...),
+    tamano_max: int = Query(..., gt=0),
+    firma: str = Query(...),
+    db: Session = Depends(get_db)
+):
+    mime_type = request.headers.get("content-type", "")
+    archivo = _ruta_firmada(ruta, "PUT", expira, firma, tamano_max, mime_type)
+    pendiente = await run_in_threadpool(PlanoRepository(db).existe_pendiente, f"{URL_PREFIX}/{ruta}")
+    if not pendiente or archivo.exists():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="El archivo ya fue subido o el plano ya no espera una subida"
+        )
+    if int(request.headers.get("content-length") or 0) > tamano_max:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"El archivo supera el máximo de {tamano_max} bytes"
+        )
+    try:
+        await local_image_service.save_stream(request.stream(), archivo, tamano_max, reemplazar=False)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except FileExistsError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="El archivo ya fue subido o el plano ya no espera una subida"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
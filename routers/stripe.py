@@ -1,7 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import stripe
 import logging
 from database import get_db
 from models.membresia import Membresia
@@ -10,15 +9,13 @@ from models.suscripcion import Suscripcion
 from repositories.suscripcion_repository import get_active_suscripcion_by_user_id
 from config import settings
 from middleware.auth_middleware import get_current_user
+from services.stripe_client import get_stripe
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
-# Configura tu clave secreta de Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 router = APIRouter(prefix="/api/stripe", tags=["stripe"])
 
 def crear_suscripcion_manual_interna(db: Session, usuario_id: int, membresia_id: int):
@@ -90,6 +87,7 @@ async def create_checkout_session(
     logger.info(f"📅 Duración: {membresia.duracion} días")
     logger.info(f"📝 Descripción: {membresia.descripcion}")
     
+    stripe = get_stripe()
     try:
         # Preparar datos para Stripe
         precio_en_centavos = int(membresia.precio * 100)
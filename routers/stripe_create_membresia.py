@@ -2,7 +2,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import stripe
 from config import settings
 from database import get_db
 from models.membresia import Membresia
@@ -12,8 +11,6 @@ from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/api/stripe", tags=["stripe"])
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 class SuscripcionCreateRequest(BaseModel):
     usuario_id: int
     membresia_id: int
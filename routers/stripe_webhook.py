@@ -7,15 +7,14 @@ from models.membresia import Membresia
 from models.suscripcion import Suscripcion
 from models.pago import Pago
 from config import settings
+from services.stripe_client import get_stripe
 from datetime import datetime, timedelta
-import stripe
 import logging
 import traceback
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/stripe", tags=["stripe-webhook"])
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 @router.post("/webhook")
 async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
@@ -25,6 +24,7 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     logger.info("=" * 80)
     logger.info("[WEBHOOK] Webhook recibido de Stripe")
     
+    stripe = get_stripe()
     try:
         event = stripe.Webhook.construct_event(
             payload, 
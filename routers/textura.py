@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, status, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from config import settings
+from services.local_image_service import CACHE_INMUTABLE
+from services.storage_service import almacenamiento_de
+from services.texture_store import texture_store
+
+router = APIRouter(
+    prefix="/texturas",
+    tags=["Texturas"]
+)
+
+@router.get(
+    "/{nombre}",
+    summary="Obtener una textura por su hash",
+    description="""
+    Sirve una textura del almacén direccionado por contenido (`<sha256>.<ext>`).
+    
+    La respuesta es inmutable (`Cache-Control: immutable`, `ETag` = hash). Las texturas guardadas
+    en Google Drive responden con una redirección permanente al archivo; las guardadas en S3, con una
+    redirección temporal a una URL prefirmada.
+    """
+)
+def get_textura(nombre: str, request: Request):
+    hash, _, extension = nombre.partition(".")
+    ubicacion = texture_store.resolver(hash)
+    if not ubicacion or ubicacion[0] != f".{extension}":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Textura {nombre} no encontrada"
+        )
+
+    _, mime_type, almacenamiento_url = ubicacion
+    headers = {"Cache-Control": CACHE_INMUTABLE, "ETag": f'"{hash}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    ruta = texture_store.ruta_local(almacenamiento_url)
+    if ruta is None:
+        almacenamiento = almacenamiento_de(almacenamiento_url)
+        destino = almacenamiento.url_descarga(almacenamiento_url) or almacenamiento_url
+        if almacenamiento.url_firmada:
+            # La URL prefirmada caduca: redirección temporal, cacheada menos que su vigencia
+            vigencia = settings.STORAGE_URL_EXPIRATION_SECONDS // 2
+            return RedirectResponse(destino, status_code=status.HTTP_302_FOUND, headers={
+                **headers, "Cache-Control": f"private, max-age={vigencia}"
+            })
+        return RedirectResponse(destino, status_code=status.HTTP_301_MOVED_PERMANENTLY, headers=headers)
+    if not ruta.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Textura {nombre} no encontrada"
+        )
+    return FileResponse(ruta, media_type=mime_type, headers=headers)
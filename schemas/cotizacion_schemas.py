@@ -2,7 +2,7 @@
 Schemas para Cotización
 """
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -14,6 +14,13 @@ class MaterialCotizacion(BaseModel):
     cantidad: float
     precio_unitario: float
     subtotal: float
+    unidad_medida: Optional[str] = None
+    descuento_pct: float = 0.0
+
+class LineaCotizacion(BaseModel):
+    """Línea solicitada: el servidor calcula precio, descuento y subtotal"""
+    material_id: int = Field(..., gt=0)
+    cantidad: float = Field(..., gt=0)
 
 class CotizacionCreate(BaseModel):
     """Schema para crear una cotización"""
@@ -22,14 +29,37 @@ class CotizacionCreate(BaseModel):
     cliente_email: EmailStr
     cliente_telefono: Optional[str] = None
     descripcion: Optional[str] = None
-    materiales: List[MaterialCotizacion]
-    subtotal: float
-    iva: float
-    total: float
+    materiales: List[LineaCotizacion] = Field(..., min_length=1)
+    # Enviados por clientes anteriores; se ignoran porque el servidor recalcula los totales
+    subtotal: Optional[float] = None
+    iva: Optional[float] = None
+    total: Optional[float] = None
     
     class Config:
         from_attributes = True
 
+class CotizacionPreviewRequest(BaseModel):
+    """Schema para calcular el precio de una cotización sin guardarla"""
+    materiales: List[LineaCotizacion] = Field(..., min_length=1)
+
+class CambioLinea(BaseModel):
+    """Línea modificada en una revisión: cantidad 0 elimina el material de la cotización"""
+    material_id: int = Field(..., gt=0)
+    cantidad: float = Field(..., ge=0)
+
+class CotizacionRevisionCreate(BaseModel):
+    """Schema para revisar una cotización enviando solo las líneas que cambian"""
+    cambios: List[CambioLinea] = Field(..., min_length=1)
+    nota: Optional[str] = None
+
+class CotizacionCloneRequest(BaseModel):
+    """Datos a reemplazar en la copia; lo que no se envía se copia de la cotización original"""
+    plano_id: Optional[int] = None
+    cliente_nombre: Optional[str] = None
+    cliente_email: Optional[EmailStr] = None
+    cliente_telefono: Optional[str] = None
+    descripcion: Optional[str] = None
+
 class CotizacionResponse(BaseModel):
     """Schema de respuesta para cotización"""
     id: int
@@ -26,6 +26,29 @@ class MaterialModelo3DCreate(BaseModel):
         }
     }
 
+# Schema para creación masiva: precio y unidad se toman del catálogo si no se envían
+class MaterialModelo3DBulkItem(BaseModel):
+    modelo3d_id: int = Field(..., gt=0, description="ID del modelo 3D")
+    material_id: int = Field(..., gt=0, description="ID del material")
+    cantidad: float = Field(..., gt=0, description="Cantidad utilizada")
+    unidad_medida: Optional[str] = Field(None, min_length=1, max_length=20, description="Unidad de medida (por defecto la del material)")
+    precio_unitario: Optional[float] = Field(None, ge=0, description="Precio unitario (por defecto Material.precio_base)")
+    
+    @field_validator('unidad_medida')
+    @classmethod
+    def unidad_lowercase(cls, v):
+        return v.lower().strip() if v is not None else v
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "modelo3d_id": 1,
+                "material_id": 5,
+                "cantidad": 45.5
+            }
+        }
+    }
+
 # Schema para actualización
 class MaterialModelo3DUpdate(BaseModel):
     cantidad: Optional[float] = Field(None, gt=0)
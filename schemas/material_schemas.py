@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 # Schema para creación
@@ -10,6 +10,7 @@ class MaterialCreate(BaseModel):
     precio_base: float = Field(..., ge=0, description="Precio base del material")
     unidad_medida: str = Field(..., min_length=1, max_length=20, description="Unidad de medida (m2, m3, unidad, kg, etc.)")
     imagen_url: Optional[str] = Field(None, description="URL de imagen del material")
+    imagen_variantes: Optional[Dict[str, str]] = Field(None, description="Derivados de la textura {\"ANCHOxALTO\": url}")
     categoria_id: int = Field(..., gt=0, description="ID de la categoría")
     
     @field_validator('codigo')
@@ -43,6 +44,7 @@ class MaterialUpdate(BaseModel):
     precio_base: Optional[float] = Field(None, ge=0)
     unidad_medida: Optional[str] = Field(None, min_length=1, max_length=20)
     imagen_url: Optional[str] = None
+    imagen_variantes: Optional[Dict[str, str]] = None
     categoria_id: Optional[int] = Field(None, gt=0)
     
     @field_validator('unidad_medida')
@@ -70,6 +72,7 @@ class MaterialResponse(BaseModel):
     precio_base: float
     unidad_medida: str
     imagen_url: Optional[str] = None
+    imagen_variantes: Optional[Dict[str, str]] = None
     categoria_id: int
     fecha_creacion: datetime
     fecha_actualizacion: datetime
@@ -19,6 +19,16 @@ class PlanoCreate(PlanoBase):
     """Esquema para crear un nuevo plano"""
     pass
 
+class PlanoSubidaCreate(PlanoBase):
+    """Esquema para iniciar la subida directa de un plano al almacenamiento"""
+    filename: str = Field(..., description="Nombre original del archivo", example="casa.png")
+    tamano: int = Field(..., gt=0, description="Tamaño del archivo en bytes", example=2_500_000)
+
+class PlanoSubidaResponse(BaseModel):
+    """Plano pendiente y datos para subir el archivo sin pasar por la API"""
+    plano_id: int = Field(..., description="ID del plano pendiente de confirmar")
+    subida: Dict[str, Any] = Field(..., description="metodo, url, campos/headers, ubicacion, expira_en")
+
 class PlanoUpdate(BaseModel):
     """Esquema para actualizar un plano"""
     nombre: Optional[str] = None
@@ -31,6 +41,8 @@ class PlanoResponse(PlanoBase):
     id: int = Field(..., description="ID único del plano", example=1)
     usuario_id: int = Field(..., description="ID del usuario propietario", example=1)
     url: Optional[str] = Field(None, description="URL del archivo", example="/uploads/plano1.jpg")
+    mime_type: Optional[str] = Field(None, description="Tipo del archivo", example="image/png")
+    tamano: Optional[int] = Field(None, description="Tamaño del archivo en bytes", example=2_500_000)
     estado: str = Field(..., description="Estado del plano", example="subido")
     fecha_subida: datetime = Field(..., description="Fecha de subida del plano")
     fecha_actualizacion: datetime = Field(..., description="Fecha de última actualización")
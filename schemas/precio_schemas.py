@@ -0,0 +1,44 @@
+"""
+Schemas para listas de precios por usuario y descuentos por volumen
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+class PrecioUsuarioItem(BaseModel):
+    """Precio propio de un material en la lista del usuario"""
+    material_id: int = Field(..., gt=0, description="ID del material")
+    precio: float = Field(..., ge=0, description="Precio unitario a usar en las cotizaciones del usuario")
+
+class DescuentoVolumenCreate(BaseModel):
+    """Schema para crear un descuento por volumen"""
+    material_id: Optional[int] = Field(None, gt=0, description="Material al que aplica (vacío = todos)")
+    categoria_id: Optional[int] = Field(None, gt=0, description="Categoría a la que aplica (vacío = todas)")
+    cantidad_minima: float = Field(..., gt=0, description="Cantidad desde la que aplica el descuento")
+    porcentaje: float = Field(..., gt=0, lt=100, description="Porcentaje de descuento")
+    activo: bool = True
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "categoria_id": 1,
+                "cantidad_minima": 100,
+                "porcentaje": 5
+            }
+        }
+    }
+
+class DescuentoVolumenResponse(BaseModel):
+    """Schema de respuesta para descuento por volumen"""
+    id: int
+    material_id: Optional[int] = None
+    categoria_id: Optional[int] = None
+    cantidad_minima: float
+    porcentaje: float
+    activo: bool
+    fecha_creacion: datetime
+    
+    model_config = {
+        "from_attributes": True
+    }
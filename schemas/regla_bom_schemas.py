@@ -0,0 +1,104 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, Optional
+from datetime import datetime
+
+# Métricas derivadas de medidas_extraidas; además se admiten "area:<tipo>", "longitud:<tipo>"
+# y "conteo:<tipo>" por tipo de objeto del modelo (wall, window, door, floor, ...)
+METRICAS_BASE = {
+    "area_piso", "area_paredes", "area_paredes_neta", "area_ventanas", "area_puertas",
+    "perimetro_total", "num_paredes", "num_ventanas", "num_puertas", "num_aberturas",
+}
+PREFIJOS_METRICA = ("area:", "longitud:", "conteo:")
+
+def validar_metrica(v: str) -> str:
+    v = v.strip()
+    if v in METRICAS_BASE or (v.startswith(PREFIJOS_METRICA) and v.split(":", 1)[1]):
+        return v
+    raise ValueError(
+        f"Métrica '{v}' no soportada. Use una de {sorted(METRICAS_BASE)} o area:<tipo>, longitud:<tipo>, conteo:<tipo>"
+    )
+
+# Schema para creación
+class ReglaBOMCreate(BaseModel):
+    nombre: str = Field(..., min_length=1, max_length=100, description="Nombre descriptivo de la regla")
+    categoria_id: int = Field(..., gt=0, description="Categoría de materiales a la que aplica")
+    unidad_medida: str = Field(..., min_length=1, max_length=20, description="Unidad de los materiales a la que aplica")
+    metrica: str = Field(..., description="Medida del plano que origina la cantidad")
+    factor: float = Field(1.0, gt=0, description="Cantidad de material por unidad de la métrica")
+    desperdicio_pct: float = Field(0.0, ge=0, le=100, description="Porcentaje de desperdicio")
+    redondear_arriba: bool = Field(False, description="Redondear la cantidad al entero superior")
+    material_id: Optional[int] = Field(None, gt=0, description="Material por defecto si no se elige uno")
+    activa: bool = True
+    
+    @field_validator('unidad_medida')
+    @classmethod
+    def unidad_lowercase(cls, v):
+        return v.lower().strip()
+    
+    @field_validator('metrica')
+    @classmethod
+    def metrica_valida(cls, v):
+        return validar_metrica(v)
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "nombre": "Pintura de muros (2 manos)",
+                "categoria_id": 2,
+                "unidad_medida": "m2",
+                "metrica": "area_paredes_neta",
+                "factor": 2.0,
+                "desperdicio_pct": 10,
+                "material_id": 4
+            }
+        }
+    }
+
+# Schema para actualización
+class ReglaBOMUpdate(BaseModel):
+    nombre: Optional[str] = Field(None, min_length=1, max_length=100)
+    metrica: Optional[str] = None
+    factor: Optional[float] = Field(None, gt=0)
+    desperdicio_pct: Optional[float] = Field(None, ge=0, le=100)
+    redondear_arriba: Optional[bool] = None
+    material_id: Optional[int] = Field(None, gt=0)
+    activa: Optional[bool] = None
+    
+    @field_validator('metrica')
+    @classmethod
+    def metrica_valida(cls, v):
+        return validar_metrica(v) if v is not None else v
+
+# Schema para respuesta
+class ReglaBOMResponse(BaseModel):
+    id: int
+    nombre: str
+    categoria_id: int
+    unidad_medida: str
+    metrica: str
+    factor: float
+    desperdicio_pct: float
+    redondear_arriba: bool
+    material_id: Optional[int] = None
+    activa: bool
+    fecha_creacion: datetime
+    
+    model_config = {
+        "from_attributes": True
+    }
+
+# Schema para generar el cómputo de un modelo 3D
+class GenerarBOMRequest(BaseModel):
+    seleccion: Dict[int, int] = Field(
+        default_factory=dict,
+        description="Material elegido por categoría ({categoria_id: material_id}); si falta se usa el de la regla"
+    )
+    categoria_id: Optional[int] = Field(None, gt=0, description="Calcular solo las reglas de esta categoría")
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "seleccion": {"1": 3, "2": 4}
+            }
+        }
+    }
@@ -1,11 +1,9 @@
 # services/auth_service.py
-from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
 from config import settings
 from repositories.user_repository import get_user_by_username
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from services.password_service import verify_password
 
 # Autenticación de usuario
 
@@ -13,7 +11,7 @@ def authenticate_user(db, username, password):
     user = get_user_by_username(db, username)
     if not user:
         return False
-    if not pwd_context.verify(password, user.contrasena):
+    if not verify_password(password, user.contrasena):
         return False
     return user
 
@@ -0,0 +1,181 @@
+"""
+Cómputo automático de materiales (BOM) a partir de las medidas de un plano
+
+Las reglas (ReglaBOM) definen, por categoría y unidad de medida, qué métrica del plano
+origina la cantidad de material. El cálculo se hace en dos pasadas lineales:
+1. Una pasada sobre los objetos del modelo agrega área, longitud y conteo por tipo.
+2. Cada regla se resuelve con una búsqueda en ese diccionario de métricas.
+Así el costo es O(objetos + reglas) en lugar de O(objetos × reglas).
+"""
+
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.modelo3d import Modelo3D
+from models.plano import Plano
+from models.regla_bom import ReglaBOM
+from repositories.material_modelo3d_repository import MaterialModelo3DRepository
+from repositories.material_repository import MaterialRepository
+from repositories.regla_bom_repository import ReglaBOMRepository
+
+def _dimensiones(obj: Dict[str, Any]) -> Tuple[str, float, float]:
+    """(tipo, ancho, área) de un objeto en formato medidas_extraidas o Three.js"""
+    if "tipo" in obj:
+        ancho = obj.get("ancho") or 0
+        area = obj.get("area")
+        if area is None:
+            area = ancho * (obj.get("alto") or 0)
+        return obj["tipo"], ancho, area
+    dimensions = obj.get("dimensions") or {}
+    ancho = dimensions.get("width") or 0
+    return obj.get("type", ""), ancho, ancho * (dimensions.get("height") or 0)
+
+def calcular_metricas(medidas: Optional[Dict[str, Any]], objetos: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """Métricas del plano: totales de medidas_extraidas y área/longitud/conteo por tipo de objeto"""
+    medidas = medidas or {}
+    por_tipo = defaultdict(lambda: [0.0, 0.0, 0])  # [área, longitud, conteo]
+    for obj in objetos:
+        tipo, ancho, area = _dimensiones(obj)
+        acumulado = por_tipo[tipo]
+        acumulado[0] += area
+        acumulado[1] += ancho
+        acumulado[2] += 1
+
+    metricas: Dict[str, float] = {}
+    for tipo, (area, longitud, conteo) in por_tipo.items():
+        metricas[f"area:{tipo}"] = area
+        metricas[f"longitud:{tipo}"] = longitud
+        metricas[f"conteo:{tipo}"] = conteo
+
+    # Los totales guardados en medidas_extraidas tienen prioridad; si faltan se derivan de los objetos
+    area_paredes = medidas.get("area_paredes", metricas.get("area:wall", 0.0))
+    area_ventanas = medidas.get("area_ventanas", metricas.get("area:window", 0.0))
+    area_puertas = medidas.get("area_puertas", metricas.get("area:door", 0.0))
+    num_ventanas = medidas.get("num_ventanas", metricas.get("conteo:window", 0))
+    num_puertas = medidas.get("num_puertas", metricas.get("conteo:door", 0))
+    metricas.update({
+        "area_piso": medidas.get("area_total", 0.0),
+        "area_paredes": area_paredes,
+        "area_ventanas": area_ventanas,
+        "area_puertas": area_puertas,
+        "area_paredes_neta": max(area_paredes - area_ventanas - area_puertas, 0.0),
+        "perimetro_total": medidas.get("perimetro_total", metricas.get("longitud:wall", 0.0)),
+        "num_paredes": medidas.get("num_paredes", metricas.get("conteo:wall", 0)),
+        "num_ventanas": num_ventanas,
+        "num_puertas": num_puertas,
+        "num_aberturas": num_ventanas + num_puertas,
+    })
+    return metricas
+
+def calcular_bom(
+    metricas: Dict[str, float],
+    reglas: List[ReglaBOM],
+    materiales: Dict[int, Any],
+    seleccion: Dict[int, int],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Aplicar las reglas a las métricas. Devuelve (líneas por material, reglas omitidas con motivo).
+    `materiales` son filas de MaterialRepository.get_pricing_rows.
+    """
+    cantidades: Dict[int, float] = defaultdict(float)
+    reglas_por_material: Dict[int, List[int]] = defaultdict(list)
+    omitidas = []
+
+    for regla in reglas:
+        material_id = seleccion.get(regla.categoria_id) or regla.material_id
+        material = materiales.get(material_id)
+        if material is None:
+            omitidas.append({"regla_id": regla.id, "motivo": "Sin material seleccionado para la categoría"})
+            continue
+        if material.categoria_id != regla.categoria_id:
+            omitidas.append({"regla_id": regla.id, "motivo": f"El material {material_id} no pertenece a la categoría {regla.categoria_id}"})
+            continue
+        if material.unidad_medida.lower() != regla.unidad_medida:
+            # La regla es para otra unidad de la misma categoría (p. ej. m2 vs unidad)
+            continue
+
+        cantidad = metricas.get(regla.metrica, 0.0) * regla.factor * (1 + regla.desperdicio_pct / 100)
+        if regla.redondear_arriba:
+            cantidad = math.ceil(cantidad)
+        if cantidad > 0:
+            cantidades[material_id] += cantidad
+            reglas_por_material[material_id].append(regla.id)
+
+    lineas = []
+    for material_id, cantidad in cantidades.items():
+        material = materiales[material_id]
+        cantidad = round(cantidad, 3)
+        lineas.append({
+            "material_id": material_id,
+            "nombre": material.nombre,
+            "categoria_id": material.categoria_id,
+            "cantidad": cantidad,
+            "unidad_medida": material.unidad_medida,
+            "precio_unitario": material.precio_base,
+            "subtotal": round(cantidad * material.precio_base, 2),
+            "reglas": reglas_por_material[material_id],
+        })
+    return lineas, omitidas
+
+def generar_bom(
+    db: Session,
+    modelo3d_id: int,
+    usuario_id: int,
+    seleccion: Optional[Dict[int, int]] = None,
+    categoria_id: Optional[int] = None,
+    guardar: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Calcular (y opcionalmente guardar) el cómputo de materiales de un modelo 3D del usuario.
+    Al guardar, las líneas de los mismos materiales se reemplazan con un único INSERT masivo.
+    Devuelve None si el modelo no existe o no pertenece al usuario.
+    """
+    seleccion = seleccion or {}
+    fila = db.query(Plano.medidas_extraidas).join(Modelo3D, Modelo3D.plano_id == Plano.id).filter(
+        Modelo3D.id == modelo3d_id, Plano.usuario_id == usuario_id
+    ).first()
+    if fila is None:
+        return None
+
+    medidas = fila.medidas_extraidas or {}
+    objetos = medidas.get("objetos")
+    if objetos is None:
+        # Planos antiguos sin detalle de objetos: usar la escena del modelo
+        datos = db.query(Modelo3D.datos_json).filter(Modelo3D.id == modelo3d_id).scalar() or {}
+        objetos = datos.get("objects", [])
+
+    metricas = calcular_metricas(medidas, objetos)
+    reglas = ReglaBOMRepository.get_all(db, categoria_id=categoria_id, solo_activas=True)
+    materiales = MaterialRepository.get_pricing_rows(
+        db, [*seleccion.values(), *(r.material_id for r in reglas if r.material_id)]
+    )
+    lineas, omitidas = calcular_bom(metricas, reglas, materiales, seleccion)
+
+    if guardar and lineas:
+        MaterialModelo3DRepository.delete_by_modelo3d_and_materials(db, modelo3d_id, [l["material_id"] for l in lineas])
+        ids = MaterialModelo3DRepository.create_bulk(db, [
+            {
+                "modelo3d_id": modelo3d_id,
+                "material_id": l["material_id"],
+                "cantidad": l["cantidad"],
+                "unidad_medida": l["unidad_medida"],
+                "precio_unitario": l["precio_unitario"],
+                "subtotal": l["subtotal"],
+            }
+            for l in lineas
+        ])
+        for linea, nuevo_id in zip(lineas, ids):
+            linea["id"] = nuevo_id
+
+    return {
+        "modelo3d_id": modelo3d_id,
+        "guardado": guardar and bool(lineas),
+        "total_objetos": len(objetos),
+        "total_reglas": len(reglas),
+        "costo_total": round(sum(l["subtotal"] for l in lineas), 2),
+        "materiales": lineas,
+        "reglas_omitidas": omitidas,
+    }
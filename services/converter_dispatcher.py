@@ -0,0 +1,160 @@
+"""
+Reparto de conversiones entre réplicas de FloorPlanTo3D-API
+
+FLOORPLAN_API_URLS lista las réplicas (separadas por coma; vacío = solo FLOORPLAN_API_URL).
+Cada conversión va a la réplica viva con menos peticiones en curso desde este worker (empates
+en turno rotativo). Una réplica que no responde (error de conexión) se marca caída y su
+conversión se reintenta en otra; un hilo de health checks consulta cada
+CONVERTER_HEALTH_INTERVAL_SECONDS a todas, también a las caídas, y las vuelve a incluir en
+cuanto responden. Un timeout no se reintenta: la réplica está viva y para el verificador
+significa que el archivo no se pudo procesar.
+
+El conteo de peticiones en curso es por worker de FastAPI: con varios workers cada uno reparte
+por su cuenta, lo que con menos-peticiones-en-curso sigue equilibrando bien la carga.
+"""
+
+import itertools
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import settings
+
+@dataclass
+class Replica:
+    url: str
+    viva: bool = True
+    en_curso: int = 0
+    atendidas: int = 0
+    fallos: int = 0
+    ultimo_error: Optional[str] = None
+
+class ConverterDispatcher:
+    """Elegir réplica, convertir y mantener el estado de salud de cada una"""
+
+    def __init__(self, urls: List[str], health_path: str = "/health", intervalo: float = 10, pool: int = 32):
+        if not urls:
+            raise ValueError("Se necesita al menos una URL de FloorPlanTo3D-API")
+        self.replicas = [Replica(url.rstrip("/")) for url in urls]
+        self.health_path = health_path
+        self.intervalo = intervalo
+        self._turno = itertools.count()
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+        self._cerrado = threading.Event()
+        # Conexiones keep-alive a las réplicas compartidas por los hilos del worker
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_connections=len(urls), pool_maxsize=pool))
+        self._session.mount("https://", HTTPAdapter(pool_connections=len(urls), pool_maxsize=pool))
+
+    def _elegir(self, excluidas: set) -> Optional[Replica]:
+        with self._lock:
+            candidatas = [r for r in self.replicas if r.viva and r.url not in excluidas]
+            if not candidatas:
+                # Todas caídas: probar igual antes de fallar (el health check puede ir atrasado)
+                candidatas = [r for r in self.replicas if r.url not in excluidas]
+            if not candidatas:
+                return None
+            inicio = next(self._turno) % len(candidatas)
+            rotadas = candidatas[inicio:] + candidatas[:inicio]
+            replica = min(rotadas, key=lambda r: r.en_curso)
+            replica.en_curso += 1
+            return replica
+
+    def _marcar(self, replica: Replica, viva: bool, error: Optional[str] = None):
+        with self._lock:
+            if replica.viva and not viva:
+                print(f"⚠️ Conversor {replica.url} fuera de servicio: {error}")
+            elif not replica.viva and viva:
+                print(f"✅ Conversor {replica.url} disponible nuevamente")
+            replica.viva = viva
+            if error:
+                replica.fallos += 1
+                replica.ultimo_error = error
+
+    def convertir(self, filename: str, file_content: bytes, timeout: float = 60,
+                  mime_type: str = "image/png", formato: str = "threejs") -> requests.Response:
+        """
+        POST /convert en la réplica con menos peticiones en curso. Los errores de conexión
+        se reintentan en las demás réplicas; si todas fallan se relanza el último.
+        """
+        self._iniciar_monitor()
+        excluidas, ultimo_error = set(), None
+        while True:
+            replica = self._elegir(excluidas)
+            if replica is None:
+                raise ultimo_error
+            try:
+                response = self._session.post(
+                    f"{replica.url}/convert",
+                    files={"file": (filename, file_content, mime_type)},
+                    params={"format": formato},
+                    timeout=timeout
+                )
+            except requests.exceptions.ConnectionError as e:
+                self._marcar(replica, viva=False, error=str(e))
+                excluidas.add(replica.url)
+                ultimo_error = e
+                continue
+            finally:
+                with self._lock:
+                    replica.en_curso -= 1
+            with self._lock:
+                replica.atendidas += 1
+            if response.status_code in (502, 503, 504):
+                # La réplica (o su proxy) no está atendiendo; un 500 del conversor significa "no es un plano"
+                self._marcar(replica, viva=False, error=f"HTTP {response.status_code}")
+            # Solo el health check la reincorpora: una respuesta que ya venía en camino no prueba que siga viva
+            return response
+
+    def verificar(self):
+        """Health check de todas las réplicas: cualquier respuesta HTTP menor a 500 cuenta como viva"""
+        for replica in self.replicas:
+            try:
+                response = self._session.get(f"{replica.url}{self.health_path}", timeout=2)
+                if response.status_code < 500:
+                    self._marcar(replica, viva=True)
+                else:
+                    self._marcar(replica, viva=False, error=f"health check HTTP {response.status_code}")
+            except requests.exceptions.RequestException as e:
+                self._marcar(replica, viva=False, error=str(e))
+
+    def _iniciar_monitor(self):
+        """Hilo de health checks, creado con la primera conversión (no al importar la API)"""
+        if self._monitor is not None or len(self.replicas) == 1:
+            return
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._vigilar, name="converter-health", daemon=True)
+                self._monitor.start()
+
+    def _vigilar(self):
+        while not self._cerrado.wait(self.intervalo):
+            self.verificar()
+
+    def cerrar(self):
+        """Detener los health checks y cerrar las conexiones a las réplicas"""
+        self._cerrado.set()
+        self._session.close()
+
+    def estado(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {"url": r.url, "viva": r.viva, "en_curso": r.en_curso, "atendidas": r.atendidas,
+                 "fallos": r.fallos, "ultimo_error": r.ultimo_error}
+                for r in self.replicas
+            ]
+
+@lru_cache(maxsize=1)
+def get_converter_dispatcher() -> ConverterDispatcher:
+    """Dispatcher del worker, creado en el primer uso"""
+    urls = [url.strip() for url in settings.FLOORPLAN_API_URLS.split(",") if url.strip()]
+    return ConverterDispatcher(
+        urls or [settings.FLOORPLAN_API_URL],
+        health_path=settings.CONVERTER_HEALTH_PATH,
+        intervalo=settings.CONVERTER_HEALTH_INTERVAL_SECONDS,
+    )
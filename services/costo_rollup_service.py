@@ -0,0 +1,105 @@
+"""
+Costos materializados por modelo 3D y por (modelo 3D, categoría)
+
+costos_modelo3d y costos_modelo3d_categoria se mantienen en la misma transacción que
+modifica materiales_modelo3d: cada flush o INSERT/UPDATE/DELETE masivo del ORM anota en
+session.info los modelos afectados, y antes del commit se recalculan solo esos modelos con
+un DELETE + INSERT … SELECT. Así las lecturas de costos son una búsqueda por clave primaria.
+
+Las sentencias Core sobre la tabla (p. ej. la importación de precios) no pasan por estos
+eventos y deben ajustar los totales con CostoModelo3DRepository.ajustar_subtotales.
+El verificador compara los totales con un agregado completo de las líneas y puede repararlos.
+"""
+
+from typing import Iterable
+
+from sqlalchemy import distinct, event, inspect, select
+from sqlalchemy.orm import Session
+
+from models.material import Material
+from models.material_modelo3d import MaterialModelo3D
+from repositories.costo_modelo3d_repository import CostoModelo3DRepository
+
+_PENDIENTES = "costos_pendientes"
+
+def _pendientes(session: Session) -> dict:
+    return session.info.setdefault(_PENDIENTES, {"modelos": set(), "materiales": set()})
+
+def marcar_modelos(db: Session, modelo3d_ids: Iterable[int]):
+    """Recalcular los costos de estos modelos al hacer commit"""
+    _pendientes(db)["modelos"].update(modelo3d_ids)
+
+def marcar_materiales(db: Session, material_ids: Iterable[int]):
+    """Recalcular al hacer commit los modelos que usan estos materiales (p. ej. cambió su categoría)"""
+    _pendientes(db)["materiales"].update(material_ids)
+
+@event.listens_for(Session, "after_flush")
+def _collect_line_changes(session, flush_context):
+    modelos, materiales = set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, MaterialModelo3D):
+            modelos.add(obj.modelo3d_id)
+            # Una línea movida a otro modelo también cambia el total del modelo anterior
+            modelos.update(inspect(obj).attrs.modelo3d_id.history.deleted or ())
+        elif isinstance(obj, Material) and obj in session.dirty:
+            if inspect(obj).attrs.categoria_id.history.has_changes():
+                materiales.add(obj.id)
+    modelos.discard(None)
+    if modelos:
+        marcar_modelos(session, modelos)
+    if materiales:
+        marcar_materiales(session, materiales)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_line_bulk_changes(orm_execute_state):
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.local_table is not MaterialModelo3D.__table__:
+        return
+    session = orm_execute_state.session
+    if orm_execute_state.is_insert:
+        parametros = orm_execute_state.parameters or []
+        if isinstance(parametros, dict):
+            parametros = [parametros]
+        marcar_modelos(session, (fila["modelo3d_id"] for fila in parametros if "modelo3d_id" in fila))
+    elif orm_execute_state.is_update or orm_execute_state.is_delete:
+        # Los modelos afectados se leen con el mismo WHERE antes de ejecutar la sentencia
+        lineas = MaterialModelo3D.__table__
+        consulta = select(distinct(lineas.c.modelo3d_id))
+        if orm_execute_state.statement.whereclause is not None:
+            consulta = consulta.where(orm_execute_state.statement.whereclause)
+        marcar_modelos(session, session.execute(consulta).scalars().all())
+
+@event.listens_for(Session, "before_commit")
+def _refresh_rollups(session):
+    session.flush()  # Commit todavía no hizo flush: las líneas pendientes se anotan ahora
+    pendientes = session.info.pop(_PENDIENTES, None)
+    if not pendientes:
+        return
+    modelos = set(pendientes["modelos"])
+    if pendientes["materiales"]:
+        modelos |= CostoModelo3DRepository.get_modelos_by_materiales(session, pendientes["materiales"])
+    if modelos:
+        CostoModelo3DRepository.recalcular(session, modelos)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rollups(session):
+    session.info.pop(_PENDIENTES, None)
+
+def verificar(db: Session, reparar: bool = False) -> dict:
+    """
+    Comparar los costos materializados con el agregado de materiales_modelo3d.
+    Con `reparar=True` recalcula los modelos inconsistentes y hace commit.
+    """
+    inconsistentes = CostoModelo3DRepository.get_inconsistentes(db)
+    modelos = inconsistentes["modelos"] | inconsistentes["categorias"]
+    reparados = 0
+    if reparar and modelos:
+        reparados = CostoModelo3DRepository.recalcular(db, modelos)
+        db.commit()
+    return {
+        "consistente": not modelos,
+        "modelos_inconsistentes": len(inconsistentes["modelos"]),
+        "modelos_con_categorias_inconsistentes": len(inconsistentes["categorias"]),
+        "modelo3d_ids": sorted(modelos)[:100],
+        "reparados": reparados,
+    }
@@ -0,0 +1,211 @@
+"""
+Documentos de cotización (PDF/XLSX) generados en el servidor
+
+El render (services/documento_render.py) es CPU-bound, así que corre en un pool de procesos
+acotado para no bloquear el event loop ni competir por el GIL. Las consultas de sus datos y las
+imágenes (miniatura del plano y texturas de los materiales) se leen antes, en el threadpool; las
+imágenes solo desde el almacenamiento de la aplicación: imagen_url la edita el usuario y el render
+no debe abrir rutas ni URL arbitrarias.
+Los documentos terminados se guardan en memoria por (cotizacion_id, formato) junto con la
+fecha_actualizacion con la que se generaron: una descarga repetida de la misma versión se
+responde desde la caché, y cualquier cambio de la cotización la invalida por sí solo.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from models.material import Material
+from models.plano import Plano
+from services.documento_render import render_pdf, render_xlsx
+from services.storage_service import almacenamiento_de, es_ubicacion_guardada
+from services.texture_store import hash_de, texture_store
+
+FORMATOS = {
+    "pdf": ("application/pdf", render_pdf),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", render_xlsx),
+}
+
+def cargar_datos(db: Session, cotizacion, items: List[dict]) -> dict:
+    """Dict plano (serializable para el pool de procesos) con todo lo que necesita el render"""
+    plano = db.query(Plano.nombre, Plano.url).filter(Plano.id == cotizacion.plano_id).first()
+    material_ids = {item["material_id"] for item in items}
+    imagenes = dict(
+        db.query(Material.id, Material.imagen_url).filter(Material.id.in_(material_ids), Material.imagen_url.isnot(None))
+    ) if material_ids else {}
+    subtotal = cotizacion.subtotal or 0.0
+    return {
+        "id": cotizacion.id,
+        "cliente_nombre": cotizacion.cliente_nombre,
+        "cliente_email": cotizacion.cliente_email,
+        "cliente_telefono": cotizacion.cliente_telefono,
+        "descripcion": cotizacion.descripcion,
+        "fecha_creacion": cotizacion.fecha_creacion.strftime("%d/%m/%Y %H:%M"),
+        "plano_nombre": plano.nombre if plano else None,
+        "plano_url": plano.url if plano else None,
+        "materiales": [{**item, "imagen_url": imagenes.get(item["material_id"])} for item in items],
+        "subtotal": subtotal,
+        "iva": cotizacion.iva,
+        "total": cotizacion.total,
+        "iva_porcentaje": round(cotizacion.iva / subtotal * 100, 2) if subtotal else settings.IVA_PORCENTAJE,
+    }
+
+def leer_imagen(url: Optional[str]) -> Optional[bytes]:
+    """
+    Bytes de una imagen guardada por la aplicación: /texturas/<hash>.<ext> (almacén de texturas)
+    o una ubicación de almacenamiento (/uploads/..., s3://, Drive). Cualquier otra cosa -URL
+    externas, rutas del disco- devuelve None.
+    """
+    hash = hash_de(url)
+    if hash and url.startswith("/texturas/"):
+        ubicacion = texture_store.resolver(hash)
+        url = ubicacion[2] if ubicacion else None
+    if not es_ubicacion_guardada(url):
+        return None
+    try:
+        return almacenamiento_de(url).leer(url)
+    except Exception as e:
+        print(f"⚠️ Imagen no disponible para el documento ({url}): {e}")
+        return None
+
+def leer_imagenes(datos: dict) -> Dict[str, Optional[bytes]]:
+    """{url: bytes} de la miniatura del plano y de las imágenes de los materiales (cada URL una vez)"""
+    urls = {datos.get("plano_url"), *(item.get("imagen_url") for item in datos["materiales"])}
+    return {url: leer_imagen(url) for url in urls if url}
+
+class RenderNoDisponible(Exception):
+    """El pool de render se rompió dos veces seguidas (-> 503)"""
+
+class DocumentCache:
+    """LRU acotada por bytes: {(cotizacion_id, formato): (fecha_actualizacion, documento)}"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._documentos: "OrderedDict[Tuple[int, str], Tuple[datetime, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, cotizacion_id: int, formato: str, version: datetime) -> Optional[bytes]:
+        with self._lock:
+            entrada = self._documentos.get((cotizacion_id, formato))
+            if entrada is None or entrada[0] != version:
+                return None
+            self._documentos.move_to_end((cotizacion_id, formato))
+            return entrada[1]
+
+    def put(self, cotizacion_id: int, formato: str, version: datetime, documento: bytes):
+        if len(documento) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._documentos.pop((cotizacion_id, formato), None)
+            if anterior:
+                self._bytes -= len(anterior[1])
+            self._documentos[(cotizacion_id, formato)] = (version, documento)
+            self._bytes += len(documento)
+            while self._bytes > self.max_bytes:
+                _, (_, descartado) = self._documentos.popitem(last=False)
+                self._bytes -= len(descartado)
+
+    def invalidate(self, cotizacion_id: Optional[int] = None):
+        with self._lock:
+            if cotizacion_id is None:
+                self._documentos.clear()
+                self._bytes = 0
+                return
+            for formato in FORMATOS:
+                entrada = self._documentos.pop((cotizacion_id, formato), None)
+                if entrada:
+                    self._bytes -= len(entrada[1])
+
+class CotizacionDocumentService:
+    """Render en pool de procesos + caché por versión + deduplicación de renders simultáneos"""
+
+    def __init__(self, workers: int, cache_max_bytes: int):
+        self.workers = workers
+        self.cache = DocumentCache(cache_max_bytes)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._en_curso: Dict[Tuple[int, str, datetime], asyncio.Future] = {}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Se crea en el primer uso; "spawn" evita heredar hilos y conexiones abiertas del servidor
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def obtener(self, db: Session, cotizacion, formato: str, cargar_items) -> bytes:
+        """
+        Documento de la cotización en `formato`. `cargar_items()` devuelve sus líneas y solo
+        se llama si hay que renderizar (en un acierto de caché no se consulta nada más).
+        """
+        version = cotizacion.fecha_actualizacion
+        documento = self.cache.get(cotizacion.id, formato, version)
+        if documento is not None:
+            return documento
+
+        clave = (cotizacion.id, formato, version)
+        en_curso = self._en_curso.get(clave)
+        if en_curso is not None:
+            return await asyncio.shield(en_curso)
+
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._en_curso[clave] = futuro
+        try:
+            # Consultas e imágenes son E/S síncrona: en el threadpool, fuera del event loop
+            datos = await run_in_threadpool(self._preparar, db, cotizacion, cargar_items)
+            documento = await self._render(formato, datos)
+            self.cache.put(cotizacion.id, formato, version, documento)
+            futuro.set_result(documento)
+            return documento
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception()  # Marcar como recuperada si nadie más la esperaba
+            raise
+        finally:
+            self._en_curso.pop(clave, None)
+
+    @staticmethod
+    def _preparar(db: Session, cotizacion, cargar_items) -> dict:
+        """Datos del render con las líneas y las imágenes ya leídas"""
+        datos = cargar_datos(db, cotizacion, cargar_items())
+        datos["imagenes"] = leer_imagenes(datos)
+        return datos
+
+    async def _render(self, formato: str, datos: dict) -> bytes:
+        """
+        Render en el pool de procesos. Si un proceso murió el pool queda roto para todas las
+        descargas: se reemplaza y se reintenta una vez; si vuelve a romperse, RenderNoDisponible.
+        """
+        _, render = FORMATOS[formato]
+        loop = asyncio.get_running_loop()
+        for intento in range(2):
+            pool = self._pool()
+            try:
+                return await loop.run_in_executor(pool, render, datos)
+            except BrokenProcessPool:
+                if self._executor is pool:  # Otra descarga ya pudo reemplazarlo
+                    self._executor = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                print(f"⚠️ Pool de documentos roto (intento {intento + 1}): se recrea")
+        raise RenderNoDisponible("El generador de documentos no está disponible. Intenta nuevamente")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+cotizacion_documentos = CotizacionDocumentService(
+    workers=settings.DOCUMENT_RENDER_WORKERS,
+    cache_max_bytes=settings.DOCUMENT_CACHE_MAX_MB * 1024 * 1024,
+)
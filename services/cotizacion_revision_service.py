@@ -0,0 +1,182 @@
+"""
+Revisiones de cotizaciones guardadas como deltas
+
+Una revisión recibe solo las líneas que cambian. Se cotizan esas líneas con el motor de
+precios, se aplican sobre cotizacion_items (que siempre contiene la versión vigente) y se
+guarda el delta con la línea anterior y la nueva. Así revisar cuesta O(cambios) y cualquier
+versión anterior se reconstruye deshaciendo deltas desde la vigente; las versiones ya
+reconstruidas quedan en una caché LRU porque una revisión nunca cambia.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.cotizacion_revision import CotizacionRevision
+from repositories.cotizacion_repository import CotizacionRepository, ITEM_CAMPOS
+from repositories.cotizacion_revision_repository import CotizacionRevisionRepository
+from services.pricing_service import cotizar, recalcular_totales
+
+class CambiosInvalidos(Exception):
+    """La revisión no se puede aplicar (material inexistente en la cotización, sin cambios, etc.)"""
+
+def _sin_id(linea: dict) -> dict:
+    """Copia de la línea para el delta: campos de MaterialCotizacion + posicion"""
+    return {campo: linea[campo] for campo in ("posicion",) + ITEM_CAMPOS}
+
+def _totales(cotizacion) -> dict:
+    return {"subtotal": cotizacion.subtotal, "iva": cotizacion.iva, "total": cotizacion.total}
+
+def crear_revision(
+    db: Session, cotizacion, usuario_id: int, cambios: List[Tuple[int, float]], nota: Optional[str] = None
+) -> CotizacionRevision:
+    """
+    Aplicar `cambios` ((material_id, cantidad); cantidad 0 elimina) a la cotización y guardar la revisión.
+    Las líneas nuevas o con otra cantidad se cotizan con los precios y descuentos vigentes.
+    """
+    cotizacion_repo = CotizacionRepository(db)
+    revision_repo = CotizacionRevisionRepository(db)
+
+    solicitados: Dict[int, float] = {}
+    for material_id, cantidad in cambios:
+        solicitados[material_id] = cantidad  # Si un material se repite, gana el último
+    actuales = cotizacion_repo.get_items_by_material(cotizacion.id, solicitados)
+
+    faltantes = [m for m, cantidad in solicitados.items() if cantidad == 0 and m not in actuales]
+    if faltantes:
+        raise CambiosInvalidos(f"Materiales que no están en la cotización: {faltantes}")
+    eliminar = [actuales[m] for m, cantidad in solicitados.items() if cantidad == 0]
+    a_cotizar = [
+        (m, cantidad) for m, cantidad in solicitados.items()
+        if cantidad > 0 and (m not in actuales or actuales[m]["cantidad"] != cantidad)
+    ]
+    if not eliminar and not a_cotizar:
+        raise CambiosInvalidos("La revisión no cambia ninguna línea")
+
+    num_lineas, ultima_posicion = cotizacion_repo.get_item_stats(cotizacion.id)
+    nuevos = sum(1 for m, _ in a_cotizar if m not in actuales)
+    if num_lineas - len(eliminar) + nuevos < 1:
+        raise CambiosInvalidos("La cotización debe conservar al menos un material")
+
+    precio = cotizar(db, usuario_id, a_cotizar)  # MaterialesNoEncontrados si alguno no existe
+
+    delta, actualizar, insertar = [], [], []
+    subtotal = Decimal(str(cotizacion.subtotal))
+    for linea in eliminar:
+        delta.append({"material_id": linea["material_id"], "antes": _sin_id(linea), "despues": None})
+        subtotal -= Decimal(str(linea["subtotal"]))
+    for nueva in precio.materiales:
+        anterior = actuales.get(nueva["material_id"])
+        if anterior is None:
+            ultima_posicion += 1
+            nueva = {"posicion": ultima_posicion, **nueva}
+            insertar.append(nueva)
+        else:
+            nueva = {"posicion": anterior["posicion"], **nueva}
+            actualizar.append({"id": anterior["id"], **nueva})
+            subtotal -= Decimal(str(anterior["subtotal"]))
+        subtotal += Decimal(str(nueva["subtotal"]))
+        delta.append({
+            "material_id": nueva["material_id"],
+            "antes": _sin_id(anterior) if anterior else None,
+            "despues": nueva,
+        })
+
+    totales = recalcular_totales(subtotal)
+    revision = revision_repo.add(CotizacionRevision(
+        cotizacion_id=cotizacion.id,
+        numero=revision_repo.get_last_numero(cotizacion.id) + 1,
+        usuario_id=usuario_id,
+        nota=nota,
+        cambios={"lineas": delta, "totales_antes": _totales(cotizacion)},
+        subtotal=float(totales.subtotal),
+        iva=float(totales.iva),
+        total=float(totales.total),
+    ))
+    cotizacion_repo.apply_item_changes(cotizacion.id, actualizar, insertar, [linea["id"] for linea in eliminar])
+    # Los totales de la fila siguen a la versión vigente (listados, PDF y su caché por fecha_actualizacion)
+    cotizacion.subtotal = revision.subtotal
+    cotizacion.iva = revision.iva
+    cotizacion.total = revision.total
+    # Explícita: si los totales no cambian (p. ej. se reemplaza una línea por otra del mismo
+    # importe) no hay UPDATE de la fila y onupdate no se dispararía, dejando el PDF anterior en caché
+    cotizacion.fecha_actualizacion = datetime.utcnow()
+    db.commit()
+    db.refresh(revision)
+    return revision
+
+class RevisionCache:
+    """LRU de versiones reconstruidas: {(cotizacion_id, numero): versión}"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._versiones: "OrderedDict[Tuple[int, int], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cotizacion_id: int, numero: int) -> Optional[dict]:
+        with self._lock:
+            version = self._versiones.get((cotizacion_id, numero))
+            if version is not None:
+                self._versiones.move_to_end((cotizacion_id, numero))
+            return version
+
+    def put(self, cotizacion_id: int, numero: int, version: dict):
+        with self._lock:
+            self._versiones[(cotizacion_id, numero)] = version
+            self._versiones.move_to_end((cotizacion_id, numero))
+            while len(self._versiones) > self.max_entries:
+                self._versiones.popitem(last=False)
+
+    def invalidate(self, cotizacion_id: Optional[int] = None):
+        with self._lock:
+            if cotizacion_id is None:
+                self._versiones.clear()
+            else:
+                for clave in [c for c in self._versiones if c[0] == cotizacion_id]:
+                    del self._versiones[clave]
+
+revision_cache = RevisionCache(max_entries=settings.REVISION_CACHE_MAX_ENTRIES)
+
+def materializar(db: Session, cotizacion, numero: int) -> Optional[dict]:
+    """
+    Cotización completa tal como quedó en la revisión `numero` (0 = versión original):
+    {"numero", "materiales", "subtotal", "iva", "total"}. None si la revisión no existe.
+    """
+    version = revision_cache.get(cotizacion.id, numero)
+    if version is not None:
+        return version
+
+    revision_repo = CotizacionRevisionRepository(db)
+    deltas = revision_repo.get_deltas_after(cotizacion.id, numero)
+    if numero > 0 and not deltas and not revision_repo.get_by_numero(cotizacion.id, numero):
+        return None
+
+    # Partir de la versión vigente y deshacer las revisiones posteriores, de la más nueva a la más antigua
+    lineas = {
+        linea["material_id"]: linea
+        for linea in CotizacionRepository(db).get_items([cotizacion.id], ("posicion",) + ITEM_CAMPOS)[cotizacion.id]
+    }
+    totales = _totales(cotizacion)
+    for _, cambios in deltas:
+        for cambio in cambios["lineas"]:
+            if cambio["antes"] is None:
+                lineas.pop(cambio["material_id"], None)
+            else:
+                lineas[cambio["material_id"]] = cambio["antes"]
+        totales = cambios["totales_antes"]
+
+    version = {
+        "numero": numero,
+        "materiales": [
+            {campo: linea[campo] for campo in ITEM_CAMPOS}
+            for linea in sorted(lineas.values(), key=lambda linea: linea["posicion"])
+        ],
+        **totales,
+    }
+    revision_cache.put(cotizacion.id, numero, version)
+    return version
@@ -0,0 +1,379 @@
+"""
+Render de documentos de cotización (PDF y XLSX) sin dependencias externas
+
+Este módulo solo usa la biblioteca estándar (y Pillow si está instalado, para imágenes
+que no son JPEG): se ejecuta en los procesos del pool de cotizacion_documento_service,
+así que no importa config, base de datos ni routers. Las funciones reciben un dict
+plano (ver cotizacion_documento_service.cargar_datos) y devuelven los bytes del archivo.
+Tampoco lee archivos ni URLs: las imágenes llegan ya leídas en datos["imagenes"] ({url: bytes}).
+"""
+
+import io
+import zipfile
+import zlib
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+# Página A4 en puntos
+ANCHO_PAGINA, ALTO_PAGINA = 595, 842
+MARGEN = 40
+
+# Anchos de Helvetica (AFM, milésimas de em) para ASCII 32..126; el resto se aproxima con 556
+_ANCHOS_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+def ancho_texto(texto: str, tam: float, negrita: bool = False) -> float:
+    """Ancho aproximado en puntos (la negrita es ~5% más ancha)"""
+    milesimas = sum(_ANCHOS_HELVETICA[ord(c) - 32] if 32 <= ord(c) <= 126 else 556 for c in texto)
+    return milesimas * tam / 1000 * (1.05 if negrita else 1.0)
+
+def recortar(texto: str, ancho_max: float, tam: float, negrita: bool = False) -> str:
+    """Recortar con '...' para que el texto quepa en `ancho_max`"""
+    texto = texto or ""
+    if ancho_texto(texto, tam, negrita) <= ancho_max:
+        return texto
+    while texto and ancho_texto(texto + "...", tam, negrita) > ancho_max:
+        texto = texto[:-1]
+    return texto + "..."
+
+def envolver(texto: str, ancho_max: float, tam: float, max_lineas: int = 4) -> List[str]:
+    """Partir un párrafo en líneas por palabras"""
+    lineas, actual = [], ""
+    for palabra in (texto or "").split():
+        candidata = f"{actual} {palabra}".strip()
+        if ancho_texto(candidata, tam) <= ancho_max:
+            actual = candidata
+            continue
+        if actual:
+            lineas.append(actual)
+        actual = palabra
+    if actual:
+        lineas.append(actual)
+    if len(lineas) > max_lineas:
+        lineas = lineas[:max_lineas]
+        lineas[-1] = recortar(lineas[-1] + " ...", ancho_max, tam)
+    return lineas
+
+def moneda(valor: float) -> str:
+    return f"${valor:,.2f}"
+
+def numero(valor: float) -> str:
+    return f"{valor:,.3f}".rstrip("0").rstrip(".")
+
+# --- Imágenes -------------------------------------------------------------------------
+
+def _dimensiones_jpeg(datos: bytes) -> Optional[Tuple[int, int, int]]:
+    """(ancho, alto, componentes) leídos del marcador SOF de un JPEG"""
+    i = 2
+    while i + 9 < len(datos):
+        if datos[i] != 0xFF:
+            return None
+        marcador = datos[i + 1]
+        largo = int.from_bytes(datos[i + 2:i + 4], "big")
+        if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):
+            alto = int.from_bytes(datos[i + 5:i + 7], "big")
+            ancho = int.from_bytes(datos[i + 7:i + 9], "big")
+            return ancho, alto, datos[i + 9]
+        i += 2 + largo
+    return None
+
+def cargar_imagen(datos: Optional[bytes], lado_max: int) -> Optional[Tuple[bytes, int, int, int]]:
+    """
+    Imagen lista para incrustar en el PDF como JPEG: (bytes, ancho, alto, componentes).
+    Con Pillow se reduce a `lado_max` píxeles y se convierte cualquier formato; sin Pillow
+    solo se incrustan JPEG tal cual. Devuelve None si la imagen no está disponible.
+    """
+    if not datos:
+        return None
+    try:
+        try:
+            from PIL import Image
+        except ImportError:
+            if datos[:2] != b"\xff\xd8":
+                return None
+            dimensiones = _dimensiones_jpeg(datos)
+            return (datos, *dimensiones) if dimensiones and dimensiones[2] in (1, 3) else None
+        with Image.open(io.BytesIO(datos)) as imagen:
+            imagen.thumbnail((lado_max, lado_max))
+            imagen = imagen.convert("RGB")
+            salida = io.BytesIO()
+            imagen.save(salida, format="JPEG", quality=80)
+            return salida.getvalue(), imagen.width, imagen.height, 3
+    except Exception as e:
+        print(f"⚠️ Imagen no disponible para el documento: {e}")
+        return None
+
+# --- PDF ------------------------------------------------------------------------------
+
+def _pdf_texto(texto: str) -> bytes:
+    """Cadena PDF literal en WinAnsiEncoding (cubre acentos y ñ)"""
+    datos = str(texto).encode("cp1252", errors="replace")
+    return b"(" + datos.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+class _Pagina:
+    """Operadores de contenido de una página"""
+
+    def __init__(self):
+        self.operaciones: List[bytes] = []
+        self.imagenes: Dict[str, int] = {}
+
+    def texto(self, x: float, y: float, texto: str, tam: float = 9, negrita: bool = False):
+        fuente = b"/F2" if negrita else b"/F1"
+        self.operaciones.append(b"BT %s %.1f Tf %.2f %.2f Td %s Tj ET" % (fuente, tam, x, y, _pdf_texto(texto)))
+
+    def texto_derecha(self, x: float, y: float, texto: str, tam: float = 9, negrita: bool = False):
+        self.texto(x - ancho_texto(texto, tam, negrita), y, texto, tam, negrita)
+
+    def linea(self, x1: float, y1: float, x2: float, y2: float, gris: float = 0.75):
+        self.operaciones.append(b"%.2f G 0.5 w %.2f %.2f m %.2f %.2f l S" % (gris, x1, y1, x2, y2))
+
+    def rectangulo(self, x: float, y: float, ancho: float, alto: float, gris: float = 0.93):
+        self.operaciones.append(b"%.2f g %.2f %.2f %.2f %.2f re f 0 g" % (gris, x, y, ancho, alto))
+
+    def imagen(self, nombre: str, objeto: int, x: float, y: float, ancho: float, alto: float):
+        self.imagenes[nombre] = objeto
+        self.operaciones.append(b"q %.2f 0 0 %.2f %.2f %.2f cm /%s Do Q" % (ancho, alto, x, y, nombre.encode()))
+
+class _DocumentoPDF:
+    """Escritor PDF 1.4 mínimo: fuentes estándar Helvetica, imágenes JPEG y contenido comprimido"""
+
+    def __init__(self):
+        # 1: catálogo, 2: árbol de páginas (se escriben al final), 3-4: fuentes
+        self.objetos: List[Optional[bytes]] = [None, None]
+        self.agregar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self.agregar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        self.paginas: List[_Pagina] = []
+
+    def agregar(self, contenido: bytes) -> int:
+        self.objetos.append(contenido)
+        return len(self.objetos)
+
+    def agregar_stream(self, diccionario: bytes, datos: bytes) -> int:
+        return self.agregar(b"<< %s /Length %d >>\nstream\n%s\nendstream" % (diccionario, len(datos), datos))
+
+    def agregar_imagen(self, imagen: Tuple[bytes, int, int, int]) -> int:
+        datos, ancho, alto, componentes = imagen
+        espacio = b"/DeviceGray" if componentes == 1 else b"/DeviceRGB"
+        return self.agregar_stream(
+            b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s /BitsPerComponent 8 /Filter /DCTDecode"
+            % (ancho, alto, espacio),
+            datos,
+        )
+
+    def nueva_pagina(self) -> _Pagina:
+        pagina = _Pagina()
+        self.paginas.append(pagina)
+        return pagina
+
+    def bytes(self) -> bytes:
+        kids = []
+        for pagina in self.paginas:
+            contenido = self.agregar_stream(b"/Filter /FlateDecode", zlib.compress(b"\n".join(pagina.operaciones)))
+            xobjects = b" ".join(b"/%s %d 0 R" % (nombre.encode(), obj) for nombre, obj in pagina.imagenes.items())
+            kids.append(self.agregar(
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> /XObject << %s >> >> >>"
+                % (ANCHO_PAGINA, ALTO_PAGINA, contenido, xobjects)
+            ))
+        self.objetos[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+        self.objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+        )
+
+        salida = io.BytesIO()
+        salida.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for numero_objeto, contenido in enumerate(self.objetos, start=1):
+            offsets.append(salida.tell())
+            salida.write(b"%d 0 obj\n%s\nendobj\n" % (numero_objeto, contenido))
+        inicio_xref = salida.tell()
+        salida.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.objetos) + 1))
+        for offset in offsets:
+            salida.write(b"%010d 00000 n \n" % offset)
+        salida.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.objetos) + 1, inicio_xref))
+        return salida.getvalue()
+
+# Columnas de la tabla de materiales: (título, x, ancho, alineación)
+_COLUMNAS = [
+    ("Material", MARGEN + 30, 150, "izq"),
+    ("Categoría", MARGEN + 184, 90, "izq"),
+    ("Cantidad", MARGEN + 330, 52, "der"),
+    ("Unidad", MARGEN + 336, 40, "izq"),
+    ("P. unitario", MARGEN + 425, 58, "der"),
+    ("Desc.", MARGEN + 462, 30, "der"),
+    ("Subtotal", ANCHO_PAGINA - MARGEN, 60, "der"),
+]
+_ALTO_FILA = 28
+_LADO_MINIATURA = 24
+
+def _encabezado_tabla(pagina: _Pagina, y: float) -> float:
+    pagina.rectangulo(MARGEN, y - 6, ANCHO_PAGINA - 2 * MARGEN, 18)
+    for titulo, x, _, alineacion in _COLUMNAS:
+        if alineacion == "der":
+            pagina.texto_derecha(x, y, titulo, 8, negrita=True)
+        else:
+            pagina.texto(x, y, titulo, 8, negrita=True)
+    return y - 22
+
+def render_pdf(datos: dict) -> bytes:
+    """PDF de la cotización: datos del cliente, miniatura del plano, materiales con imagen y totales"""
+    pdf = _DocumentoPDF()
+    pagina = pdf.nueva_pagina()
+    y = ALTO_PAGINA - MARGEN - 10
+
+    pagina.texto(MARGEN, y, f"Cotización #{datos['id']}", 18, negrita=True)
+    y -= 22
+    pagina.texto(MARGEN, y, f"Fecha: {datos['fecha_creacion']}", 9)
+    y -= 20
+    for etiqueta, valor in (
+        ("Cliente", datos["cliente_nombre"]),
+        ("Email", datos["cliente_email"]),
+        ("Teléfono", datos.get("cliente_telefono")),
+        ("Plano", datos.get("plano_nombre")),
+    ):
+        if valor:
+            pagina.texto(MARGEN, y, f"{etiqueta}:", 9, negrita=True)
+            pagina.texto(MARGEN + 55, y, recortar(valor, 280, 9), 9)
+            y -= 13
+    for linea in envolver(datos.get("descripcion"), 330, 9):
+        pagina.texto(MARGEN, y, linea, 9)
+        y -= 12
+
+    # Miniatura del plano en la esquina superior derecha
+    imagenes_leidas = datos.get("imagenes") or {}
+    miniatura = cargar_imagen(imagenes_leidas.get(datos.get("plano_url")), 480)
+    if miniatura:
+        _, ancho, alto, _ = miniatura
+        escala = min(160 / ancho, 120 / alto)
+        objeto = pdf.agregar_imagen(miniatura)
+        pagina.imagen("Plano", objeto, ANCHO_PAGINA - MARGEN - ancho * escala,
+                      ALTO_PAGINA - MARGEN - alto * escala, ancho * escala, alto * escala)
+        y = min(y, ALTO_PAGINA - MARGEN - 130)
+
+    y = _encabezado_tabla(pagina, y - 16)
+    imagenes: Dict[str, Optional[int]] = {}
+    for i, item in enumerate(datos["materiales"]):
+        if y < MARGEN + _ALTO_FILA:
+            pagina = pdf.nueva_pagina()
+            y = _encabezado_tabla(pagina, ALTO_PAGINA - MARGEN - 10)
+        url = item.get("imagen_url")
+        if url and url not in imagenes:
+            imagen = cargar_imagen(imagenes_leidas.get(url), 96)
+            imagenes[url] = pdf.agregar_imagen(imagen) if imagen else None
+        if url and imagenes[url]:
+            pagina.imagen(f"M{imagenes[url]}", imagenes[url], MARGEN, y - 8, _LADO_MINIATURA, _LADO_MINIATURA)
+        valores = [
+            item["nombre"], item["categoria"], numero(item["cantidad"]), item.get("unidad_medida") or "",
+            moneda(item["precio_unitario"]), f"{numero(item.get('descuento_pct') or 0)}%", moneda(item["subtotal"]),
+        ]
+        for valor, (_, x, ancho, alineacion) in zip(valores, _COLUMNAS):
+            if alineacion == "der":
+                pagina.texto_derecha(x, y, valor, 8)
+            else:
+                pagina.texto(x, y, recortar(valor, ancho, 8), 8)
+        pagina.linea(MARGEN, y - 12, ANCHO_PAGINA - MARGEN, y - 12)
+        y -= _ALTO_FILA
+
+    if y < MARGEN + 60:
+        pagina = pdf.nueva_pagina()
+        y = ALTO_PAGINA - MARGEN - 10
+    y -= 6
+    for etiqueta, valor, negrita in (
+        ("Subtotal", datos["subtotal"], False),
+        (f"IVA ({numero(datos['iva_porcentaje'])}%)", datos["iva"], False),
+        ("Total", datos["total"], True),
+    ):
+        pagina.texto_derecha(ANCHO_PAGINA - MARGEN - 90, y, etiqueta, 10, negrita)
+        pagina.texto_derecha(ANCHO_PAGINA - MARGEN, y, moneda(valor), 10, negrita)
+        y -= 15
+    return pdf.bytes()
+
+# --- XLSX -----------------------------------------------------------------------------
+
+def _columna(indice: int) -> str:
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def _celda(fila: int, columna: int, valor) -> str:
+    referencia = f"{_columna(columna)}{fila}"
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c r="{referencia}"><v>{valor}</v></c>'
+    return f'<c r="{referencia}" t="inlineStr"><is><t xml:space="preserve">{escape(str(valor))}</t></is></c>'
+
+def render_xlsx(datos: dict) -> bytes:
+    """Planilla de la cotización (una hoja, sin imágenes) en formato Office Open XML"""
+    filas = [
+        [f"Cotización #{datos['id']}"],
+        ["Fecha", datos["fecha_creacion"]],
+        ["Cliente", datos["cliente_nombre"]],
+        ["Email", datos["cliente_email"]],
+        ["Teléfono", datos.get("cliente_telefono") or ""],
+        ["Plano", datos.get("plano_nombre") or ""],
+        ["Descripción", datos.get("descripcion") or ""],
+        [],
+        ["Material ID", "Material", "Categoría", "Cantidad", "Unidad", "Precio unitario", "Descuento %", "Subtotal"],
+    ]
+    for item in datos["materiales"]:
+        filas.append([
+            item["material_id"], item["nombre"], item["categoria"], item["cantidad"], item.get("unidad_medida") or "",
+            item["precio_unitario"], item.get("descuento_pct") or 0, item["subtotal"],
+        ])
+    filas += [
+        [],
+        ["", "", "", "", "", "", "Subtotal", datos["subtotal"]],
+        ["", "", "", "", "", "", f"IVA {numero(datos['iva_porcentaje'])}%", datos["iva"]],
+        ["", "", "", "", "", "", "Total", datos["total"]],
+    ]
+    hoja = "".join(
+        f'<row r="{i}">' + "".join(_celda(i, j, v) for j, v in enumerate(fila) if v != "") + "</row>"
+        for i, fila in enumerate(filas, start=1)
+    )
+    anchos = [12, 40, 24, 12, 10, 16, 14, 14]
+    columnas = "".join(f'<col min="{i}" max="{i}" width="{w}" customWidth="1"/>' for i, w in enumerate(anchos, start=1))
+
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as xlsx:
+        xlsx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ))
+        xlsx.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        xlsx.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="Cotización {datos["id"]}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        xlsx.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'
+        ))
+        xlsx.writestr("xl/worksheets/sheet1.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'<cols>{columnas}</cols><sheetData>{hoja}</sheetData></worksheet>'
+        ))
+    return salida.getvalue()
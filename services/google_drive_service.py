@@ -5,12 +5,8 @@ Servicio real para manejar archivos en Google Drive
 import os
 import json
 import io
+from functools import lru_cache
 from typing import Optional
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
 from config import settings
 
 class GoogleDriveService:
@@ -27,6 +23,11 @@ class GoogleDriveService:
         
     def authenticate(self):
         """Autenticación real con Google Drive"""
+        # Imports diferidos: el cliente de Google es pesado y solo se necesita al primer uso
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+
         try:
             # Cargar credenciales existentes
             if os.path.exists('token.json'):
@@ -88,6 +89,7 @@ class GoogleDriveService:
             }
             
             # Crear objeto de media
+            from googleapiclient.http import MediaIoBaseUpload
             media = MediaIoBaseUpload(
                 io.BytesIO(file_content),
                 mimetype=mime_type,
@@ -194,5 +196,7 @@ class GoogleDriveService:
             print(f"❌ Error haciendo público el archivo {file_id}: {e}")
             return False
 
-# Instancia global del servicio
-google_drive_service = GoogleDriveService()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_google_drive_service() -> GoogleDriveService:
+    """Instancia global del servicio, creada en el primer uso"""
+    return GoogleDriveService()
\ No newline at end of file
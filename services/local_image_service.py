@@ -1,76 +1,160 @@
 """
-Servicio alternativo para guardar imágenes localmente (fallback si Google Drive falla)
+Almacenamiento local de imágenes: fallback si Google Drive falla y almacenamiento principal
+en despliegues sin conexión (TEXTURE_STORAGE=local)
+
+Los archivos se reparten en subdirectorios por los primeros caracteres del SHA-256 de su
+nombre (textures/ab/cd/<nombre>) para que ningún directorio crezca sin límite, y se escriben
+en un temporal del mismo directorio que se renombra al final: un lector nunca ve un archivo
+a medio escribir. Los nombres son únicos (hash del contenido o marca de tiempo) y un archivo
+nunca cambia, así que /uploads/textures se sirve con Cache-Control immutable (ArchivosInmutables,
+montado en main.py) con Range y, si el servidor anuncia la extensión ASGI pathsend, sendfile.
+Las demás carpetas (p. ej. planos) son privadas: solo se leen con URL firmadas
+(services/storage_service.py, routers/storage.py).
 """
 
+import hashlib
 import os
-import shutil
+import tempfile
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 from pathlib import Path
 
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from config import settings
+
+# El contenido de una URL de /uploads o /texturas nunca cambia: el navegador puede guardarlo un año
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+URL_PREFIX = "/uploads"
+
 class LocalImageService:
     """Servicio para guardar imágenes localmente"""
-    
-    def __init__(self):
-        # Directorio donde se guardarán las imágenes
-        self.upload_dir = Path("uploads/textures")
-        self.upload_dir.mkdir(parents=True, exist_ok=True)
-        
+
+    def __init__(self, base_dir: str):
+        # Directorio donde se guardarán las imágenes (textures/ se sirve en /uploads/textures)
+        # Los directorios se crean con el primer archivo: importar el módulo no escribe en el disco
+        self.base_dir = Path(base_dir)
+        self.upload_dir = self.base_dir / "textures"
+
+    def _ruta(self, filename: str, carpeta: str = "textures") -> Path:
+        """<carpeta>/ab/cd/<nombre>, con ab/cd tomados del hash del nombre"""
+        clave = hashlib.sha256(filename.encode()).hexdigest()
+        return self.base_dir / carpeta / clave[:2] / clave[2:4] / filename
+
+    def url_for(self, file_path: Path) -> str:
+        return f"{URL_PREFIX}/{file_path.relative_to(self.base_dir).as_posix()}"
+
+    def ubicacion(self, filename: str, carpeta: str = "textures") -> str:
+        """URL que tendrá un archivo guardado con save_as (sin escribirlo)"""
+        return self.url_for(self._ruta(Path(filename).name, carpeta))
+
+    def path_for(self, image_url: str) -> Optional[Path]:
+        """Archivo en disco de una URL /uploads/... (None si la URL no es local o sale del directorio)"""
+        if not image_url.startswith(f"{URL_PREFIX}/"):
+            return None
+        ruta = (self.base_dir / image_url[len(URL_PREFIX) + 1:]).resolve()
+        if not ruta.is_relative_to(self.base_dir.resolve()):
+            return None
+        return ruta
+
     def upload_image(self, file_content: bytes, filename: str, material_name: str) -> Optional[str]:
         """
         Guardar imagen localmente
-        
+
         Args:
             file_content: Contenido del archivo en bytes
             filename: Nombre original del archivo
             material_name: Nombre del material
-            
+
         Returns:
             URL relativa del archivo guardado
         """
+        # Generar nombre único
+        extension = Path(filename).suffix.lower()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_name = material_name.replace(" ", "_").lower()
+        return self.save_as(file_content, f"texture_{safe_name}_{timestamp}{extension}")
+
+    def save_as(self, file_content: bytes, filename: str, carpeta: str = "textures") -> Optional[str]:
+        """Guardar con un nombre ya único (p. ej. hash del contenido); devuelve la URL relativa"""
+        file_path = self._ruta(Path(filename).name, carpeta)
+        temporal = None
         try:
-            # Generar nombre único
-            extension = Path(filename).suffix.lower()
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_name = material_name.replace(" ", "_").lower()
-            new_filename = f"texture_{safe_name}_{timestamp}{extension}"
-            
-            # Ruta completa del archivo
-            file_path = self.upload_dir / new_filename
-            
-            # Guardar archivo
-            with open(file_path, 'wb') as f:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            # Temporal en el mismo directorio: os.replace es atómico dentro del mismo sistema de archivos
+            descriptor, temporal = tempfile.mkstemp(dir=file_path.parent, prefix=".tmp-")
+            with os.fdopen(descriptor, 'wb') as f:
                 f.write(file_content)
-            
-            # Retornar URL relativa (para servir con FastAPI)
-            relative_url = f"/uploads/textures/{new_filename}"
-            
-            print(f"✅ Imagen guardada localmente: {file_path}")
-            print(f"🔗 URL: {relative_url}")
-            
-            return relative_url
-            
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, file_path)
+            return self.url_for(file_path)
         except Exception as e:
             print(f"❌ Error guardando imagen localmente: {e}")
+            if temporal and os.path.exists(temporal):
+                os.unlink(temporal)
             return None
-    
+
+    async def save_stream(self, chunks: AsyncIterator[bytes], file_path: Path, tamano_max: int,
+                          reemplazar: bool = True) -> int:
+        """
+        Escribir un cuerpo recibido por partes con la misma escritura atómica que save_as.
+        ValueError (y nada escrito) si supera `tamano_max` bytes; devuelve el tamaño.
+        Con `reemplazar=False` FileExistsError si el archivo ya existe (también si otra
+        escritura termina antes: el enlace final es atómico).
+        """
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=file_path.parent, prefix=".tmp-")
+        tamano = 0
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                async for chunk in chunks:
+                    tamano += len(chunk)
+                    if tamano > tamano_max:
+                        raise ValueError(f"El archivo supera el máximo de {tamano_max} bytes")
+                    await run_in_threadpool(f.write, chunk)
+                await run_in_threadpool(os.fsync, f.fileno())
+            if reemplazar:
+                os.replace(temporal, file_path)
+            else:
+                os.link(temporal, file_path)
+                os.unlink(temporal)
+            return tamano
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
     def delete_image(self, image_url: str) -> bool:
         """Eliminar imagen local"""
         try:
-            # Extraer nombre del archivo de la URL
-            filename = Path(image_url).name
-            file_path = self.upload_dir / filename
-            
-            if file_path.exists():
+            file_path = self.path_for(image_url)
+
+            if file_path and file_path.exists():
                 file_path.unlink()
                 print(f"✅ Imagen eliminada: {file_path}")
                 return True
             else:
-                print(f"⚠️ Imagen no encontrada: {file_path}")
+                print(f"⚠️ Imagen no encontrada: {image_url}")
                 return False
-                
+
         except Exception as e:
             print(f"❌ Error eliminando imagen: {e}")
             return False
 
-local_image_service = LocalImageService()
+class ArchivosInmutables(StaticFiles):
+    """StaticFiles con Cache-Control immutable (FileResponse ya resuelve Range, If-None-Match y pathsend)"""
+
+    async def check_config(self) -> None:
+        # Mientras no se guardó ninguna textura el directorio no existe: 404 en lugar de error
+        if os.path.isdir(self.directory):
+            await super().check_config()
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = CACHE_INMUTABLE
+        return response
+
+local_image_service = LocalImageService(settings.LOCAL_STORAGE_DIR)
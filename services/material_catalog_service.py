@@ -0,0 +1,252 @@
+"""
+Catálogo de materiales cacheado en memoria para GET /materiales/ y GET /categorias/
+
+Las páginas se guardan ya serializadas (JSON + ETag) por (categoría, búsqueda, skip, limit).
+Las categorías con su conteo de materiales forman una sola instantánea que además sirve para
+agregar la categoría a cada material sin hacer JOIN.
+Cualquier commit que toque materiales o categorías sube la versión del catálogo y
+descarta las entradas; el TTL cubre escrituras hechas por otros workers.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.categoria import Categoria
+from models.material import Material
+from repositories.categoria_repository import CategoriaRepository
+from repositories.material_repository import MaterialRepository
+
+_CATALOG_TABLES = {Material.__tablename__, Categoria.__tablename__}
+
+def material_to_dict(material: Material, categorias: Optional[Dict[int, dict]] = None) -> dict:
+    """
+    Representación pública de un material con su categoría: tomada de `categorias`
+    (instantánea {id: categoría}) si se pasa, o de la relación si está cargada
+    """
+    data = {
+        "id": material.id,
+        "codigo": material.codigo,
+        "nombre": material.nombre,
+        "descripcion": material.descripcion,
+        "precio_base": material.precio_base,
+        "unidad_medida": material.unidad_medida,
+        "imagen_url": material.imagen_url,
+        "imagen_variantes": material.imagen_variantes,
+        "categoria_id": material.categoria_id,
+        "fecha_creacion": material.fecha_creacion.isoformat() if material.fecha_creacion else None,
+        "fecha_actualizacion": material.fecha_actualizacion.isoformat() if material.fecha_actualizacion else None
+    }
+    if categorias is not None:
+        categoria = categorias.get(material.categoria_id)
+        if categoria:
+            data["categoria"] = {"id": categoria["id"], "codigo": categoria["codigo"], "nombre": categoria["nombre"]}
+    elif material.categoria:
+        data["categoria"] = {
+            "id": material.categoria.id,
+            "codigo": material.categoria.codigo,
+            "nombre": material.categoria.nombre
+        }
+    return data
+
+class CatalogPage:
+    """Página pre-serializada lista para enviarse"""
+
+    __slots__ = ("body", "etag", "created_at")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.created_at = time.monotonic()
+
+class MaterialCatalogCache:
+    """LRU versionado de páginas del catálogo"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._pages: "OrderedDict[tuple, CatalogPage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(categoria_id: Optional[int], search: Optional[str], skip: int, limit: int) -> tuple:
+        search = (search or "").strip().lower()
+        return (categoria_id or None, search or None, skip, limit)
+
+    def get(self, key: tuple) -> Optional[CatalogPage]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                return None
+            if time.monotonic() - page.created_at > self.ttl_seconds:
+                del self._pages[key]
+                return None
+            self._pages.move_to_end(key)
+            return page
+
+    def put(self, key: tuple, page: CatalogPage, version: int):
+        with self._lock:
+            # Una escritura ocurrida mientras se construía la página la deja obsoleta
+            if version != self.version:
+                return
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._pages.clear()
+
+    def get_page(self, db: Session, categoria_id: Optional[int] = None, search: Optional[str] = None,
+                 skip: int = 0, limit: int = 100) -> Tuple[CatalogPage, bool]:
+        """Devolver (página, hit). Construye y cachea la página si no existe"""
+        key = self.make_key(categoria_id, search, skip, limit)
+        page = self.get(key)
+        if page is not None:
+            return page, True
+
+        version = self.version
+        categoria_id, search_term = key[0], key[1]
+        materiales = MaterialRepository.get_filtered(db, categoria_id, search_term, skip=skip, limit=limit)
+        total = MaterialRepository.count_filtered(db, categoria_id, search_term)
+
+        payload = {
+            "message": "Materiales obtenidos exitosamente",
+            "data": {
+                "materiales": materiales_con_categoria(db, materiales),
+                "total": total,
+                "skip": skip,
+                "limit": limit
+            }
+        }
+        page = CatalogPage(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.put(key, page, version)
+        return page, False
+
+class CategoriasSnapshot:
+    """Categorías con total_materiales: {id: categoría} y la respuesta de GET /categorias/ ya serializada"""
+
+    __slots__ = ("categorias", "page")
+
+    def __init__(self, categorias: Dict[int, dict], page: CatalogPage):
+        self.categorias = categorias
+        self.page = page
+
+class CategoriaSnapshotCache:
+    """Instantánea única de categorías, versionada igual que las páginas del catálogo"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._snapshot: Optional[CategoriasSnapshot] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+
+    def get(self, db: Session) -> Tuple[CategoriasSnapshot, bool]:
+        """Devolver (instantánea, hit). Al reconstruir hace una sola consulta (conteos agrupados)"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.page.created_at <= self.ttl_seconds:
+            return snapshot, True
+
+        version = self.version
+        categorias = {categoria["id"]: categoria for categoria in CategoriaRepository.get_all_with_count(db)}
+        payload = {
+            "message": "Categorías obtenidas exitosamente",
+            "data": {
+                "categorias": list(categorias.values()),
+                "total": len(categorias)
+            }
+        }
+        snapshot = CategoriasSnapshot(
+            categorias,
+            CatalogPage(json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_isoformat).encode("utf-8"))
+        )
+        with self._lock:
+            # Una escritura ocurrida mientras se construía la deja obsoleta: se usa pero no se guarda
+            if version == self.version:
+                self._snapshot = snapshot
+        return snapshot, False
+
+def _isoformat(valor):
+    return valor.isoformat()
+
+def materiales_con_categoria(db: Session, materiales: Iterable[Material]) -> List[dict]:
+    """material_to_dict de cada material con la categoría tomada de la instantánea (sin JOIN ni lazy load)"""
+    categorias = categoria_snapshot.get(db)[0].categorias
+    return [material_to_dict(m, categorias) for m in materiales]
+
+material_catalog = MaterialCatalogCache(
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS
+)
+categoria_snapshot = CategoriaSnapshotCache(ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS)
+
+# --- Invalidación automática en commits que tocan el catálogo ---
+#
+# Cada commit acumula en session.info los cambios de materiales/categorías:
+#   ("upsert" | "delete", snapshot) por objeto, o ("bulk", None) para UPDATE/DELETE masivos.
+# Tras el commit se invalida el caché y se notifica a los índices registrados.
+
+_change_listeners: List[Callable[[list], None]] = []
+
+def on_catalog_change(callback: Callable[[list], None]):
+    """Registrar un callback que recibe la lista de cambios de cada commit"""
+    _change_listeners.append(callback)
+    return callback
+
+def _snapshot(obj) -> dict:
+    if isinstance(obj, Material):
+        return {"tipo": "material", "id": obj.id, "codigo": obj.codigo, "nombre": obj.nombre,
+                "categoria_id": obj.categoria_id}
+    return {"tipo": "categoria", "id": obj.id, "codigo": obj.codigo, "nombre": obj.nombre}
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session, flush_context):
+    changes = []
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, (Material, Categoria)):
+            changes.append(("upsert", _snapshot(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, (Material, Categoria)):
+            changes.append(("delete", _snapshot(obj)))
+    if changes:
+        session.info.setdefault("catalog_changes", []).extend(changes)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_catalog_bulk_changes(orm_execute_state):
+    # UPDATE/DELETE masivos (query.update(), update(Material)) no pasan por el flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.local_table.name in _CATALOG_TABLES:
+            orm_execute_state.session.info.setdefault("catalog_changes", []).append(("bulk", None))
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog(session):
+    changes = session.info.pop("catalog_changes", None)
+    if not changes:
+        return
+    material_catalog.invalidate()
+    categoria_snapshot.invalidate()
+    for callback in _change_listeners:
+        try:
+            callback(changes)
+        except Exception as e:
+            print(f"⚠️ Error notificando cambio de catálogo: {e}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changes", None)
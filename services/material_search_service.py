@@ -0,0 +1,162 @@
+"""
+Búsqueda de materiales con ranking por relevancia
+
+En PostgreSQL usa la columna `search_vector` (tsvector, configuración 'spanish', sin acentos)
+y el índice de trigramas creados por migrations/add_materiales_search.sql.
+En otros motores (SQLite en desarrollo/benchmarks) usa un índice invertido en memoria
+que se reconstruye cuando cambia la versión del catálogo.
+"""
+
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, or_
+from sqlalchemy.orm import Session
+
+from models.material import Material
+from services.material_catalog_service import material_catalog
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Pesos por campo, equivalentes a setweight A/B de la migración
+_FIELD_WEIGHTS = (("nombre", 1.0), ("codigo", 1.0), ("descripcion", 0.4))
+_PREFIX_FACTOR = 0.6  # Una coincidencia por prefijo vale menos que la palabra completa
+
+def normalize(text: Optional[str]) -> str:
+    """Minúsculas y sin acentos ("Mármol" -> "marmol")"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+class InMemoryMaterialIndex:
+    """Índice invertido token -> {material_id: peso} con búsqueda por prefijo vía bisect"""
+
+    def __init__(self):
+        self.version = -1
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._tokens: List[str] = []
+        self._categorias: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def build(self, rows, version: int):
+        """Construir desde filas (id, codigo, nombre, descripcion, categoria_id)"""
+        postings: Dict[str, Dict[int, float]] = {}
+        categorias = {}
+        for material_id, codigo, nombre, descripcion, categoria_id in rows:
+            categorias[material_id] = categoria_id
+            campos = {"codigo": codigo, "nombre": nombre, "descripcion": descripcion}
+            for campo, peso in _FIELD_WEIGHTS:
+                for token in tokenize(campos[campo]):
+                    docs = postings.setdefault(token, {})
+                    if docs.get(material_id, 0.0) < peso:
+                        docs[material_id] = peso
+        self._postings = postings
+        self._tokens = sorted(postings)
+        self._categorias = categorias
+        self.version = version
+
+    def ensure_fresh(self, db: Session):
+        """Reconstruir si el catálogo cambió desde la última construcción"""
+        if self.version == material_catalog.version:
+            return
+        with self._lock:
+            version = material_catalog.version
+            if self.version == version:
+                return
+            rows = db.query(
+                Material.id, Material.codigo, Material.nombre, Material.descripcion, Material.categoria_id
+            ).all()
+            self.build(rows, version)
+
+    def _match_term(self, term: str) -> Dict[int, float]:
+        """Puntaje por material para un término: palabra exacta o prefijo"""
+        scores: Dict[int, float] = {}
+        i = bisect_left(self._tokens, term)
+        while i < len(self._tokens) and self._tokens[i].startswith(term):
+            token = self._tokens[i]
+            factor = 1.0 if token == term else _PREFIX_FACTOR
+            for material_id, peso in self._postings[token].items():
+                score = peso * factor
+                if scores.get(material_id, 0.0) < score:
+                    scores[material_id] = score
+            i += 1
+        return scores
+
+    def search(self, query: str, categoria_id: Optional[int] = None,
+               skip: int = 0, limit: int = 20) -> Tuple[List[Tuple[int, float]], int]:
+        """
+        Todos los términos deben coincidir (AND).
+        Devuelve ([(material_id, puntaje)] de la página pedida, total de coincidencias)
+        """
+        terms = tokenize(query)
+        if not terms:
+            return [], 0
+        # Empezar por el término más selectivo reduce el trabajo de la intersección
+        per_term = sorted((self._match_term(t) for t in terms), key=len)
+        result = per_term[0]
+        for scores in per_term[1:]:
+            result = {mid: s + scores[mid] for mid, s in result.items() if mid in scores}
+            if not result:
+                return [], 0
+        if categoria_id:
+            result = {mid: s for mid, s in result.items() if self._categorias.get(mid) == categoria_id}
+        # Solo se ordena lo necesario para la página, no todas las coincidencias
+        top = heapq.nsmallest(skip + limit, result.items(), key=lambda item: (-item[1], item[0]))
+        return top[skip:], len(result)
+
+material_search_index = InMemoryMaterialIndex()
+
+def _search_postgres(db: Session, query: str, categoria_id: Optional[int],
+                     skip: int, limit: int) -> Tuple[List[Tuple[Material, float]], int]:
+    terms = tokenize(query)
+    if not terms:
+        return [], 0
+    plain = " ".join(terms)
+    tsquery = func.to_tsquery("spanish", " & ".join(f"{t}:*" for t in terms))
+    vector = literal_column("materiales.search_vector")
+    nombre_norm = func.f_unaccent(func.lower(Material.nombre))
+
+    condition = or_(
+        vector.op("@@")(tsquery),
+        nombre_norm.op("%")(plain),
+        func.lower(Material.codigo).op("%")(plain)
+    )
+    rank = (func.ts_rank_cd(vector, tsquery) + func.similarity(nombre_norm, plain)).label("rank")
+
+    base = db.query(Material).filter(condition)
+    if categoria_id:
+        base = base.filter(Material.categoria_id == categoria_id)
+    total = base.with_entities(func.count(Material.id)).scalar()
+
+    rows = base.with_entities(Material, rank).order_by(
+        rank.desc(), Material.id
+    ).offset(skip).limit(limit).all()
+    return [(material, float(score)) for material, score in rows], total
+
+def _search_in_memory(db: Session, query: str, categoria_id: Optional[int],
+                      skip: int, limit: int) -> Tuple[List[Tuple[Material, float]], int]:
+    material_search_index.ensure_fresh(db)
+    page, total = material_search_index.search(query, categoria_id, skip, limit)
+    if not page:
+        return [], total
+    materiales = {
+        m.id: m for m in db.query(Material).filter(
+            Material.id.in_([mid for mid, _ in page])
+        ).all()
+    }
+    return [(materiales[mid], score) for mid, score in page if mid in materiales], total
+
+def search_materials(db: Session, query: str, categoria_id: Optional[int] = None,
+                     skip: int = 0, limit: int = 20) -> Tuple[List[Tuple[Material, float]], int]:
+    """Buscar materiales por relevancia. Devuelve ([(material, puntaje)], total)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgres(db, query, categoria_id, skip, limit)
+    return _search_in_memory(db, query, categoria_id, skip, limit)
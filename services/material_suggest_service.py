@@ -0,0 +1,168 @@
+"""
+Sugerencias de autocompletado para materiales y categorías
+
+Índice de prefijos en memoria: un arreglo ordenado de claves normalizadas por tipo + bisect
+(filtrar por tipo no recorre las claves del otro; sin filtro se mezclan los dos en orden).
+Cada nombre se indexa desde el inicio de cada palabra ("Cerámica Blanca" responde
+a "cer" y a "bla") y el código completo. Se actualiza de forma incremental con los
+cambios de cada commit (ver on_catalog_change) y solo se reconstruye completo
+tras un UPDATE/DELETE masivo o cuando vence su TTL: los commits de otros workers no
+pasan por el listener de este proceso.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.categoria import Categoria
+from models.material import Material
+from services.material_catalog_service import on_catalog_change
+from services.material_search_service import normalize
+
+Ref = Tuple[str, int]  # (tipo, id)
+
+def _keys_for(codigo: Optional[str], nombre: Optional[str]) -> List[str]:
+    keys = []
+    if codigo:
+        keys.append(normalize(codigo))
+    words = normalize(nombre).split()
+    for i in range(len(words)):
+        keys.append(" ".join(words[i:]))
+    return keys
+
+class PrefixSuggestIndex:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.loaded_at = 0.0
+        self._recargando = threading.Lock()
+        self._entries: Dict[str, List[Tuple[str, int]]] = {}  # tipo -> [(clave, id)] ordenado
+        self._keys_by_ref: Dict[Ref, List[str]] = {}
+        self._items: Dict[Ref, dict] = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    # --- construcción y mantenimiento ---
+
+    def load(self, db: Session):
+        """Carga completa desde la base de datos"""
+        materiales = db.query(Material.id, Material.codigo, Material.nombre, Material.categoria_id).all()
+        categorias = db.query(Categoria.id, Categoria.codigo, Categoria.nombre).all()
+        entries, keys_by_ref, items = {"material": [], "categoria": []}, {}, {}
+        for m in materiales:
+            item = {"tipo": "material", "id": m.id, "codigo": m.codigo, "nombre": m.nombre, "categoria_id": m.categoria_id}
+            self._collect(item, entries, keys_by_ref, items)
+        for c in categorias:
+            item = {"tipo": "categoria", "id": c.id, "codigo": c.codigo, "nombre": c.nombre}
+            self._collect(item, entries, keys_by_ref, items)
+        for claves in entries.values():
+            claves.sort()
+        with self._lock:
+            self._entries, self._keys_by_ref, self._items = entries, keys_by_ref, items
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _collect(item: dict, entries: dict, keys_by_ref: dict, items: dict):
+        ref = (item["tipo"], item["id"])
+        keys = _keys_for(item["codigo"], item["nombre"])
+        keys_by_ref[ref] = keys
+        items[ref] = item
+        entries.setdefault(ref[0], []).extend((key, ref[1]) for key in keys)
+
+    def upsert(self, item: dict):
+        """Insertar o reemplazar un material/categoría (O(log n) búsqueda + desplazamiento del arreglo)"""
+        ref = (item["tipo"], item["id"])
+        with self._lock:
+            self._remove_keys(ref)
+            keys = _keys_for(item["codigo"], item["nombre"])
+            entries = self._entries.setdefault(ref[0], [])
+            for key in keys:
+                insort(entries, (key, ref[1]))
+            self._keys_by_ref[ref] = keys
+            self._items[ref] = dict(item)
+
+    def remove(self, tipo: str, item_id: int):
+        with self._lock:
+            self._remove_keys((tipo, item_id))
+            self._items.pop((tipo, item_id), None)
+
+    def _remove_keys(self, ref: Ref):
+        entries = self._entries.get(ref[0], [])
+        for key in self._keys_by_ref.pop(ref, []):
+            entry = (key, ref[1])
+            i = bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+
+    def apply_changes(self, changes: Iterable[tuple]):
+        """Aplicar los cambios de un commit; un cambio masivo obliga a recargar"""
+        if not self.loaded:
+            return
+        for action, snapshot in changes:
+            if action == "bulk":
+                self.loaded = False
+                return
+            if action == "delete":
+                self.remove(snapshot["tipo"], snapshot["id"])
+            else:
+                self.upsert(snapshot)
+
+    # --- consulta ---
+
+    def _desde(self, tipo: str, prefix: str) -> Iterator[Tuple[str, str, int]]:
+        """Claves de un tipo que empiezan por `prefix`, en orden, como (clave, tipo, id)"""
+        entries = self._entries.get(tipo, [])
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            yield entries[i][0], tipo, entries[i][1]
+            i += 1
+
+    def suggest(self, prefix: str, limit: int = 10, tipo: Optional[str] = None) -> List[dict]:
+        """
+        Hasta `limit` elementos cuyo código o alguna palabra del nombre empieza por `prefix`.
+        Primero los que coinciden desde el inicio del nombre/código, luego el resto; cada grupo en orden alfabético.
+        """
+        prefix = " ".join(normalize(prefix).split())
+        if not prefix:
+            return []
+        inicio, resto = [], []
+        vistos = set()
+        with self._lock:
+            candidatos = heapq.merge(*(self._desde(t, prefix) for t in ([tipo] if tipo else sorted(self._entries))))
+            # Se examinan más claves que `limit` para poder priorizar coincidencias al inicio; el
+            # tope cuenta claves recorridas (no aciertos) y como cada tipo tiene su arreglo, filtrar
+            # por tipo no lo gasta en claves del otro
+            for key, item_tipo, item_id in islice(candidatos, limit * 8):
+                ref = (item_tipo, item_id)
+                if ref in vistos:
+                    continue
+                vistos.add(ref)
+                item = self._items[ref]
+                # Claves principales: código y nombre completo (las primeras de _keys_for)
+                principales = self._keys_by_ref[ref][:2 if item["codigo"] else 1]
+                (inicio if key in principales else resto).append(item)
+                if len(inicio) >= limit:
+                    break
+        return (inicio + resto)[:limit]
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load(db)
+            return
+        if time.monotonic() - self.loaded_at > self.ttl_seconds and self._recargando.acquire(blocking=False):
+            # Vencido: recarga un solo hilo; los demás siguen respondiendo con el índice anterior
+            try:
+                self.load(db)
+            finally:
+                self._recargando.release()
+
+material_suggest_index = PrefixSuggestIndex(ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS)
+on_catalog_change(material_suggest_index.apply_changes)
@@ -0,0 +1,84 @@
+"""
+Servicio de contraseñas: hash con bcrypt, verificación fuera del event loop
+y migración transparente de los hashes SHA-256 heredados
+"""
+
+import asyncio
+import hashlib
+import hmac
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from config import settings
+
+# Hashes del esquema anterior: sha256 hex sin sal
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+# Pool acotado: bcrypt es CPU-bound y no debe bloquear el event loop ni saturar la CPU
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
+def _to_bytes(password: str) -> bytes:
+    # bcrypt solo usa los primeros 72 bytes; bcrypt>=5 lanza error si se pasan más
+    return password.encode("utf-8")[:72]
+
+def hash_password(password: str) -> str:
+    """Hash bcrypt con sal"""
+    return bcrypt.hashpw(_to_bytes(password), bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)).decode("ascii")
+
+def is_legacy_hash(hashed_password: str) -> bool:
+    """True si el hash es del esquema SHA-256 sin sal"""
+    return bool(_LEGACY_SHA256.match(hashed_password or ""))
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True si el hash es heredado o usa menos rondas que las configuradas"""
+    if is_legacy_hash(hashed_password):
+        return True
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds < settings.BCRYPT_ROUNDS
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verificar contraseña contra un hash bcrypt o SHA-256 heredado"""
+    if not hashed_password:
+        return False
+    if is_legacy_hash(hashed_password):
+        legacy = hashlib.sha256(plain_password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, hashed_password)
+    try:
+        return bcrypt.checkpw(_to_bytes(plain_password), hashed_password.encode("ascii"))
+    except ValueError:
+        # Hash corrupto o de un esquema desconocido
+        return False
+
+# Hash de referencia para igualar el tiempo de respuesta cuando el usuario no existe
+_DUMMY_HASH: Optional[str] = None
+
+def _dummy_hash() -> str:
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password("floorplan-dummy-password")
+    return _DUMMY_HASH
+
+async def verify_password_async(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """
+    Verificar en el pool de hashing sin bloquear el event loop.
+    Si no hay hash (usuario inexistente) se verifica contra uno ficticio para no
+    revelar por tiempo de respuesta qué correos están registrados.
+    """
+    loop = asyncio.get_running_loop()
+    if hashed_password is None:
+        await loop.run_in_executor(_executor, verify_password, plain_password, _dummy_hash())
+        return False
+    return await loop.run_in_executor(_executor, verify_password, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Hashear en el pool de hashing sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, hash_password, password)
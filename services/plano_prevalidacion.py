@@ -0,0 +1,282 @@
+"""
+Pre-validación de planos antes de llamar a FloorPlanTo3D-API
+
+El conversor tarda segundos por archivo y hasta ahora decidía él si un archivo era un plano.
+Acá se descarta localmente lo que no puede serlo y se prepara el resto en el formato que el
+conversor procesa mejor:
+- Tipo real por firma (magic bytes): PNG, JPEG, PDF o SVG, sin importar la extensión
+- Dimensiones desde la cabecera, sin decodificar la imagen: rechaza las diminutas y las que
+  superan el límite de píxeles (bombas de descompresión)
+- Imágenes en blanco: desviación estándar de grises de una miniatura (JPEG en modo draft)
+- PDF (primera página) y SVG se rasterizan a PNG a la resolución pedida
+- Escaneos enormes se reducen al lado máximo con el que trabaja el conversor
+- Con `normalizar` (el tiempo del conversor crece con la resolución y una foto de celular
+  trae color, rotación EXIF y papel gris con sombras): orientación EXIF, escala de grises,
+  lado mayor acotado, iluminación pareja (se divide por el fondo estimado), contraste estirado
+  y 16 niveles de gris, que dejan el papel liso y el PNG compacto. `escala` queda registrada
+  para llevar las coordenadas del modelo a las unidades de la imagen original
+
+Requiere Pillow; pypdfium2 para PDF y resvg-py para SVG (imports diferidos para no cargarlos
+al arrancar la API). Las funciones son puras para poder ejecutarse en un pool de procesos.
+"""
+
+import io
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+FIRMAS = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"%PDF-", "application/pdf"),
+)
+EXTENSIONES = {"image/png": ".png", "image/jpeg": ".jpg", "application/pdf": ".pdf", "image/svg+xml": ".svg"}
+
+# Referencias a archivos o URLs externas dentro de un SVG (solo se aceptan "#id" y data:)
+_HREF_EXTERNO = re.compile(rb"""href\s*=\s*["'](?!\s*(?:#|data:))""", re.IGNORECASE)
+_ETIQUETA_SVG = re.compile(rb"<svg\b[^>]*>", re.IGNORECASE)
+_ATRIBUTO_SVG = re.compile(rb"""\b(width|height|viewBox)\s*=\s*["']([^"']*)["']""")
+_LONGITUD_SVG = re.compile(r"\s*([0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*(px|pt|pc|mm|cm|in|%)?\s*")
+# Píxeles CSS (96 por pulgada) por unidad de longitud SVG
+_UNIDADES_SVG = {None: 1.0, "px": 1.0, "pt": 96 / 72, "pc": 16.0, "mm": 96 / 25.4, "cm": 96 / 2.54, "in": 96.0}
+_LADO_MINIATURA = 512
+_ORIENTACION_EXIF = 0x0112
+_CORTE_CONTRASTE = 1  # % de píxeles más oscuros/claros que se saturan (papel gris -> blanco, trazos -> negro)
+_LADO_FONDO = 64  # El fondo (papel iluminado) se estima a esta resolución: cada píxel cubre lado/64 del plano
+_NIVELES_GRIS = 16
+
+class ArchivoInvalido(Exception):
+    """El archivo no puede ser un plano: no se envía al conversor"""
+
+@dataclass
+class PlanoPreparado:
+    """Lo que se envía al conversor y lo que se supo del archivo original"""
+    contenido: bytes
+    filename: str
+    mime_type: str          # Tipo del contenido enviado al conversor
+    mime_type_original: str
+    ancho: int
+    alto: int
+    ancho_original: int     # Píxeles de la imagen original ya orientada (de la página a `dpi` para PDF/SVG)
+    alto_original: int
+
+    @property
+    def modificado(self) -> bool:
+        return self.mime_type != self.mime_type_original or (self.ancho, self.alto) != (self.ancho_original, self.alto_original)
+
+    @property
+    def escala(self) -> float:
+        """Píxeles enviados por píxel original (1 si no se redujo o no se sabe)"""
+        return self.ancho / self.ancho_original if self.ancho_original else 1.0
+
+def detectar_tipo(contenido: bytes) -> Optional[str]:
+    """Tipo MIME por la firma del archivo (None si no es un formato de plano)"""
+    for firma, mime_type in FIRMAS:
+        if contenido.startswith(firma):
+            return mime_type
+    inicio = contenido[:2048].lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if (inicio.startswith(b"<?xml") or inicio.startswith(b"<svg") or inicio.startswith(b"<!--")
+            or inicio.startswith(b"<!doctype svg")) and b"<svg" in inicio:
+        return "image/svg+xml"
+    return None
+
+def prevalidar(contenido: bytes, filename: str, lado_min: int, lado_max: int, dpi: int,
+               min_desviacion: float, max_megapixeles: int, normalizar: bool = False) -> PlanoPreparado:
+    """Validar y preparar un plano para el conversor; ArchivoInvalido si no puede ser un plano"""
+    from PIL import Image, UnidentifiedImageError
+
+    mime_type = detectar_tipo(contenido)
+    if mime_type is None:
+        raise ArchivoInvalido("El archivo no es un plano válido: el contenido no es PNG, JPEG, PDF ni SVG")
+
+    nombre = filename.rsplit(".", 1)[0] or "plano"
+    if mime_type == "application/pdf":
+        imagen, (ancho_original, alto_original) = _rasterizar_pdf(contenido, dpi, lado_max)
+    elif mime_type == "image/svg+xml":
+        imagen, (ancho_original, alto_original) = _rasterizar_svg(contenido, dpi, lado_max, max_megapixeles)
+    else:
+        try:
+            imagen = Image.open(io.BytesIO(contenido))
+        except (UnidentifiedImageError, OSError) as e:
+            raise ArchivoInvalido(f"El archivo no es un plano válido: imagen corrupta ({e})")
+        except Image.DecompressionBombError:
+            raise ArchivoInvalido(f"La imagen es demasiado grande. Máximo: {max_megapixeles} megapíxeles")
+        # Solo la cabecera está leída: el tamaño se valida antes de decodificar
+        if imagen.width * imagen.height > max_megapixeles * 1_000_000:
+            raise ArchivoInvalido(
+                f"La imagen es demasiado grande ({imagen.width}x{imagen.height}). Máximo: {max_megapixeles} megapíxeles"
+            )
+        ancho_original, alto_original = imagen.size
+
+    if min(ancho_original, alto_original) < lado_min:
+        raise ArchivoInvalido(
+            f"La imagen es demasiado pequeña para ser un plano ({ancho_original}x{alto_original}). "
+            f"Lado mínimo: {lado_min}px"
+        )
+    rasterizado = mime_type in ("application/pdf", "image/svg+xml")
+    try:
+        # La miniatura de una imagen se decodifica aparte: `imagen` sigue sin decodificar
+        desviacion = _desviacion_grises(imagen.copy() if rasterizado else Image.open(io.BytesIO(contenido)))
+    except OSError as e:
+        raise ArchivoInvalido(f"El archivo no es un plano válido: imagen corrupta ({e})")
+    if desviacion < min_desviacion:
+        raise ArchivoInvalido("El archivo no es un plano válido: la imagen está en blanco")
+
+    if normalizar:
+        if imagen.getexif().get(_ORIENTACION_EXIF) in (5, 6, 7, 8):
+            ancho_original, alto_original = alto_original, ancho_original  # Foto girada 90°
+        imagen = _normalizar(imagen, (ancho_original, alto_original), lado_max)
+        buffer = io.BytesIO()
+        imagen.save(buffer, format="PNG")  # optimize=True tarda 5-10x más y apenas reduce un PNG de 16 grises
+        return PlanoPreparado(buffer.getvalue(), f"{nombre}.png", "image/png", mime_type,
+                              imagen.width, imagen.height, ancho_original, alto_original)
+
+    if not rasterizado and max(imagen.size) <= lado_max:
+        # Ya está en un formato y tamaño que el conversor procesa: se envía sin recodificar
+        return PlanoPreparado(contenido, f"{nombre}{EXTENSIONES[mime_type]}", mime_type, mime_type,
+                              ancho_original, alto_original, ancho_original, alto_original)
+
+    imagen = _reducir(imagen, lado_max)
+    buffer = io.BytesIO()
+    if mime_type == "image/jpeg":
+        imagen.convert("RGB").save(buffer, format="JPEG", quality=90)
+        enviado = "image/jpeg"
+    else:
+        imagen.save(buffer, format="PNG")
+        enviado = "image/png"
+    return PlanoPreparado(buffer.getvalue(), f"{nombre}{EXTENSIONES[enviado]}", enviado, mime_type,
+                          imagen.width, imagen.height, ancho_original, alto_original)
+
+def _desviacion_grises(miniatura) -> float:
+    """Desviación estándar de grises de una miniatura (un plano tiene trazos; una hoja en blanco no)"""
+    from PIL import ImageStat
+
+    if miniatura.format == "JPEG":
+        miniatura.draft("L", (_LADO_MINIATURA, _LADO_MINIATURA))  # Decodificar a 1/2..1/8 directamente
+    miniatura.thumbnail((_LADO_MINIATURA, _LADO_MINIATURA))
+    return ImageStat.Stat(_sobre_blanco(miniatura).convert("L")).stddev[0]
+
+def _sobre_blanco(imagen):
+    """Componer la transparencia sobre blanco (un PNG transparente se vería negro al convertirlo)"""
+    from PIL import Image
+
+    if imagen.mode in ("RGBA", "LA", "PA") or (imagen.mode == "P" and "transparency" in imagen.info):
+        rgba = imagen.convert("RGBA")
+        fondo = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+        return Image.alpha_composite(fondo, rgba).convert("RGB")
+    return imagen
+
+def _reducir(imagen, lado_max: int):
+    from PIL import Image
+
+    destino = _ajustar(imagen.size, lado_max)
+    if imagen.format == "JPEG" and destino != imagen.size:
+        imagen.draft("RGB", destino)  # El decodificador JPEG reduce 1/2..1/8 casi gratis
+    imagen = _sobre_blanco(imagen)
+    if imagen.size != destino:
+        imagen = imagen.resize(destino, Image.LANCZOS)
+    return imagen
+
+def _normalizar(imagen, tamano: Tuple[int, int], lado_max: int):
+    """Orientada según EXIF, en grises, `tamano` acotado a `lado_max`, iluminación pareja y contraste estirado"""
+    from PIL import Image, ImageFilter, ImageMath, ImageOps
+
+    destino = _ajustar(tamano, lado_max)
+    if imagen.format == "JPEG":
+        # Decodificar directo a grises y a 1/2..1/8 (cuadrado: todavía sin aplicar la rotación EXIF)
+        imagen.draft("L", (max(destino), max(destino)))
+    imagen = ImageOps.exif_transpose(imagen)
+    gris = _sobre_blanco(imagen).convert("L")
+    if gris.size != destino:
+        gris = gris.resize(destino, Image.LANCZOS, reducing_gap=3.0)
+    # Fondo: el máximo local de una miniatura (el papel; los trazos son finos) suavizado y ampliado.
+    # Dividir por él quita sombras y viñeteo de una foto y deja igual un escaneo con papel blanco
+    fondo = gris.copy()
+    fondo.thumbnail((_LADO_FONDO, _LADO_FONDO))
+    fondo = fondo.filter(ImageFilter.MaxFilter(5)).filter(ImageFilter.BoxBlur(2))
+    fondo = fondo.resize(gris.size, Image.BILINEAR).point(lambda v: max(v, 1))
+    parejo = ImageMath.lambda_eval(lambda a: a["convert"](a["gris"] * 255 / a["fondo"], "L"), gris=gris, fondo=fondo)
+    paso = 256 // _NIVELES_GRIS
+    return ImageOps.autocontrast(parejo, cutoff=_CORTE_CONTRASTE).point(
+        lambda v: v // paso * 255 // (_NIVELES_GRIS - 1)
+    )
+
+def _ajustar(tamano: Tuple[int, int], lado_max: int) -> Tuple[int, int]:
+    escala = min(1.0, lado_max / max(tamano))
+    return max(1, round(tamano[0] * escala)), max(1, round(tamano[1] * escala))
+
+def _rasterizar_pdf(contenido: bytes, dpi: int, lado_max: int):
+    """Primera página del PDF a `dpi` (sin superar `lado_max`): (imagen PIL, tamaño a `dpi`)"""
+    import pypdfium2 as pdfium
+
+    try:
+        pdf = pdfium.PdfDocument(contenido)
+    except pdfium.PdfiumError as e:
+        raise ArchivoInvalido(f"El archivo no es un plano válido: PDF ilegible ({e})")
+    try:
+        if len(pdf) == 0:
+            raise ArchivoInvalido("El archivo no es un plano válido: el PDF no tiene páginas")
+        pagina = pdf[0]
+        ancho_pt, alto_pt = pagina.get_size()
+        escala = min(dpi / 72, lado_max / max(ancho_pt, alto_pt, 1))
+        imagen = pagina.render(scale=escala, fill_color=(255, 255, 255, 255)).to_pil()
+        pagina.close()
+        return imagen, (round(ancho_pt * dpi / 72), round(alto_pt * dpi / 72))
+    finally:
+        pdf.close()
+
+def _tamano_svg(contenido: bytes) -> Tuple[float, float]:
+    """
+    Tamaño declarado del SVG en píxeles CSS, leído de width/height/viewBox de la etiqueta <svg>
+    sin parsear el documento. Sin tamaño declarado resvg usaría el del contenido, que puede
+    ser cualquier cosa: se rechaza.
+    """
+    etiqueta = _ETIQUETA_SVG.search(contenido[:65536])
+    atributos = {k.decode(): v.decode("utf-8", "replace") for k, v in _ATRIBUTO_SVG.findall(etiqueta.group(0))} if etiqueta else {}
+    caja = None
+    try:
+        valores = [float(v) for v in re.split(r"[\s,]+", atributos.get("viewBox", "").strip()) if v]
+        if len(valores) == 4 and valores[2] > 0 and valores[3] > 0:
+            caja = valores[2], valores[3]
+    except ValueError:
+        pass
+    tamano = []
+    for i, atributo in enumerate(("width", "height")):
+        longitud = _LONGITUD_SVG.fullmatch(atributos.get(atributo, ""))
+        if longitud and longitud.group(2) == "%":
+            valor = caja[i] * float(longitud.group(1)) / 100 if caja else None
+        elif longitud:
+            valor = float(longitud.group(1)) * _UNIDADES_SVG[longitud.group(2)]
+        else:
+            valor = caja[i] if caja else None  # Sin width/height (o en em/ex) rige el viewBox
+        if not valor or valor <= 0:
+            raise ArchivoInvalido("El SVG no declara su tamaño: se necesitan width/height o viewBox")
+        tamano.append(valor)
+    return tamano[0], tamano[1]
+
+def _rasterizar_svg(contenido: bytes, dpi: int, lado_max: int, max_megapixeles: int):
+    """
+    SVG a `dpi` (96 px por pulgada = 1:1) sin superar `lado_max`, sobre fondo blanco: (imagen PIL,
+    tamaño a `dpi`). El tamaño se valida con el declarado, antes de renderizar, y se renderiza una vez
+    """
+    import resvg_py
+    from PIL import Image
+
+    if _HREF_EXTERNO.search(contenido):
+        raise ArchivoInvalido("El SVG referencia archivos externos: incrustar las imágenes como data:")
+    ancho_css, alto_css = _tamano_svg(contenido)
+    tamano = round(ancho_css * dpi / 96), round(alto_css * dpi / 96)
+    if tamano[0] * tamano[1] > max_megapixeles * 1_000_000:
+        raise ArchivoInvalido(
+            f"El SVG es demasiado grande ({tamano[0]}x{tamano[1]} a {dpi} dpi). Máximo: {max_megapixeles} megapíxeles"
+        )
+    escala = min(dpi / 96, lado_max / max(ancho_css, alto_css))
+    ancho, alto = max(1, round(ancho_css * escala)), max(1, round(alto_css * escala))
+    try:
+        png = bytes(resvg_py.svg_to_bytes(svg_string=contenido.decode("utf-8"), width=ancho, height=alto,
+                                          dpi=96, background="#ffffff"))
+        imagen = Image.open(io.BytesIO(png))
+        imagen.load()
+    except (ValueError, UnicodeDecodeError, OSError) as e:
+        raise ArchivoInvalido(f"El archivo no es un plano válido: SVG ilegible ({e})")
+    return imagen, tamano
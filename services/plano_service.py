@@ -3,15 +3,47 @@ Servicio de negocio para Plano
 """
 
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from repositories.plano_repository import PlanoRepository
 from repositories.modelo3d_repository import Modelo3DRepository
 from schemas.plano_schemas import PlanoCreate, PlanoUpdate, PlanoResponse, PlanoListResponse
 from schemas.modelo3d_schemas import Modelo3DResponse
+import mimetypes
+import multiprocessing
 import requests
 import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
 from config import settings
-from .google_drive_service import google_drive_service
+from database import SessionLocal
+from .converter_dispatcher import get_converter_dispatcher
+from .plano_prevalidacion import EXTENSIONES, ArchivoInvalido, PlanoPreparado, detectar_tipo, prevalidar
+from .progreso_service import SIN_SEGUIMIENTO, Seguimiento
+from .storage_service import almacenamiento_de, get_storage
+
+@dataclass
+class ArchivoPlano:
+    """Columnas del archivo de un plano necesarias para servir su descarga"""
+    nombre: str
+    url: Optional[str]
+    mime_type: Optional[str]
+    tamano: Optional[int]
+
+    @property
+    def media_type(self) -> str:
+        return self.mime_type or mimetypes.guess_type(Path(self.url).name)[0] or 'application/octet-stream'
+
+    @property
+    def nombre_descarga(self) -> str:
+        # Las URL de Google Drive no tienen extensión: se deduce del tipo
+        extension = Path(self.url).suffix or mimetypes.guess_extension(self.media_type) or ''
+        return f"{self.nombre}{extension}"
 
 class PlanoService:
     def __init__(self, db: Session):
@@ -19,22 +51,157 @@ class PlanoService:
         self.plano_repo = PlanoRepository(db)
         self.modelo3d_repo = Modelo3DRepository(db)
 
-    def create_plano(self, plano_data: PlanoCreate, usuario_id: int, file_content: bytes = None, filename: str = None) -> PlanoResponse:
-        """Crear un nuevo plano con verificación previa"""
+    def create_plano(self, plano_data: PlanoCreate, usuario_id: int, file_content: bytes = None, filename: str = None,
+                     progreso: Seguimiento = SIN_SEGUIMIENTO) -> PlanoResponse:
+        """Crear un nuevo plano con verificación previa (el archivo pasa por la API)"""
         if not file_content or not filename:
             raise Exception("Archivo requerido para crear plano")
         
-        # PASO 1: Verificar que es un plano válido con FloorPlanTo3D-API
+        # PASO 1: Pre-validar localmente (tipo real, dimensiones, imagen en blanco) y preparar para el conversor
+        preparado = self._preparar(file_content, filename)
+        
+        # PASO 2: Verificar que es un plano válido con FloorPlanTo3D-API
+        verification_data, medidas_extraidas = self._verificar_plano(preparado, progreso)
+        
+        # PASO 3: Si la verificación es exitosa, subir al almacenamiento (el archivo original)
+        progreso("guardando")
+        almacenamiento = get_storage()
+        mime_type = preparado.mime_type_original
+        # La extensión de la clave sigue al contenido real (un JPEG renombrado a .png se guarda como .jpg)
+        clave = self._clave(Path(filename).stem + EXTENSIONES.get(mime_type, Path(filename).suffix))
+        try:
+            print(f"📤 Subiendo archivo verificado a {almacenamiento.nombre}...")
+            file_url = almacenamiento.guardar(clave, file_content, mime_type)
+            
+            if not file_url:
+                raise Exception(f"Error al subir archivo a {almacenamiento.nombre}")
+            
+            print(f"✅ Archivo subido exitosamente")
+                
+        except Exception as e:
+            print(f"❌ Error subiendo archivo: {e}")
+            raise Exception(f"Error al subir archivo: {str(e)}")
+        
+        # PASO 4: Crear registro en BD con estado 'completado' (ya verificado y convertido)
+        # Agregar medidas extraídas al plano_data
+        plano_data_with_measures = PlanoCreate(
+            nombre=plano_data.nombre,
+            formato=plano_data.formato,
+            tipo_plano=plano_data.tipo_plano,
+            descripcion=plano_data.descripcion,
+            medidas_extraidas=medidas_extraidas
+        )
+        plano = self.plano_repo.create(
+            plano_data_with_measures, usuario_id, file_url, mime_type=mime_type, tamano=len(file_content)
+        )
+        
+        # Actualizar estado a completado ya que ya fue verificado y convertido
+        self.plano_repo.update_estado(plano.id, usuario_id, "completado")
+        
+        # PASO 5: Guardar datos del modelo 3D directamente
+        self._guardar_modelo3d(plano.id, verification_data)
+        
+        return PlanoResponse.from_orm(plano)
+
+    def iniciar_subida(self, plano_data: PlanoCreate, usuario_id: int, filename: str, tamano: int) -> Optional[Dict[str, Any]]:
+        """
+        Registrar un plano 'pendiente' y devolver la subida directa al almacenamiento
+        (None si el backend no la soporta: usar create_plano)
+        """
+        almacenamiento = get_storage()
+        subida = almacenamiento.subida_directa(self._clave(filename), self._mime_type(filename), self._tamano_max())
+        if subida is None:
+            return None
+        
+        plano = self.plano_repo.create(plano_data, usuario_id, subida["ubicacion"], estado="pendiente")
+        print(f"📤 Plano {plano.id} esperando subida directa a {almacenamiento.nombre} ({tamano} bytes)")
+        return {"plano_id": plano.id, "subida": subida}
+
+    def confirmar_subida(self, plano_id: int, usuario_id: int,
+                         progreso: Seguimiento = SIN_SEGUIMIENTO) -> Optional[PlanoResponse]:
+        """
+        Verificar un plano subido directamente: tamaño y tipo desde los metadatos del
+        almacenamiento y contenido con FloorPlanTo3D-API. Si no es un plano válido se
+        eliminan el archivo y el registro.
+        """
+        plano = self.plano_repo.get_by_id(plano_id, usuario_id)
+        if not plano:
+            return None
+        if plano.estado != "pendiente":
+            raise ValueError("El plano ya fue confirmado")
+        
+        progreso("validando", plano_id=plano_id)
+        almacenamiento = almacenamiento_de(plano.url)
+        info = almacenamiento.info(plano.url)
+        if info is None:
+            raise ValueError("El archivo del plano todavía no se subió")
+        
+        try:
+            if info.tamano > self._tamano_max():
+                raise Exception(f"El archivo es demasiado grande. Tamaño máximo: {settings.PLANO_MAX_MB}MB")
+            if info.mime_type and info.mime_type != self._mime_type(Path(plano.url).name):
+                raise Exception(f"Tipo de archivo no coincide con la subida: {info.mime_type}")
+            file_content = almacenamiento.leer(plano.url)
+            if not file_content:
+                raise Exception("No se pudo leer el archivo subido")
+            preparado = self._preparar(file_content, Path(plano.url).name)
+            if preparado.mime_type_original != self._mime_type(Path(plano.url).name):
+                # La clave y el tipo del objeto ya quedaron fijados al iniciar la subida
+                raise ArchivoInvalido(f"El contenido ({preparado.mime_type_original}) no coincide con el tipo declarado")
+            verification_data, medidas_extraidas = self._verificar_plano(preparado, progreso)
+        except Exception as e:
+            # Un error de conexión con el verificador no invalida el archivo: se puede reintentar
+            if "conexión" not in str(e).lower():
+                almacenamiento.eliminar(plano.url)
+                self.plano_repo.delete(plano_id, usuario_id)
+            raise
+        
+        progreso("guardando", plano_id=plano_id)
+        self.plano_repo.set_archivo_info(plano_id, info.mime_type or self._mime_type(Path(plano.url).name), info.tamano)
+        self.plano_repo.update(plano_id, usuario_id, PlanoUpdate(medidas_extraidas=medidas_extraidas))
+        plano = self.plano_repo.update_estado(plano_id, usuario_id, "completado")
+        self._guardar_modelo3d(plano_id, verification_data)
+        return PlanoResponse.from_orm(plano)
+
+    def _preparar(self, file_content: bytes, filename: str) -> PlanoPreparado:
+        """
+        Pre-validar el archivo antes del conversor (ArchivoInvalido si no puede ser un plano).
+        Desactivada o sin Pillow/pypdfium2/resvg-py se envía tal cual, con su tipo real.
+        """
+        if settings.PLANO_PREVALIDACION:
+            try:
+                # Decodificar y reducir un escaneo es CPU pura: va a un proceso para no frenar al resto
+                preparado = _en_pool_preparacion(
+                    prevalidar, file_content, filename,
+                    lado_min=settings.PLANO_MIN_LADO,
+                    lado_max=settings.PLANO_CONVERTER_MAX_LADO,
+                    dpi=settings.PLANO_RASTER_DPI,
+                    min_desviacion=settings.PLANO_MIN_DESVIACION,
+                    max_megapixeles=settings.PLANO_MAX_MEGAPIXELES,
+                    normalizar=settings.PLANO_NORMALIZAR
+                )
+                if preparado.modificado:
+                    print(f"🖼️ Plano preparado para el conversor: {preparado.mime_type_original} "
+                          f"{preparado.ancho_original}x{preparado.alto_original} -> {preparado.mime_type} "
+                          f"{preparado.ancho}x{preparado.alto} ({len(preparado.contenido) / 1024:.0f} KB)")
+                return preparado
+            except ImportError as e:
+                print(f"⚠️ Pre-validación no disponible ({e.name} no está instalado): el plano se envía sin validar")
+        mime_type = detectar_tipo(file_content) or self._mime_type(filename)
+        return PlanoPreparado(file_content, filename, mime_type, mime_type, 0, 0, 0, 0)
+
+    def _verificar_plano(self, preparado: PlanoPreparado,
+                         progreso: Seguimiento = SIN_SEGUIMIENTO) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Verificar con FloorPlanTo3D-API que el archivo es un plano; devuelve (modelo 3D, medidas)"""
         print(f"🔍 Verificando que el archivo es un plano válido...")
+        progreso("convirtiendo")
         
         try:
-            # Llamar a FloorPlanTo3D-API para verificar que es un plano
-            flask_url = settings.FLOORPLAN_API_URL
-            response = requests.post(
-                f"{flask_url}/convert",
-                files={"file": (filename, file_content, "image/png")},
-                params={"format": "threejs"},
-                timeout=60  # 60 segundos para verificación
+            # Llamar a FloorPlanTo3D-API (la réplica con menos carga) para verificar que es un plano
+            response = get_converter_dispatcher().convertir(
+                preparado.filename, preparado.contenido,
+                timeout=60,  # 60 segundos para verificación
+                mime_type=preparado.mime_type
             )
             
             # Manejar diferentes tipos de errores
@@ -54,7 +221,7 @@ class PlanoService:
             
             # Verificar que la respuesta contiene datos de plano
             try:
-                verification_data = response.json()
+                verification_data = self._reescalar_modelo(response.json(), preparado)
             except ValueError:
                 raise Exception("El archivo no es un plano arquitectónico válido. Respuesta inválida del sistema.")
             
@@ -64,6 +231,7 @@ class PlanoService:
             print(f"✅ Verificación exitosa: {len(verification_data.get('objects', []))} objetos detectados")
             
             # 🔍 EXTRAER MEDIDAS del plano
+            progreso("midiendo", objetos=len(verification_data.get('objects', [])))
             medidas_extraidas = self._extract_measurements(verification_data)
             print(f"📏 Medidas extraídas: {medidas_extraidas}")
             
@@ -80,59 +248,60 @@ class PlanoService:
             else:
                 raise Exception(f"El archivo no es un plano arquitectónico válido: {str(e)}")
         
-        # PASO 2: Si la verificación es exitosa, subir a Google Drive
-        file_url = None
-        try:
-            # Determinar el tipo MIME basado en la extensión del archivo
-            mime_type = 'image/jpeg'  # Por defecto
-            if filename.lower().endswith('.png'):
-                mime_type = 'image/png'
-            elif filename.lower().endswith('.gif'):
-                mime_type = 'image/gif'
-            elif filename.lower().endswith('.webp'):
-                mime_type = 'image/webp'
-            
-            print(f"📤 Subiendo archivo verificado a Google Drive...")
-            
-            # Subir archivo a Google Drive
-            file_url = google_drive_service.upload_file(
-                file_content=file_content,
-                filename=filename,
-                mime_type=mime_type
-            )
-            
-            if not file_url:
-                raise Exception("Error al subir archivo a Google Drive")
-            
-            print(f"✅ Archivo subido exitosamente a Google Drive")
-                
-        except Exception as e:
-            print(f"❌ Error subiendo archivo a Google Drive: {e}")
-            raise Exception(f"Error al subir archivo: {str(e)}")
-        
-        # PASO 3: Crear registro en BD con estado 'completado' (ya verificado y convertido)
-        # Agregar medidas extraídas al plano_data
-        plano_data_with_measures = PlanoCreate(
-            nombre=plano_data.nombre,
-            formato=plano_data.formato,
-            tipo_plano=plano_data.tipo_plano,
-            descripcion=plano_data.descripcion,
-            medidas_extraidas=medidas_extraidas
-        )
-        plano = self.plano_repo.create(plano_data_with_measures, usuario_id, file_url)
-        
-        # Actualizar estado a completado ya que ya fue verificado y convertido
-        self.plano_repo.update_estado(plano.id, usuario_id, "completado")
-        
-        # PASO 4: Guardar datos del modelo 3D directamente
+        return verification_data, medidas_extraidas
+
+    @staticmethod
+    def _reescalar_modelo(datos: Dict[str, Any], preparado: PlanoPreparado) -> Dict[str, Any]:
+        """
+        Llevar el modelo a la escala de la imagen original: el conversor mide sobre la imagen
+        que recibe y la normalización pudo reducirla. Solo se tocan las medidas en planta
+        (x/z, ancho/profundidad y bounds); la altura de paredes y aberturas no sale de la imagen.
+        """
+        if not preparado.modificado or not isinstance(datos, dict):
+            return datos
+        escala = preparado.escala
+        reescalar = settings.PLANO_REESCALAR_MODELO and escala not in (0, 1)
+        if reescalar:
+            factor = 1 / escala
+            for obj in datos.get('objects', []):
+                dimensions, position = obj.get('dimensions') or {}, obj.get('position') or {}
+                for campos, valores in ((('width', 'depth'), dimensions), (('x', 'z'), position)):
+                    for campo in campos:
+                        if isinstance(valores.get(campo), (int, float)):
+                            valores[campo] *= factor
+            bounds = (datos.get('scene') or {}).get('bounds') or {}
+            for campo in ('width', 'height'):
+                if isinstance(bounds.get(campo), (int, float)):
+                    bounds[campo] *= factor
+        datos.setdefault('metadata', {})['normalizacion'] = {
+            'escala': round(escala, 6),
+            'reescalado': reescalar,
+            'original': {'ancho': preparado.ancho_original, 'alto': preparado.alto_original},
+            'enviado': {'ancho': preparado.ancho, 'alto': preparado.alto, 'mime_type': preparado.mime_type},
+        }
+        return datos
+
+    def _guardar_modelo3d(self, plano_id: int, verification_data: Dict[str, Any]):
         try:
-            self.modelo3d_repo.update(plano.id, verification_data, "generado")
+            self.modelo3d_repo.update(plano_id, verification_data, "generado")
             print(f"✅ Modelo 3D guardado en base de datos")
         except Exception as e:
             print(f"⚠️ Error guardando modelo 3D: {e}")
             # No fallar por esto, el plano ya está creado
-        
-        return PlanoResponse.from_orm(plano)
+
+    @staticmethod
+    def _clave(filename: str) -> str:
+        """Clave única en el almacenamiento (el nombre original queda en plano.nombre)"""
+        return f"planos/{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+
+    @staticmethod
+    def _mime_type(filename: str) -> str:
+        """Tipo MIME basado en la extensión del archivo"""
+        return mimetypes.guess_type(filename)[0] or 'image/jpeg'
+
+    @staticmethod
+    def _tamano_max() -> int:
+        return settings.PLANO_MAX_MB * 1024 * 1024
 
     def get_plano(self, plano_id: int, usuario_id: int) -> Optional[PlanoResponse]:
         """Obtener un plano por ID"""
@@ -157,6 +326,24 @@ class PlanoService:
         
         return PlanoResponse.from_orm(plano)
 
+    def get_archivo(self, plano_id: int, usuario_id: int) -> Optional[ArchivoPlano]:
+        """
+        Datos para descargar el archivo de un plano del usuario. Los planos anteriores a las
+        columnas mime_type/tamano las completan desde el almacenamiento en su primera descarga.
+        """
+        fila = self.plano_repo.get_archivo(plano_id, usuario_id)
+        if not fila:
+            return None
+        
+        archivo = ArchivoPlano(*fila)
+        if archivo.url and (archivo.mime_type is None or archivo.tamano is None):
+            info = almacenamiento_de(archivo.url).info(archivo.url)
+            if info:
+                archivo.mime_type = info.mime_type or archivo.mime_type
+                archivo.tamano = info.tamano or None
+                self.plano_repo.set_archivo_info(plano_id, archivo.mime_type, archivo.tamano)
+        return archivo
+
     def get_planos_usuario(self, usuario_id: int, skip: int = 0, limit: int = 100) -> PlanoListResponse:
         """Obtener lista paginada de planos del usuario"""
         planos = self.plano_repo.get_all_by_usuario(usuario_id, skip, limit)
@@ -196,7 +383,8 @@ class PlanoService:
         """Eliminar un plano"""
         return self.plano_repo.delete(plano_id, usuario_id)
 
-    def convertir_a_3d(self, plano_id: int, usuario_id: int) -> Optional[Dict[str, Any]]:
+    def convertir_a_3d(self, plano_id: int, usuario_id: int,
+                       progreso: Seguimiento = SIN_SEGUIMIENTO) -> Optional[Dict[str, Any]]:
         """Convertir un plano a 3D usando el servicio Flask"""
         # Verificar que el plano existe y pertenece al usuario
         plano = self.plano_repo.get_by_id(plano_id, usuario_id)
@@ -218,33 +406,27 @@ class PlanoService:
                 print("Usando archivo de prueba para URL simulada")
                 with open("test_image.png", "rb") as f:
                     file_content = f.read()
-            elif plano.url.startswith('http'):
-                # Descargar archivo real de Google Drive
-                file_response = requests.get(plano.url, timeout=30)
-                if file_response.status_code == 200:
-                    file_content = file_response.content
-                else:
-                    raise Exception(f"No se pudo descargar el archivo de Google Drive: {file_response.status_code}")
             else:
-                # Archivo local
-                with open(plano.url, "rb") as f:
-                    file_content = f.read()
+                # Descargar del almacenamiento donde quedó el archivo (Drive, local o S3)
+                file_content = almacenamiento_de(plano.url).leer(plano.url)
+                if not file_content:
+                    raise Exception("No se pudo descargar el archivo del plano")
+            preparado = self._preparar(file_content, plano.nombre)
             
             # Llamar al servicio Flask para conversión real
-            flask_url = settings.FLOORPLAN_API_URL
             datos_json = None
             
             try:
-                print(f"🚀 Llamando a FloorPlanTo3D-API: {flask_url}/convert?format=threejs")
-                response = requests.post(
-                    f"{flask_url}/convert",
-                    files={"file": (plano.nombre, file_content, "image/png")},
-                    params={"format": "threejs"},  # Formato optimizado para Three.js
-                    timeout=120  # 120 segundos para procesamiento
+                print(f"🚀 Llamando a FloorPlanTo3D-API: /convert?format=threejs")
+                progreso("convirtiendo", plano_id=plano_id)
+                response = get_converter_dispatcher().convertir(
+                    preparado.filename, preparado.contenido,
+                    timeout=120,  # 120 segundos para procesamiento
+                    mime_type=preparado.mime_type
                 )
                 
                 if response.status_code == 200:
-                    datos_json = response.json()
+                    datos_json = self._reescalar_modelo(response.json(), preparado)
                     print("✅ Conversión exitosa desde FloorPlanTo3D-API")
                     print(f"📊 Datos recibidos: {len(datos_json.get('objects', []))} objetos detectados")
                 else:
@@ -258,6 +440,7 @@ class PlanoService:
                 raise Exception(error_msg)
             
             # Guardar modelo3d
+            progreso("guardando", plano_id=plano_id)
             modelo3d = self.modelo3d_repo.update(plano_id, datos_json, "generado")
             
             # Cambiar estado a completado
@@ -521,4 +704,57 @@ class PlanoService:
                 'num_puertas': 0,
                 'objetos': [],
                 'error': str(e)
-            }
\ No newline at end of file
+            }
+
+def purgar_pendientes(max_segundos: Optional[int] = None) -> int:
+    """
+    Borrar los planos de subida directa que siguen sin confirmar después de `max_segundos`
+    (por defecto PLANO_PENDIENTE_MAX_SECONDS) y su archivo, si llegó a subirse; devuelve cuántos
+    """
+    maximo = settings.PLANO_PENDIENTE_MAX_SECONDS if max_segundos is None else max_segundos
+    antes_de = datetime.utcnow() - timedelta(seconds=maximo)
+    db = SessionLocal()
+    borrados = 0
+    try:
+        plano_repo = PlanoRepository(db)
+        for plano in plano_repo.get_pendientes_vencidos(antes_de):
+            url = plano.url
+            # La fila se borra primero: sin plano pendiente la URL firmada ya no acepta el archivo
+            if plano_repo.delete_pendiente_vencido(plano.id, antes_de):
+                if url:
+                    almacenamiento = almacenamiento_de(url)
+                    if almacenamiento.info(url) is not None:
+                        almacenamiento.eliminar(url)
+                borrados += 1
+    finally:
+        db.close()
+    if borrados:
+        print(f"🗑️ {borrados} planos sin confirmar eliminados")
+    return borrados
+
+@lru_cache(maxsize=1)
+def get_pool_preparacion() -> ProcessPoolExecutor:
+    """Procesos que pre-validan y normalizan planos, creados en el primer uso ("spawn" evita heredar hilos y conexiones)"""
+    return ProcessPoolExecutor(
+        max_workers=settings.PLANO_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    )
+
+_pool_lock = threading.Lock()
+
+def _en_pool_preparacion(fn, *args, **kwargs):
+    """
+    Ejecutar en el pool de preparación. Si un proceso murió (sin memoria, un crash de pdfium)
+    el pool queda roto para todas las peticiones: se reemplaza y se reintenta una vez, porque
+    el archivo de esta petición pudo no ser el culpable. Si vuelve a romperse, el archivo se rechaza.
+    """
+    for intento in range(2):
+        pool = get_pool_preparacion()
+        try:
+            return pool.submit(fn, *args, **kwargs).result()
+        except BrokenProcessPool:
+            with _pool_lock:
+                if get_pool_preparacion() is pool:  # Otra petición ya pudo reemplazarlo
+                    get_pool_preparacion.cache_clear()
+            pool.shutdown(wait=False, cancel_futures=True)
+            print(f"⚠️ Pool de preparación de planos roto (intento {intento + 1}): se recrea")
+    raise ArchivoInvalido("No se pudo procesar el archivo: su validación agotó los recursos del servidor")
@@ -0,0 +1,259 @@
+"""
+Importación masiva de precios de materiales (CSV o JSON) como tarea en segundo plano
+
+1. El archivo se valida en el request (filas con error se informan por número de fila).
+2. La tarea carga las filas en una tabla temporal y resuelve código -> material y precio anterior.
+3. Un único UPDATE … FROM actualiza materiales.precio_base.
+4. Las líneas de materiales_modelo3d que usaban el precio anterior se recalculan con
+   UPDATE … FROM por lotes de materiales (cada lote avanza el progreso).
+   Con `forzar=True` se recalculan todas, incluso las que tenían un precio manual.
+   Cada lote suma la diferencia de subtotales a los costos materializados por modelo 3D.
+
+Todo es una sola transacción: las líneas se reconocen por tener el precio anterior, así que
+si se guardaran los precios nuevos y la tarea se cortara antes de las líneas, volver a importar
+el mismo archivo ya no las encontraría. Un error deja todo como estaba y se puede reintentar.
+El commit dispara la invalidación del catálogo y de los precios cacheados
+(ver material_catalog_service.on_catalog_change). El estado de las tareas vive en memoria
+del worker que las ejecuta.
+"""
+
+import csv
+import io
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, and_, func, select, update
+
+from database import SessionLocal, engine
+from models.material import Material
+from models.material_modelo3d import MaterialModelo3D
+from repositories.costo_modelo3d_repository import CostoModelo3DRepository
+
+MAX_ARCHIVO_MB = 20
+LOTE_MATERIALES = 500  # Materiales por UPDATE de líneas (acota el tamaño de cada sentencia)
+
+@dataclass
+class FilaPrecio:
+    fila: int
+    precio: float
+    material_id: Optional[int] = None
+    codigo: Optional[str] = None
+
+def _precio(valor, decimal_coma: bool) -> float:
+    if isinstance(valor, str):
+        valor = valor.strip().replace("$", "")
+        if decimal_coma and "," in valor:
+            valor = valor.replace(".", "").replace(",", ".")  # 1.234,56 -> 1234.56
+    precio = float(valor)
+    if precio < 0 or precio != precio:
+        raise ValueError("el precio debe ser un número mayor o igual a 0")
+    return precio
+
+def _fila_desde_dict(numero: int, datos: dict, decimal_coma: bool = False) -> FilaPrecio:
+    precio = datos.get("precio", datos.get("precio_base"))
+    if precio in (None, ""):
+        raise ValueError("falta la columna precio")
+    material_id = datos.get("material_id", datos.get("id"))
+    codigo = datos.get("codigo")
+    if material_id not in (None, ""):
+        return FilaPrecio(numero, _precio(precio, decimal_coma), material_id=int(material_id))
+    if codigo not in (None, "") and str(codigo).strip():
+        return FilaPrecio(numero, _precio(precio, decimal_coma), codigo=str(codigo).strip())
+    raise ValueError("falta codigo o material_id")
+
+def parse_archivo(contenido: bytes, nombre_archivo: str) -> Tuple[List[FilaPrecio], List[dict]]:
+    """
+    Filas válidas y errores ({"fila", "error"}) de un CSV (columnas codigo|material_id y precio;
+    separador , o ;) o de un JSON (lista de objetos con las mismas claves).
+    """
+    if len(contenido) > MAX_ARCHIVO_MB * 1024 * 1024:
+        raise ValueError(f"El archivo supera el máximo de {MAX_ARCHIVO_MB} MB")
+    texto = contenido.decode("utf-8-sig")
+    filas, errores = [], []
+
+    if nombre_archivo.lower().endswith(".json"):
+        datos = json.loads(texto)
+        if isinstance(datos, dict):
+            datos = datos.get("precios", [])
+        if not isinstance(datos, list):
+            raise ValueError("El JSON debe ser una lista de objetos {codigo|material_id, precio}")
+        for numero, item in enumerate(datos, start=1):
+            try:
+                filas.append(_fila_desde_dict(numero, item))
+            except (ValueError, TypeError, AttributeError) as e:
+                errores.append({"fila": numero, "error": str(e)})
+        return filas, errores
+
+    separador = ";" if texto.split("\n", 1)[0].count(";") > texto.split("\n", 1)[0].count(",") else ","
+    lector = csv.DictReader(io.StringIO(texto), delimiter=separador)
+    lector.fieldnames = [(columna or "").strip().lower() for columna in (lector.fieldnames or [])]
+    if "precio" not in lector.fieldnames and "precio_base" not in lector.fieldnames:
+        raise ValueError("El CSV debe tener una columna 'precio' y otra 'codigo' o 'material_id'")
+    for numero, item in enumerate(lector, start=2):  # La fila 1 es el encabezado
+        try:
+            filas.append(_fila_desde_dict(numero, item, decimal_coma=separador == ";"))
+        except (ValueError, TypeError) as e:
+            errores.append({"fila": numero, "error": str(e)})
+    return filas, errores
+
+@dataclass
+class ImportJob:
+    """Estado de una importación (lo que devuelve GET /materiales/precios/importar/{job_id})"""
+    id: str
+    total_filas: int
+    forzar: bool = False
+    estado: str = "pendiente"  # pendiente | procesando | completado | error
+    etapa: str = "en cola"
+    progreso: float = 0.0
+    materiales_actualizados: int = 0
+    lineas_actualizadas: int = 0
+    errores: List[dict] = field(default_factory=list)
+    mensaje: Optional[str] = None
+    duraciones_ms: Dict[str, float] = field(default_factory=dict)
+    fecha_creacion: datetime = field(default_factory=datetime.utcnow)
+    fecha_fin: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "etapa": self.etapa,
+            "progreso": round(self.progreso, 3),
+            "total_filas": self.total_filas,
+            "forzar": self.forzar,
+            "materiales_actualizados": self.materiales_actualizados,
+            "lineas_actualizadas": self.lineas_actualizadas,
+            "errores": self.errores[:100],
+            "total_errores": len(self.errores),
+            "mensaje": self.mensaje,
+            "duraciones_ms": self.duraciones_ms,
+            "fecha_creacion": self.fecha_creacion.isoformat(),
+            "fecha_fin": self.fecha_fin.isoformat() if self.fecha_fin else None,
+        }
+
+class ImportJobRegistry:
+    """Tareas recientes en memoria (se conservan las últimas `max_jobs`)"""
+
+    def __init__(self, max_jobs: int = 100):
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, ImportJob] = {}
+        self._lock = threading.Lock()
+
+    def create(self, total_filas: int, errores: List[dict], forzar: bool) -> ImportJob:
+        job = ImportJob(id=uuid.uuid4().hex, total_filas=total_filas, errores=list(errores), forzar=forzar)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.pop(next(iter(self._jobs)))
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+price_import_jobs = ImportJobRegistry()
+
+def _tabla_temporal(nombre: str) -> Table:
+    return Table(
+        nombre, MetaData(),
+        Column("fila", Integer, primary_key=True),
+        Column("material_id", Integer, index=True),
+        Column("codigo", String(50)),
+        Column("precio", Float, nullable=False),
+        Column("precio_anterior", Float),
+        prefixes=["TEMPORARY"],
+    )
+
+def run_import(job: ImportJob, filas: List[FilaPrecio]):
+    """Ejecutar la importación (BackgroundTasks la corre en un hilo después de responder)"""
+    job.estado, job.etapa = "procesando", "preparando"
+    inicio = time.perf_counter()
+    staging = _tabla_temporal(f"tmp_precios_{job.id[:12]}")
+    materiales = Material.__table__
+    lineas = MaterialModelo3D.__table__
+
+    # Conexión dedicada: la tabla temporal vive en ella hasta el DROP posterior al commit
+    with engine.connect() as conexion:
+        db = SessionLocal(bind=conexion)
+        try:
+            staging.create(db.connection())  # Dentro de la transacción de la sesión, que es quien hace commit
+            db.execute(staging.insert(), [
+                {"fila": f.fila, "material_id": f.material_id, "codigo": f.codigo, "precio": f.precio} for f in filas
+            ])
+            # Resolver códigos y precio anterior; filas sin material quedan con material_id NULL
+            db.execute(update(staging).where(staging.c.codigo.isnot(None)).values(
+                material_id=select(materiales.c.id).where(materiales.c.codigo == staging.c.codigo).scalar_subquery()
+            ))
+            db.execute(update(staging).values(
+                precio_anterior=select(materiales.c.precio_base).where(materiales.c.id == staging.c.material_id).scalar_subquery()
+            ))
+            sin_material = db.execute(
+                select(staging.c.fila).where(staging.c.precio_anterior.is_(None)).order_by(staging.c.fila)
+            ).scalars().all()
+            job.errores.extend({"fila": fila, "error": "material no encontrado"} for fila in sin_material)
+            # Un mismo material repetido: gana la última fila del archivo
+            db.execute(staging.delete().where(
+                staging.c.precio_anterior.is_(None) | staging.c.fila.notin_(
+                    select(func.max(staging.c.fila)).group_by(staging.c.material_id)
+                )
+            ))
+            cambiados = db.execute(
+                select(staging.c.material_id).where(staging.c.precio != staging.c.precio_anterior).order_by(staging.c.material_id)
+            ).scalars().all()
+            job.duraciones_ms["preparacion"] = round((time.perf_counter() - inicio) * 1000, 1)
+
+            job.etapa = "actualizando materiales"
+            t = time.perf_counter()
+            resultado = db.execute(
+                update(Material).where(
+                    Material.id == staging.c.material_id,
+                    staging.c.precio != staging.c.precio_anterior
+                ).values(precio_base=staging.c.precio, fecha_actualizacion=datetime.utcnow()).execution_options(
+                    synchronize_session=False
+                )
+            )
+            job.materiales_actualizados = resultado.rowcount
+            job.duraciones_ms["materiales"] = round((time.perf_counter() - t) * 1000, 1)
+
+            job.etapa = "recalculando líneas de modelos 3D"
+            t = time.perf_counter()
+            total_lotes = max(1, -(-len(cambiados) // LOTE_MATERIALES))
+            job.progreso = 1 / (total_lotes + 1)
+            for i in range(0, len(cambiados), LOTE_MATERIALES):
+                lote = cambiados[i:i + LOTE_MATERIALES]
+                condiciones = [lineas.c.material_id == staging.c.material_id, staging.c.material_id.in_(lote)]
+                if not job.forzar:
+                    # Solo líneas que seguían el precio de catálogo; los precios manuales se respetan
+                    condiciones.append(lineas.c.precio_unitario == staging.c.precio_anterior)
+                # Los costos materializados reciben la diferencia en la misma transacción del lote
+                CostoModelo3DRepository.ajustar_subtotales(db, lineas.c.cantidad * staging.c.precio, *condiciones)
+                resultado = db.execute(update(lineas).where(and_(*condiciones)).values(
+                    precio_unitario=staging.c.precio,
+                    subtotal=lineas.c.cantidad * staging.c.precio
+                ))
+                job.lineas_actualizadas += resultado.rowcount
+                job.progreso = (i // LOTE_MATERIALES + 2) / (total_lotes + 1)
+            db.commit()  # Precios, líneas y costos juntos; invalida catálogo y precios cacheados (on_catalog_change)
+            job.duraciones_ms["lineas"] = round((time.perf_counter() - t) * 1000, 1)
+
+            job.estado, job.etapa, job.progreso = "completado", "completado", 1.0
+            job.mensaje = (f"{job.materiales_actualizados} materiales y {job.lineas_actualizadas} líneas actualizadas")
+            print(f"✅ Importación de precios {job.id}: {job.mensaje}")
+        except Exception as e:
+            db.rollback()
+            job.estado, job.mensaje = "error", str(e)
+            print(f"❌ Error en importación de precios {job.id}: {e}")
+        finally:
+            db.close()
+            try:
+                staging.drop(conexion, checkfirst=True)
+                conexion.commit()
+            except Exception as e:
+                print(f"⚠️ No se pudo eliminar la tabla temporal {staging.name}: {e}")
+            job.duraciones_ms["total"] = round((time.perf_counter() - inicio) * 1000, 1)
+            job.fecha_fin = datetime.utcnow()
@@ -0,0 +1,230 @@
+"""
+Motor de precios de cotizaciones
+
+Los precios, descuentos e IVA se calculan en el servidor con Decimal; lo que envía el
+cliente como precio_unitario/subtotal/total se ignora. Una cotización carga todos sus
+precios con una sola consulta IN (más una para la lista de precios del usuario y otra
+para los descuentos por volumen).
+
+Para /cotizaciones/preview se usa PriceCache: los mismos datos con un TTL corto, que se
+invalida al cambiar el catálogo, la lista de precios de un usuario o los descuentos.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from repositories.material_repository import MaterialRepository
+from repositories.precio_repository import PrecioRepository
+from services.material_catalog_service import on_catalog_change
+
+CENTAVO = Decimal("0.01")
+CIEN = Decimal(100)
+
+def _decimal(valor) -> Decimal:
+    # str() evita arrastrar el error binario del float (0.1 -> 0.1000000000000000055...)
+    return valor if isinstance(valor, Decimal) else Decimal(str(valor))
+
+def _redondear(valor: Decimal) -> Decimal:
+    return valor.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+class MaterialesNoEncontrados(Exception):
+    """Alguna línea referencia un material que no existe"""
+    def __init__(self, material_ids: List[int]):
+        self.material_ids = material_ids
+        super().__init__(f"Materiales no encontrados: {material_ids}")
+
+@dataclass
+class CotizacionCalculada:
+    """Resultado del motor: líneas listas para MaterialCotizacion y totales en Decimal"""
+    materiales: List[dict] = field(default_factory=list)
+    subtotal: Decimal = Decimal(0)
+    descuento: Decimal = Decimal(0)
+    iva: Decimal = Decimal(0)
+    total: Decimal = Decimal(0)
+    iva_porcentaje: Decimal = Decimal(0)
+
+    def totales(self) -> dict:
+        return {
+            "subtotal": float(self.subtotal),
+            "descuento": float(self.descuento),
+            "iva_porcentaje": float(self.iva_porcentaje),
+            "iva": float(self.iva),
+            "total": float(self.total),
+        }
+
+class TablaDescuentos:
+    """Descuentos por volumen indexados por alcance (material, categoría, general)"""
+
+    def __init__(self, descuentos: Iterable):
+        self._por_material: Dict[int, list] = {}
+        self._por_categoria: Dict[int, list] = {}
+        self._generales: list = []
+        for d in descuentos:
+            escalon = (d.cantidad_minima, _decimal(d.porcentaje), d.categoria_id)
+            if d.material_id is not None:
+                self._por_material.setdefault(d.material_id, []).append(escalon)
+            elif d.categoria_id is not None:
+                self._por_categoria.setdefault(d.categoria_id, []).append(escalon)
+            else:
+                self._generales.append(escalon)
+
+    def porcentaje(self, material_id: int, categoria_id: int, cantidad: float) -> Decimal:
+        """Mayor porcentaje entre los escalones alcanzados por la cantidad"""
+        mejor = Decimal(0)
+        for escalones in (self._por_material.get(material_id, ()), self._por_categoria.get(categoria_id, ()), self._generales):
+            for minima, porcentaje, categoria in escalones:
+                if cantidad >= minima and porcentaje > mejor and (categoria is None or categoria == categoria_id):
+                    mejor = porcentaje
+        return mejor
+
+def calcular_cotizacion(
+    lineas: Iterable[Tuple[int, float]],
+    materiales: Dict[int, object],
+    precios_usuario: Dict[int, float],
+    descuentos: TablaDescuentos,
+    iva_porcentaje: Optional[float] = None,
+) -> CotizacionCalculada:
+    """
+    Calcular líneas y totales. `lineas` son pares (material_id, cantidad); las líneas repetidas
+    de un mismo material se agrupan para que el descuento por volumen considere la cantidad total.
+    """
+    cantidades: Dict[int, float] = {}
+    for material_id, cantidad in lineas:
+        cantidades[material_id] = cantidades.get(material_id, 0) + cantidad
+
+    faltantes = [m for m in cantidades if m not in materiales]
+    if faltantes:
+        raise MaterialesNoEncontrados(faltantes)
+
+    resultado = CotizacionCalculada(
+        iva_porcentaje=_decimal(settings.IVA_PORCENTAJE if iva_porcentaje is None else iva_porcentaje)
+    )
+    subtotal = Decimal(0)
+    descuento_total = Decimal(0)
+    for material_id, cantidad in cantidades.items():
+        material = materiales[material_id]
+        precio = _decimal(precios_usuario.get(material_id, material.precio_base))
+        porcentaje = descuentos.porcentaje(material_id, material.categoria_id, cantidad)
+        bruto = precio * _decimal(cantidad)
+        descuento = _redondear(bruto * porcentaje / CIEN)
+        linea_subtotal = _redondear(bruto) - descuento
+        subtotal += linea_subtotal
+        descuento_total += descuento
+        resultado.materiales.append({
+            "material_id": material_id,
+            "nombre": material.nombre,
+            "categoria": material.categoria_nombre,
+            "unidad_medida": material.unidad_medida,
+            "cantidad": cantidad,
+            "precio_unitario": float(precio),
+            "descuento_pct": float(porcentaje),
+            "subtotal": float(linea_subtotal),
+        })
+
+    resultado.subtotal = subtotal
+    resultado.descuento = descuento_total
+    resultado.iva = _redondear(subtotal * resultado.iva_porcentaje / CIEN)
+    resultado.total = subtotal + resultado.iva
+    return resultado
+
+def recalcular_totales(subtotal, iva_porcentaje: Optional[float] = None) -> CotizacionCalculada:
+    """IVA y total para un subtotal ya conocido (p. ej. al revisar solo algunas líneas)"""
+    resultado = CotizacionCalculada(
+        subtotal=_redondear(_decimal(subtotal)),
+        iva_porcentaje=_decimal(settings.IVA_PORCENTAJE if iva_porcentaje is None else iva_porcentaje)
+    )
+    resultado.iva = _redondear(resultado.subtotal * resultado.iva_porcentaje / CIEN)
+    resultado.total = resultado.subtotal + resultado.iva
+    return resultado
+
+def cotizar(db: Session, usuario_id: int, lineas: List[Tuple[int, float]]) -> CotizacionCalculada:
+    """Precio autoritativo (sin caché) para guardar una cotización"""
+    ids = {material_id for material_id, _ in lineas}
+    return calcular_cotizacion(
+        lineas,
+        MaterialRepository.get_pricing_rows(db, ids),
+        PrecioRepository.get_user_prices(db, usuario_id, ids),
+        TablaDescuentos(PrecioRepository.get_discounts(db, solo_activos=True)),
+    )
+
+class PriceCache:
+    """
+    Caché en memoria con TTL corto de los datos que usa el motor: filas de precio por material,
+    lista de precios por usuario y tabla de descuentos. Solo la usa el preview; guardar una
+    cotización siempre consulta la base.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._materiales: Dict[int, Tuple[float, object]] = {}
+        self._usuarios: Dict[int, Tuple[float, Dict[int, float]]] = {}
+        self._descuentos: Optional[Tuple[float, TablaDescuentos]] = None
+        self._lock = threading.Lock()
+
+    def _vigente(self, cargado_en: float) -> bool:
+        return time.monotonic() - cargado_en < self.ttl_seconds
+
+    def materiales(self, db: Session, ids: Iterable[int]) -> Dict[int, object]:
+        encontrados, faltantes = {}, []
+        with self._lock:
+            for material_id in set(ids):
+                entrada = self._materiales.get(material_id)
+                if entrada and self._vigente(entrada[0]):
+                    encontrados[material_id] = entrada[1]
+                else:
+                    faltantes.append(material_id)
+        if faltantes:
+            cargados = MaterialRepository.get_pricing_rows(db, faltantes)
+            ahora = time.monotonic()
+            with self._lock:
+                for material_id, fila in cargados.items():
+                    self._materiales[material_id] = (ahora, fila)
+            encontrados.update(cargados)
+        return encontrados
+
+    def precios_usuario(self, db: Session, usuario_id: int) -> Dict[int, float]:
+        with self._lock:
+            entrada = self._usuarios.get(usuario_id)
+        if entrada and self._vigente(entrada[0]):
+            return entrada[1]
+        precios = PrecioRepository.get_user_prices(db, usuario_id)
+        with self._lock:
+            self._usuarios[usuario_id] = (time.monotonic(), precios)
+        return precios
+
+    def descuentos(self, db: Session) -> TablaDescuentos:
+        entrada = self._descuentos
+        if entrada and self._vigente(entrada[0]):
+            return entrada[1]
+        tabla = TablaDescuentos(PrecioRepository.get_discounts(db, solo_activos=True))
+        self._descuentos = (time.monotonic(), tabla)
+        return tabla
+
+    def invalidate_materiales(self, changes=None):
+        with self._lock:
+            self._materiales.clear()
+
+    def invalidate_usuario(self, usuario_id: int):
+        with self._lock:
+            self._usuarios.pop(usuario_id, None)
+
+    def invalidate_descuentos(self):
+        self._descuentos = None
+
+price_cache = PriceCache(ttl_seconds=settings.PRICE_CACHE_TTL_SECONDS)
+on_catalog_change(price_cache.invalidate_materiales)
+
+def cotizar_preview(db: Session, usuario_id: int, lineas: List[Tuple[int, float]]) -> CotizacionCalculada:
+    """Precio de vista previa desde PriceCache (puede tener hasta PRICE_CACHE_TTL_SECONDS de antigüedad)"""
+    return calcular_cotizacion(
+        lineas,
+        price_cache.materiales(db, (material_id for material_id, _ in lineas)),
+        price_cache.precios_usuario(db, usuario_id),
+        price_cache.descuentos(db),
+    )
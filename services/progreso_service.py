@@ -0,0 +1,190 @@
+"""
+Progreso de la subida y conversión de planos para GET /planos/progreso/{seguimiento} (SSE)
+
+El cliente genera una clave de seguimiento (un UUID), se suscribe a su canal y la envía con
+POST /planos/, POST /planos/{id}/confirmar o POST /planos/{id}/convertir. Cada etapa se
+publica en el canal "<usuario_id>:<clave>": recibido, validando, convirtiendo, midiendo,
+guardando y, al final, listo o error.
+
+El bus se elige con PROGRESO_BACKEND:
+- "memoria": reparte en el mismo proceso (un solo worker de uvicorn)
+- "postgres": publica con pg_notify y cada worker escucha con LISTEN y reparte a sus
+  suscriptores locales, así la petición y la suscripción pueden caer en workers distintos
+
+Las etapas se publican desde el threadpool (PlanoService es síncrono; los endpoints async usan
+Seguimiento.publicar) y se entregan a colas asyncio de los suscriptores con call_soon_threadsafe.
+Cada canal recuerda su último evento para que un suscriptor que llega tarde sepa en qué etapa
+va la operación.
+"""
+
+import asyncio
+import json
+import select
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+ETAPAS = ("recibido", "validando", "convirtiendo", "midiendo", "guardando", "listo", "error")
+ETAPAS_FINALES = {"listo", "error"}
+
+Suscriptor = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+class BusProgreso:
+    """Pub/sub en memoria: canal -> colas de los suscriptores de este proceso"""
+
+    nombre = "memoria"
+
+    def __init__(self, canales_recordados: int = 10_000):
+        self._suscriptores: Dict[str, Set[Suscriptor]] = {}
+        self._ultimos: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._canales_recordados = canales_recordados
+        self._lock = threading.Lock()
+
+    def publicar(self, canal: str, evento: Dict[str, Any]):
+        """Publicar un evento (se puede llamar desde cualquier hilo)"""
+        self._entregar(canal, evento)
+
+    def _entregar(self, canal: str, evento: Dict[str, Any]):
+        with self._lock:
+            self._ultimos[canal] = evento
+            self._ultimos.move_to_end(canal)
+            if len(self._ultimos) > self._canales_recordados:
+                self._ultimos.popitem(last=False)
+            suscriptores = list(self._suscriptores.get(canal, ()))
+        for loop, cola in suscriptores:
+            try:
+                loop.call_soon_threadsafe(cola.put_nowait, evento)
+            except RuntimeError:
+                pass  # Event loop cerrado: el suscriptor ya se fue
+
+    @asynccontextmanager
+    async def suscribir(self, canal: str) -> AsyncIterator[asyncio.Queue]:
+        """Cola con los eventos del canal; empieza con el último publicado, si hay"""
+        suscriptor = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._suscriptores.setdefault(canal, set()).add(suscriptor)
+            ultimo = self._ultimos.get(canal)
+        if ultimo is not None:
+            suscriptor[1].put_nowait(ultimo)
+        try:
+            yield suscriptor[1]
+        finally:
+            with self._lock:
+                restantes = self._suscriptores.get(canal)
+                if restantes is not None:
+                    restantes.discard(suscriptor)
+                    if not restantes:
+                        del self._suscriptores[canal]
+
+    def suscriptores(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._suscriptores.values())
+
+class BusProgresoPostgres(BusProgreso):
+    """NOTIFY para publicar y un hilo con LISTEN por worker que entrega a los suscriptores locales"""
+
+    nombre = "postgres"
+    CANAL_PG = "plano_progreso"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._escucha: Optional[threading.Thread] = None
+
+    def publicar(self, canal: str, evento: Dict[str, Any]):
+        from sqlalchemy import text
+        from database import engine
+
+        self._iniciar_escucha()
+        payload = json.dumps({"canal": canal, "evento": evento})
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:canal_pg, :payload)"),
+                         {"canal_pg": self.CANAL_PG, "payload": payload})
+
+    @asynccontextmanager
+    async def suscribir(self, canal: str) -> AsyncIterator[asyncio.Queue]:
+        self._iniciar_escucha()
+        async with super().suscribir(canal) as cola:
+            yield cola
+
+    def _iniciar_escucha(self):
+        if self._escucha is not None:
+            return
+        with self._lock:
+            if self._escucha is None:
+                self._escucha = threading.Thread(target=self._escuchar, name="progreso-listen", daemon=True)
+                self._escucha.start()
+
+    def _escuchar(self):
+        from database import engine
+
+        while True:
+            try:
+                # Conexión propia fuera del pool: queda tomada mientras viva el worker
+                conn = engine.raw_connection().detach().driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.CANAL_PG}")
+                print(f"✅ Escuchando progreso de planos en Postgres ({self.CANAL_PG})")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        datos = json.loads(conn.notifies.pop(0).payload)
+                        self._entregar(datos["canal"], datos["evento"])
+            except Exception as e:
+                print(f"⚠️ Escucha de progreso interrumpida, reconectando: {e}")
+                time.sleep(1)
+
+class Seguimiento:
+    """Publicar las etapas de una operación de un usuario; sin clave no publica nada"""
+
+    def __init__(self, usuario_id: int, clave: Optional[str], bus: Optional[BusProgreso] = None):
+        self.canal = canal_de(usuario_id, clave) if clave else None
+        self._bus = bus
+        self._secuencia = 0
+
+    def __call__(self, etapa: str, **datos):
+        if self.canal is None:
+            return
+        self._secuencia += 1
+        evento = {"etapa": etapa, "secuencia": self._secuencia, "ts": time.time(), **datos}
+        try:
+            (self._bus or get_bus_progreso()).publicar(self.canal, evento)
+        except Exception as e:
+            # El progreso es informativo: nunca hace fallar la operación
+            print(f"⚠️ No se pudo publicar el progreso '{etapa}': {e}")
+
+    async def publicar(self, etapa: str, **datos):
+        """
+        Igual que llamarlo, desde una corrutina: con el bus de Postgres publicar es un pg_notify
+        síncrono (conexión y commit) y no puede correr en el event loop
+        """
+        if self.canal is None:
+            return
+        if (self._bus or get_bus_progreso()).nombre == BusProgreso.nombre:
+            self(etapa, **datos)  # En memoria solo encola: no bloquea
+        else:
+            await run_in_threadpool(self, etapa, **datos)
+
+SIN_SEGUIMIENTO = Seguimiento(0, None)
+
+def canal_de(usuario_id: int, clave: str) -> str:
+    return f"{usuario_id}:{clave}"
+
+def formato_sse(evento: Dict[str, Any]) -> str:
+    """Evento en formato text/event-stream (el id permite a EventSource reanudar)"""
+    return f"id: {evento['secuencia']}\nevent: {evento['etapa']}\ndata: {json.dumps(evento)}\n\n"
+
+@lru_cache(maxsize=1)
+def get_bus_progreso() -> BusProgreso:
+    """Bus del worker según PROGRESO_BACKEND"""
+    if settings.PROGRESO_BACKEND == "postgres":
+        return BusProgresoPostgres()
+    return BusProgreso()
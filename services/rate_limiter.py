@@ -0,0 +1,67 @@
+"""
+Limitador de tasa en memoria basado en token buckets
+"""
+
+import threading
+import time
+from typing import Dict, Tuple
+
+class TokenBucket:
+    """Bucket con `capacity` tokens que se recargan a `refill_per_second`"""
+
+    __slots__ = ("capacity", "refill_per_second", "tokens", "updated_at")
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def consume(self, now: float, tokens: float = 1.0) -> Tuple[bool, float]:
+        """Consumir tokens. Devuelve (permitido, segundos hasta tener tokens suficientes)"""
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated_at = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True, 0.0
+        return False, (tokens - self.tokens) / self.refill_per_second
+
+class RateLimiter:
+    """
+    Conjunto de token buckets indexados por clave (IP, cuenta, etc.).
+    Los buckets llenos e inactivos se descartan periódicamente para acotar la memoria.
+    """
+
+    def __init__(self, per_minute: int, burst: int = None, prune_every: int = 1024):
+        self.capacity = float(burst or per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._prune_every = prune_every
+        self._calls = 0
+
+    def hit(self, key: str) -> Tuple[bool, float]:
+        """Registrar un intento para `key`. Devuelve (permitido, retry_after en segundos)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.capacity, self.refill_per_second)
+            allowed, retry_after = bucket.consume(now)
+            self._calls += 1
+            if self._calls % self._prune_every == 0:
+                self._prune(now)
+        return allowed, retry_after
+
+    def reset(self, key: str):
+        """Olvidar el historial de una clave"""
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def _prune(self, now: float):
+        # Un bucket que ya se habría recargado por completo equivale a uno nuevo
+        full_after = self.capacity / self.refill_per_second
+        stale = [k for k, b in self._buckets.items() if now - b.updated_at >= full_after]
+        for key in stale:
+            del self._buckets[key]
@@ -0,0 +1,385 @@
+"""
+Almacenamiento de archivos (planos y texturas) con backends intercambiables
+
+- drive: Google Drive, el comportamiento histórico. No genera URL firmadas: Drive no envía
+  cabeceras CORS ni permite subir sin credenciales, así que la API sigue haciendo de proxy.
+- local: directorio LOCAL_STORAGE_DIR (services/local_image_service.py). Las URL firmadas con
+  HMAC (SECRET_KEY) apuntan a /storage/... de esta misma API (routers/storage.py), que sirve
+  o escribe el archivo sin pasar por ningún endpoint de negocio.
+- s3: cualquier servicio compatible con S3 (AWS, MinIO, R2; moto en los benchmarks). Las URL
+  prefirmadas van directo al bucket: los bytes del archivo no pasan por la API.
+
+Cada ubicación guardada en la base de datos (plano.url, texturas.almacenamiento_url) indica su
+backend (https://drive.google.com/..., /uploads/... o s3://bucket/clave) y `almacenamiento_de`
+resuelve el que corresponde: cambiar STORAGE_BACKEND no rompe los archivos anteriores.
+"""
+
+import hashlib
+import hmac
+import mimetypes
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+from urllib.parse import quote, urlencode
+
+import requests
+
+from config import settings
+from .google_drive_service import get_google_drive_service
+from .local_image_service import URL_PREFIX, local_image_service
+
+# Carpetas del almacenamiento local que se sirven sin firma (montaje /uploads/textures en main.py)
+CARPETAS_PUBLICAS = {"textures"}
+STORAGE_PREFIX = "/storage"
+# Tamaño de cada parte al transmitir un archivo sin cargarlo entero en memoria
+TAMANO_PARTE = 64 * 1024
+# Ubicación que devuelve GoogleDriveService.upload_file (AlmacenamientoDrive.leer la descarga tal cual)
+_UBICACION_DRIVE = re.compile(r"https://drive\.google\.com/uc\?export=view&id=[\w-]+")
+
+def content_disposition(nombre: str) -> str:
+    """Cabecera de descarga; los nombres no ASCII van codificados (RFC 6266), como en FileResponse"""
+    codificado = quote(nombre)
+    if codificado != nombre:
+        return f"attachment; filename*=utf-8''{codificado}"
+    return f'attachment; filename="{nombre}"'
+
+def _rango_http(inicio: int, fin: Optional[int]) -> Optional[str]:
+    if not inicio and fin is None:
+        return None
+    return f"bytes={inicio}-{'' if fin is None else fin}"
+
+def _recortar(partes: Iterable[bytes], inicio: int, fin: Optional[int]) -> Iterator[bytes]:
+    """Bytes [inicio, fin] de un flujo completo (para orígenes que ignoran Range)"""
+    posicion = 0
+    for parte in partes:
+        desde, hasta = max(inicio - posicion, 0), len(parte) if fin is None else min(fin + 1 - posicion, len(parte))
+        posicion += len(parte)
+        if desde < hasta:
+            yield parte[desde:hasta]
+        if fin is not None and posicion > fin:
+            break
+
+@dataclass
+class ObjetoInfo:
+    """Metadatos de un archivo ya guardado (para verificar una subida directa sin leerla)"""
+    tamano: int
+    mime_type: Optional[str] = None
+
+class Almacenamiento:
+    """
+    Interfaz común. `clave` es la ruta lógica del archivo (p. ej. planos/<uuid>.png) y la
+    ubicación es lo que se guarda en la base de datos. `url_descarga` y `subida_directa`
+    devuelven None cuando el backend no las soporta y la API debe hacer de proxy.
+    """
+    nombre = ""
+    # True si url_descarga caduca (no se puede redirigir con 301 ni cachear como inmutable)
+    url_firmada = False
+
+    def guardar(self, clave: str, contenido: bytes, mime_type: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def leer(self, ubicacion: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def info(self, ubicacion: str) -> Optional[ObjetoInfo]:
+        raise NotImplementedError
+
+    def eliminar(self, ubicacion: str) -> bool:
+        raise NotImplementedError
+
+    def abrir(self, ubicacion: str, inicio: int = 0, fin: Optional[int] = None) -> Optional[Iterator[bytes]]:
+        """Bytes [inicio, fin] (fin incluido, None = hasta el final) por partes, o None si no existe"""
+        contenido = self.leer(ubicacion)
+        if contenido is None:
+            return None
+        return iter([contenido[inicio:None if fin is None else fin + 1]])
+
+    def url_descarga(self, ubicacion: str, nombre_descarga: Optional[str] = None) -> Optional[str]:
+        return None
+
+    def subida_directa(self, clave: str, mime_type: str, tamano_max: int) -> Optional[dict]:
+        """
+        Subida sin pasar por la API: {"metodo", "url", "campos" (POST de formulario) o
+        "headers" (PUT), "ubicacion", "expira_en"}
+        """
+        return None
+
+class AlmacenamientoDrive(Almacenamiento):
+    nombre = "drive"
+
+    @staticmethod
+    def _file_id(ubicacion: str) -> str:
+        return ubicacion.rsplit("id=", 1)[-1]
+
+    def guardar(self, clave: str, contenido: bytes, mime_type: str) -> Optional[str]:
+        return get_google_drive_service().upload_file(
+            file_content=contenido, filename=Path(clave).name, mime_type=mime_type
+        )
+
+    def leer(self, ubicacion: str) -> Optional[bytes]:
+        response = requests.get(ubicacion, timeout=30)
+        if response.status_code != 200:
+            print(f"❌ No se pudo descargar el archivo de Google Drive: {response.status_code}")
+            return None
+        return response.content
+
+    def info(self, ubicacion: str) -> Optional[ObjetoInfo]:
+        archivo = get_google_drive_service().get_file_info(self._file_id(ubicacion))
+        if not archivo:
+            return None
+        return ObjetoInfo(tamano=int(archivo.get("size") or 0), mime_type=archivo.get("mimeType"))
+
+    def eliminar(self, ubicacion: str) -> bool:
+        return get_google_drive_service().delete_file(self._file_id(ubicacion))
+
+    def abrir(self, ubicacion: str, inicio: int = 0, fin: Optional[int] = None) -> Optional[Iterator[bytes]]:
+        rango = _rango_http(inicio, fin)
+        response = requests.get(ubicacion, headers={"Range": rango} if rango else None, stream=True, timeout=30)
+        if response.status_code not in (200, 206):
+            print(f"❌ No se pudo descargar el archivo de Google Drive: {response.status_code}")
+            response.close()
+            return None
+        return self._partes(response, inicio, fin, recortar=bool(rango) and response.status_code == 200)
+
+    @staticmethod
+    def _partes(response, inicio: int, fin: Optional[int], recortar: bool) -> Iterator[bytes]:
+        try:
+            partes = response.iter_content(TAMANO_PARTE)
+            # Un 200 a una petición con Range trae el archivo completo
+            yield from _recortar(partes, inicio, fin) if recortar else partes
+        finally:
+            response.close()
+
+class AlmacenamientoLocal(Almacenamiento):
+    nombre = "local"
+    url_firmada = True
+
+    @staticmethod
+    def _carpeta(clave: str) -> str:
+        return Path(clave).parent.as_posix() or "textures"
+
+    @staticmethod
+    def _ruta_relativa(ubicacion: str) -> str:
+        return ubicacion[len(URL_PREFIX) + 1:]
+
+    @staticmethod
+    def firmar(metodo: str, ruta: str, expira: int, tamano_max: int = 0, mime_type: str = "") -> str:
+        mensaje = f"{metodo}\n{ruta}\n{expira}\n{tamano_max}\n{mime_type}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), mensaje, hashlib.sha256).hexdigest()
+
+    @classmethod
+    def verificar(cls, metodo: str, ruta: str, expira: int, firma: str, tamano_max: int = 0, mime_type: str = "") -> bool:
+        if expira < time.time():
+            return False
+        return hmac.compare_digest(cls.firmar(metodo, ruta, expira, tamano_max, mime_type), firma)
+
+    def guardar(self, clave: str, contenido: bytes, mime_type: str) -> Optional[str]:
+        return local_image_service.save_as(contenido, Path(clave).name, self._carpeta(clave))
+
+    def leer(self, ubicacion: str) -> Optional[bytes]:
+        ruta = local_image_service.path_for(ubicacion)
+        if not ruta or not ruta.is_file():
+            return None
+        return ruta.read_bytes()
+
+    def info(self, ubicacion: str) -> Optional[ObjetoInfo]:
+        ruta = local_image_service.path_for(ubicacion)
+        if not ruta or not ruta.is_file():
+            return None
+        return ObjetoInfo(tamano=ruta.stat().st_size, mime_type=mimetypes.guess_type(ruta.name)[0])
+
+    def eliminar(self, ubicacion: str) -> bool:
+        return local_image_service.delete_image(ubicacion)
+
+    def abrir(self, ubicacion: str, inicio: int = 0, fin: Optional[int] = None) -> Optional[Iterator[bytes]]:
+        ruta = local_image_service.path_for(ubicacion)
+        if not ruta or not ruta.is_file():
+            return None
+        return self._partes(open(ruta, "rb"), inicio, fin)
+
+    @staticmethod
+    def _partes(archivo, inicio: int, fin: Optional[int]) -> Iterator[bytes]:
+        with archivo:
+            archivo.seek(inicio)
+            restante = None if fin is None else fin + 1 - inicio
+            while restante is None or restante > 0:
+                parte = archivo.read(TAMANO_PARTE if restante is None else min(TAMANO_PARTE, restante))
+                if not parte:
+                    break
+                if restante is not None:
+                    restante -= len(parte)
+                yield parte
+
+    def url_descarga(self, ubicacion: str, nombre_descarga: Optional[str] = None) -> Optional[str]:
+        ruta = self._ruta_relativa(ubicacion)
+        if ruta.split("/", 1)[0] in CARPETAS_PUBLICAS:
+            return ubicacion
+        expira = int(time.time()) + settings.STORAGE_URL_EXPIRATION_SECONDS
+        parametros = {"expira": expira, "firma": self.firmar("GET", ruta, expira)}
+        if nombre_descarga:
+            parametros["nombre"] = nombre_descarga
+        return f"{STORAGE_PREFIX}/{quote(ruta)}?{urlencode(parametros)}"
+
+    def subida_directa(self, clave: str, mime_type: str, tamano_max: int) -> Optional[dict]:
+        ubicacion = local_image_service.ubicacion(Path(clave).name, self._carpeta(clave))
+        ruta = self._ruta_relativa(ubicacion)
+        expira = int(time.time()) + settings.STORAGE_URL_EXPIRATION_SECONDS
+        parametros = {
+            "expira": expira, "tamano_max": tamano_max,
+            "firma": self.firmar("PUT", ruta, expira, tamano_max, mime_type),
+        }
+        return {
+            "metodo": "PUT",
+            "url": f"{STORAGE_PREFIX}/{quote(ruta)}?{urlencode(parametros)}",
+            "headers": {"Content-Type": mime_type},
+            "ubicacion": ubicacion,
+            "expira_en": settings.STORAGE_URL_EXPIRATION_SECONDS,
+        }
+
+class AlmacenamientoS3(Almacenamiento):
+    """Servicio compatible con S3; boto3 se importa en el primer uso (no se carga al importar main)"""
+    nombre = "s3"
+    url_firmada = True
+
+    def __init__(self):
+        self.bucket = settings.S3_BUCKET
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client(
+                        "s3",
+                        endpoint_url=settings.S3_ENDPOINT_URL,
+                        region_name=settings.S3_REGION,
+                        aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+                        config=Config(signature_version="s3v4"),
+                    )
+        return self._client
+
+    def _clave(self, ubicacion: str) -> str:
+        return ubicacion[len(f"s3://{self.bucket}/"):]
+
+    def guardar(self, clave: str, contenido: bytes, mime_type: str) -> Optional[str]:
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=clave, Body=contenido, ContentType=mime_type)
+            return f"s3://{self.bucket}/{clave}"
+        except Exception as e:
+            print(f"❌ Error subiendo {clave} a S3: {e}")
+            return None
+
+    def leer(self, ubicacion: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._clave(ubicacion))["Body"].read()
+        except Exception as e:
+            print(f"❌ Error leyendo {ubicacion} de S3: {e}")
+            return None
+
+    def info(self, ubicacion: str) -> Optional[ObjetoInfo]:
+        from botocore.exceptions import ClientError
+
+        try:
+            objeto = self.client.head_object(Bucket=self.bucket, Key=self._clave(ubicacion))
+        except ClientError:
+            return None
+        return ObjetoInfo(tamano=objeto["ContentLength"], mime_type=objeto.get("ContentType"))
+
+    def eliminar(self, ubicacion: str) -> bool:
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self._clave(ubicacion))
+            return True
+        except Exception as e:
+            print(f"❌ Error eliminando {ubicacion} de S3: {e}")
+            return False
+
+    def abrir(self, ubicacion: str, inicio: int = 0, fin: Optional[int] = None) -> Optional[Iterator[bytes]]:
+        from botocore.exceptions import ClientError
+
+        parametros = {"Bucket": self.bucket, "Key": self._clave(ubicacion)}
+        rango = _rango_http(inicio, fin)
+        if rango:
+            parametros["Range"] = rango
+        try:
+            cuerpo = self.client.get_object(**parametros)["Body"]
+        except ClientError as e:
+            print(f"❌ Error leyendo {ubicacion} de S3: {e}")
+            return None
+        return self._partes(cuerpo)
+
+    @staticmethod
+    def _partes(cuerpo) -> Iterator[bytes]:
+        try:
+            yield from cuerpo.iter_chunks(TAMANO_PARTE)
+        finally:
+            cuerpo.close()
+
+    def url_descarga(self, ubicacion: str, nombre_descarga: Optional[str] = None) -> Optional[str]:
+        parametros = {"Bucket": self.bucket, "Key": self._clave(ubicacion)}
+        if nombre_descarga:
+            parametros["ResponseContentDisposition"] = content_disposition(nombre_descarga)
+        return self.client.generate_presigned_url(
+            "get_object", Params=parametros, ExpiresIn=settings.STORAGE_URL_EXPIRATION_SECONDS
+        )
+
+    def subida_directa(self, clave: str, mime_type: str, tamano_max: int) -> Optional[dict]:
+        # POST de formulario: a diferencia de un PUT prefirmado, S3 rechaza el archivo si excede el tamaño
+        formulario = self.client.generate_presigned_post(
+            self.bucket, clave,
+            Fields={"Content-Type": mime_type},
+            Conditions=[{"Content-Type": mime_type}, ["content-length-range", 1, tamano_max]],
+            ExpiresIn=settings.STORAGE_URL_EXPIRATION_SECONDS,
+        )
+        return {
+            "metodo": "POST",
+            "url": formulario["url"],
+            "campos": formulario["fields"],
+            "ubicacion": f"s3://{self.bucket}/{clave}",
+            "expira_en": settings.STORAGE_URL_EXPIRATION_SECONDS,
+        }
+
+_BACKENDS = {"drive": AlmacenamientoDrive, "local": AlmacenamientoLocal, "s3": AlmacenamientoS3}
+_instancias: Dict[str, Almacenamiento] = {}
+_instancias_lock = threading.Lock()
+
+def get_storage(nombre: Optional[str] = None) -> Almacenamiento:
+    """Backend por nombre (por defecto STORAGE_BACKEND), creado en el primer uso"""
+    nombre = nombre or settings.STORAGE_BACKEND
+    if nombre not in _instancias:
+        with _instancias_lock:
+            if nombre not in _instancias:
+                if nombre not in _BACKENDS:
+                    raise ValueError(f"Almacenamiento desconocido: {nombre}")
+                _instancias[nombre] = _BACKENDS[nombre]()
+    return _instancias[nombre]
+
+def es_ubicacion_guardada(ubicacion: Optional[str]) -> bool:
+    """
+    Si la ubicación tiene la forma de las que guardan los backends. Un valor que editó un
+    usuario (Material.imagen_url) se valida con esto antes de leerlo desde el servidor:
+    cualquier otra URL sería un GET a un host arbitrario desde la red interna.
+    """
+    if not ubicacion:
+        return False
+    if ubicacion.startswith(f"{URL_PREFIX}/"):
+        return local_image_service.path_for(ubicacion) is not None
+    if ubicacion.startswith("s3://"):
+        return bool(settings.S3_BUCKET) and ubicacion.startswith(f"s3://{settings.S3_BUCKET}/")
+    return _UBICACION_DRIVE.fullmatch(ubicacion) is not None
+
+def almacenamiento_de(ubicacion: str) -> Almacenamiento:
+    """Backend donde está guardada una ubicación de la base de datos"""
+    if ubicacion.startswith("s3://"):
+        return get_storage("s3")
+    if ubicacion.startswith(f"{URL_PREFIX}/"):
+        return get_storage("local")
+    return get_storage("drive")
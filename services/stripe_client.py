@@ -0,0 +1,16 @@
+"""
+Cliente de Stripe inicializado en el primer uso
+"""
+
+from functools import lru_cache
+from config import settings
+
+@lru_cache(maxsize=1)
+def get_stripe():
+    """
+    Importar y configurar el SDK de Stripe.
+    El import es costoso, así que se difiere hasta la primera petición que lo necesita.
+    """
+    import stripe
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
@@ -0,0 +1,55 @@
+"""
+Procesamiento de texturas para el visor 3D (se ejecuta en el pool de procesos del pipeline)
+
+Three.js solo genera mipmaps y usa RepeatWrapping sin reescalar cuando la textura mide una
+potencia de 2 por lado. Cada textura se lleva a esa forma (lado máximo TEXTURE_MAX_SIZE) y
+se codifica en WebP junto con la cadena de derivados a la mitad hasta TEXTURE_MIN_SIZE:
+el visor descarga el nivel que necesita y los mismos PNG/WebP sirven de entrada a toktx
+para generar KTX2 fuera de la API.
+Requiere Pillow (import diferido para no cargarlo al arrancar la API).
+"""
+
+import io
+from typing import List
+
+def potencia_de_2(valor: int, maximo: int) -> int:
+    """Mayor potencia de 2 que no supera `valor` ni `maximo` (como floorPowerOfTwo de Three.js)"""
+    potencia = 1
+    # Nunca se amplía: ampliar solo agrega bytes sin agregar detalle
+    while potencia * 2 <= min(valor, maximo):
+        potencia *= 2
+    return potencia
+
+def procesar_textura(contenido: bytes, tamano_max: int, tamano_min: int, calidad: int) -> dict:
+    """
+    Derivados WebP potencia de 2 de una imagen:
+    {"ancho_original", "alto_original", "variantes": [{"ancho", "alto", "contenido"}]}
+    ordenados del más grande al más chico. ValueError si la imagen no se puede leer.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        imagen = Image.open(io.BytesIO(contenido))
+        imagen.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError(f"No se pudo leer la imagen: {e}")
+
+    imagen = ImageOps.exif_transpose(imagen)  # Fotos de celular rotadas por EXIF
+    ancho_original, alto_original = imagen.size
+    con_alfa = imagen.mode in ("RGBA", "LA", "PA") or (imagen.mode == "P" and "transparency" in imagen.info)
+    imagen = imagen.convert("RGBA" if con_alfa else "RGB")
+
+    ancho = potencia_de_2(ancho_original, tamano_max)
+    alto = potencia_de_2(alto_original, tamano_max)
+    variantes: List[dict] = []
+    nivel = imagen.resize((ancho, alto), Image.LANCZOS) if (ancho, alto) != imagen.size else imagen
+    while True:
+        buffer = io.BytesIO()
+        nivel.save(buffer, format="WEBP", quality=calidad, method=4)
+        variantes.append({"ancho": nivel.width, "alto": nivel.height, "contenido": buffer.getvalue()})
+        if max(nivel.size) // 2 < tamano_min:
+            break
+        # Cada nivel sale del anterior, como la cadena de mipmaps
+        nivel = nivel.resize((max(1, nivel.width // 2), max(1, nivel.height // 2)), Image.LANCZOS)
+
+    return {"ancho_original": ancho_original, "alto_original": alto_original, "variantes": variantes}
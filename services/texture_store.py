@@ -0,0 +1,216 @@
+"""
+Almacén de texturas direccionado por contenido
+
+Cada archivo se guarda una sola vez, con el SHA-256 de sus bytes como nombre, y se publica en
+/texturas/<hash>.<ext> (routers/textura.py). Como el contenido detrás de esa URL nunca cambia,
+se sirve con Cache-Control immutable y el navegador descarga una sola vez la textura aunque la
+usen muchos materiales. Subir una imagen ya conocida no vuelve a subir nada: los derivados se
+buscan por el hash de la imagen original (se salta también el reescalado) y cada archivo por
+su propio hash.
+
+texturas.referencias cuenta los materiales que usan cada archivo y se actualiza en la misma
+transacción que modifica imagen_url / imagen_variantes (eventos de sesión, igual que los costos
+materializados). `purgar` borra del almacenamiento los archivos que quedaron sin referencias
+hace más de TEXTURE_ORPHAN_GRACE_SECONDS: el plazo cubre a una subida que ya encontró el
+archivo pero todavía no hizo commit del material que lo usa.
+"""
+
+import hashlib
+import re
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models.material import Material
+from models.textura import Textura
+from repositories.textura_repository import TexturaRepository
+from .local_image_service import local_image_service
+from .storage_service import almacenamiento_de, get_storage
+
+_URL_TEXTURA = re.compile(r"/texturas/([0-9a-f]{64})\.")
+_REFERENCIAS = "texturas_referencias"
+
+def calcular_hash(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+def hash_de(url: Optional[str]) -> Optional[str]:
+    """Hash de una URL /texturas/<hash>.<ext> (None para URL externas)"""
+    coincidencia = _URL_TEXTURA.search(url or "")
+    return coincidencia.group(1) if coincidencia else None
+
+def hashes_en(imagen_url: Optional[str], imagen_variantes: Optional[dict]) -> set:
+    """Hashes de las texturas del almacén que usa un material"""
+    urls = [imagen_url, *(imagen_variantes or {}).values()]
+    return {hash for hash in map(hash_de, urls) if hash}
+
+class TextureStore:
+    """Guardar, resolver y purgar texturas por hash (cada operación abre su propia sesión: se usa desde hilos)"""
+
+    def __init__(self):
+        # hash -> (extension, mime_type, almacenamiento_url): nunca cambia mientras el archivo exista
+        self._ubicaciones: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _subir(contenido: bytes, nombre: str, mime_type: str) -> Optional[str]:
+        """Subir al almacenamiento de TEXTURE_STORAGE; si falla, guardar en el almacenamiento local"""
+        almacenamiento = get_storage(settings.TEXTURE_STORAGE)
+        url = almacenamiento.guardar(f"textures/{nombre}", contenido, mime_type)
+        if url or almacenamiento.nombre == "local":
+            return url
+        print(f"⚠️ {almacenamiento.nombre} falló, guardando {nombre} localmente...")
+        return get_storage("local").guardar(f"textures/{nombre}", contenido, mime_type)
+
+    @staticmethod
+    def _borrar(almacenamiento_url: str) -> bool:
+        return almacenamiento_de(almacenamiento_url).eliminar(almacenamiento_url)
+
+    def guardar(self, contenido: bytes, extension: str, mime_type: str,
+                ancho: Optional[int] = None, alto: Optional[int] = None) -> Optional[str]:
+        """Devolver la URL pública del archivo, subiéndolo solo si su hash no estaba guardado"""
+        hash = calcular_hash(contenido)
+        db = SessionLocal()
+        try:
+            existente = TexturaRepository.get(db, hash)
+            if existente:
+                TexturaRepository.touch(db, hash)
+                return existente.url
+
+            almacenamiento_url = self._subir(contenido, f"{hash}{extension}", mime_type)
+            if not almacenamiento_url:
+                return None
+            textura = Textura(
+                hash=hash, extension=extension, mime_type=mime_type, tamano=len(contenido),
+                ancho=ancho, alto=alto, almacenamiento_url=almacenamiento_url, referencias=0
+            )
+            try:
+                return TexturaRepository.create(db, textura).url
+            except IntegrityError:
+                # Otra subida del mismo contenido ganó: se descarta la copia propia si es otro archivo
+                db.rollback()
+                existente = TexturaRepository.get(db, hash)
+                if existente.almacenamiento_url != almacenamiento_url:
+                    self._borrar(almacenamiento_url)
+                TexturaRepository.touch(db, hash)
+                return existente.url
+        finally:
+            db.close()
+
+    def registrar_origen(self, origen: str, urls: Iterable[str]):
+        """Anotar que estos derivados salen de la imagen con hash `origen` (solo con todos ya guardados)"""
+        db = SessionLocal()
+        try:
+            TexturaRepository.set_origen(db, origen, {hash_de(url) for url in urls} - {None})
+        finally:
+            db.close()
+
+    def buscar_derivados(self, origen: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """(imagen_url, variantes) ya guardados para la imagen con hash `origen`, o None"""
+        db = SessionLocal()
+        try:
+            derivados = TexturaRepository.get_by_origen(db, origen)
+            if not derivados:
+                return None
+            # Un derivado compartido con otra imagen conserva el origen de esa: la cadena debe estar completa
+            niveles, lado = 0, max(derivados[0].ancho, derivados[0].alto)
+            while True:
+                niveles += 1
+                if lado // 2 < settings.TEXTURE_MIN_SIZE:
+                    break
+                lado //= 2
+            if len(derivados) != niveles:
+                return None
+            for textura in derivados:
+                TexturaRepository.touch(db, textura.hash)
+            return derivados[0].url, {f"{t.ancho}x{t.alto}": t.url for t in derivados}
+        finally:
+            db.close()
+
+    def resolver(self, hash: str) -> Optional[tuple]:
+        """(extension, mime_type, almacenamiento_url) de una textura, o None si no existe"""
+        ubicacion = self._ubicaciones.get(hash)
+        if ubicacion is None:
+            db = SessionLocal()
+            try:
+                fila = TexturaRepository.get_ubicacion(db, hash)
+            finally:
+                db.close()
+            if fila is None:
+                return None
+            ubicacion = tuple(fila)
+            with self._lock:
+                self._ubicaciones[hash] = ubicacion
+        return ubicacion
+
+    def ruta_local(self, almacenamiento_url: str) -> Optional[Path]:
+        """Archivo en disco de una textura guardada localmente"""
+        return local_image_service.path_for(almacenamiento_url)
+
+    def purgar(self, gracia_segundos: Optional[int] = None) -> int:
+        """Borrar texturas sin referencias desde hace más de `gracia_segundos`; devuelve cuántas"""
+        gracia = settings.TEXTURE_ORPHAN_GRACE_SECONDS if gracia_segundos is None else gracia_segundos
+        antes_de = datetime.utcnow() - timedelta(seconds=gracia)
+        db = SessionLocal()
+        borradas = 0
+        try:
+            for textura in TexturaRepository.get_huerfanas(db, antes_de):
+                almacenamiento_url = textura.almacenamiento_url
+                # La fila se borra primero: si alguien la volvió a usar, el archivo se conserva
+                if TexturaRepository.delete_huerfana(db, textura.hash, antes_de):
+                    with self._lock:
+                        self._ubicaciones.pop(textura.hash, None)
+                    self._borrar(almacenamiento_url)
+                    borradas += 1
+        finally:
+            db.close()
+        if borradas:
+            print(f"🗑️ {borradas} texturas sin referencias eliminadas")
+        return borradas
+
+texture_store = TextureStore()
+
+@event.listens_for(Session, "after_flush")
+def _collect_texture_references(session, flush_context):
+    deltas = session.info.setdefault(_REFERENCIAS, {})
+
+    def sumar(hashes, delta):
+        for hash in hashes:
+            deltas[hash] = deltas.get(hash, 0) + delta
+
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, Material):
+            continue
+        estado = inspect(obj)
+        actuales = hashes_en(obj.imagen_url, obj.imagen_variantes)
+        if obj in session.new:
+            sumar(actuales, 1)
+        elif obj in session.deleted:
+            sumar(actuales, -1)
+        else:
+            url, variantes = estado.attrs.imagen_url.history, estado.attrs.imagen_variantes.history
+            if not (url.has_changes() or variantes.has_changes()):
+                continue
+            anteriores = hashes_en(
+                url.deleted[0] if url.deleted else obj.imagen_url,
+                variantes.deleted[0] if variantes.deleted else obj.imagen_variantes
+            )
+            sumar(actuales - anteriores, 1)
+            sumar(anteriores - actuales, -1)
+
+@event.listens_for(Session, "before_commit")
+def _apply_texture_references(session):
+    session.flush()
+    deltas = session.info.pop(_REFERENCIAS, None)
+    if deltas:
+        TexturaRepository.sumar_referencias(session, deltas)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_texture_references(session):
+    session.info.pop(_REFERENCIAS, None)
@@ -1,10 +1,21 @@
 """
 Servicio para subir texturas/imágenes de materiales a Google Drive
+
+TexturePipeline procesa y sube las texturas sin bloquear el event loop: el reescalado y la
+codificación WebP (services/texture_processing.py) corren en un pool de procesos y la subida
+de cada derivado, que usa el cliente síncrono de Drive, en un pool de hilos. Los archivos se
+guardan en el almacén direccionado por contenido (services/texture_store.py).
 """
 
-from typing import Optional
-from .google_drive_service import google_drive_service
-from .local_image_service import local_image_service
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from config import settings
+from .texture_processing import procesar_textura
+from .texture_store import calcular_hash, texture_store
 
 class TextureUploadService:
     """Servicio para gestionar subida de texturas"""
@@ -12,70 +23,37 @@ class TextureUploadService:
     @staticmethod
     def upload_texture(file_content: bytes, filename: str, material_name: str) -> Optional[str]:
         """
-        Subir una imagen de textura a Google Drive (con fallback local)
+        Guardar una imagen de textura sin procesar en el almacén direccionado por contenido
         
         Args:
             file_content: Contenido binario del archivo
             filename: Nombre original del archivo
-            material_name: Nombre del material para el nombre del archivo
+            material_name: Nombre del material (solo para el log)
             
         Returns:
-            URL pública del archivo subido o None si falla
+            URL pública estable (/texturas/<hash>.<ext>) o None si falla
         """
+        import os
+
+        extension = os.path.splitext(filename)[1].lower()
+        # Determinar tipo MIME
+        mime_types = {
+            '.jpg': 'image/jpeg',
+            '.jpeg': 'image/jpeg',
+            '.png': 'image/png',
+            '.gif': 'image/gif',
+            '.webp': 'image/webp',
+            '.bmp': 'image/bmp'
+        }
+        mime_type = mime_types.get(extension, 'image/jpeg')
+
+        # El almacén no vuelve a subir un contenido ya guardado; si Drive falla guarda localmente
+        print(f"📤 Guardando textura de '{material_name}'...")
         try:
-            # Generar nombre de archivo único
-            import os
-            from datetime import datetime
-            
-            extension = os.path.splitext(filename)[1].lower()
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_material_name = material_name.replace(" ", "_").lower()
-            new_filename = f"texture_{safe_material_name}_{timestamp}{extension}"
-            
-            # Determinar tipo MIME
-            mime_types = {
-                '.jpg': 'image/jpeg',
-                '.jpeg': 'image/jpeg',
-                '.png': 'image/png',
-                '.gif': 'image/gif',
-                '.webp': 'image/webp',
-                '.bmp': 'image/bmp'
-            }
-            mime_type = mime_types.get(extension, 'image/jpeg')
-            
-            # Intentar subir a Google Drive primero
-            print(f"📤 Intentando subir a Google Drive...")
-            file_url = google_drive_service.upload_file(
-                file_content=file_content,
-                filename=new_filename,
-                mime_type=mime_type
-            )
-            
-            if file_url:
-                print(f"✅ Subida a Google Drive exitosa")
-                return file_url
-            
-            # Si Google Drive falla, usar URL de Unsplash como placeholder temporal
-            print(f"⚠️ Google Drive falló, usando URL de Unsplash temporal...")
-            # Generar URL de Unsplash aleatoria
-            import random
-            width = random.choice([800, 1024, 1200])
-            seed = abs(hash(material_name)) % 10000
-            placeholder_url = f"https://source.unsplash.com/random/{width}x{width}/?texture,material,{safe_material_name}&sig={seed}"
-            print(f"🔗 URL temporal: {placeholder_url}")
-            return placeholder_url
-            
+            return texture_store.guardar(file_content, extension, mime_type)
         except Exception as e:
             print(f"❌ Error subiendo textura: {str(e)}")
-            # Usar URL de Unsplash como fallback
-            try:
-                import random
-                safe_material_name = material_name.replace(" ", "_").lower()
-                width = random.choice([800, 1024, 1200])
-                seed = abs(hash(material_name)) % 10000
-                return f"https://source.unsplash.com/random/{width}x{width}/?texture,material,{safe_material_name}&sig={seed}"
-            except:
-                return None
+            return None
     
     @staticmethod
     def validate_image_file(filename: str, file_size: int) -> tuple[bool, str]:
@@ -105,3 +83,97 @@ class TextureUploadService:
         return True, ""
 
 texture_upload_service = TextureUploadService()
+
+class TexturePipeline:
+    """Reescalado potencia de 2 + derivados WebP en procesos, subidas en hilos"""
+
+    def __init__(self, process_workers: int, upload_workers: int):
+        self.process_workers = process_workers
+        self.upload_workers = upload_workers
+        self._procesos: Optional[ProcessPoolExecutor] = None
+        self._hilos: Optional[ThreadPoolExecutor] = None
+
+    def _pool_procesos(self) -> ProcessPoolExecutor:
+        # Se crea en el primer uso; "spawn" evita heredar hilos y conexiones abiertas del servidor
+        if self._procesos is None:
+            self._procesos = ProcessPoolExecutor(
+                max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._procesos
+
+    def _pool_hilos(self) -> ThreadPoolExecutor:
+        if self._hilos is None:
+            self._hilos = ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="texturas")
+        return self._hilos
+
+    async def procesar_y_subir(self, file_content: bytes, filename: str, material_name: str) -> Tuple[Optional[str], Optional[Dict[str, str]]]:
+        """
+        Devolver (imagen_url, variantes {"ANCHOxALTO": url}) con imagen_url = el derivado más grande.
+        Sin Pillow la imagen se sube tal cual (variantes None). ValueError si la imagen no se puede leer.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            import PIL  # noqa: F401 (solo comprobar que está instalado; se usa en el pool)
+        except ImportError:
+            print("⚠️ Pillow no está instalado: la textura se sube sin procesar")
+            url = await loop.run_in_executor(
+                self._pool_hilos(), TextureUploadService.upload_texture, file_content, filename, material_name
+            )
+            return url, None
+
+        # Una imagen ya subida (aunque sea para otro material) reutiliza sus derivados sin reprocesarla
+        origen = calcular_hash(file_content)
+        existentes = await loop.run_in_executor(self._pool_hilos(), texture_store.buscar_derivados, origen)
+        if existentes:
+            print(f"♻️ Textura de '{material_name}' ya guardada: se reutilizan sus derivados")
+            return existentes
+
+        resultado = await self._procesar(file_content)
+        variantes = resultado["variantes"]
+        # Todos los derivados se guardan en paralelo; los que ya existen no se vuelven a subir
+        urls = await asyncio.gather(*(
+            loop.run_in_executor(
+                self._pool_hilos(), texture_store.guardar, v["contenido"], ".webp", "image/webp", v["ancho"], v["alto"]
+            )
+            for v in variantes
+        ))
+        if not all(urls):
+            return None, None
+        await loop.run_in_executor(self._pool_hilos(), texture_store.registrar_origen, origen, urls)
+        print(f"✅ Textura procesada: {resultado['ancho_original']}x{resultado['alto_original']} -> "
+              f"{len(variantes)} derivados WebP ({sum(len(v['contenido']) for v in variantes) / 1024:.0f} KB)")
+        return urls[0], {f"{v['ancho']}x{v['alto']}": url for v, url in zip(variantes, urls)}
+
+    async def _procesar(self, file_content: bytes) -> dict:
+        """
+        procesar_textura en el pool de procesos. Si un proceso murió (sin memoria, un crash del
+        decodificador) el pool queda roto para todas las subidas: se reemplaza y se reintenta una
+        vez; si vuelve a romperse, la imagen se rechaza (ValueError -> 400).
+        """
+        loop = asyncio.get_running_loop()
+        for intento in range(2):
+            pool = self._pool_procesos()
+            try:
+                return await loop.run_in_executor(
+                    pool, procesar_textura, file_content,
+                    settings.TEXTURE_MAX_SIZE, settings.TEXTURE_MIN_SIZE, settings.TEXTURE_WEBP_QUALITY
+                )
+            except BrokenProcessPool:
+                if self._procesos is pool:  # Otra subida ya pudo reemplazarlo
+                    self._procesos = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                print(f"⚠️ Pool de texturas roto (intento {intento + 1}): se recrea")
+        raise ValueError("No se pudo procesar la imagen: su procesamiento agotó los recursos del servidor")
+
+    def shutdown(self):
+        if self._procesos is not None:
+            self._procesos.shutdown(wait=False, cancel_futures=True)
+            self._procesos = None
+        if self._hilos is not None:
+            self._hilos.shutdown(wait=False)
+            self._hilos = None
+
+texture_pipeline = TexturePipeline(
+    process_workers=settings.TEXTURE_PROCESS_WORKERS,
+    upload_workers=settings.TEXTURE_UPLOAD_WORKERS
+)